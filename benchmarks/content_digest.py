@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Prompt size and content quality of the readability digest.
+
+Compares, for every page of the benchmark corpus and of the cluttered
+pages (articles inside cookie banners, menus and comment threads), the
+content that categorize_content used to send (main content text cut at
+MAX_CONTENT_LENGTH characters) with the readability digest
+(extract_digest, CONTENT_DIGEST_TOKENS budget):
+
+- tokens: prompt content tokens (token_budget.count_tokens, default provider)
+- precision: share of the sent text that is article text (the listed
+  article of cluttered pages; title, headings and <p> paragraphs of the
+  corpus pages, whose generator puts only article text in <p>)
+- lead: share of pages whose first article paragraph is sent
+- similarity: cosine similarity of the word counts of the sent text and
+  the whole article, a proxy for what the categorizer gets to see
+- ms: extraction time per page
+
+    python benchmarks/content_digest.py
+    python benchmarks/content_digest.py --tokens 1500 --json digest.json
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+import fixtures  # noqa: E402
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _nonspace(text):
+    return len(re.sub(r"\s+", "", text))
+
+
+def _cosine(a, b):
+    dot = sum(count * b[word] for word, count in a.items() if word in b)
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 0.0
+
+
+def article_parts(corpus_page, page):
+    """Title and headings, and the paragraphs of the article"""
+    if "article" in corpus_page:
+        return corpus_page["article"][:1], corpus_page["article"][1:]
+    headings = [page.title or ""] + [element.get_text(" ", strip=True) for element in page.soup.find_all(["h1", "h2", "h3"])]
+    paragraphs = [element.get_text(" ", strip=True) for element in page.soup.find_all("p")]
+    return [part for part in headings if part], [part for part in paragraphs if part]
+
+
+def measure(text, headings, paragraphs, article_words):
+    from tagwiseapp.reader.token_budget import count_tokens
+
+    leftover = text
+    for part in sorted(headings + paragraphs, key=len, reverse=True):
+        leftover = leftover.replace(part, "")
+    size = _nonspace(text)
+    lead = paragraphs[0][:60] in text if paragraphs else True
+    return {
+        "tokens": count_tokens(text),
+        "precision": 1 - _nonspace(leftover) / size if size else 0.0,
+        "lead": 1.0 if lead else 0.0,
+        "similarity": _cosine(Counter(WORD.findall(text.lower())), article_words),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=None, help="Digest token budget (default CONTENT_DIGEST_TOKENS)")
+    parser.add_argument("--pages", type=int, default=None, help="Limit the number of corpus pages")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    from tagwiseapp.reader.content_extractor import extract_content, extract_digest
+    from tagwiseapp.reader.html_utils import MAX_CONTENT_LENGTH, clean_html_content
+    from tagwiseapp.reader.parsed_page import ParsedPage
+
+    pages = fixtures.load_corpus()[:args.pages] + fixtures.generate_cluttered_pages()[:args.pages]
+    results = defaultdict(lambda: defaultdict(list))
+    for corpus_page in pages:
+        layout = corpus_page["url"].rsplit("/", 2)[-2]
+        if "article" in corpus_page:
+            layout = f"clutter/{layout}"
+        headings, paragraphs = article_parts(corpus_page, ParsedPage(corpus_page["html"], corpus_page["url"]))
+        article_words = Counter(WORD.findall(" ".join(headings + paragraphs).lower()))
+
+        start = time.perf_counter()
+        page = ParsedPage(corpus_page["html"], corpus_page["url"])
+        before = clean_html_content(extract_content(page))[:MAX_CONTENT_LENGTH]
+        before_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        page = ParsedPage(corpus_page["html"], corpus_page["url"])
+        after = extract_digest(page, args.tokens)
+        after_ms = (time.perf_counter() - start) * 1000
+
+        for name, text, ms in (("before", before, before_ms), ("digest", after, after_ms)):
+            row = measure(text, headings, paragraphs, article_words)
+            row["ms"] = ms
+            for group in (layout, "all"):
+                for key, value in row.items():
+                    results[group][f"{name}_{key}"].append(value)
+
+    summary = {group: {key: statistics.mean(values) for key, values in metrics.items()}
+               for group, metrics in results.items()}
+
+    print(f"{'layout':<16}{'pages':>6}  {'tokens':>15}  {'precision':>13}  {'lead':>11}  {'similarity':>11}  {'ms':>13}")
+    print(f"{'':<16}{'':>6}  {'before/digest':>15}  {'before/digest':>13}  {'':>11}  {'':>11}  {'':>13}")
+    for group in sorted(summary, key=lambda name: (name == "all", name)):
+        s = summary[group]
+        print(f"{group:<16}{len(results[group]['before_tokens']):>6}"
+              f"  {s['before_tokens']:>7.0f}/{s['digest_tokens']:<7.0f}"
+              f"  {s['before_precision']:>6.2f}/{s['digest_precision']:<6.2f}"
+              f"  {s['before_lead']:>5.2f}/{s['digest_lead']:<5.2f}"
+              f"  {s['before_similarity']:>5.2f}/{s['digest_similarity']:<5.2f}"
+              f"  {s['before_ms']:>6.1f}/{s['digest_ms']:<6.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""
+Fixtures for the reader pipeline benchmarks.
+
+- HTML corpus: gzipped JSON lines, one {"url", "html"} object per line.
+  benchmarks/corpus/pages.jsonl.gz holds 300 synthetic pages of 2 KB to
+  370 KB in seven layouts. It is generated on first use and is the same on
+  every machine, so only the generator is checked in.
+  `python benchmarks/fixtures.py record urls.txt` appends real pages to
+  benchmarks/corpus/recorded.jsonl.gz, which is loaded too when it exists.
+  No recorded set is checked in; commit one (and save a new baseline) to
+  share it.
+- Taxonomies: synthetic category trees and tag lists of a given size.
+- LLM outputs: the shapes correct_json_format has to repair.
+- Image server: a local HTTP server for og:image downloads, so thumbnail
+  extraction is measured without network access.
+- Cluttered pages: articles wrapped in cookie banners, menus and comment
+  threads, with the article text listed, for judging content extraction.
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import random
+import sys
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+CORPUS_PATH = os.path.join(CORPUS_DIR, "pages.jsonl.gz")
+RECORDED_PATH = os.path.join(CORPUS_DIR, "recorded.jsonl.gz")
+CORPUS_SIZE = 300
+CORPUS_SEED = 20240501
+CLUTTERED_SIZE = 80
+CLUTTERED_SEED = 20240601
+
+# Image URLs in the corpus use this host; the benchmark points it at the local image server
+IMAGE_HOST = "http://images.tagwise.test"
+
+WORDS = (
+    "python django framework web development database query index cache latency "
+    "throughput bookmark category tag search vector embedding model prompt token "
+    "yazılım geliştirme veritabanı önbellek arama kategori etiket içerik sayfa "
+    "design typography color layout travel city museum recipe kitchen flavor "
+    "finance market stock budget health sleep exercise nutrition music guitar album "
+    "science physics biology climate energy research history empire archive"
+).split()
+
+TOPICS = (
+    ("Teknoloji", ["Yazılım", "Yapay Zeka", "Web Geliştirme", "Donanım"]),
+    ("Bilim", ["Fizik", "Biyoloji", "İklim"]),
+    ("Yaşam", ["Yemek", "Seyahat", "Sağlık"]),
+    ("Finans", ["Borsa", "Kişisel Finans"]),
+    ("Sanat", ["Müzik", "Tasarım", "Tarih"]),
+)
+
+
+def _sentence(rng, words=None):
+    words = [rng.choice(WORDS) for _ in range(words or rng.randint(8, 22))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraphs(rng, target_bytes):
+    parts, size = [], 0
+    while size < target_bytes:
+        paragraph = "<p>" + " ".join(_sentence(rng) for _ in range(rng.randint(2, 6))) + "</p>"
+        parts.append(paragraph)
+        size += len(paragraph)
+    return "\n".join(parts)
+
+
+def _nav(rng, links):
+    items = "".join(f'<li><a href="/{rng.choice(WORDS)}/{i}">{rng.choice(WORDS).title()}</a></li>' for i in range(links))
+    return f"<nav><ul>{items}</ul></nav>"
+
+
+def _head(rng, title, index, meta_image):
+    tags = [f"<title>{title}</title>", '<meta charset="utf-8">', f'<meta name="description" content="{_sentence(rng)}">']
+    if meta_image == "og":
+        tags.append(f'<meta property="og:image" content="{IMAGE_HOST}/og/{index}.png">')
+    elif meta_image == "twitter":
+        tags.append(f'<meta name="twitter:image" content="{IMAGE_HOST}/tw/{index}.png">')
+    elif meta_image == "schema":
+        tags.append(f'<meta itemprop="image" content="/img/{index}.png">')
+    tags.append("<style>" + "".join(f".c{i}{{margin:{i}px;color:#{i:03x}}}" for i in range(rng.randint(20, 200))) + "</style>")
+    return "<head>" + "".join(tags) + "</head>"
+
+
+def _script(rng, size):
+    data = {"state": [{"id": i, "text": _sentence(rng, 6)} for i in range(max(1, size // 80))]}
+    return f"<script>window.__STATE__ = {json.dumps(data)};</script>"
+
+
+def generate_page(rng, index):
+    """One synthetic page; the layout and size vary like real bookmarked pages"""
+    layout = rng.choice(["article", "docs", "shop", "blog", "news", "video", "bare"])
+    # Log-uniform body size between 1 KB and 256 KB
+    target = int(2 ** rng.uniform(10, 18))
+    title = _sentence(rng, rng.randint(3, 8))[:-1]
+    meta_image = rng.choice(["og", "og", "twitter", "schema", None])
+    head = _head(rng, title, index, meta_image)
+    body_text = _paragraphs(rng, target)
+
+    if layout == "article":
+        body = f"<header>{_nav(rng, 12)}</header><main><article><h1>{title}</h1>{body_text}</article></main><footer>{_nav(rng, 8)}</footer>"
+    elif layout == "docs":
+        code = "".join(f"<pre><code>def f{i}(x):\n    return x * {i}\n</code></pre>" for i in range(rng.randint(2, 30)))
+        body = f"<div class=\"sidebar\">{_nav(rng, 60)}</div><div id=\"content\"><h1>{title}</h1>{body_text}{code}</div>"
+    elif layout == "shop":
+        products = "".join(
+            f'<div class="product"><img src="/p/{i}.jpg"><span>{_sentence(rng, 4)}</span><b>{rng.randint(10, 999)} TL</b></div>'
+            for i in range(rng.randint(10, 80))
+        )
+        body = f"<header>{_nav(rng, 30)}</header><div class=\"content\">{products}{body_text}</div>{_script(rng, target // 2)}"
+    elif layout == "blog":
+        comments = "".join(f'<div class="comment"><b>{rng.choice(WORDS)}</b>{_sentence(rng)}</div>' for _ in range(rng.randint(0, 60)))
+        body = f"<header><h1>{title}</h1></header><article>{body_text}</article><section>{comments}</section><footer>©</footer>"
+    elif layout == "news":
+        ads = "".join(f'<iframe src="https://ads.example/{i}"></iframe><div class="ad">{_sentence(rng, 5)}</div>' for i in range(rng.randint(5, 40)))
+        body = f"<header>{_nav(rng, 40)}</header><main>{ads}<article>{body_text}</article>{ads}</main><footer>{_nav(rng, 20)}</footer>"
+    elif layout == "video":
+        body = f"<div id=\"player\"></div><h1>{title}</h1><div>{body_text[:4000]}</div>{_script(rng, target)}"
+    else:
+        body = body_text
+
+    html = f"<!DOCTYPE html><html lang=\"tr\">{head}<body>{body}</body></html>"
+    return {"url": f"https://site{index % 37}.example/{layout}/{index}", "html": html}
+
+
+def generate_corpus(count=CORPUS_SIZE, seed=CORPUS_SEED):
+    rng = random.Random(seed)
+    return [generate_page(rng, index) for index in range(count)]
+
+
+def generate_cluttered_page(rng, index):
+    """
+    A page whose article is surrounded by a cookie banner, a mega menu, a share
+    bar, a comment thread, related links and a newsletter box. "article" lists
+    the title and paragraphs of the article, for measuring what an extractor keeps.
+    """
+    title = _sentence(rng, rng.randint(3, 8))[:-1]
+    paragraphs = [" ".join(_sentence(rng) for _ in range(rng.randint(2, 6))) for _ in range(rng.randint(3, 40))]
+    article = f"<h1>{title}</h1>" + "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+
+    legal = " ".join(_sentence(rng) for _ in range(rng.randint(10, 40)))
+    cookie = f'<div id="cookie-consent" class="cookie-banner"><p>{legal}</p><button>Kabul et</button></div>'
+    menu = '<div class="mega-menu">' + "".join(
+        "<ul>" + "".join(f'<li><a href="/{rng.choice(WORDS)}/{i}">{_sentence(rng, 3)}</a></li>' for i in range(rng.randint(5, 25))) + "</ul>"
+        for _ in range(rng.randint(2, 8))
+    ) + "</div>"
+    share = '<div class="share-bar">' + "".join(f'<a href="/share/{name}">{name}</a>' for name in ("Twitter", "Facebook", "LinkedIn", "E-posta")) + "</div>"
+    comments = '<div class="comments">' + "".join(
+        f'<div class="comment"><span class="author">{rng.choice(WORDS)}</span><p>{" ".join(_sentence(rng) for _ in range(rng.randint(1, 5)))}</p></div>'
+        for _ in range(rng.randint(5, 80))
+    ) + "</div>"
+    related = '<div class="related-posts"><h3>İlgili yazılar</h3><ul>' + "".join(
+        f'<li><a href="/post/{i}">{_sentence(rng, rng.randint(4, 9))}</a></li>' for i in range(rng.randint(3, 12))
+    ) + "</ul></div>"
+    newsletter = f'<div class="newsletter"><p>{_sentence(rng)}</p><input type="email"></div>'
+
+    wrapper = rng.choice(["article", "post", "bare"])
+    if wrapper == "article":
+        body = f"{cookie}{menu}<article>{article}{share}{comments}</article>{related}{newsletter}"
+    elif wrapper == "post":
+        body = f'{cookie}{menu}<div class="post">{article}{share}</div>{comments}{related}{newsletter}'
+    else:
+        body = f"{cookie}{menu}{article}{share}{comments}{related}{newsletter}"
+
+    head = _head(rng, title, index, rng.choice(["og", None]))
+    html = f"<!DOCTYPE html><html lang=\"tr\">{head}<body>{body}</body></html>"
+    return {"url": f"https://blog{index % 11}.example/{wrapper}/{index}", "html": html, "article": [title] + paragraphs}
+
+
+def generate_cluttered_pages(count=CLUTTERED_SIZE, seed=CLUTTERED_SEED):
+    """Pages with heavy boilerplate around the article (generated in memory, not stored)"""
+    rng = random.Random(seed)
+    return [generate_cluttered_page(rng, index) for index in range(count)]
+
+
+def write_corpus(pages, path=CORPUS_PATH, append=False):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # mtime=0 keeps the file byte-identical across runs
+    with open(path, "ab" if append else "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+        for page in pages:
+            f.write((json.dumps(page, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+def load_corpus(path=CORPUS_PATH, image_host=None):
+    """
+    Load the synthetic corpus (generating it first if the file is missing) and the recorded pages.
+
+    Args:
+        path (str): Synthetic corpus file
+        image_host (str, optional): Base URL replacing IMAGE_HOST in the pages
+
+    Returns:
+        List[Dict]: Pages with "url" and "html"
+    """
+    if not os.path.exists(path):
+        write_corpus(generate_corpus(), path)
+    pages = []
+    for corpus_file in (path, RECORDED_PATH):
+        if os.path.exists(corpus_file):
+            with gzip.open(corpus_file, "rt", encoding="utf-8") as f:
+                pages.extend(json.loads(line) for line in f if line.strip())
+    if image_host:
+        for page in pages:
+            page["html"] = page["html"].replace(IMAGE_HOST, image_host)
+    return pages
+
+
+def record_pages(urls, path=RECORDED_PATH):
+    """Fetch real pages and append them to the corpus"""
+    import requests
+
+    pages = []
+    for url in urls:
+        try:
+            response = requests.get(url, timeout=20, headers={"User-Agent": "Mozilla/5.0 (tagwise benchmark recorder)"})
+            response.raise_for_status()
+            pages.append({"url": url, "html": response.text})
+            print(f"recorded {url} ({len(response.text)} chars)")
+        except Exception as e:
+            print(f"skipped {url}: {e}")
+    write_corpus(pages, path, append=True)
+
+
+def make_taxonomy(size, seed=7):
+    """
+    Synthetic categories and tags.
+
+    Args:
+        size (int): Number of tags; the category tree grows with it (at most ~500 categories)
+
+    Returns:
+        tuple: (categories, tags) in the get_existing_categories / get_existing_tags format
+    """
+    rng = random.Random(seed + size)
+    categories, next_id = [], 1
+    main_count = min(len(TOPICS) + size // 100, 60)
+    for index in range(main_count):
+        name, subs = TOPICS[index % len(TOPICS)]
+        main_id = next_id
+        categories.append({"id": main_id, "name": name if index < len(TOPICS) else f"{name} {index}", "is_main": True, "parent_id": None})
+        next_id += 1
+        for sub in subs + [f"{rng.choice(WORDS).title()} {i}" for i in range(min(size // 200, 6))]:
+            categories.append({"id": next_id, "name": sub, "is_main": False, "parent_id": main_id})
+            next_id += 1
+
+    names = set()
+    while len(names) < size:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(1, 3))]
+        names.add("-".join(words) if len(names) % 3 else " ".join(words))
+    tags = [{"id": i + 1, "name": name} for i, name in enumerate(sorted(names))]
+    return categories, tags
+
+
+def make_llm_outputs(count=50, seed=11):
+    """LLM responses in the shapes correct_json_format repairs (fences, prose, trailing commas, Python literals)"""
+    rng = random.Random(seed)
+    outputs = []
+    for index in range(count):
+        data = {
+            "title": _sentence(rng, 6),
+            "description": " ".join(_sentence(rng) for _ in range(3)),
+            "categories": [{"main": main, "sub": rng.choice(subs)} for main, subs in rng.sample(TOPICS, 2)],
+            "tags": [rng.choice(WORDS) for _ in range(rng.randint(3, 8))],
+        }
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        shape = index % 4
+        if shape == 0:
+            text = f"```json\n{text}\n```"
+        elif shape == 1:
+            text = f"İşte analiz sonucu:\n{text}\nUmarım yardımcı olur."
+        elif shape == 2:
+            text = text.replace("]", ",]").replace("\n}", ",\n}")
+        else:
+            text = text.replace('"title"', "title").replace("}", ', "featured": True}')
+        outputs.append(text)
+    return outputs
+
+
+def _png(size=320):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (40, 120, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@contextmanager
+def image_server():
+    """Serve one PNG for every path on localhost; yields the base URL"""
+    body = _png()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    generate = sub.add_parser("generate", help="Rebuild the synthetic corpus")
+    generate.add_argument("--count", type=int, default=CORPUS_SIZE)
+    record = sub.add_parser("record", help="Append real pages from a file of URLs (one per line)")
+    record.add_argument("url_file")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        write_corpus(generate_corpus(args.count))
+        print(f"wrote {args.count} pages to {CORPUS_PATH} ({os.path.getsize(CORPUS_PATH) // 1024} KB)")
+    else:
+        with open(args.url_file) as f:
+            record_pages([line.strip() for line in f if line.strip() and not line.startswith("#")])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the LLM client registry.
+
+Compares building a new client per call (LLMFactory.create_llm, what
+LLMChain used to do on every request and retry) with reusing a cached
+client (LLMFactory.get_llm).
+
+    python benchmarks/llm_client_overhead.py --iterations 200
+    python benchmarks/llm_client_overhead.py --live --provider gemini --iterations 10
+
+Without --live only client construction is measured and placeholder API
+keys are used, so no network access is needed. With --live each iteration
+also sends a tiny prompt, which includes the TLS/connection setup that a
+fresh client pays on its first request.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label, timings):
+    print(f"  {label:<22} mean {statistics.mean(timings) * 1000:8.3f} ms   "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1] * 1000:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", action="append", help="Provider(s) to measure (default: all)")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--live", action="store_true", help="Also invoke the model on every iteration")
+    args = parser.parse_args()
+
+    if not args.live:
+        for key in ("GEMINI_API_KEY", "OPENAI_API_KEY", "ANTHROPIC_API_KEY"):
+            os.environ.setdefault(key, "benchmark-placeholder-key")
+
+    # API keys are read when the reader package is imported
+    from tagwiseapp.reader.django_setup import setup_django
+    setup_django()
+    from tagwiseapp.reader.llm_factory import LLMFactory
+    from langchain_core.messages import HumanMessage
+
+    providers = args.provider or ["gemini", "openai", "anthropic"]
+    prompt = [HumanMessage(content="Reply with the single word: ok")]
+
+    for provider in providers:
+        print(f"{provider} ({args.iterations} iterations{', live' if args.live else ''})")
+
+        def fresh_client():
+            llm = LLMFactory.create_llm(provider=provider)
+            if args.live:
+                llm.invoke(prompt)
+
+        def cached_client():
+            llm = LLMFactory.get_llm(provider=provider)
+            if args.live:
+                llm.invoke(prompt)
+
+        LLMFactory.clear_llm_cache()
+        fresh = measure(fresh_client, args.iterations)
+        cached = measure(cached_client, args.iterations)
+
+        report("create_llm per call", fresh)
+        report("get_llm (cached)", cached)
+        saved = statistics.mean(fresh) - statistics.mean(cached)
+        print(f"  overhead removed per call: {saved * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
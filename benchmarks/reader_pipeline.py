@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the reader pipeline stages.
+
+Runs every stage over the HTML corpus and the synthetic taxonomies from
+benchmarks/fixtures.py and reports, per stage:
+
+- wall time per item (mean / p50 / p95) of the fastest of --repeat runs
+- throughput (items/s, and MB/s of HTML for the HTML stages)
+- allocations: peak traced memory of a single item and the number of
+  allocated blocks it left behind (tracemalloc, separate pass)
+
+The analysis[...] stages run the HTML stages of one URL analysis together
+(main content, thumbnail URL, LLM digest): analysis[parse_once] shares one
+ParsedPage, analysis[parse_per_stage] parses the page again in every stage
+with html.parser as the stages did before ParsedPage. Their ratio is the
+CPU saving per analysis.
+
+LLM calls use the fake provider, so no API key or network is needed.
+
+    python benchmarks/reader_pipeline.py
+    python benchmarks/reader_pipeline.py --stage clean_html_content --stage find_similar_tag
+    python benchmarks/reader_pipeline.py --save-baseline
+    python benchmarks/reader_pipeline.py --threshold 0.2 --json results.json
+
+The results are compared with benchmarks/baseline.json; the script exits
+with status 1 if the mean time per item of a stage grew by more than
+--threshold (default 25%). Baselines depend on the machine: save a new one
+(--save-baseline) on the machine that runs the comparison.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+import fixtures  # noqa: E402
+
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_TAXONOMY_SIZES = (10, 1000, 50000)
+# Pages sent through the whole categorize_content pipeline
+PIPELINE_PAGES = 40
+# Items measured under tracemalloc per stage
+ALLOCATION_SAMPLE = 20
+# Slowdowns smaller than this (ms per item) are timer noise, not regressions
+NOISE_FLOOR_MS = 0.05
+
+
+class Stage:
+    """A benchmarked function applied to a list of items"""
+
+    def __init__(self, name, fn, items, item_bytes=None):
+        self.name = name
+        self.fn = fn
+        self.items = items
+        self.item_bytes = item_bytes
+
+    def run_once(self):
+        timings = []
+        for item in self.items:
+            start = time.perf_counter()
+            self.fn(item)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    def allocations(self):
+        """Largest peak memory and leftover block count of a single item"""
+        sample = self.items[:: max(1, len(self.items) // ALLOCATION_SAMPLE)][:ALLOCATION_SAMPLE]
+        peak, blocks = 0, 0
+        tracemalloc.start()
+        try:
+            for item in sample:
+                tracemalloc.reset_peak()
+                before = tracemalloc.take_snapshot()
+                self.fn(item)
+                after = tracemalloc.take_snapshot()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                blocks = max(blocks, sum(stat.count_diff for stat in after.compare_to(before, "filename")))
+        finally:
+            tracemalloc.stop()
+        return peak, blocks
+
+    def measure(self, repeat):
+        runs = [self.run_once() for _ in range(repeat)]
+        timings = min(runs, key=sum)
+        total = sum(timings)
+        ordered = sorted(timings)
+        peak, blocks = self.allocations()
+        result = {
+            "items": len(timings),
+            "mean_ms": statistics.mean(timings) * 1000,
+            "p50_ms": ordered[len(ordered) // 2] * 1000,
+            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            "items_per_s": len(timings) / total if total else 0.0,
+            "peak_kb": peak / 1024,
+            "blocks": blocks,
+        }
+        if self.item_bytes:
+            result["mb_per_s"] = sum(self.item_bytes) / (1024 * 1024) / total if total else 0.0
+        return result
+
+
+def build_stages(pages, image_host, taxonomy_sizes):
+    from tagwiseapp.reader import content_analyzer
+    from tagwiseapp.reader.category_matcher import find_similar_category, find_similar_tag
+    from tagwiseapp.reader.category_prompt_factory import CategoryPromptFactory
+    from tagwiseapp.reader.content_extractor import extract_content, extract_digest
+    from tagwiseapp.reader.html_utils import clean_html_content, MAX_CONTENT_LENGTH
+    from tagwiseapp.reader import parsed_page
+    from tagwiseapp.reader.parsed_page import ParsedPage
+    from tagwiseapp.reader.utils import correct_json_format, extract_thumbnail_from_html, _thumbnail_image_url
+
+    html_bytes = [len(page["html"].encode("utf-8")) for page in pages]
+    stages = [
+        Stage("extract_content", lambda page: extract_content(page["html"]), pages, html_bytes),
+        Stage("clean_html_content", lambda page: clean_html_content(page["html"]), pages, html_bytes),
+        Stage("extract_digest", lambda page: extract_digest(page["html"]), pages, html_bytes),
+        Stage("extract_thumbnail_from_html", lambda page: extract_thumbnail_from_html(page["html"], page["url"]), pages, html_bytes),
+        Stage("correct_json_format", correct_json_format, fixtures.make_llm_outputs()),
+    ]
+
+    def analysis_parse_once(page):
+        parsed = ParsedPage(page["html"], page["url"])
+        return extract_content(parsed), _thumbnail_image_url(parsed, page["url"]), extract_digest(parsed)
+
+    def analysis_parse_per_stage(page):
+        # Every stage gets the HTML string and parses it on its own, with html.parser
+        with mock.patch.object(parsed_page, "PARSER", "html.parser"):
+            return (extract_content(page["html"]), _thumbnail_image_url(page["html"], page["url"]),
+                    extract_digest(page["html"]))
+
+    stages += [
+        Stage("analysis[parse_once]", analysis_parse_once, pages, html_bytes),
+        Stage("analysis[parse_per_stage]", analysis_parse_per_stage, pages, html_bytes),
+    ]
+
+    sample_text = clean_html_content(pages[0]["html"])[:MAX_CONTENT_LENGTH]
+    for size in taxonomy_sizes:
+        categories, tags = fixtures.make_taxonomy(size)
+        # Half of the lookups hit an existing name, half need the fuzzy scan
+        lookups = max(5, min(50, 100000 // size))
+        tag_queries = [tags[i * len(tags) // lookups]["name"] if i % 2 else f"{tags[i % len(tags)]['name']}x"
+                       for i in range(lookups)]
+        sub_names = [cat["name"] for cat in categories if not cat["is_main"]]
+        category_queries = [sub_names[i % len(sub_names)] + ("" if i % 2 else "s") for i in range(lookups)]
+        stages += [
+            Stage(f"find_similar_tag[{size}]",
+                  lambda query, tags=tags: find_similar_tag(query, tags, accept_new=True), tag_queries),
+            Stage(f"find_similar_category[{size}]",
+                  lambda query, categories=categories: find_similar_category(
+                      query, categories, is_main_category=False, accept_new=True), category_queries),
+            Stage(f"category_prompt[{size}]",
+                  lambda page, categories=categories, tags=tags: CategoryPromptFactory.create_category_prompt(
+                      content=sample_text, url=page["url"], existing_categories=categories, existing_tags=tags),
+                  pages[:20]),
+        ]
+
+    categories, tags = fixtures.make_taxonomy(1000)
+
+    def categorize(page):
+        with mock.patch.object(content_analyzer, "get_existing_categories", return_value=categories), \
+                mock.patch.object(content_analyzer, "get_existing_tags", return_value=tags):
+            return content_analyzer.categorize_content(page["html"], page["url"])
+
+    pipeline_pages = pages[:PIPELINE_PAGES]
+    stages.append(Stage("categorize_content[fake]", categorize, pipeline_pages, html_bytes[:PIPELINE_PAGES]))
+    return stages
+
+
+def compare(results, baseline, threshold):
+    """Return the stages whose mean time per item regressed beyond the threshold"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("stages", {}).get(name)
+        if not base or not base.get("mean_ms"):
+            continue
+        change = result["mean_ms"] / base["mean_ms"] - 1
+        result["change"] = change
+        if change > threshold and result["mean_ms"] - base["mean_ms"] > NOISE_FLOOR_MS:
+            regressions.append((name, change))
+    return regressions
+
+
+def print_table(results):
+    print(f"{'stage':<34}{'items':>6}{'mean ms':>11}{'p95 ms':>11}{'items/s':>11}{'MB/s':>8}{'peak KB':>10}{'blocks':>8}{'vs base':>9}")
+    for name, r in results.items():
+        mb = f"{r['mb_per_s']:.1f}" if "mb_per_s" in r else "-"
+        change = f"{r['change']:+.0%}" if "change" in r else "-"
+        print(f"{name:<34}{r['items']:>6}{r['mean_ms']:>11.3f}{r['p95_ms']:>11.3f}{r['items_per_s']:>11.1f}"
+              f"{mb:>8}{r['peak_kb']:>10.0f}{r['blocks']:>8}{change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stage", action="append", help="Only run stages whose name starts with this (repeatable)")
+    parser.add_argument("--taxonomy-sizes", default=",".join(map(str, DEFAULT_TAXONOMY_SIZES)))
+    parser.add_argument("--pages", type=int, default=None, help="Limit the number of corpus pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the fastest is reported")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown per stage (0.25 = 25%%)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    # Offline: the fake provider answers every LLM call
+    os.environ["DEFAULT_LLM_PROVIDER"] = "fake"
+    os.environ["FALLBACK_LLM_PROVIDERS"] = ""
+    os.environ["LLM_HEDGE_ANALYSIS"] = "false"
+    os.environ["EMBEDDING_PROVIDER"] = "fake"
+    logging.disable(logging.WARNING)
+
+    from tagwiseapp.reader.django_setup import setup_django
+    with contextlib.redirect_stdout(io.StringIO()):
+        setup_django()
+
+    with fixtures.image_server() as image_host:
+        pages = fixtures.load_corpus(image_host=image_host)[:args.pages]
+        sizes = [int(size) for size in args.taxonomy_sizes.split(",") if size]
+        stages = build_stages(pages, image_host, sizes)
+        if args.stage:
+            stages = [stage for stage in stages if any(stage.name.startswith(prefix) for prefix in args.stage)]
+
+        results = {}
+        for stage in stages:
+            print(f"running {stage.name} ({len(stage.items)} items)...", file=sys.stderr)
+            # The pipeline prints progress; keep it out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[stage.name] = stage.measure(args.repeat)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pages": len(pages),
+            "repeat": args.repeat,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "stages": results,
+    }
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    print_table(results)
+    once, per_stage = results.get("analysis[parse_once]"), results.get("analysis[parse_per_stage]")
+    if once and per_stage and once["mean_ms"]:
+        once["speedup_vs_parse_per_stage"] = per_stage["mean_ms"] / once["mean_ms"]
+        print(f"parse once vs per stage: {once['speedup_vs_parse_per_stage']:.1f}x less time per analysis")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+    if regressions:
+        for name, change in regressions:
+            print(f"REGRESSION {name}: {change:+.0%} mean time per item (threshold {args.threshold:.0%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -299,6 +299,8 @@ class ChatbotManager {
             let titleNotificationElement = null;
             let conversationId = null;
             let sources = [];
+            let titleReceived = false;
+            let titlePending = false;
             
             // Bot mesaj içeriğine referans
             const botMessageContent = botMessageElement.querySelector('.message-content');
@@ -421,6 +423,7 @@ class ChatbotManager {
                                 break;
                                 
                             case 'title':
+                                titleReceived = true;
                                 // Update title directly without animations
                                 if (this.currentChatTitle) {
                                     this.currentChatTitle.textContent = data.title;
@@ -447,6 +450,7 @@ class ChatbotManager {
                             case 'completion':
                                 // Final data with sources
                                 sources = data.sources || [];
+                                titlePending = Boolean(data.title_pending);
                                 
                                 // Ensure the final formatting is applied
                                 if (botMessageContent) {
@@ -484,6 +488,11 @@ class ChatbotManager {
                 titleNotificationElement.remove();
             }
             
+            // The title was still being generated when the stream ended
+            if (titlePending && !titleReceived && conversationId) {
+                this.pollConversationTitle(conversationId);
+            }
+            
             // Reload conversations list
             this.loadConversations();
             
@@ -573,6 +582,11 @@ class ChatbotManager {
                     }
                 }
                 
+                // The title is still being generated in the background
+                if (data.title_pending && data.conversation_id) {
+                    this.pollConversationTitle(data.conversation_id);
+                }
+                
                 // Reload conversations list
                 this.loadConversations();
             } else {
@@ -816,6 +830,32 @@ class ChatbotManager {
         this.messagesContainer.scrollTop = this.messagesContainer.scrollHeight;
     }
     
+    async pollConversationTitle(conversationId, attempts = 5, delay = 2000) {
+        // Fetch the conversation until the background task has saved its title
+        for (let attempt = 0; attempt < attempts; attempt++) {
+            await new Promise(resolve => setTimeout(resolve, delay));
+            try {
+                const response = await fetch(`/chatbot/conversations/${conversationId}/`);
+                if (!response.ok) {
+                    return;
+                }
+                
+                const data = await response.json();
+                const title = data.conversation && data.conversation.title;
+                if (title && title !== 'PENDING_AI_TITLE') {
+                    if (this.currentChatTitle && this.currentConversationId === conversationId) {
+                        this.currentChatTitle.textContent = title;
+                    }
+                    this.loadConversations();
+                    return;
+                }
+            } catch (error) {
+                console.error('Error fetching conversation title:', error);
+                return;
+            }
+        }
+    }
+    
     escapeHtml(text) {
         const div = document.createElement('div');
         div.textContent = text;
@@ -0,0 +1,141 @@
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import json
+import re
+import time
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = ('Open many concurrent streaming chatbot requests against running servers and compare '
+            'how many streams each one can hold (e.g. WSGI vs ASGI deployment)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            required=True,
+            help='label=base_url of a running server, e.g. wsgi=http://127.0.0.1:8000 (repeatable)'
+        )
+        parser.add_argument('--username', required=True, help='User to log in as')
+        parser.add_argument('--password', required=True, help='Password of the user')
+        parser.add_argument('--concurrency', type=int, default=100, help='Number of simultaneous streams')
+        parser.add_argument('--message', default='What did I save about Python?', help='Question to ask')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Per-request timeout in seconds')
+        parser.add_argument('--output', help='Optional path to write the results as JSON')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            label, _, base_url = target.partition('=')
+            if not base_url:
+                raise CommandError(f"Invalid --target '{target}', expected label=base_url")
+            targets.append((label, base_url.rstrip('/')))
+
+        results = {}
+        for label, base_url in targets:
+            self.stdout.write(f"{label}: {options['concurrency']} concurrent streams -> {base_url}")
+            results[label] = asyncio.run(self.run_target(base_url, options))
+            self.print_result(label, results[label])
+
+        if len(results) > 1:
+            self.stdout.write("\nComparison (completed streams / p95 time to first chunk):")
+            for label, result in results.items():
+                self.stdout.write(
+                    f"  {label:<10} {result['completed']:>5}/{result['requests']:<5} "
+                    f"{result['ttfb_p95']:.2f}s  wall {result['wall_time']:.2f}s"
+                )
+
+        if options.get('output'):
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    async def login(self, client, base_url, username, password):
+        """Log in through the login form and return the session/CSRF cookies"""
+        response = await client.get(f"{base_url}/login/")
+        csrf_token = client.cookies.get('csrftoken')
+        if not csrf_token:
+            match = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.text)
+            csrf_token = match.group(1) if match else ''
+
+        await client.post(
+            f"{base_url}/login/",
+            data={'username': username, 'password': password, 'csrfmiddlewaretoken': csrf_token},
+            headers={'Referer': f"{base_url}/login/"},
+        )
+        # Cookies are marked secure in production settings, so send them explicitly
+        cookies = {name: value for name, value in client.cookies.items()}
+        if 'sessionid' not in cookies:
+            raise CommandError(f"Login failed for {username} on {base_url}")
+        return cookies
+
+    async def stream_once(self, client, base_url, cookies, message):
+        started = time.perf_counter()
+        first_chunk = None
+        completed = False
+        headers = {
+            'Cookie': '; '.join(f"{name}={value}" for name, value in cookies.items()),
+            'X-CSRFToken': cookies.get('csrftoken', ''),
+            'Referer': f"{base_url}/",
+            'Content-Type': 'application/json',
+        }
+        body = json.dumps({'message': message, 'stream': True, 'bypass_cache': True})
+
+        try:
+            async with client.stream('POST', f"{base_url}/chatbot/ask/", content=body, headers=headers) as response:
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    if event.get('type') == 'content' and first_chunk is None:
+                        first_chunk = time.perf_counter() - started
+                    elif event.get('type') == 'completion':
+                        completed = True
+        except Exception as e:
+            return {'completed': False, 'error': str(e), 'ttfb': None, 'total': time.perf_counter() - started}
+
+        return {'completed': completed, 'error': None, 'ttfb': first_chunk, 'total': time.perf_counter() - started}
+
+    async def run_target(self, base_url, options):
+        limits = httpx.Limits(max_connections=options['concurrency'] + 10)
+        async with httpx.AsyncClient(timeout=options['timeout'], limits=limits) as client:
+            cookies = await self.login(client, base_url, options['username'], options['password'])
+
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(*[
+                self.stream_once(client, base_url, cookies, options['message'])
+                for _ in range(options['concurrency'])
+            ])
+            wall_time = time.perf_counter() - started
+
+        ttfbs = [o['ttfb'] for o in outcomes if o['ttfb'] is not None]
+        totals = [o['total'] for o in outcomes if o['completed']]
+        errors = [o['error'] for o in outcomes if o['error']]
+        return {
+            'requests': len(outcomes),
+            'completed': sum(1 for o in outcomes if o['completed']),
+            'errors': len(errors),
+            'first_error': errors[0] if errors else None,
+            'ttfb_p50': percentile(ttfbs, 50),
+            'ttfb_p95': percentile(ttfbs, 95),
+            'total_p50': percentile(totals, 50),
+            'total_p95': percentile(totals, 95),
+            'wall_time': wall_time,
+        }
+
+    def print_result(self, label, result):
+        style = self.style.SUCCESS if result['completed'] == result['requests'] else self.style.WARNING
+        self.stdout.write(style(f"  completed {result['completed']}/{result['requests']} streams, {result['errors']} errors"))
+        self.stdout.write(f"  time to first chunk p50 {result['ttfb_p50']:.2f}s, p95 {result['ttfb_p95']:.2f}s")
+        self.stdout.write(f"  total time p50 {result['total_p50']:.2f}s, p95 {result['total_p95']:.2f}s")
+        if result['first_error']:
+            self.stdout.write(self.style.ERROR(f"  first error: {result['first_error']}"))
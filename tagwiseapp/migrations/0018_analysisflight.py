@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tagwiseapp', '0017_chatmessage_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisFlight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('value', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
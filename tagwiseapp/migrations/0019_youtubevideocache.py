@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tagwiseapp', '0018_analysisflight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YouTubeVideoCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_id', models.CharField(max_length=32, unique=True)),
+                ('info', models.JSONField(blank=True, null=True)),
+                ('title', models.CharField(blank=True, default='', max_length=500)),
+                ('transcript', models.BinaryField(blank=True, null=True)),
+                ('thumbnail_url', models.CharField(blank=True, default='', max_length=500)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -120,4 +120,26 @@ class ChatMessage(models.Model):
         
     def __str__(self):
         sender = "User" if self.is_user else "Bot"
-        return f"{sender}: {self.content[:50]}..." if len(self.content) > 50 else self.content
\ No newline at end of file
+        return f"{sender}: {self.content[:50]}..." if len(self.content) > 50 else self.content
+
+class AnalysisFlight(models.Model):
+    """Result of a URL analysis, read by requests in other workers that waited for it"""
+    key = models.CharField(max_length=64, unique=True)  # sha256 of the normalized URL
+    value = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.key} ({self.created_at})"
+
+class YouTubeVideoCache(models.Model):
+    """Cached yt-dlp info, title, transcript and thumbnail URL of a YouTube video"""
+    video_id = models.CharField(max_length=32, unique=True)
+    info = models.JSONField(null=True, blank=True)
+    title = models.CharField(max_length=500, blank=True, default='')
+    transcript = models.BinaryField(null=True, blank=True)  # zlib-compressed; empty if the video has none
+    thumbnail_url = models.CharField(max_length=500, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"{self.video_id} ({self.title})" if self.title else self.video_id
@@ -0,0 +1,165 @@
+import os
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Minimum cosine similarity between two question embeddings to reuse an answer
+SIMILARITY_THRESHOLD = float(os.environ.get("CHATBOT_CACHE_SIMILARITY", "0.95"))
+# Maximum number of cached answers kept per user (least recently used are evicted)
+MAX_ENTRIES_PER_USER = int(os.environ.get("CHATBOT_CACHE_MAX_ENTRIES", "200"))
+# Time-to-live of a cached answer (seconds)
+ENTRY_TTL = int(os.environ.get("CHATBOT_CACHE_TTL", str(24 * 60 * 60)))
+
+
+def normalize_question(question):
+    """Lower-case a question and strip punctuation/extra whitespace"""
+    text = re.sub(r"[^\w\s]", " ", (question or "").lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class AnswerCache:
+    """
+    Per-user semantic cache of chatbot answers.
+
+    Entries are scoped by the user's vectorstore version stamp and the active
+    retrieval filter, so any re-index (bookmark added, changed or deleted)
+    makes older answers unreachable. A lookup first tries the exact
+    normalized question text and then falls back to cosine similarity of the
+    question embeddings.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, max_entries=MAX_ENTRIES_PER_USER, ttl=ENTRY_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0}
+
+    def _user_entries(self, user_id, version):
+        """Get the entry table for a user, dropping entries from old versions"""
+        user_entries = self._entries.setdefault(user_id, OrderedDict())
+        stale = [key for key, entry in user_entries.items()
+                 if entry["version"] != version or time.time() - entry["created_at"] > self.ttl]
+        for key in stale:
+            del user_entries[key]
+        return user_entries
+
+    def lookup(self, user_id, version, question, embed_fn=None, scope=None):
+        """
+        Find a cached answer for a question.
+
+        Args:
+            user_id: Owner of the cache entries
+            version: Current vectorstore version stamp
+            question: User's question string
+            embed_fn: Callable returning the question embedding (optional)
+            scope: Extra key such as the active category filter
+
+        Returns:
+            dict: Cached {'answer', 'sources'} or None
+        """
+        if version is None:
+            return None
+
+        normalized = normalize_question(question)
+        with self._lock:
+            user_entries = self._user_entries(user_id, version)
+            entry = user_entries.get((scope, normalized))
+            if entry is not None:
+                user_entries.move_to_end((scope, normalized))
+                return self._hit(entry, 1.0)
+            candidates = [(key, e) for key, e in user_entries.items() if key[0] == scope]
+
+        if not candidates or embed_fn is None:
+            self._miss()
+            return None
+
+        vector = self._embed(embed_fn, question)
+        if vector is None:
+            self._miss()
+            return None
+
+        best_key, best_entry, best_score = None, None, -1.0
+        for key, candidate in candidates:
+            score = float(np.dot(vector, candidate["vector"])) if candidate["vector"] is not None else -1.0
+            if score > best_score:
+                best_key, best_entry, best_score = key, candidate, score
+
+        if best_score >= self.threshold:
+            with self._lock:
+                if best_key in self._entries.get(user_id, {}):
+                    self._entries[user_id].move_to_end(best_key)
+            return self._hit(best_entry, best_score)
+
+        self._miss()
+        return None
+
+    def store(self, user_id, version, question, answer, sources, embed_fn=None, scope=None):
+        """Cache an answer for a question under the current vectorstore version"""
+        if version is None or not answer:
+            return
+
+        vector = self._embed(embed_fn, question) if embed_fn is not None else None
+        normalized = normalize_question(question)
+        with self._lock:
+            user_entries = self._user_entries(user_id, version)
+            user_entries[(scope, normalized)] = {
+                "version": version,
+                "vector": vector,
+                "answer": answer,
+                "sources": list(sources or []),
+                "created_at": time.time(),
+            }
+            user_entries.move_to_end((scope, normalized))
+            while len(user_entries) > self.max_entries:
+                user_entries.popitem(last=False)
+            self.stats["stores"] += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.stats["bypassed"] += 1
+
+    def clear(self, user_id=None):
+        """Drop cached answers for one user (or everyone)"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def get_stats(self):
+        """Return hit/miss counters and the hit rate"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _embed(self, embed_fn, question):
+        try:
+            vector = np.asarray(embed_fn(question), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm else None
+        except Exception as e:
+            logger.error(f"Error embedding question for answer cache: {str(e)}")
+            return None
+
+    def _hit(self, entry, score):
+        with self._lock:
+            self.stats["hits"] += 1
+        logger.info(f"Answer cache hit (similarity {score:.3f}, hit rate {self.get_stats()['hit_rate']:.0%})")
+        return {"answer": entry["answer"], "sources": list(entry["sources"])}
+
+    def _miss(self):
+        with self._lock:
+            self.stats["misses"] += 1
+
+
+# Process-wide cache shared by all chatbot instances
+answer_cache = AnswerCache()
@@ -11,10 +11,20 @@ from langchain.prompts.chat import (
 )
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.retrievers import BaseRetriever
-from .vectorstore import load_vectorstore
+from langchain_core.documents import Document
+from .vectorstore import load_vectorstore, get_metadata_index, get_vectorstore_version
 from .indexer import index_user_bookmarks
+from .retriever import PrefilteredFAISSRetriever
+from .answer_cache import answer_cache
+from tagwiseapp.reader.llm_factory import LLMFactory
+from tagwiseapp.reader import settings as llm_settings
+from tagwiseapp.reader.token_budget import fit_count
+from .query_router import route_structured_query
+from asgiref.sync import sync_to_async
 import json
 import logging
+from collections import OrderedDict
+from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +42,27 @@ except Exception as e:
         "candidate_count": 1,
     }
 
+# Question embeddings kept per chatbot instance (answer cache lookup and store)
+QUESTION_VECTOR_CACHE_SIZE = 32
+
+class TokenBudgetRetrievalChain(ConversationalRetrievalChain):
+    """
+    ConversationalRetrievalChain that keeps the retrieved documents within
+    max_tokens_limit, counted locally with the provider's tokenizer
+    approximation (the base class asks the LLM, an API call for Gemini).
+    """
+
+    token_provider: Optional[str] = None
+
+    def _reduce_tokens_below_limit(self, docs: List[Document]) -> List[Document]:
+        if not self.max_tokens_limit:
+            return docs
+        keep = fit_count([doc.page_content for doc in docs], self.max_tokens_limit, self.token_provider)
+        if keep < len(docs):
+            logger.info(f"Context token budget: kept {keep} of {len(docs)} retrieved documents")
+        return docs[:keep]
+
+
 class BookmarkChatbot:
     """
     Conversational chatbot for bookmark search and information retrieval
@@ -65,25 +96,39 @@ class BookmarkChatbot:
             memory_key="chat_history"
         )
         
+        # Active retrieval filter, used to scope cached answers
+        self.filter_scope = None
+        self.active_filters = {}
+        self._question_vectors = OrderedDict()
+        
+        # Provider the chatbot talks to; token budgets are counted for its tokenizer
+        self.provider = "fake" if llm_settings.DEFAULT_PROVIDER == "fake" else "gemini"
+        
         self.llm = self._create_llm()
         self.chain = self._create_chain()
     
     def _create_llm(self):
         """Create and configure the LLM"""
         try:
+            if self.provider == "fake":
+                # Offline runs / load tests: local fake provider, no API key needed
+                return LLMFactory.get_llm(provider="fake")
+            
             if not self.api_key:
                 logger.error("Cannot create LLM: No API key available")
                 raise ValueError("Missing API key for Gemini")
                 
             logger.info(f"Creating LLM with API key (starts with): {self.api_key[:5]}...")
             
-            return ChatGoogleGenerativeAI(
-                model="gemini-2.0-flash",
-                google_api_key=self.api_key,
+            # Shared client from the LLM registry, reused across chatbot instances
+            return LLMFactory.get_llm(
+                provider="gemini",
+                model_name="gemini-2.0-flash",
                 temperature=GEMINI_CONFIG.get("temperature", 0.7),
+                max_tokens=GEMINI_CONFIG.get("max_output_tokens", 2048),
+                google_api_key=self.api_key,
                 top_p=GEMINI_CONFIG.get("top_p", 0.95),
                 top_k=GEMINI_CONFIG.get("top_k", 40),
-                max_output_tokens=GEMINI_CONFIG.get("max_output_tokens", 2048),
             )
         except Exception as e:
             logger.error(f"Error creating LLM: {str(e)}")
@@ -170,6 +215,7 @@ class BookmarkChatbot:
             vectorstore = self._get_vectorstore()
             if vectorstore is None:
                 raise ValueError("Failed to initialize vector database")
+            self.vectorstore = vectorstore
 
             # Basit çözüm: Yerleşik VectorStoreRetriever kullan
             retriever = vectorstore.as_retriever(
@@ -181,12 +227,15 @@ class BookmarkChatbot:
             )
             
             # Define a proper chat history formatter that turns message objects into a string
+            # (the most recent messages within CHATBOT_HISTORY_TOKENS)
             def format_chat_history(chat_messages):
-                return "\n".join([
+                lines = [
                     f"Human: {message.content}" if isinstance(message, HumanMessage) 
                     else f"AI: {message.content}" 
                     for message in chat_messages
-                ])
+                ]
+                keep = fit_count(lines[::-1], llm_settings.CHATBOT_HISTORY_TOKENS, self.provider)
+                return "\n".join(lines[len(lines) - keep:])
             
             # Create condense question prompt
             condense_question_prompt = PromptTemplate.from_template(
@@ -248,7 +297,7 @@ class BookmarkChatbot:
             """
             
             # Basitleştirilmiş zincir oluşturma - using the string-based approach for compatibility
-            return ConversationalRetrievalChain.from_llm(
+            return TokenBudgetRetrievalChain.from_llm(
                 llm=self.llm,
                 retriever=retriever,
                 memory=self.memory,
@@ -257,22 +306,120 @@ class BookmarkChatbot:
                 condense_question_prompt=condense_question_prompt,  # Custom prompt for question condensation
                 return_source_documents=True,
                 verbose=True,
+                max_tokens_limit=llm_settings.CHATBOT_CONTEXT_TOKENS,
+                token_provider=self.provider,
             )
         except Exception as e:
             logger.error(f"Error creating chain: {str(e)}")
             raise
     
-    def get_response(self, query):
+    def _cached_question_vector(self, query):
+        vector = self._question_vectors.get(query)
+        if vector is not None:
+            self._question_vectors.move_to_end(query)
+        return vector
+    
+    def _remember_question_vector(self, query, vector):
+        self._question_vectors[query] = vector
+        while len(self._question_vectors) > QUESTION_VECTOR_CACHE_SIZE:
+            self._question_vectors.popitem(last=False)
+        return vector
+    
+    def _embed_question(self, query):
+        """Embed a question once per chatbot instance (the last QUESTION_VECTOR_CACHE_SIZE questions)"""
+        vector = self._cached_question_vector(query)
+        if vector is None:
+            vector = self._remember_question_vector(query, self.vectorstore._embed_query(query))
+        return vector
+    
+    def can_use_cache(self):
+        """
+        Cached answers are only valid for standalone questions; follow-ups
+        depend on the conversation history loaded into memory.
+        """
+        return not any(isinstance(message, HumanMessage) for message in self.memory.chat_memory.messages)
+    
+    def get_cached_response(self, query):
+        """
+        Look up a previously generated answer for a (near-)identical question.
+        A hit is added to the conversation memory, as a generated answer would be.
+        
+        Args:
+            query: User's question string
+            
+        Returns:
+            dict: Contains 'answer' and 'sources', or None on a cache miss
+        """
+        try:
+            cached = answer_cache.lookup(
+                self.user_id,
+                get_vectorstore_version(self.user_id),
+                query,
+                embed_fn=self._embed_question,
+                scope=self.filter_scope
+            )
+        except Exception as e:
+            logger.error(f"Error reading answer cache: {str(e)}")
+            return None
+        
+        if cached is not None:
+            self.memory.chat_memory.add_user_message(query)
+            self.memory.chat_memory.add_ai_message(cached["answer"])
+        return cached
+    
+    def cache_response(self, query, answer, sources):
+        """Store an answer so near-identical questions can reuse it"""
+        try:
+            answer_cache.store(
+                self.user_id,
+                get_vectorstore_version(self.user_id),
+                query,
+                answer,
+                sources,
+                embed_fn=self._embed_question,
+                scope=self.filter_scope
+            )
+        except Exception as e:
+            logger.error(f"Error writing answer cache: {str(e)}")
+    
+    def route_query(self, query):
+        """
+        Answer count/list questions directly from the database
+        
+        Args:
+            query: User's question string
+            
+        Returns:
+            dict: Contains 'answer' and 'sources', or None if the question needs RAG
+        """
+        routed = route_structured_query(
+            self.user_id,
+            query,
+            tag=self.active_filters.get("tags"),
+            category=self.active_filters.get("categories")
+        )
+        if routed is not None:
+            self.memory.chat_memory.add_user_message(query)
+            self.memory.chat_memory.add_ai_message(routed["answer"])
+        return routed
+    
+    def get_response(self, query, use_cache=True):
         """
         Get a response from the chatbot for a user query
         
         Args:
             query: User's question string
+            use_cache: Whether the semantic answer cache may be used
             
         Returns:
             dict: Contains 'answer' and optionally 'sources'
         """
         try:
+            # Sayma/listeleme soruları LLM'e gitmeden veritabanından yanıtlanır
+            routed = self.route_query(query)
+            if routed is not None:
+                return routed
+            
             # API anahtarı kontrolü
             if not self.api_key:
                 logger.error("No API key provided for Gemini")
@@ -283,6 +430,13 @@ class BookmarkChatbot:
             
             logger.info(f"Processing query: '{query[:50]}...' (if longer)")
             
+            use_cache = use_cache and self.can_use_cache()
+            if use_cache:
+                cached = self.get_cached_response(query)
+                if cached is not None:
+                    cached["cached"] = True
+                    return cached
+            
             # Güvenli bir şekilde chain'i çağır
             try:
                 logger.info("Calling LLM chain")
@@ -306,23 +460,11 @@ class BookmarkChatbot:
             
             response = {
                 "answer": answer,
-                "sources": []
+                "sources": self._format_sources(result)
             }
             
-            # Add sources if available
-            if "source_documents" in result:
-                source_count = 0
-                for doc in result["source_documents"]:
-                    if hasattr(doc, "metadata") and "url" in doc.metadata and "title" in doc.metadata:
-                        if doc.metadata.get("source") not in ["empty", "error"]:
-                            response["sources"].append({
-                                "title": doc.metadata["title"],
-                                "url": doc.metadata["url"],
-                                "id": doc.metadata.get("id")
-                            })
-                            source_count += 1
-                
-                logger.info(f"Found {source_count} sources for the query")
+            if use_cache:
+                self.cache_response(query, response["answer"], response["sources"])
             
             return response
             
@@ -334,6 +476,121 @@ class BookmarkChatbot:
             
             return {"answer": "I'm sorry, I encountered an error trying to process your question.", "sources": []}
             
+    def _format_sources(self, result):
+        """Convert the chain's source documents into source dicts"""
+        sources = []
+        if "source_documents" in result:
+            for doc in result["source_documents"]:
+                if hasattr(doc, "metadata") and "url" in doc.metadata and "title" in doc.metadata:
+                    if doc.metadata.get("source") not in ["empty", "error"]:
+                        sources.append({
+                            "title": doc.metadata["title"],
+                            "url": doc.metadata["url"],
+                            "id": doc.metadata.get("id")
+                        })
+            
+            logger.info(f"Found {len(sources)} sources for the query")
+        return sources
+    
+    async def _aembed_question(self, query):
+        """Async version of _embed_question"""
+        vector = self._cached_question_vector(query)
+        if vector is None:
+            vector = self._remember_question_vector(query, await self.vectorstore._aembed_query(query))
+        return vector
+    
+    async def aroute_query(self, query):
+        """Async version of route_query (the ORM work runs in a worker thread)"""
+        return await sync_to_async(self.route_query)(query)
+    
+    async def aget_cached_response(self, query):
+        """Async version of get_cached_response; the question is embedded with the async API"""
+        try:
+            await self._aembed_question(query)
+        except Exception as e:
+            logger.error(f"Error embedding question for answer cache: {str(e)}")
+            return None
+        return self.get_cached_response(query)
+    
+    async def aget_response(self, query, use_cache=True):
+        """
+        Async version of get_response using the chain's ainvoke
+        
+        Args:
+            query: User's question string
+            use_cache: Whether the semantic answer cache may be used
+            
+        Returns:
+            dict: Contains 'answer' and optionally 'sources'
+        """
+        try:
+            routed = await self.aroute_query(query)
+            if routed is not None:
+                return routed
+            
+            if not self.api_key:
+                logger.error("No API key provided for Gemini")
+                return {
+                    "answer": "I can't search your bookmarks right now. API configuration is missing.",
+                    "sources": []
+                }
+            
+            use_cache = use_cache and self.can_use_cache()
+            if use_cache:
+                cached = await self.aget_cached_response(query)
+                if cached is not None:
+                    cached["cached"] = True
+                    return cached
+            
+            try:
+                result = await self.chain.ainvoke({"question": query})
+            except Exception as e:
+                logger.error(f"Chain execution error: {str(e)}")
+                return {
+                    "answer": "I'm sorry, I encountered an error searching your bookmarks. Please try again later.",
+                    "sources": []
+                }
+            
+            response = {
+                "answer": result.get("answer", "I couldn't find an answer to your question."),
+                "sources": self._format_sources(result)
+            }
+            
+            if use_cache:
+                self.cache_response(query, response["answer"], response["sources"])
+            
+            return response
+        except Exception as e:
+            logger.error(f"Error getting async response: {str(e)}")
+            return {"answer": "I'm sorry, I encountered an error trying to process your question.", "sources": []}
+    
+    async def astream_response(self, query):
+        """
+        Async version of stream_response using the chain's astream.
+        Sources of the streamed answer are kept in self.last_sources.
+        
+        Args:
+            query: User's question string
+            
+        Returns:
+            async generator: Yields chunks of the answer as they are generated
+        """
+        self.last_sources = []
+        if not self.api_key:
+            logger.error("No API key provided for Gemini")
+            yield "I can't search your bookmarks right now. API configuration is missing."
+            return
+        
+        try:
+            async for chunk in self.chain.astream({"question": query}):
+                if "source_documents" in chunk:
+                    self.last_sources = self._format_sources(chunk)
+                if "answer" in chunk:
+                    yield chunk["answer"]
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            yield "I'm sorry, I encountered an error processing your request."
+    
     def ask(self, query):
         """
         Direct query to the LLM without RAG context, used for title generation.
@@ -387,6 +644,11 @@ class BookmarkChatbot:
         Returns:
             generator: Yields chunks of the answer as they are generated
         """
+        routed = self.route_query(query)
+        if routed is not None:
+            yield routed["answer"]
+            return
+        
         if not self.api_key:
             logger.error("No API key provided for Gemini")
             yield "I can't search your bookmarks right now. API configuration is missing."
@@ -439,6 +701,34 @@ class BookmarkChatbot:
             logger.error(f"Error streaming title generation: {str(e)}")
             yield "Untitled Chat"
             
+    def _get_filter_index(self):
+        """Get the loaded vectorstore and its category/tag metadata index"""
+        vectorstore = getattr(self, "vectorstore", None) or self._get_vectorstore()
+        if getattr(self, "metadata_index", None) is None:
+            self.metadata_index = get_metadata_index(vectorstore, self.user_id)
+        return vectorstore, self.metadata_index
+    
+    def _apply_prefilter(self, field, value):
+        """
+        Restrict retrieval to bookmarks whose metadata field contains value.
+        The matching FAISS rows are looked up in the metadata index and the
+        similarity search runs only over that subset.
+        """
+        vectorstore, metadata_index = self._get_filter_index()
+        ids = metadata_index.lookup(field, value)
+        self.filter_scope = f"{field}:{str(value).strip().lower()}"
+        self.active_filters = {field: value}
+        
+        retriever = PrefilteredFAISSRetriever(
+            vectorstore=vectorstore,
+            ids=sorted(ids),
+            k=20,  # Maximum limit for safety
+            score_threshold=0.3  # Minimum similarity score
+        )
+        
+        logger.info(f"Created prefiltered retriever for {field} '{value}' ({len(ids)} bookmarks)")
+        self.chain.retriever = retriever
+    
     def filter_by_category(self, category):
         """
         Update the retriever to filter by a specific category
@@ -447,31 +737,26 @@ class BookmarkChatbot:
             category: Category name to filter by
         """
         try:
-            vectorstore = self._get_vectorstore()
-            
-            # Create a metadata filter function
-            def filter_func(metadata):
-                return category.lower() in [c.lower() for c in metadata.get("categories", [])]
-                
-            # Daha basit çözüm: Doğrudan as_retriever metodunu filtre ile kullan
-            retriever = vectorstore.as_retriever(
-                search_type="similarity_score_threshold",
-                search_kwargs={
-                    "k": 20,  # Maximum limit for safety
-                    "score_threshold": 0.3,  # Minimum similarity score
-                    "filter": filter_func
-                }
-            )
-            
-            logger.info(f"Created filtered retriever for category '{category}'")
-            self.chain.retriever = retriever
+            self._apply_prefilter("categories", category)
         except Exception as e:
             logger.error(f"Error filtering by category: {str(e)}")
+    
+    def filter_by_tag(self, tag):
+        """
+        Update the retriever to filter by a specific tag
+        
+        Args:
+            tag: Tag name to filter by
+        """
+        try:
+            self._apply_prefilter("tags", tag)
+        except Exception as e:
+            logger.error(f"Error filtering by tag: {str(e)}")
             
     def reset_filter(self):
         """Reset any filters on the retriever"""
         try:
-            vectorstore = self._get_vectorstore()
+            vectorstore = getattr(self, "vectorstore", None) or self._get_vectorstore()
             
             # Filtre olmadan yeni retriever oluştur
             retriever = vectorstore.as_retriever(
@@ -484,6 +769,8 @@ class BookmarkChatbot:
             
             logger.info("Reset retriever filters")
             self.chain.retriever = retriever
+            self.filter_scope = None
+            self.active_filters = {}
         except Exception as e:
             logger.error(f"Error resetting filter: {str(e)}")
             
@@ -12,8 +12,15 @@ logger = logging.getLogger(__name__)
 def get_embeddings():
     """
     Returns an instance of GoogleGenerativeAIEmbeddings using the Gemini API key.
+    With EMBEDDING_PROVIDER=fake returns local hash-based embeddings instead
+    (no API key or network needed).
     Returns None if there's an error.
     """
+    if os.environ.get("EMBEDDING_PROVIDER", "gemini").lower() == "fake":
+        from tagwiseapp.reader.fake_provider import FakeEmbeddings
+        logger.debug("Creating FakeEmbeddings instance")
+        return FakeEmbeddings()
+    
     api_key = os.environ.get("GEMINI_API_KEY")
     
     if not api_key:
@@ -0,0 +1,134 @@
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# File stored next to the FAISS files inside a user's vectorstore directory
+METADATA_INDEX_FILENAME = "metadata_index.json"
+
+# Metadata fields of a bookmark document that can be used as filters
+INDEXED_FIELDS = ("categories", "subcategories", "tags")
+
+
+def _normalize_key(value):
+    """Normalize a category/tag name so lookups are case-insensitive"""
+    return str(value).strip().lower()
+
+
+class MetadataIndex:
+    """
+    Inverted index from bookmark metadata (categories, subcategories, tags)
+    to FAISS row ids.
+
+    The index is built once when the vectorstore is saved, so filtered
+    queries only need a dictionary lookup to get the set of rows to search.
+    """
+
+    def __init__(self, fields=None, size=0):
+        self.fields = {field: {} for field in INDEXED_FIELDS}
+        for field, mapping in (fields or {}).items():
+            self.fields[field] = {key: set(ids) for key, ids in mapping.items()}
+        self.size = size
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        """
+        Build the index from the documents stored in a FAISS vectorstore.
+
+        Args:
+            vectorstore: LangChain FAISS vectorstore
+
+        Returns:
+            MetadataIndex
+        """
+        index = cls(size=vectorstore.index.ntotal)
+        for row_id, docstore_id in vectorstore.index_to_docstore_id.items():
+            doc = vectorstore.docstore.search(docstore_id)
+            metadata = getattr(doc, "metadata", None)
+            if metadata:
+                index.add(row_id, metadata)
+        return index
+
+    def add(self, row_id, metadata):
+        """Register the metadata of a single FAISS row"""
+        for field in INDEXED_FIELDS:
+            for value in metadata.get(field) or []:
+                key = _normalize_key(value)
+                if key:
+                    self.fields[field].setdefault(key, set()).add(int(row_id))
+        self.size = max(self.size, int(row_id) + 1)
+
+    def lookup(self, field, value):
+        """
+        Get the FAISS row ids whose metadata field contains the given value.
+
+        Args:
+            field: One of INDEXED_FIELDS
+            value: Category/tag name (case-insensitive)
+
+        Returns:
+            set: Matching row ids (empty if nothing matches)
+        """
+        return set(self.fields.get(field, {}).get(_normalize_key(value), set()))
+
+    def to_dict(self):
+        return {
+            "size": self.size,
+            "fields": {
+                field: {key: sorted(ids) for key, ids in mapping.items()}
+                for field, mapping in self.fields.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(fields=data.get("fields", {}), size=data.get("size", 0))
+
+
+def save_metadata_index(vectorstore, path):
+    """
+    Build and save the metadata index for a vectorstore.
+
+    Args:
+        vectorstore: LangChain FAISS vectorstore
+        path: Vectorstore directory
+
+    Returns:
+        MetadataIndex or None if there's an error
+    """
+    try:
+        index = MetadataIndex.from_vectorstore(vectorstore)
+        with open(os.path.join(path, METADATA_INDEX_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f)
+        return index
+    except Exception as e:
+        logger.error(f"Error saving metadata index to {path}: {str(e)}")
+        return None
+
+
+def load_metadata_index(vectorstore, path=None):
+    """
+    Load the metadata index saved next to a vectorstore. The index is rebuilt
+    from the vectorstore's documents if the file is missing or stale.
+
+    Args:
+        vectorstore: LangChain FAISS vectorstore
+        path: Vectorstore directory (optional)
+
+    Returns:
+        MetadataIndex
+    """
+    if path:
+        file_path = os.path.join(path, METADATA_INDEX_FILENAME)
+        try:
+            if os.path.exists(file_path):
+                with open(file_path, "r", encoding="utf-8") as f:
+                    index = MetadataIndex.from_dict(json.load(f))
+                if index.size == vectorstore.index.ntotal:
+                    return index
+                logger.info(f"Metadata index at {path} is stale, rebuilding")
+        except Exception as e:
+            logger.error(f"Error loading metadata index from {path}: {str(e)}")
+
+    return MetadataIndex.from_vectorstore(vectorstore)
@@ -0,0 +1,233 @@
+"""
+Structured query router for the chatbot.
+
+Questions that are really database lookups ("how many bookmarks do I have
+tagged python", "show my latest 5 saves in Technology") are detected with
+simple rules and answered straight from the ORM with a templated answer.
+Everything else returns None and goes through the RAG chain: questions with
+a topic left over after the lookup phrase and its filters ("how many
+bookmarks are about machine learning"), and filters that are not one of the
+user's tags or categories ("how many bookmarks did I save in 2023").
+"""
+
+import re
+import logging
+from django.db.models import Q
+from tagwiseapp.models import Bookmark, Tag, Category
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for "latest N" listings
+MAX_LIST_LIMIT = 20
+DEFAULT_LIST_LIMIT = 5
+
+_ITEM = r"(?:bookmarks?|saves?|links?|pages?|sites?|yer imleri(?:m|ni|mi)?|yer imi|kayıt(?:lar)?(?:ım|ımı)?)"
+_STOP = r"(?=\s+(?:in|under|tagged|with|etiketli|kategorisinde\w*)\b|\s*[?.!]?\s*$)"
+
+COUNT_BOOKMARKS = re.compile(rf"^\s*(?:how many|number of|count(?: of)?(?: my)?)\s+{_ITEM}\b|\bkaç\s+(?:tane\s+)?{_ITEM}", re.IGNORECASE)
+COUNT_TAGS = re.compile(r"^\s*how many (?:different |distinct )?tags\b|\bkaç\s+(?:tane\s+)?etiket", re.IGNORECASE)
+COUNT_CATEGORIES = re.compile(r"^\s*how many (?:different |distinct )?(?:main )?categories\b|\bkaç\s+(?:tane\s+)?kategori", re.IGNORECASE)
+LATEST_BOOKMARKS = re.compile(
+    rf"^\s*(?:show|list|give|get|what are|what were)?\s*(?:me\s+)?(?:my\s+|the\s+)?(?:latest|last|most recent|newest|recent)\s+(?:(?P<n>\d+)\s+)?{_ITEM}"
+    rf"|\bson\s+(?:(?P<tr_n>\d+)\s+)?{_ITEM}",
+    re.IGNORECASE
+)
+
+TAG_FILTER = re.compile(rf"\b(?:tagged(?: with| as)?|with (?:the )?tag)\s+[\"']?(?P<value>[^\"'?]+?)[\"']?{_STOP}", re.IGNORECASE)
+CATEGORY_FILTER = re.compile(rf"\b(?:in|under)\s+(?:the\s+|my\s+)?(?:category\s+)?[\"']?(?P<value>[^\"'?]+?)[\"']?(?:\s+category)?{_STOP}", re.IGNORECASE)
+TR_TAG_FILTER = re.compile(r"[\"']?(?P<value>[\w\-\.\+#]+)[\"']?\s+etiketli\w*", re.IGNORECASE)
+TR_CATEGORY_FILTER = re.compile(r"[\"']?(?P<value>[\w\-\.\+#]+)[\"']?\s+kategorisinde\w*", re.IGNORECASE)
+
+# Words that may remain after the lookup phrase and its filters are removed;
+# anything else ("about react", "in 2023", "mention async") is a topic for RAG
+FILLER_WORDS = {
+    "do", "does", "did", "i", "have", "has", "had", "my", "me", "the", "a", "an", "in", "total", "all",
+    "saved", "save", "stored", "are", "is", "there", "what", "were", "was", "show", "list", "give", "get",
+    "can", "you", "please", "so", "far", "currently", "now", "right", "of",
+    "kaç", "tane", "var", "benim", "toplam", "toplamda", "mı", "mi", "mu", "mü", "göster", "listele",
+    "bana", "tüm", "şu", "son",
+}
+
+
+def _category_filter(category_names):
+    """CATEGORY_FILTER restricted to the given category names"""
+    names = "|".join(re.escape(name) for name in sorted(category_names, key=len, reverse=True))
+    return re.compile(
+        rf"\b(?:in|under)\s+(?:the\s+|my\s+)?(?:category\s+)?[\"']?(?P<value>{names})[\"']?(?:\s+category)?(?!\w)",
+        re.IGNORECASE
+    )
+
+
+def _extract_filter(question, patterns):
+    """Return (value, span) of the first filter found, or (None, None)"""
+    for pattern in patterns:
+        match = pattern.search(question)
+        if match:
+            value = match.group("value").strip()
+            if value and value.lower() not in ("total", "all", "my bookmarks"):
+                return value, match.span()
+    return None, None
+
+
+def _has_topic(question, spans):
+    """Check for words left over once the matched spans are removed"""
+    for start, end in sorted(spans, reverse=True):
+        question = question[:start] + " " + question[end:]
+    leftover = [word for word in re.findall(r"\w+", question.lower()) if word not in FILLER_WORDS]
+    if leftover:
+        logger.debug(f"Structured query has a topic {leftover}, leaving it to RAG")
+    return bool(leftover)
+
+
+def parse_structured_query(question, category_names=None):
+    """
+    Detect whether a question can be answered with a database query.
+
+    Args:
+        question: User's question string
+        category_names: The user's category names; when given, only these
+            are recognized after "in"/"under"
+
+    Returns:
+        dict: {'intent', 'tag', 'category', 'limit'} or None for open-ended questions
+    """
+    if not question:
+        return None
+
+    for pattern, intent in ((COUNT_TAGS, "count_tags"), (COUNT_CATEGORIES, "count_categories")):
+        match = pattern.search(question)
+        if match:
+            return None if _has_topic(question, [match.span()]) else {"intent": intent}
+
+    intent, limit = None, None
+    match = LATEST_BOOKMARKS.search(question)
+    if match:
+        intent = "latest"
+        n = match.group("n") or match.group("tr_n")
+        limit = min(int(n), MAX_LIST_LIMIT) if n else DEFAULT_LIST_LIMIT
+    else:
+        match = COUNT_BOOKMARKS.search(question)
+        if match:
+            intent = "count"
+
+    if intent is None:
+        return None
+
+    if category_names is not None:
+        category_patterns = [_category_filter(category_names)] if category_names else []
+    else:
+        category_patterns = [CATEGORY_FILTER]
+    tag, tag_span = _extract_filter(question, [TAG_FILTER, TR_TAG_FILTER])
+    category, category_span = _extract_filter(question, category_patterns + [TR_CATEGORY_FILTER])
+
+    spans = [span for span in (match.span(), tag_span, category_span) if span]
+    if _has_topic(question, spans):
+        return None
+
+    return {
+        "intent": intent,
+        "tag": tag,
+        "category": category,
+        "limit": limit,
+    }
+
+
+def _filtered_bookmarks(user_id, tag=None, category=None):
+    bookmarks = Bookmark.objects.filter(user_id=user_id)
+    if tag:
+        bookmarks = bookmarks.filter(tags__name__iexact=tag)
+    if category:
+        bookmarks = bookmarks.filter(
+            Q(main_categories__name__iexact=category) | Q(subcategories__name__iexact=category)
+        )
+    return bookmarks.distinct()
+
+
+def _describe_filters(tag, category):
+    parts = []
+    if tag:
+        parts.append(f"tagged '{tag}'")
+    if category:
+        parts.append(f"in the '{category}' category")
+    return (" " + " and ".join(parts)) if parts else ""
+
+
+def _source(bookmark):
+    return {"title": bookmark.title, "url": bookmark.url, "id": bookmark.id}
+
+
+def run_structured_query(user_id, parsed):
+    """
+    Run a parsed structured query against the ORM and render the answer.
+
+    Returns:
+        dict: Contains 'answer' and 'sources'
+    """
+    intent = parsed["intent"]
+
+    if intent == "count_tags":
+        count = Tag.objects.filter(user_id=user_id).count()
+        return {"answer": f"You have {count} tag{'s' if count != 1 else ''}.", "sources": []}
+
+    if intent == "count_categories":
+        categories = Category.objects.filter(user_id=user_id)
+        main_count = categories.filter(parent__isnull=True).count()
+        sub_count = categories.filter(parent__isnull=False).count()
+        return {
+            "answer": f"You have {main_count} main categor{'ies' if main_count != 1 else 'y'} "
+                      f"and {sub_count} subcategor{'ies' if sub_count != 1 else 'y'}.",
+            "sources": []
+        }
+
+    tag, category = parsed.get("tag"), parsed.get("category")
+    bookmarks = _filtered_bookmarks(user_id, tag, category)
+    filters = _describe_filters(tag, category)
+
+    if intent == "count":
+        count = bookmarks.count()
+        return {"answer": f"You have {count} bookmark{'s' if count != 1 else ''}{filters}.", "sources": []}
+
+    latest = list(bookmarks.order_by("-created_at")[:parsed.get("limit") or DEFAULT_LIST_LIMIT])
+    if not latest:
+        return {"answer": f"You don't have any bookmarks{filters} yet.", "sources": []}
+
+    lines = [f"Here are your {len(latest)} most recent bookmark{'s' if len(latest) != 1 else ''}{filters}:"]
+    for position, bookmark in enumerate(latest, start=1):
+        lines.append(f"{position}. {bookmark.title} - {bookmark.url} (saved {bookmark.created_at.strftime('%d.%m.%Y')})")
+    return {"answer": "\n".join(lines), "sources": [_source(b) for b in latest]}
+
+
+def route_structured_query(user_id, question, tag=None, category=None):
+    """
+    Answer a question from the database if it is a structured query.
+
+    Args:
+        user_id: Owner of the bookmarks
+        question: User's question string
+        tag: Active tag filter of the chatbot (optional)
+        category: Active category filter of the chatbot (optional)
+
+    Returns:
+        dict: Contains 'answer' and 'sources', or None if the question should go to RAG
+    """
+    try:
+        category_names = Category.objects.filter(user_id=user_id).values_list("name", flat=True)
+        parsed = parse_structured_query(question, category_names=list(category_names))
+        if parsed is None:
+            return None
+
+        # A filter that is not one of the user's tags or categories is a topic, not a lookup
+        if parsed.get("tag") and not Tag.objects.filter(user_id=user_id, name__iexact=parsed["tag"]).exists():
+            return None
+        if parsed.get("category") and not Category.objects.filter(user_id=user_id, name__iexact=parsed["category"]).exists():
+            return None
+
+        if parsed["intent"] in ("count", "latest"):
+            parsed["tag"] = parsed.get("tag") or tag
+            parsed["category"] = parsed.get("category") or category
+
+        logger.info(f"Routing question to structured query: {parsed}")
+        return run_structured_query(user_id, parsed)
+    except Exception as e:
+        logger.error(f"Error running structured query: {str(e)}")
+        return None
@@ -0,0 +1,73 @@
+from typing import Any, List, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PrefilteredFAISSRetriever(BaseRetriever):
+    """
+    Retriever that runs the FAISS similarity search only over a given
+    subset of rows (e.g. the bookmarks of one category).
+
+    Unlike passing a Python ``filter`` callable to LangChain's FAISS wrapper,
+    the subset is applied inside FAISS with an ``IDSelector``, so the top-k
+    results are always taken from matching documents and nothing has to be
+    over-fetched and thrown away.
+    """
+
+    vectorstore: Any
+    ids: List[int]
+    k: int = 20
+    score_threshold: Optional[float] = None
+
+    def _search_subset(self, vector, k):
+        """Search the FAISS index restricted to self.ids"""
+        import faiss
+
+        ids = np.array(sorted(self.ids), dtype=np.int64)
+        try:
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids))
+            scores, indices = self.vectorstore.index.search(vector, k, params=params)
+            return list(zip(scores[0], indices[0]))
+        except Exception as e:
+            # Older FAISS builds or index types without selector support:
+            # compare against the reconstructed subset vectors directly
+            logger.debug(f"IDSelector search unavailable, using subset scan: {str(e)}")
+            subset = np.vstack([self.vectorstore.index.reconstruct(int(i)) for i in ids])
+            if self.vectorstore.distance_strategy.value == "MAX_INNER_PRODUCT":
+                scores = subset @ vector[0]
+                order = np.argsort(-scores)[:k]
+            else:
+                scores = ((subset - vector[0]) ** 2).sum(axis=1)
+                order = np.argsort(scores)[:k]
+            return [(scores[j], ids[j]) for j in order]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if not self.ids:
+            return []
+
+        import faiss
+
+        vector = np.array([self.vectorstore._embed_query(query)], dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            faiss.normalize_L2(vector)
+
+        k = min(self.k, len(self.ids))
+        relevance_fn = self.vectorstore._select_relevance_score_fn()
+
+        docs = []
+        for score, row_id in self._search_subset(vector, k):
+            if row_id == -1:
+                continue
+            if self.score_threshold is not None and relevance_fn(float(score)) < self.score_threshold:
+                continue
+            doc = self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[int(row_id)])
+            if isinstance(doc, Document):
+                docs.append(doc)
+        return docs
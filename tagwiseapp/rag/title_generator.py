@@ -0,0 +1,140 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.db import close_old_connections
+from tagwiseapp.reader.llm_factory import LLMFactory
+
+logger = logging.getLogger(__name__)
+
+# Placeholder title of conversations that are waiting for an AI generated title
+PENDING_AI_TITLE = "PENDING_AI_TITLE"
+
+# Cheaper/faster model used only for conversation titles
+TITLE_MODEL = os.environ.get("CHATBOT_TITLE_MODEL", "gemini-2.0-flash-lite")
+# Seconds before a title request is abandoned in favour of the fallback title
+TITLE_TIMEOUT = float(os.environ.get("CHATBOT_TITLE_TIMEOUT", "10"))
+# Number of background threads generating titles
+TITLE_WORKERS = int(os.environ.get("CHATBOT_TITLE_WORKERS", "4"))
+# Seconds a streamed answer stays open after its completion event, waiting for the title
+TITLE_WAIT_TIMEOUT = float(os.environ.get("CHATBOT_TITLE_WAIT_TIMEOUT", "15"))
+
+_executor = ThreadPoolExecutor(max_workers=TITLE_WORKERS, thread_name_prefix="chat-title")
+
+
+def build_title_prompt(message):
+    """Prompt asking for a short title based on the user's first message"""
+    return f"""
+    Create a concise, descriptive title (3-5 words) for a conversation that starts with the user's message below.
+    The title should reflect the main topic or intent of the conversation.
+    Do not include phrases like 'Title:', 'Chat about:', or similar prefixes.
+    Just return the title itself, nothing else.
+
+    User: {message}
+
+    Examples:
+    - "Data Analysis Project Plan"
+    - "Python Error Debugging"
+    - "Marketing Strategy Ideas"
+    - "React Component Design"
+
+    Title:
+    """
+
+
+def fallback_title(message):
+    """Use the first few words of the user message as the title"""
+    words = message.split()
+    truncated_message = " ".join(words[:5])
+    return truncated_message + "..." if len(words) > 5 else truncated_message
+
+
+def clean_title(raw_title, message):
+    """
+    Remove prefixes/quotes from a generated title and enforce its length.
+    Falls back to the user message when the title is unusable.
+    """
+    title = (raw_title or "").strip()
+    for prefix in ["Title:", "title:", "Title", "TITLE:", "TITLE", "Chat Title:", "Chat title:"]:
+        if title.startswith(prefix):
+            title = title[len(prefix):].strip()
+
+    # Remove quotes if they wrap the entire title
+    if (title.startswith('"') and title.endswith('"')) or (title.startswith("'") and title.endswith("'")):
+        title = title[1:-1].strip()
+
+    if not title or len(title) < 3:
+        return fallback_title(message)
+    if len(title) > 100:
+        return title[:97] + "..."
+    return title
+
+
+def _get_title_llm(api_key):
+    return LLMFactory.get_llm(
+        provider="gemini",
+        model_name=TITLE_MODEL,
+        temperature=0.2,
+        max_tokens=32,
+        timeout=TITLE_TIMEOUT,
+        google_api_key=api_key,
+        max_retries=1,
+    )
+
+
+def generate_title(message, api_key=None):
+    """
+    Generate a conversation title for the user's first message
+
+    Args:
+        message: User's message
+        api_key: Gemini API key (defaults to GEMINI_API_KEY)
+
+    Returns:
+        str: Cleaned title, or a title derived from the message on failure
+    """
+    api_key = api_key or os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        logger.error("Cannot generate title: No API key available")
+        return fallback_title(message)
+
+    llm = None
+    try:
+        llm = _get_title_llm(api_key)
+        result = llm.invoke(build_title_prompt(message))
+        return clean_title(getattr(result, "content", result), message)
+    except Exception as e:
+        if llm is not None:
+            LLMFactory.invalidate_llm(llm)
+        logger.error(f"Error generating title: {str(e)}")
+        return fallback_title(message)
+
+
+def schedule_title_generation(conversation_id, message, current_title, api_key=None):
+    """
+    Generate a conversation title in the background and save it.
+
+    The title is only written if the conversation still has current_title,
+    so a rename made while the title was being generated is kept.
+
+    Args:
+        conversation_id: ChatConversation id
+        message: User's first message
+        current_title: Title of the conversation when the task was scheduled
+        api_key: Gemini API key
+
+    Returns:
+        Future: Resolves to the generated title
+    """
+    from tagwiseapp.models import ChatConversation
+
+    def task():
+        try:
+            title = generate_title(message, api_key)
+            ChatConversation.objects.filter(id=conversation_id, title=current_title).update(title=title)
+            logger.info(f"Updated conversation {conversation_id} title to: {title}")
+            return title
+        finally:
+            close_old_connections()
+
+    logger.info(f"Scheduling title generation for conversation {conversation_id} with {TITLE_MODEL}")
+    return _executor.submit(task)
@@ -1,5 +1,6 @@
 from langchain_community.vectorstores import FAISS
 from .embeddings import get_embeddings
+from .metadata_index import save_metadata_index, load_metadata_index
 import os
 import shutil
 import logging
@@ -77,6 +78,7 @@ def save_vectorstore(vectorstore, user_id):
         
         # Save using LangChain's FAISS native method
         vectorstore.save_local(path)
+        save_metadata_index(vectorstore, path)
         logger.info(f"Vectorstore saved for user {user_id}")
         return True
     except Exception as e:
@@ -124,6 +126,28 @@ def load_vectorstore(user_id):
         logger.error(f"Unexpected error in load_vectorstore for user {user_id}: {str(e)}")
         return None
 
+def get_vectorstore_version(user_id):
+    """
+    Get a version stamp for a user's vectorstore. The stamp changes every time
+    the vectorstore is saved, so it can be used to invalidate derived caches.
+    
+    Returns:
+        int or None if the user has no saved vectorstore
+    """
+    try:
+        return os.stat(os.path.join(get_vectorstore_path(user_id), "index.faiss")).st_mtime_ns
+    except OSError:
+        return None
+
+def get_metadata_index(vectorstore, user_id):
+    """
+    Get the category/tag metadata index for a user's vectorstore
+
+    Returns:
+        MetadataIndex
+    """
+    return load_metadata_index(vectorstore, get_vectorstore_path(user_id))
+
 def delete_vectorstore(user_id):
     """
     Delete a user's vectorstore
@@ -8,14 +8,16 @@ This package contains modules for analyzing web pages and categorizing them.
 from .main import analyze_url, main 
 
 # Import content analyzer functions for easy access
-from .content_analyzer import categorize_content, analyze_screenshot, generate_summary_from_content, generate_summary_from_screenshot
+from .content_analyzer import categorize_content, categorize_contents, analyze_screenshot, generate_summary_from_content, generate_summary_from_screenshot
 
 # Import HTML utility functions
 from .html_utils import clean_html_content, MAX_CONTENT_LENGTH
+from .parsed_page import ParsedPage
 
 # Import category matcher functions
 from .category_matcher import find_similar_category, find_similar_tag, get_existing_categories, get_existing_tags, match_categories_and_tags
 
 # Import YouTube analyzer functions for easy access
 from .youtube_analyzer import is_youtube_url, analyze_youtube_video, extract_youtube_video_id, \
-                              get_youtube_thumbnail, get_youtube_thumbnail_webp, fetch_youtube_thumbnail 
\ No newline at end of file
+                              get_youtube_thumbnail, get_youtube_thumbnail_webp, fetch_youtube_thumbnail, \
+                              resolve_youtube_thumbnail 
\ No newline at end of file
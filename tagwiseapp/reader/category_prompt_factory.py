@@ -8,6 +8,9 @@ import json
 from typing import List, Dict, Optional, Any
 import logging
 
+from .settings import CONTENT_MAX_TOKENS
+from .token_budget import count_tokens, truncate_to_tokens
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,31 +21,18 @@ class CategoryPromptFactory:
     """
     
     @staticmethod
-    def create_category_prompt(content: str, url: str, 
-                               existing_title: Optional[str] = None,
-                               existing_description: Optional[str] = None,
-                               existing_categories: Optional[List[Dict[str, Any]]] = None,
-                               existing_tags: Optional[List[Dict[str, Any]]] = None) -> str:
+    def format_examples(existing_categories: Optional[List[Dict[str, Any]]] = None,
+                        existing_tags: Optional[List[Dict[str, Any]]] = None):
         """
-        İçerik kategorilendirme için LLM promptu oluşturur.
+        Mevcut kategori ve etiketlerden prompt için örnek listeleri oluşturur.
         
         Args:
-            content (str): İçerik metni
-            url (str): URL
-            existing_title (str, optional): Mevcut başlık
-            existing_description (str, optional): Mevcut açıklama
             existing_categories (List[Dict], optional): Mevcut kategoriler
             existing_tags (List[Dict], optional): Mevcut etiketler
             
         Returns:
-            str: LLM promptu
+            tuple: (kategori örnekleri, etiket örnekleri) metinleri
         """
-        # Truncate content if too long
-        MAX_CONTENT_LENGTH = 15000
-        if len(content) > MAX_CONTENT_LENGTH:
-            logger.info(f"Content too long ({len(content)} chars), truncating to {MAX_CONTENT_LENGTH}")
-            content = content[:MAX_CONTENT_LENGTH] + "..."
-        
         # Format existing categories for the prompt
         category_examples = ""
         if existing_categories:
@@ -72,6 +62,59 @@ class CategoryPromptFactory:
             tag_list = [tag.get('name', '') for tag in existing_tags[:20]]  # Limit to 20 examples
             tag_examples += ", ".join(tag_list)
         
+        return category_examples, tag_examples
+    
+    @staticmethod
+    def create_taxonomy_context(existing_categories: Optional[List[Dict[str, Any]]] = None,
+                                existing_tags: Optional[List[Dict[str, Any]]] = None) -> Optional[str]:
+        """
+        Kullanıcının kategori ve etiket örneklerini, sistem talimatından hemen sonra
+        gönderilecek sabit bağlam olarak döndürür (sağlayıcı prompt önbelleği için).
+        
+        Args:
+            existing_categories (List[Dict], optional): Mevcut kategoriler
+            existing_tags (List[Dict], optional): Mevcut etiketler
+            
+        Returns:
+            str or None: Bağlam metni, örnek yoksa None
+        """
+        category_examples, tag_examples = CategoryPromptFactory.format_examples(existing_categories, existing_tags)
+        context = "\n\n".join(part for part in (category_examples.strip(), tag_examples.strip()) if part)
+        return context or None
+    
+    @staticmethod
+    def create_category_prompt(content: str, url: str, 
+                               existing_title: Optional[str] = None,
+                               existing_description: Optional[str] = None,
+                               existing_categories: Optional[List[Dict[str, Any]]] = None,
+                               existing_tags: Optional[List[Dict[str, Any]]] = None,
+                               include_examples: bool = True) -> str:
+        """
+        İçerik kategorilendirme için LLM promptu oluşturur.
+        
+        Args:
+            content (str): İçerik metni
+            url (str): URL
+            existing_title (str, optional): Mevcut başlık
+            existing_description (str, optional): Mevcut açıklama
+            existing_categories (List[Dict], optional): Mevcut kategoriler
+            existing_tags (List[Dict], optional): Mevcut etiketler
+            include_examples (bool, optional): Kategori/etiket örneklerini prompta ekle
+                (False: örnekler create_taxonomy_context ile ayrıca gönderilir)
+            
+        Returns:
+            str: LLM promptu
+        """
+        # Truncate content if it exceeds the token budget
+        content_tokens = count_tokens(content)
+        if content_tokens > CONTENT_MAX_TOKENS:
+            logger.info(f"Content too long ({content_tokens} tokens), truncating to {CONTENT_MAX_TOKENS}")
+            content = truncate_to_tokens(content, CONTENT_MAX_TOKENS)
+        
+        category_examples, tag_examples = "", ""
+        if include_examples:
+            category_examples, tag_examples = CategoryPromptFactory.format_examples(existing_categories, existing_tags)
+        
         # Build the prompt
         prompt = f"""
         Bu bir web sayfası içeriğidir. Lütfen bu içeriği analiz edip kategorilere ayır ve etiketle.
@@ -108,6 +151,74 @@ class CategoryPromptFactory:
         logger.info(f"Created category prompt for URL: {url}")
         return prompt
     
+    @staticmethod
+    def create_batch_category_prompt(items: List[Dict[str, Any]],
+                                     existing_categories: Optional[List[Dict[str, Any]]] = None,
+                                     existing_tags: Optional[List[Dict[str, Any]]] = None,
+                                     include_examples: bool = True) -> str:
+        """
+        Birden fazla sayfayı tek LLM çağrısında kategorilendirmek için prompt oluşturur.
+        Kategori/etiket örnekleri ve talimatlar sayfa başına değil, bir kez gönderilir.
+        
+        Args:
+            items (List[Dict]): index, url, content ve isteğe bağlı title/description içeren sayfalar
+            existing_categories (List[Dict], optional): Mevcut kategoriler
+            existing_tags (List[Dict], optional): Mevcut etiketler
+            include_examples (bool, optional): Kategori/etiket örneklerini prompta ekle
+            
+        Returns:
+            str: LLM promptu
+        """
+        category_examples, tag_examples = "", ""
+        if include_examples:
+            category_examples, tag_examples = CategoryPromptFactory.format_examples(existing_categories, existing_tags)
+        
+        documents = []
+        for item in items:
+            lines = [f"### Sayfa {item['index']}", f"URL: {item['url']}"]
+            if item.get('title'):
+                lines.append(f"Mevcut başlık: {item['title']}")
+            if item.get('description'):
+                lines.append(f"Mevcut açıklama: {item['description']}")
+            lines.append(f"İçerik:\n{item['content']}")
+            documents.append("\n".join(lines))
+        documents_text = "\n\n".join(documents)
+        
+        prompt = f"""
+        Aşağıda {len(items)} farklı web sayfasının içeriği var. Her sayfayı birbirinden bağımsız olarak analiz edip kategorilere ayır ve etiketle.
+        
+        {category_examples}
+        
+        {tag_examples}
+        
+        {documents_text}
+        
+        Lütfen aşağıdaki JSON formatında, her sayfa için bir öğe içeren tek bir yanıt oluştur:
+        ```json
+        {{
+            "items": [
+                {{
+                    "index": 0,
+                    "title": "Sayfanın başlığı",
+                    "description": "Sayfanın kısa açıklaması",
+                    "categories": [
+                        {{ "main": "Ana kategori adı", "sub": "Alt kategori adı" }}
+                    ],
+                    "tags": ["etiket1", "etiket2", "etiket3"]
+                }}
+            ]
+        }}
+        ```
+        
+        "index" alanı sayfanın başlığındaki numara olmalı; her sayfa için tam olarak bir öğe döndür.
+        Kategoriler için ana ve alt kategori yapısını kullan. Her kategori için main ve sub alanı olmalı.
+        Etiketler için her sayfayı en iyi tanımlayan 3-7 arasında etiket belirle.
+        Yanıt yalnızca JSON formatında olmalıdır, başka açıklama ekleme.
+        """
+        
+        logger.info(f"Created batch category prompt for {len(items)} pages")
+        return prompt
+    
     @staticmethod
     def create_screenshot_category_prompt(url: str, 
                                         existing_title: Optional[str] = None,
@@ -127,34 +238,7 @@ class CategoryPromptFactory:
         Returns:
             str: LLM promptu
         """
-        # Format existing categories for the prompt
-        category_examples = ""
-        if existing_categories:
-            # Get main categories
-            main_categories = [cat for cat in existing_categories if cat.get('is_main', False)]
-            
-            # Format category examples
-            if main_categories:
-                category_examples = "Mevcut kategori örnekleri:\n"
-                for main_cat in main_categories[:10]:  # Limit to 10 examples
-                    main_name = main_cat.get('name', '')
-                    # Get subcategories for this main category
-                    sub_cats = [
-                        cat.get('name', '') for cat in existing_categories 
-                        if cat.get('parent_id') == main_cat.get('id') and not cat.get('is_main', True)
-                    ]
-                    
-                    if sub_cats:
-                        category_examples += f"- {main_name}: {', '.join(sub_cats[:5])}\n"
-                    else:
-                        category_examples += f"- {main_name}\n"
-        
-        # Format existing tags for the prompt
-        tag_examples = ""
-        if existing_tags:
-            tag_examples = "Mevcut etiket örnekleri:\n"
-            tag_list = [tag.get('name', '') for tag in existing_tags[:20]]  # Limit to 20 examples
-            tag_examples += ", ".join(tag_list)
+        category_examples, tag_examples = CategoryPromptFactory.format_examples(existing_categories, existing_tags)
         
         # Build the prompt
         prompt = f"""
@@ -5,6 +5,7 @@ This module provides functions for analyzing content with LangChain.
 Replaces the gemini_analyzer.py with a provider-agnostic implementation.
 """
 
+import copy
 import json
 import base64
 import logging
@@ -22,12 +23,14 @@ from .category_matcher import (
     find_similar_category,
     find_similar_tag
 )
-from .html_utils import clean_html_content, MAX_CONTENT_LENGTH
+from .html_utils import clean_html_content
+from .token_budget import count_tokens, truncate_to_tokens
+from .content_extractor import extract_digest, is_html
 from .prompts import TEXT_SYSTEM_INSTRUCTION, IMAGE_SYSTEM_INSTRUCTION
 from .category_prompt_factory import CategoryPromptFactory
 from .llm_factory import LLMFactory
-from .settings import get_model_config
-from .schemas import ContentAnalysisModel, get_content_analysis_json_schema
+from .settings import get_model_config, HEDGE_ANALYSIS, BATCH_MAX_ITEMS, BATCH_TOKEN_BUDGET, BATCH_ITEM_MAX_TOKENS, CONTENT_MAX_TOKENS
+from .schemas import ContentAnalysisModel, BatchContentAnalysisModel, analysis_to_dict
 
 # Import LangChain message types for invoking LLMs
 from langchain_core.messages import HumanMessage, SystemMessage
@@ -182,17 +185,177 @@ def generate_summary_from_content(content: str, url: str) -> str:
         return f"URL: {url} için HTML içeriğinden özet oluşturulamadı."
 
 
-def categorize_content(content: str, url: str, existing_title: Optional[str] = None, existing_description: Optional[str] = None, use_structured_output: bool = True, user=None) -> Dict:
+def _default_result(url: str, existing_title: Optional[str] = None, existing_description: Optional[str] = None) -> Dict:
+    """Kategorilendirme başarısız olduğunda döndürülen genel sonuç"""
+    return {
+        'url': url,
+        'title': existing_title or '',
+        'description': existing_description or '',
+        'categories': [{
+            'main': 'Genel',
+            'sub': 'Diğer',
+            'main_id': None,
+            'sub_id': None
+        }],
+        'tags': [{
+            'name': 'genel',
+            'id': None
+        }]
+    }
+
+
+def _match_result(result: Dict, existing_categories: List[Dict], existing_tags: List[Dict]) -> Dict:
+    """
+    LLM sonucundaki kategori ve etiketleri veritabanındakilerle eşleştirir.
+    
+    Args:
+        result (Dict): LLM'den gelen kategorilendirme sonucu
+        existing_categories (List[Dict]): Mevcut kategoriler
+        existing_tags (List[Dict]): Mevcut etiketler
+        
+    Returns:
+        Dict: Eşleştirilmiş kategori/etiket id'leri eklenmiş sonuç
+    """
+    # Kategori eşleştirme için veritabanındaki kategorilerle karşılaştır
+    if result.get('categories'):
+        matched_categories = []
+        for category in result.get('categories', []):
+            # YouTube sonuçları main_category/subcategory anahtarlarını kullanır
+            main_key, sub_key = ('main_category', 'subcategory') if 'main_category' in category else ('main', 'sub')
+            main_category = category.get(main_key, '')
+            sub_category = category.get(sub_key, '')
+            
+            # Ana kategoriyi eşleştir
+            matched_main = find_similar_category(main_category, existing_categories, is_main_category=True, accept_new=True)
+            
+            # Alt kategoriyi eşleştir
+            matched_sub = find_similar_category(sub_category, existing_categories, is_main_category=False, accept_new=True, parent_category_id=matched_main.get('id') if matched_main else None)
+            
+            matched_categories.append({
+                main_key: matched_main.get('name') if matched_main else main_category,
+                sub_key: matched_sub.get('name') if matched_sub else sub_category,
+                'main_id': matched_main.get('id') if matched_main else None,
+                'sub_id': matched_sub.get('id') if matched_sub else None
+            })
+        
+        # Eşleştirilmiş kategorileri sonuca ekle
+        result['categories'] = matched_categories
+        
+        # Üst seviyedeki ana/alt kategori (YouTube) ilk kategoriyle aynı kalmalı
+        if 'main_category' in result and 'main_category' in matched_categories[0]:
+            result['main_category'] = matched_categories[0]['main_category']
+            result['subcategory'] = matched_categories[0]['subcategory']
+    
+    # Etiketleri eşleştir
+    if result.get('tags'):
+        matched_tags = []
+        
+        for tag_item in result.get('tags', []):
+            # Etiket formatını kontrol et - string veya dict olabilir
+            if isinstance(tag_item, dict) and 'name' in tag_item:
+                tag_name = tag_item.get('name')
+            elif isinstance(tag_item, str):
+                tag_name = tag_item
+            else:
+                continue  # Geçersiz format
+            
+            if tag_name:
+                matched_tag = find_similar_tag(tag_name, existing_tags, accept_new=True)
+                if matched_tag:
+                    matched_tags.append({
+                        'name': matched_tag.get('name'),
+                        'id': matched_tag.get('id')
+                    })
+        
+        # Eşleştirilmiş etiketleri sonuca ekle
+        result['tags'] = matched_tags
+    
+    return result
+
+
+def match_result_to_user(result: Dict, user=None) -> Dict:
+    """
+    Eşleştirilmemiş (match=False ile üretilmiş) bir analiz sonucunun kategori ve
+    etiketlerini kullanıcının kendi kategori ve etiketleriyle eşleştirir (sonuç kopyalanır).
+    
+    Args:
+        result (Dict): LLM'den gelen, birden fazla istek arasında paylaşılabilen sonuç
+        user: Sonucu alacak kullanıcı
+        
+    Returns:
+        Dict: Kullanıcıya göre eşleştirilmiş sonuç
+    """
+    if not isinstance(result, dict):
+        return result
+    return _match_result(copy.deepcopy(result), get_existing_categories(user), get_existing_tags(user))
+
+
+def _content_digest(content: Any) -> str:
+    """LLM'e gönderilecek, token bütçesine sığdırılmış sayfa metni"""
+    if is_html(content):
+        # HTML: menü, çerez bandı ve yorumlar olmadan token bütçeli özet
+        return extract_digest(content)
+    # Düz metin: boşlukları normalize et ve token bütçesine göre kısalt
+    return truncate_to_tokens(clean_html_content(content), CONTENT_MAX_TOKENS)
+
+
+def _categorization_chain(clean_text: str, url: str, existing_title: Optional[str], existing_description: Optional[str],
+                          existing_categories: List[Dict], tags: List[Dict]):
+    """Yapılandırılmış kategorilendirme için LLM zinciri ve prompt'u"""
+    prompt = CategoryPromptFactory.create_category_prompt(
+        content=clean_text,
+        url=url,
+        existing_title=existing_title,
+        existing_description=existing_description,
+        existing_categories=existing_categories,
+        existing_tags=tags,
+        # Structured requests send the examples as cacheable chain context
+        include_examples=False
+    )
+    # Pydantic schema: providers return it natively, validated once
+    llm_chain = LLMChain(
+        system_prompt=TEXT_SYSTEM_INSTRUCTION,
+        output_schema=ContentAnalysisModel,
+        model_type="text",
+        hedge=HEDGE_ANALYSIS,
+        context=CategoryPromptFactory.create_taxonomy_context(existing_categories, tags)
+    )
+    return llm_chain, prompt
+
+
+def _structured_result(structured_result: Any, url: str, existing_title: Optional[str], existing_description: Optional[str]) -> Dict:
+    """Yapılandırılmış LLM çıktısını sonuç sözlüğüne çevirir (gerekirse metinden ayrıştırır)"""
+    # Check if we got a structured output or a string
+    if isinstance(structured_result, dict):
+        logger.info("Successfully received structured output")
+        # Add URL if not present
+        if not structured_result.get('url'):
+            structured_result['url'] = url
+        
+        # Structured output already has the right format,
+        # but we still need to match categories and tags with existing ones
+        return structured_result
+    
+    logger.warning("Structured output failed, falling back to text parsing")
+    # Fallback to text parsing
+    corrected_json_text = correct_json_format(str(structured_result))
+    json_result = json.loads(corrected_json_text)
+    return ensure_correct_json_structure(json_result, url, existing_title, existing_description)
+
+
+def categorize_content(content: str, url: str, existing_title: Optional[str] = None, existing_description: Optional[str] = None, use_structured_output: bool = True, user=None, match: bool = True) -> Dict:
     """
     HTML içeriğini kategorize eder ve etiketler.
 
     Args:
-        content (str): HTML içeriği
+        content (str or ParsedPage): HTML içeriği, ayrıştırılmış sayfa veya çıkarılmış metin
         url (str): URL adresi
         existing_title (Optional[str], optional): Mevcut başlık. Defaults to None.
         existing_description (Optional[str], optional): Mevcut açıklama. Defaults to None.
         use_structured_output (bool, optional): Whether to use structured output. Defaults to True.
         user: Kullanıcı objesi, kişiselleştirilmiş kategoriler için kullanılır. Defaults to None.
+        match (bool, optional): False ise LLM sonucu veritabanıyla eşleştirilmeden döndürülür
+            (bkz. match_result_to_user). Defaults to True.
 
     Returns:
         Dict: Kategorize edilmiş sonuçlar
@@ -200,12 +363,7 @@ def categorize_content(content: str, url: str, existing_title: Optional[str] = N
     try:
         print(f"Kategorilendirme başlatılıyor... URL: {url}")
         
-        # HTML içerikteki HTML etiketlerini temizle
-        clean_text = clean_html_content(content)
-        
-        # Temizlenmiş metni kısalt
-        if len(clean_text) > MAX_CONTENT_LENGTH:
-            clean_text = clean_text[:MAX_CONTENT_LENGTH]
+        clean_text = _content_digest(content)
         
         if existing_title:
             # Kullanıcı için daha anlamlı bir başlık kullan
@@ -222,60 +380,40 @@ def categorize_content(content: str, url: str, existing_title: Optional[str] = N
         existing_categories = get_existing_categories(user)
         tags = get_existing_tags(user)
         
-        # Kategori ve etiketler için LLM prompt'u hazırla
-        prompt = CategoryPromptFactory.create_category_prompt(
-            content=clean_text,
-            url=url,
-            existing_title=existing_title,
-            existing_description=existing_description,
-            existing_categories=existing_categories,
-            existing_tags=tags
-        )
-        
-        logger = logging.getLogger(__name__)
         logger.info(f"Sending categorization request to LLM for URL: {url}")
         
         try:
             if use_structured_output:
-                # Use structured output with JSON schema
-                output_schema = get_content_analysis_json_schema()
-                
-                # Create LLMChain with structured output
-                llm_chain = LLMChain(
-                    system_prompt=TEXT_SYSTEM_INSTRUCTION,
-                    output_schema=output_schema,
-                    model_type="text"
-                )
+                llm_chain, prompt = _categorization_chain(clean_text, url, existing_title, existing_description,
+                                                          existing_categories, tags)
                 
                 # Run the chain
-                structured_result = llm_chain.run(prompt)
-                
-                # Check if we got a structured output or a string
-                if isinstance(structured_result, dict):
-                    logger.info("Successfully received structured output")
-                    # Add URL if not present
-                    if 'url' not in structured_result:
-                        structured_result['url'] = url
-                    
-                    # Structured output already has the right format,
-                    # but we still need to match categories and tags with existing ones
-                    result = structured_result
-                else:
-                    logger.warning("Structured output failed, falling back to text parsing")
-                    # Fallback to text parsing
-                    corrected_json_text = correct_json_format(str(structured_result))
-                    json_result = json.loads(corrected_json_text)
-                    result = ensure_correct_json_structure(json_result, url, existing_title, existing_description)
+                result = _structured_result(analysis_to_dict(llm_chain.run(prompt)), url, existing_title, existing_description)
             else:
+                # Kategori ve etiketler için LLM prompt'u hazırla (örnekler prompt'un içinde)
+                prompt = CategoryPromptFactory.create_category_prompt(
+                    content=clean_text,
+                    url=url,
+                    existing_title=existing_title,
+                    existing_description=existing_description,
+                    existing_categories=existing_categories,
+                    existing_tags=tags,
+                    include_examples=True
+                )
+                
                 # Use traditional approach
-                llm = LLMFactory.create_llm(
+                llm = LLMFactory.get_llm(
                     provider=settings.get('provider', 'gemini'),
                     model_name=settings.get('model_name', 'gemini-2.0-flash'),
                     temperature=0.2
                 )
                 
                 # Invoke LLM
-                response = llm.invoke([HumanMessage(content=prompt)])
+                try:
+                    response = llm.invoke([HumanMessage(content=prompt)])
+                except Exception:
+                    LLMFactory.invalidate_llm(llm)
+                    raise
                 
                 # Extract content from response
                 if hasattr(response, 'content'):
@@ -296,98 +434,215 @@ def categorize_content(content: str, url: str, existing_title: Optional[str] = N
                     logger.error(f"JSON parse error: {str(e)}")
                     # Boş bir dict ile devam et
                     json_result = {}
-            
-            # Kategori eşleştirme için veritabanındaki kategorilerle karşılaştır
-            if result.get('categories'):
-                matched_categories = []
-                for category in result.get('categories', []):
-                    main_category = category.get('main', '')
-                    sub_category = category.get('sub', '')
-                    
-                    # Ana kategoriyi eşleştir
-                    matched_main = find_similar_category(main_category, existing_categories, is_main_category=True, accept_new=True)
-                    
-                    # Alt kategoriyi eşleştir
-                    matched_sub = find_similar_category(sub_category, existing_categories, is_main_category=False, accept_new=True, parent_category_id=matched_main.get('id') if matched_main else None)
-                    
-                    matched_categories.append({
-                        'main': matched_main.get('name') if matched_main else main_category,
-                        'sub': matched_sub.get('name') if matched_sub else sub_category,
-                        'main_id': matched_main.get('id') if matched_main else None,
-                        'sub_id': matched_sub.get('id') if matched_sub else None
-                    })
-                
-                # Eşleştirilmiş kategorileri sonuca ekle
-                result['categories'] = matched_categories
-            
-            # Etiketleri eşleştir
-            if result.get('tags'):
-                matched_tags = []
-                existing_tags = get_existing_tags()
-                
-                for tag_item in result.get('tags', []):
-                    # Etiket formatını kontrol et - string veya dict olabilir
-                    if isinstance(tag_item, dict) and 'name' in tag_item:
-                        tag_name = tag_item.get('name')
-                    elif isinstance(tag_item, str):
-                        tag_name = tag_item
-                    else:
-                        continue  # Geçersiz format
-                    
-                    if tag_name:
-                        matched_tag = find_similar_tag(tag_name, existing_tags, accept_new=True)
-                        if matched_tag:
-                            matched_tags.append({
-                                'name': matched_tag.get('name'),
-                                'id': matched_tag.get('id')
-                            })
                 
-                # Eşleştirilmiş etiketleri sonuca ekle
-                result['tags'] = matched_tags
+                # JSON yapısının doğru olduğundan emin ol
+                result = ensure_correct_json_structure(json_result, url, existing_title, existing_description)
             
-            return result
+            if not match:
+                return result
+            return _match_result(result, existing_categories, tags)
         except Exception as e:
             logger.error(f"Error during categorization: {str(e)}")
             # Hata durumunda boş bir sonuç döndür
-            default_result = {
-                'url': url,
-                'title': existing_title or '',
-                'description': existing_description or '',
-                'categories': [{
-                    'main': 'Genel',
-                    'sub': 'Diğer',
-                    'main_id': None,
-                    'sub_id': None
-                }],
-                'tags': [{
-                    'name': 'genel',
-                    'id': None
-                }]
-            }
-            return default_result
+            return _default_result(url, existing_title, existing_description)
             
     except Exception as e:
         print(f"İçerik kategorilendirme hatası: {str(e)}")
         # Hata durumunda boş bir sonuç döndür
-        default_result = {
-            'url': url,
-            'title': existing_title or '',
-            'description': existing_description or '',
-            'categories': [{
-                'main': 'Genel',
-                'sub': 'Diğer',
-                'main_id': None,
-                'sub_id': None
-            }],
-            'tags': [{
-                'name': 'genel',
-                'id': None
-            }]
-        }
-        return default_result
+        return _default_result(url, existing_title, existing_description)
+
+
+async def acategorize_content(content: str, url: str, existing_title: Optional[str] = None, existing_description: Optional[str] = None, user=None, match: bool = True) -> Dict:
+    """
+    categorize_content'in asenkron versiyonu (ASGI görünümleri için).
+    
+    LLM çağrısı LLMChain.arun ile event loop'u bloklamadan yapılır; yalnızca
+    kategori ve etiket sorguları sync_to_async ile çalışır. Her zaman
+    yapılandırılmış çıktı kullanılır.
+
+    Args:
+        content (str or ParsedPage): HTML içeriği, ayrıştırılmış sayfa veya çıkarılmış metin
+        url (str): URL adresi
+        existing_title (Optional[str], optional): Mevcut başlık. Defaults to None.
+        existing_description (Optional[str], optional): Mevcut açıklama. Defaults to None.
+        user: Kullanıcı objesi, kişiselleştirilmiş kategoriler için kullanılır. Defaults to None.
+        match (bool, optional): False ise LLM sonucu veritabanıyla eşleştirilmeden döndürülür. Defaults to True.
+
+    Returns:
+        Dict: Kategorize edilmiş sonuçlar
+    """
+    from asgiref.sync import sync_to_async
+    
+    try:
+        print(f"Kategorilendirme başlatılıyor (async)... URL: {url}")
+        clean_text = _content_digest(content)
+        
+        # Kategori verilerini yükle - kullanıcı bazlı
+        existing_categories = await sync_to_async(get_existing_categories)(user)
+        tags = await sync_to_async(get_existing_tags)(user)
+        
+        llm_chain, prompt = _categorization_chain(clean_text, url, existing_title, existing_description,
+                                                  existing_categories, tags)
+        logger.info(f"Sending async categorization request to LLM for URL: {url}")
+        result = _structured_result(analysis_to_dict(await llm_chain.arun(prompt)), url, existing_title, existing_description)
+        
+        if not match:
+            return result
+        return _match_result(result, existing_categories, tags)
+    except Exception as e:
+        logger.error(f"Error during async categorization: {str(e)}")
+        # Hata durumunda boş bir sonuç döndür
+        return _default_result(url, existing_title, existing_description)
+
+
+def _is_valid_analysis(item: Any) -> bool:
+    """Check that a batch item has the fields of a content analysis result"""
+    return (
+        isinstance(item, dict)
+        and isinstance(item.get('title'), str)
+        and isinstance(item.get('tags'), list)
+        and isinstance(item.get('categories'), list)
+        and bool(item['categories'])
+        and all(isinstance(category, dict) and category.get('main') for category in item['categories'])
+    )
+
+
+def _pack_batches(items: List[Dict]) -> List[List[Dict]]:
+    """Group prepared items into batches within BATCH_MAX_ITEMS and BATCH_TOKEN_BUDGET"""
+    batches = []
+    current, current_tokens = [], 0
+    for item in items:
+        tokens = count_tokens(item['content'])
+        if current and (len(current) >= BATCH_MAX_ITEMS or current_tokens + tokens > BATCH_TOKEN_BUDGET):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _run_batch(batch: List[Dict], existing_categories: List[Dict], existing_tags: List[Dict]) -> Optional[Dict[int, Dict]]:
+    """
+    Sayfa grubunu tek LLM çağrısıyla kategorilendirir.
+    
+    Returns:
+        Dict[int, Dict] or None: index -> geçerli sonuç; yanıt şemaya uymuyorsa None
+    """
+    prompt = CategoryPromptFactory.create_batch_category_prompt(
+        batch, existing_categories, existing_tags, include_examples=False
+    )
+    llm_chain = LLMChain(
+        system_prompt=TEXT_SYSTEM_INSTRUCTION,
+        output_schema=BatchContentAnalysisModel,
+        model_type="text",
+        context=CategoryPromptFactory.create_taxonomy_context(existing_categories, existing_tags)
+    )
+    response = analysis_to_dict(llm_chain.run(prompt))
+    
+    if not isinstance(response, dict) or not isinstance(response.get('items'), list):
+        logger.warning(f"Batch response does not match the schema ({type(response).__name__})")
+        return None
+    
+    expected = {item['index'] for item in batch}
+    results = {}
+    for item in response['items']:
+        index = item.get('index') if isinstance(item, dict) else None
+        if index in expected and _is_valid_analysis(item):
+            results[index] = item
+    return results
+
+
+def categorize_contents(items: List[Dict[str, Any]], use_structured_output: bool = True, user=None) -> List[Dict]:
+    """
+    Birden fazla HTML içeriğini toplu olarak kategorize eder (içe aktarma ve
+    yeniden kategorilendirme işleri için).
+    
+    Temizlenmiş içerikler BATCH_TOKEN_BUDGET sınırında gruplanıp her grup tek
+    bir LLM çağrısıyla analiz edilir; sistem talimatı ve kategori örnekleri
+    sayfa başına tekrar gönderilmez. Yanıtta eksik ya da bozuk olan sayfalar
+    bir kez daha toplu olarak denenir; yanıt şemaya uymazsa veya sayfa yine
+    başarısız olursa categorize_content ile tek tek analiz edilir.
+    
+    Args:
+        items (List[Dict]): 'content' ve 'url' alanları, isteğe bağlı 'title' ve
+            'description' alanları olan sayfalar
+        use_structured_output (bool, optional): Whether to use structured output. Defaults to True.
+        user: Kullanıcı objesi, kişiselleştirilmiş kategoriler için kullanılır. Defaults to None.
+    
+    Returns:
+        List[Dict]: Girdi sırasıyla kategorize edilmiş sonuçlar
+    """
+    if not items:
+        return []
+    
+    def categorize_single(item):
+        return categorize_content(
+            item['content'], item['url'], item.get('title'), item.get('description'),
+            use_structured_output=use_structured_output, user=user
+        )
+    
+    if not use_structured_output or len(items) == 1:
+        return [categorize_single(item) for item in items]
+    
+    existing_categories = get_existing_categories(user)
+    tags = get_existing_tags(user)
+    
+    prepared = []
+    for index, item in enumerate(items):
+        if is_html(item['content']):
+            clean_text = extract_digest(item['content'], max_tokens=BATCH_ITEM_MAX_TOKENS)
+        else:
+            clean_text = truncate_to_tokens(clean_html_content(item['content']), BATCH_ITEM_MAX_TOKENS)
+        prepared.append({
+            'index': index,
+            'url': item['url'],
+            'title': item.get('title'),
+            'description': item.get('description'),
+            'content': clean_text,
+        })
+    
+    results = {}
+    single = []
+    for batch in _pack_batches(prepared):
+        pending = batch
+        # First attempt plus one retry of the pages that failed to parse
+        for attempt in range(2):
+            try:
+                batch_results = _run_batch(pending, existing_categories, tags)
+            except Exception as e:
+                logger.error(f"Batch categorization failed: {str(e)}")
+                batch_results = None
+            
+            if batch_results is None:
+                # Schema mismatch or failed call: analyze these pages one by one
+                break
+            results.update(batch_results)
+            pending = [item for item in pending if item['index'] not in batch_results]
+            if not pending:
+                break
+            logger.info(f"{len(pending)} of {len(batch)} pages missing from the batch response")
+        single.extend(item['index'] for item in pending)
+    
+    logger.info(
+        f"Categorized {len(results)} of {len(items)} pages in batches, "
+        f"{len(single)} with single requests"
+    )
+    
+    output = []
+    for index, item in enumerate(items):
+        if index in results:
+            result = results[index]
+            result.pop('index', None)
+            result['url'] = item['url']
+            output.append(_match_result(result, existing_categories, tags))
+        else:
+            output.append(categorize_single(item))
+    return output
 
 
-def analyze_screenshot(screenshot_base64: str, url: str, existing_title: Optional[str] = None, existing_description: Optional[str] = None, use_structured_output: bool = True, user=None) -> Dict:
+def analyze_screenshot(screenshot_base64: str, url: str, existing_title: Optional[str] = None, existing_description: Optional[str] = None, use_structured_output: bool = True, user=None, match: bool = True) -> Dict:
     """
     Ekran görüntüsünü analiz eder ve kategorize eder.
 
@@ -398,6 +653,8 @@ def analyze_screenshot(screenshot_base64: str, url: str, existing_title: Optiona
         existing_description (Optional[str], optional): Mevcut açıklama. Defaults to None.
         use_structured_output (bool, optional): Whether to use structured output. Defaults to True.
         user: Kullanıcı objesi, kişiselleştirilmiş kategoriler için kullanılır. Defaults to None.
+        match (bool, optional): False ise LLM sonucu veritabanıyla eşleştirilmeden döndürülür
+            (bkz. match_result_to_user). Defaults to True.
 
     Returns:
         Dict: Analiz sonuçları
@@ -427,27 +684,28 @@ def analyze_screenshot(screenshot_base64: str, url: str, existing_title: Optiona
         
         try:
             # Vision models typically don't support structured output as well,
-            # but we can try with JSON schema
-            output_schema = get_content_analysis_json_schema() if use_structured_output else None
+            # but we can try with the Pydantic schema
+            output_schema = ContentAnalysisModel if use_structured_output else None
             
             # Create LLM chain with optional structured output
             llm_chain = LLMChain(
                 system_prompt=IMAGE_SYSTEM_INSTRUCTION, 
                 model_type="vision",
-                output_schema=output_schema if use_structured_output else None
+                output_schema=output_schema if use_structured_output else None,
+                hedge=HEDGE_ANALYSIS
             )
             
             # Process the image
             image_data = llm_chain.process_image(screenshot_base64)
             
             # Run chain
-            response = llm_chain.run(prompt, image_data=image_data)
+            response = analysis_to_dict(llm_chain.run(prompt, image_data=image_data))
             
             # Handle the response based on its type
             if use_structured_output and isinstance(response, dict):
                 logger.info("Successfully received structured output from vision model")
                 # Add URL if not present
-                if 'url' not in response:
+                if not response.get('url'):
                     response['url'] = url
                 json_result = response
             else:
@@ -470,7 +728,7 @@ def analyze_screenshot(screenshot_base64: str, url: str, existing_title: Optiona
             result = ensure_correct_json_structure(json_result, url, existing_title, existing_description)
             
             # Kategori eşleştirme için veritabanındaki kategorilerle karşılaştır
-            if result.get('categories'):
+            if match and result.get('categories'):
                 matched_categories = []
                 for category in result.get('categories', []):
                     main_category = category.get('main', '')
@@ -493,7 +751,7 @@ def analyze_screenshot(screenshot_base64: str, url: str, existing_title: Optiona
                 result['categories'] = matched_categories
             
             # Etiketleri eşleştir
-            if result.get('tags'):
+            if match and result.get('tags'):
                 matched_tags = []
                 existing_tags = get_existing_tags()
                 
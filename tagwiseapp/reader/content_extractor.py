@@ -4,15 +4,19 @@ Content Extractor Module
 This module provides functions for extracting content from HTML.
 """
 
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
+import re
+
+from .parsed_page import ParsedPage
+
+# Text that contains markup (a tag, comment or doctype) and is parsed as HTML
+HTML_MARKUP = re.compile(r'<(?:[a-zA-Z][a-zA-Z0-9]*[\s/>]|!)')
 
 def extract_content(html):
     """
     HTML içeriğinden header ve footer dışındaki ana içeriği çıkarır.
     
     Args:
-        html (str): HTML içeriği
+        html (str or ParsedPage): HTML içeriği veya bir kez ayrıştırılmış sayfa
         
     Returns:
         str: Çıkarılan metin içeriği
@@ -20,33 +24,33 @@ def extract_content(html):
     if not html:
         return ""
     
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    # Header ve footer elementlerini kaldır
-    for header in soup.find_all(['header', 'nav']):
-        header.decompose()
-    
-    for footer in soup.find_all(['footer']):
-        footer.decompose()
-    
-    # Diğer gereksiz elementleri kaldır
-    for element in soup.find_all(['script', 'style', 'iframe', 'svg']):
-        element.decompose()
-    
-    # Ana içerik bölümlerini bul
-    main_content = soup.find('main') or soup.find('article') or soup.find('div', {'id': 'content'}) or soup.find('div', {'class': 'content'})
+    page = html if isinstance(html, ParsedPage) else ParsedPage(html)
+    return page.main_text
+
+def is_html(content):
+    """İçeriğin HTML olup olmadığını (ParsedPage veya etiket içeren metin) döndürür"""
+    return isinstance(content, ParsedPage) or bool(content and HTML_MARKUP.search(content))
+
+def extract_digest(html, max_tokens=None):
+    """
+    HTML içeriğinden LLM için kısa bir özet metin çıkarır: menü, çerez bandı,
+    yorum ve reklam blokları atlanır; başlıklar ve giriş paragrafları önceliklidir.
     
-    # Ana içerik bulunamadıysa, body içeriğini kullan
-    if not main_content:
-        main_content = soup.body
+    Args:
+        html (str or ParsedPage): HTML içeriği veya bir kez ayrıştırılmış sayfa
+        max_tokens (int, optional): Token bütçesi; varsayılan CONTENT_DIGEST_TOKENS
+        
+    Returns:
+        str: Satır başına bir blok içeren özet metin
+    """
+    if not html:
+        return ""
     
-    # Eğer hala içerik bulunamadıysa, tüm metni al
-    if not main_content:
-        return soup.get_text(strip=True)
+    from .readability import build_digest
+    from .settings import CONTENT_DIGEST_TOKENS
     
-    # Metni temizle ve döndür
-    text = main_content.get_text(separator=' ', strip=True)
-    return text
+    page = html if isinstance(html, ParsedPage) else ParsedPage(html)
+    return build_digest(page, max_tokens or CONTENT_DIGEST_TOKENS)
 
 def extract_description(content):
     """
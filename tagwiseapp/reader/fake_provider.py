@@ -0,0 +1,357 @@
+"""
+Fake Provider Module
+
+This module provides a local chat model ("fake" provider) and embeddings
+that need no API key or network, for tests, offline benchmarks and load
+tests of the whole pipeline.
+
+- Responses are deterministic: the same messages give the same answer.
+  Structured output (with_structured_output / bind_tools) returns tool
+  call arguments that are valid for the requested schema.
+- Latency, 503 errors, 429 rate limits and streaming chunk timing can be
+  injected (FAKE_LLM_* settings).
+- It mimics provider-side prompt caching: the content up to the last
+  cache_control breakpoint is remembered, and repeated prefixes are
+  reported as cache_read input tokens like Anthropic does.
+- FakeEmbeddings hashes words into a fixed size vector, so texts sharing
+  words get similar vectors.
+"""
+
+import re
+import math
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from . import settings
+from .prompt_cache import estimate_tokens
+
+# Prefix hashes "cached" by the fake provider, shared by all clients like a real provider cache
+_cached_prefixes = set()
+_cached_prefixes_lock = threading.Lock()
+
+# Words used for generated string values
+FAKE_WORDS = (
+    "Technology", "Science", "Programming", "Design", "Education", "Business",
+    "Health", "Travel", "Music", "Finance", "Python", "Django", "Cloud", "Data",
+)
+
+# Batch prompts mark each page with its index ("### Sayfa 3")
+INDEX_MARKER = re.compile(r"^### Sayfa (\d+)", re.MULTILINE)
+
+
+class FakeProviderError(Exception):
+    """Injected provider error carrying an HTTP status code like the real SDK exceptions"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution.
+
+    Args:
+        spec (str): "fixed:S", "uniform:MIN,MAX", "lognormal:MEDIAN,SIGMA" or "exponential:MEAN" (seconds)
+
+    Returns:
+        Callable: Function drawing a latency in seconds from a random generator
+    """
+    kind, _, args = (spec or "fixed:0").partition(":")
+    values = [float(value) for value in args.split(",") if value.strip()] or [0.0]
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _resolve(schema: dict, defs: dict) -> dict:
+    if "$ref" in schema:
+        return _resolve(defs[schema["$ref"].split("/")[-1]], defs)
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            # Optional fields: use the first non-null option
+            options = [option for option in schema[key] if option.get("type") != "null"]
+            return _resolve(options[0] if options else {"type": "null"}, defs)
+    if "allOf" in schema and len(schema["allOf"]) == 1:
+        return _resolve(schema["allOf"][0], defs)
+    return schema
+
+
+def fake_value(schema: dict, seed: str, defs: dict = None, indexes: Sequence[int] = ()) -> Any:
+    """
+    Deterministic value that is valid for a JSON schema.
+
+    Args:
+        schema (dict): JSON schema of the value
+        seed (str): Seed text; the same seed gives the same value
+        defs (dict, optional): Schema definitions ($defs) for $ref lookups
+        indexes (Sequence[int], optional): Page indexes of a batch prompt; a list
+            of objects with an "index" field gets one object per index
+
+    Returns:
+        Any: Generated value
+    """
+    defs = defs if defs is not None else schema.get("$defs", {})
+    schema = _resolve(schema, defs)
+    number = int(_digest(seed)[:8], 16)
+
+    if "enum" in schema:
+        return schema["enum"][number % len(schema["enum"])]
+    kind = schema.get("type", "object" if "properties" in schema else "string")
+    if kind == "object":
+        return {
+            name: fake_value(prop, f"{seed}.{name}", defs, indexes)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        item_schema = _resolve(schema.get("items", {}), defs)
+        if indexes and "index" in item_schema.get("properties", {}):
+            items = []
+            for index in indexes:
+                item = fake_value(item_schema, f"{seed}[{index}]", defs)
+                item["index"] = index
+                items.append(item)
+            return items
+        count = 1 + number % 3
+        count = max(schema.get("minItems", 0), min(count, schema.get("maxItems", count)))
+        return [fake_value(item_schema, f"{seed}[{i}]", defs, indexes) for i in range(count)]
+    if kind == "integer":
+        return number % 100
+    if kind == "number":
+        return (number % 1000) / 10
+    if kind == "boolean":
+        return number % 2 == 0
+    if kind == "null":
+        return None
+    return FAKE_WORDS[number % len(FAKE_WORDS)]
+
+
+def _content_blocks(message: BaseMessage) -> List[dict]:
+    if isinstance(message.content, str):
+        return [{"type": "text", "text": message.content}]
+    return [block if isinstance(block, dict) else {"type": "text", "text": str(block)} for block in message.content]
+
+
+def _block_text(block: dict) -> str:
+    return block.get("text") or ""
+
+
+def _messages_text(messages: List[BaseMessage]) -> str:
+    return "\x00".join(_block_text(block) for message in messages for block in _content_blocks(message))
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model returning deterministic responses with provider-like usage
+    metadata, injected latency and failures.
+    """
+
+    model_name: str = "fake-text"
+    responses: Optional[List[str]] = None
+    default_response: Optional[str] = None
+    latency: str = settings.FAKE_LLM_LATENCY
+    error_rate: float = settings.FAKE_LLM_ERROR_RATE
+    rate_limit_rate: float = settings.FAKE_LLM_RATE_LIMIT_RATE
+    stream_chunk_size: int = settings.FAKE_LLM_STREAM_CHUNK_SIZE
+    stream_chunk_delay: float = settings.FAKE_LLM_STREAM_CHUNK_DELAY
+    seed: Optional[int] = settings.FAKE_LLM_SEED
+    _calls: int = 0
+    _rng: Optional[random.Random] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _random(self) -> random.Random:
+        if self._rng is None:
+            self._rng = random.Random(self.seed)
+        return self._rng
+
+    def _draw_call(self) -> float:
+        """Latency of the next call; raises the injected 429/503 errors"""
+        rng = self._random()
+        delay = max(0.0, parse_latency(self.latency)(rng))
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            raise FakeProviderError(429, "Fake provider rate limit exceeded, retry in 1s")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise FakeProviderError(503, "Fake provider is unavailable")
+        return delay
+
+    def _next_response(self, messages: List[BaseMessage]) -> str:
+        if self.responses:
+            response = self.responses[self._calls % len(self.responses)]
+            self._calls += 1
+            return response
+        if self.default_response is not None:
+            return self.default_response
+        return f"Fake answer {_digest(self.model_name + _messages_text(messages))[:12]}"
+
+    def _tool_call_message(self, messages: List[BaseMessage], tools: List[dict]) -> AIMessage:
+        """Tool call of the first bound tool, with schema-valid arguments"""
+        function = tools[0]["function"]
+        text = _messages_text(messages)
+        human_text = "\n".join(
+            _block_text(block) for message in messages if isinstance(message, HumanMessage)
+            for block in _content_blocks(message)
+        )
+        indexes = [int(index) for index in INDEX_MARKER.findall(human_text)]
+        args = fake_value(function.get("parameters", {}), f"{self.model_name}\x00{text}", indexes=indexes)
+        return AIMessage(
+            content="",
+            tool_calls=[{"name": function["name"], "args": args, "id": f"call_{_digest(text)[:16]}"}],
+        )
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[dict]]) -> AIMessage:
+        if tools:
+            message = self._tool_call_message(messages, tools)
+            output = str(message.tool_calls[0]["args"])
+        else:
+            output = self._next_response(messages)
+            message = AIMessage(content=output)
+        message.usage_metadata = self._usage(messages, output)
+        return message
+
+    def _usage(self, messages: List[BaseMessage], output: str) -> dict:
+        """Input/output token counts, with the cache_control prefix reported as cached"""
+        texts, prefix_end = [], None
+        for message in messages:
+            for block in _content_blocks(message):
+                texts.append(_block_text(block))
+                if block.get("cache_control"):
+                    prefix_end = len(texts)
+
+        input_tokens = sum(estimate_tokens(text, "fake") for text in texts)
+        details = {}
+        if prefix_end is not None:
+            prefix = "\x00".join(texts[:prefix_end])
+            prefix_tokens = sum(estimate_tokens(text, "fake") for text in texts[:prefix_end])
+            key = _digest(f"{self.model_name}\x00{prefix}")
+            with _cached_prefixes_lock:
+                if key in _cached_prefixes:
+                    details["cache_read"] = prefix_tokens
+                else:
+                    _cached_prefixes.add(key)
+                    details["cache_creation"] = prefix_tokens
+
+        output_tokens = estimate_tokens(output, "fake")
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": details,
+        }
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[str] = None, **kwargs: Any):
+        """Bind tools; the model always calls the first one (as with tool_choice="any")"""
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        tools: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._draw_call())
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, tools))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        tools: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._draw_call())
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, tools))])
+
+    def _chunks(self, message: AIMessage) -> Iterator[ChatGenerationChunk]:
+        text = message.content
+        size = max(1, self.stream_chunk_size)
+        for start in range(0, len(text), size):
+            last = start + size >= len(text)
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=text[start:start + size],
+                usage_metadata=message.usage_metadata if last else None,
+            ))
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._draw_call())
+        for index, chunk in enumerate(self._chunks(self._respond(messages, None))):
+            if index and self.stream_chunk_delay:
+                time.sleep(self.stream_chunk_delay)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._draw_call())
+        for index, chunk in enumerate(self._chunks(self._respond(messages, None))):
+            if index and self.stream_chunk_delay:
+                await asyncio.sleep(self.stream_chunk_delay)
+            yield chunk
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic embeddings: each word is hashed to a signed dimension and
+    the vector is L2-normalized, so texts sharing words are close.
+    """
+
+    def __init__(self, dimensions: int = settings.FAKE_EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        words = re.findall(r"\w+", text.lower()) or [text]
+        for word in words:
+            number = int(_digest(word)[:8], 16)
+            vector[number % self.dimensions] += 1.0 if number & (1 << 31) else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def clear_fake_cache():
+    """Forget the prefixes cached by the fake provider"""
+    with _cached_prefixes_lock:
+        _cached_prefixes.clear()
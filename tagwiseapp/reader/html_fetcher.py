@@ -2,35 +2,155 @@
 HTML Fetcher Module
 
 This module provides functions for fetching HTML content from URLs.
+
+The body is streamed: the Content-Type is checked before any of it is
+read, chunks are decoded as they arrive and reading stops at
+HTML_FETCH_MAX_BYTES. In head-only mode reading stops as soon as the
+document head is complete, which is enough for the title, description
+and og:image of a page.
 """
 
+import re
+import codecs
+
 import httpx
 
-def fetch_html(url):
+from . import settings
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+}
+
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+# Bytes searched for a meta charset when the response header has none
+CHARSET_SNIFF_BYTES = 2048
+# Markers after which the head is complete
+HEAD_END_MARKERS = ("</head", "<body")
+
+
+class HtmlStream:
+    """
+    Incremental reader of one streamed HTML response.
+
+    Feed it the raw chunks; feed() returns True when reading should stop
+    (byte cap reached or, in head-only mode, end of head seen).
+    """
+
+    def __init__(self, response, max_bytes=None, head_only=False):
+        self.response = response
+        self.max_bytes = max_bytes or settings.HTML_FETCH_MAX_BYTES
+        self.head_only = head_only
+        self.bytes_read = 0
+        self.truncated = False
+        self.head_complete = False
+        self._decoder = None
+        self._pending = b""
+        self._parts = []
+        self._scan_tail = ""
+
+    @property
+    def chunk_size(self):
+        return settings.HTML_HEAD_CHUNK_SIZE if self.head_only else settings.HTML_FETCH_CHUNK_SIZE
+
+    @property
+    def content_type(self):
+        return self.response.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    def is_html(self):
+        """True if the response declares an HTML-like content type (or none at all)"""
+        return not self.content_type or self.content_type in settings.HTML_CONTENT_TYPES
+
+    def _encoding(self, head):
+        encoding = self.response.charset_encoding
+        if not encoding:
+            match = META_CHARSET.search(head[:CHARSET_SNIFF_BYTES])
+            encoding = match.group(1).decode("ascii") if match else "utf-8"
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            encoding = "utf-8"
+        return encoding
+
+    def _decode(self, data, final=False):
+        if self._decoder is None:
+            self._decoder = codecs.getincrementaldecoder(self._encoding(data))(errors="replace")
+        text = self._decoder.decode(data, final=final)
+        if text:
+            self._parts.append(text)
+            if self.head_only:
+                window = (self._scan_tail + text).lower()
+                self.head_complete = any(marker in window for marker in HEAD_END_MARKERS)
+                self._scan_tail = window[-8:]
+
+    def feed(self, chunk):
+        """Add a chunk of the body; returns True when no more should be read"""
+        remaining = self.max_bytes - self.bytes_read
+        if len(chunk) >= remaining:
+            chunk = chunk[:remaining]
+            self.truncated = True
+        self.bytes_read += len(chunk)
+
+        # Decoding waits for enough bytes to find a meta charset
+        if self._decoder is None and not self.truncated and self.bytes_read < CHARSET_SNIFF_BYTES:
+            self._pending += chunk
+            return False
+        self._decode(self._pending + chunk)
+        self._pending = b""
+        return self.truncated or self.head_complete
+
+    def text(self):
+        """Decoded body read so far"""
+        # A character cut by the byte cap is dropped rather than replaced
+        self._decode(self._pending, final=not self.truncated)
+        self._pending = b""
+        return "".join(self._parts)
+
+    def log_result(self):
+        if self.truncated:
+            print(f"HTML boyut sınırına ulaşıldı ({self.max_bytes} bayt), sayfanın geri kalanı okunmadı")
+        elif self.head_only and self.head_complete:
+            print(f"Sayfa başlığı okundu ({self.bytes_read} bayt), gövde okunmadı")
+
+
+def _normalize_url(url):
+    # Add https:// protocol if missing
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+        print(f"URL'ye protokol eklendi: {url}")
+    return url
+
+
+def fetch_html(url, head_only=False, max_bytes=None):
     """
     URL'den HTML içeriğini çeker.
-    
+
     Args:
         url (str): Çekilecek sayfanın URL'si
-        
+        head_only (bool): True ise yalnızca </head> etiketine kadar okunur
+            (başlık, açıklama ve og:image için yeterli)
+        max_bytes (int, optional): Okunacak en fazla bayt; varsayılan HTML_FETCH_MAX_BYTES
+
     Returns:
-        str or None: Başarılı olursa HTML içeriği, başarısız olursa None
+        str or None: Başarılı olursa HTML içeriği, başarısız olursa veya içerik HTML değilse None
     """
     try:
-        # Add https:// protocol if missing
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-            print(f"URL'ye protokol eklendi: {url}")
-            
+        url = _normalize_url(url)
         print(f"URL'ye bağlanılıyor: {url}")
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-        }
-        response = httpx.get(url, headers=headers, timeout=60.0, follow_redirects=True)
-        response.raise_for_status()
-        print(f"Bağlantı başarılı, durum kodu: {response.status_code}")
-        return response.text
+        with httpx.stream("GET", url, headers=HEADERS, timeout=settings.HTML_FETCH_TIMEOUT,
+                          follow_redirects=True) as response:
+            response.raise_for_status()
+            print(f"Bağlantı başarılı, durum kodu: {response.status_code}")
+            stream = HtmlStream(response, max_bytes, head_only)
+            if not stream.is_html():
+                print(f"HTML olmayan içerik atlandı: {stream.content_type}")
+                return None
+            for chunk in response.iter_bytes(stream.chunk_size):
+                if stream.feed(chunk):
+                    break
+        stream.log_result()
+        return stream.text()
     except httpx.RequestError as e:
         print(f"URL'ye bağlanırken hata oluştu: {e}")
         return None
@@ -44,6 +164,63 @@ def fetch_html(url):
         print(f"HTML çekerken beklenmeyen hata: {str(e)}")
         return None
 
+async def afetch_html(url, head_only=False, max_bytes=None):
+    """
+    fetch_html'in asenkron versiyonu (ASGI görünümleri için).
+
+    Args:
+        url (str): Çekilecek sayfanın URL'si
+        head_only (bool): True ise yalnızca </head> etiketine kadar okunur
+        max_bytes (int, optional): Okunacak en fazla bayt; varsayılan HTML_FETCH_MAX_BYTES
+
+    Returns:
+        str or None: Başarılı olursa HTML içeriği, başarısız olursa veya içerik HTML değilse None
+    """
+    try:
+        url = _normalize_url(url)
+        print(f"URL'ye bağlanılıyor (async): {url}")
+        async with httpx.AsyncClient(headers=HEADERS, timeout=settings.HTML_FETCH_TIMEOUT,
+                                     follow_redirects=True) as client:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                print(f"Bağlantı başarılı, durum kodu: {response.status_code}")
+                stream = HtmlStream(response, max_bytes, head_only)
+                if not stream.is_html():
+                    print(f"HTML olmayan içerik atlandı: {stream.content_type}")
+                    return None
+                async for chunk in response.aiter_bytes(stream.chunk_size):
+                    if stream.feed(chunk):
+                        break
+        stream.log_result()
+        return stream.text()
+    except httpx.RequestError as e:
+        print(f"URL'ye bağlanırken hata oluştu: {e}")
+        return None
+    except httpx.HTTPStatusError as e:
+        print(f"HTTP hata kodu: {e.response.status_code}")
+        return None
+    except Exception as e:
+        print(f"HTML çekerken beklenmeyen hata: {str(e)}")
+        return None
+
+def fetch_page_metadata(url):
+    """
+    Sayfanın yalnızca head bölümünü çekerek meta verilerini döndürür
+    (ör. thumbnail yenileme için gövde indirilmez).
+
+    Args:
+        url (str): Sayfanın URL'si
+
+    Returns:
+        dict or None: title, description, image_url, canonical_url ve language; sayfa alınamazsa None
+    """
+    from .parsed_page import ParsedPage
+
+    html = fetch_html(url, head_only=True)
+    if not html:
+        return None
+    return ParsedPage(html, _normalize_url(url)).metadata
+
 if __name__ == "__main__":
     # Test için
     test_url = "www.example.com"  # Protocol missing
@@ -51,4 +228,4 @@ if __name__ == "__main__":
     if html:
         print(f"HTML içeriği başarıyla alındı. İlk 100 karakter: {html[:100]}")
     else:
-        print("HTML içeriği alınamadı.") 
\ No newline at end of file
+        print("HTML içeriği alınamadı.")
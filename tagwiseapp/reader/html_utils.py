@@ -4,15 +4,16 @@ HTML Utilities Module
 This module provides functions for HTML content processing.
 """
 
-import re
-from bs4 import BeautifulSoup
 import logging
 
+from .parsed_page import ParsedPage, normalize_text
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Maximum content length to process (characters)
+# Maximum content length to process (characters); prompts are limited by
+# CONTENT_MAX_TOKENS / CONTENT_DIGEST_TOKENS (token_budget.py) instead
 MAX_CONTENT_LENGTH = 15000
 
 def clean_html_content(html_content):
@@ -20,32 +21,28 @@ def clean_html_content(html_content):
     HTML içeriğindeki HTML etiketlerini temizler ve düz metin çıkarır.
     
     Args:
-        html_content (str): HTML içeriği
+        html_content (str or ParsedPage): HTML içeriği, bir kez ayrıştırılmış sayfa
+            veya önceden çıkarılmış düz metin (tekrar ayrıştırılmaz)
         
     Returns:
         str: Temizlenmiş düz metin
     """
     try:
+        if isinstance(html_content, ParsedPage):
+            text = html_content.clean_text
+            logger.info(f"Cleaned parsed page, original size: {len(html_content.html)}, new size: {len(text)}")
+            return text
+        
         # Check if content is empty
         if not html_content or len(html_content) < 10:
             logger.warning("HTML content is empty or too short")
             return ""
-            
-        # Parse HTML with BeautifulSoup
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style", "noscript", "iframe", "head", "meta", "link"]):
-            script.extract()
         
-        # Get text and normalize whitespace
-        text = soup.get_text(separator=' ')
-        
-        # Normalize whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        # Remove non-printable characters
-        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]', '', text)
+        # Already plain text (e.g. extract_content output): no markup or entities to parse
+        if '<' not in html_content and '&' not in html_content:
+            return normalize_text(html_content)
+            
+        text = ParsedPage(html_content).clean_text
         
         logger.info(f"Cleaned HTML content, original size: {len(html_content)}, new size: {len(text)}")
         return text
@@ -54,4 +51,4 @@ def clean_html_content(html_content):
         logger.error(f"Error cleaning HTML content: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
-        return html_content 
\ No newline at end of file
+        return html_content.html if isinstance(html_content, ParsedPage) else html_content 
\ No newline at end of file
@@ -5,13 +5,18 @@ This module provides a factory for creating LLM instances using LangChain.
 """
 
 import base64
+import json
 import time
+import asyncio
 import logging
-from typing import Optional, List, Dict, Any, Union, Type
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, List, Dict, Any, Union, Type, AsyncIterator
 
 # LangChain imports
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser, PydanticOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
@@ -23,21 +28,76 @@ from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 
 # Error handling
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry
 
 # Local imports
 from . import settings
+from .provider_router import provider_router, RateLimitTimeout, StructuredOutputError
+from .rate_limiter import rate_limiter, is_rate_limit_error
+from .retry_policy import retry_policy
+from .prompt_cache import CACHE_CONTROL_PROVIDERS, cache_control_block, gemini_context_cache, prompt_cache_stats
+from .fake_provider import FakeChatModel
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Threads running hedged provider calls (a primary and at most one hedge per call)
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+
+# Semaphores bounding concurrent async LLM calls, one per event loop
+_llm_semaphores = weakref.WeakKeyDictionary()
+_llm_semaphores_lock = threading.Lock()
+
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    """
+    Return the process-wide semaphore (for the running event loop) that
+    limits concurrent async LLM calls to LLM_MAX_CONCURRENCY.
+    """
+    loop = asyncio.get_running_loop()
+    with _llm_semaphores_lock:
+        if loop not in _llm_semaphores:
+            _llm_semaphores[loop] = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        return _llm_semaphores[loop]
+
 
 class LLMFactory:
     """
     Factory class for creating LLM instances with fallback support.
+    
+    create_llm always builds a new client; get_llm returns a process-wide
+    cached client for the same (provider, model, temperature, max_tokens,
+    timeout) so its HTTP connection pool and auth setup are reused.
     """
     
+    _clients: Dict[tuple, BaseChatModel] = {}
+    _clients_lock = threading.Lock()
+    client_stats = {"created": 0, "reused": 0, "invalidated": 0, "expired": 0}
+    
+    @staticmethod
+    def _resolve_config(provider, model_name, temperature, max_tokens, timeout, model_type):
+        """Merge explicit parameters with the provider's model configuration"""
+        # If no provider specified, use default
+        if not provider:
+            provider = settings.DEFAULT_PROVIDER
+            
+        # Get model configuration
+        config = settings.get_model_config(provider, model_type)
+        
+        # Override config with provided parameters
+        if model_name:
+            config["model_name"] = model_name
+        if temperature is not None:
+            config["temperature"] = temperature
+        if max_tokens is not None:
+            config["max_tokens"] = max_tokens
+        if timeout is None:
+            timeout = settings.REQUEST_TIMEOUT
+        
+        return provider, config, timeout
+    
     @staticmethod
     def create_llm(
         provider: str = None,
@@ -45,67 +105,82 @@ class LLMFactory:
         temperature: float = None,
         max_tokens: int = None,
         timeout: int = None,
-        model_type: str = "text"
+        model_type: str = "text",
+        **model_kwargs
     ) -> BaseChatModel:
         """
         Creates an LLM instance for the specified provider.
         
         Args:
-            provider (str, optional): The LLM provider (gemini, openai, anthropic)
+            provider (str, optional): The LLM provider (gemini, openai, anthropic, fake)
             model_name (str, optional): The model name
             temperature (float, optional): Temperature setting for generation
             max_tokens (int, optional): Maximum tokens to generate
             timeout (int, optional): Request timeout in seconds
             model_type (str, optional): Type of model (text or vision)
+            **model_kwargs: Extra provider specific constructor arguments (e.g. top_p, api key)
             
         Returns:
             BaseChatModel: LangChain chat model instance
         """
-        # If no provider specified, use default
-        if not provider:
-            provider = settings.DEFAULT_PROVIDER
-            
-        # Get model configuration
-        config = settings.get_model_config(provider, model_type)
-        
-        # Override config with provided parameters
-        if model_name:
-            config["model_name"] = model_name
-        if temperature is not None:
-            config["temperature"] = temperature
-        if max_tokens is not None:
-            config["max_tokens"] = max_tokens
-        if timeout is None:
-            timeout = settings.REQUEST_TIMEOUT
+        provider, config, timeout = LLMFactory._resolve_config(
+            provider, model_name, temperature, max_tokens, timeout, model_type
+        )
             
         logger.info(f"Creating LLM with provider: {provider}, model: {config['model_name']}")
         
+        # All clients of a provider share its request/token budget
+        shared = dict(
+            rate_limiter=rate_limiter.for_provider(provider),
+            callbacks=[rate_limiter.callback(provider)],
+        )
+        # Retries belong to retry_policy and its RetryBudget (LLMChain); SDK retries
+        # would multiply every attempt behind the budget's back
+        sdk_retries = dict(max_retries=0)
+        
         # Create LLM instance based on provider
         try:
             if provider == "gemini":
-                return ChatGoogleGenerativeAI(
+                params = dict(
                     model=config["model_name"],
                     temperature=config["temperature"],
                     max_output_tokens=config["max_tokens"],
                     google_api_key=settings.GEMINI_API_KEY,
                     request_timeout=timeout,
+                    **shared,
+                    **sdk_retries
                 )
+                params.update(model_kwargs)
+                return ChatGoogleGenerativeAI(**params)
             elif provider == "openai":
-                return ChatOpenAI(
+                params = dict(
                     model=config["model_name"],
                     temperature=config["temperature"],
                     max_tokens=config["max_tokens"],
                     openai_api_key=settings.OPENAI_API_KEY,
                     request_timeout=timeout,
+                    **shared,
+                    **sdk_retries
                 )
+                params.update(model_kwargs)
+                return ChatOpenAI(**params)
             elif provider == "anthropic":
-                return ChatAnthropic(
+                params = dict(
                     model=config["model_name"],
                     temperature=config["temperature"],
                     max_tokens=config["max_tokens"],
                     anthropic_api_key=settings.ANTHROPIC_API_KEY,
                     request_timeout=timeout,
+                    **shared,
+                    **sdk_retries
                 )
+                params.update(model_kwargs)
+                return ChatAnthropic(**params)
+            elif provider == "fake":
+                # Local provider for tests and offline runs
+                params = dict(model_name=config["model_name"], **shared)
+                params.update(model_kwargs)
+                return FakeChatModel(**params)
             else:
                 logger.warning(f"Unknown provider: {provider}, falling back to Gemini")
                 return LLMFactory.create_llm("gemini", model_type=model_type)
@@ -113,19 +188,132 @@ class LLMFactory:
         except Exception as e:
             logger.error(f"Error creating LLM with provider {provider}: {str(e)}")
             raise
+    
+    @classmethod
+    def get_llm(
+        cls,
+        provider: str = None,
+        model_name: str = None,
+        temperature: float = None,
+        max_tokens: int = None,
+        timeout: int = None,
+        model_type: str = "text",
+        **model_kwargs
+    ) -> BaseChatModel:
+        """
+        Returns a cached LLM client, creating it on first use.
+        
+        Takes the same arguments as create_llm. Clients are shared by all
+        threads; call invalidate_llm after a failed request so the next
+        call gets a fresh client.
+        
+        Returns:
+            BaseChatModel: LangChain chat model instance
+        """
+        provider, config, timeout = cls._resolve_config(
+            provider, model_name, temperature, max_tokens, timeout, model_type
+        )
+        key = (
+            provider,
+            config["model_name"],
+            config["temperature"],
+            config["max_tokens"],
+            timeout,
+            tuple(sorted(model_kwargs.items())),
+        )
+        
+        with cls._clients_lock:
+            llm = cls._clients.get(key)
+            if llm is not None:
+                cls.client_stats["reused"] += 1
+                return llm
+            
+            llm = cls.create_llm(
+                provider=provider,
+                model_name=config["model_name"],
+                temperature=config["temperature"],
+                max_tokens=config["max_tokens"],
+                timeout=timeout,
+                model_type=model_type,
+                **model_kwargs
+            )
+            cls._clients[key] = llm
+            cls.client_stats["created"] += 1
+            return llm
+    
+    @classmethod
+    def invalidate_llm(cls, llm: BaseChatModel) -> bool:
+        """
+        Drop a cached client (e.g. after a failed request) so it is recreated.
+        
+        Args:
+            llm (BaseChatModel): Client returned by get_llm
+            
+        Returns:
+            bool: True if the client was in the cache
+        """
+        with cls._clients_lock:
+            for key, cached in list(cls._clients.items()):
+                if cached is llm:
+                    del cls._clients[key]
+                    cls.client_stats["invalidated"] += 1
+                    logger.info(f"Dropped cached LLM client for provider: {key[0]}, model: {key[1]}")
+                    return True
+        return False
+    
+    @classmethod
+    def drop_cached_content_clients(cls, names: List[str]):
+        """
+        Drop the clients created for Gemini cached contents that expired,
+        so a client per cache name does not stay in the registry forever.
+        
+        Args:
+            names (List[str]): Expired cached content names
+        """
+        names = set(names)
+        with cls._clients_lock:
+            expired = [key for key in cls._clients if dict(key[5]).get("cached_content") in names]
+            for key in expired:
+                del cls._clients[key]
+            cls.client_stats["expired"] += len(expired)
+        if expired:
+            logger.info(f"Dropped {len(expired)} LLM client(s) of expired Gemini context caches")
+    
+    @classmethod
+    def clear_llm_cache(cls):
+        """Drop all cached clients"""
+        with cls._clients_lock:
+            cls._clients.clear()
+
+
+gemini_context_cache.on_expire(LLMFactory.drop_cached_content_clients)
 
 
 class LLMChain:
     """
     Class for creating and running LLM chains with fallback support.
+    
+    With hedge=True a request that the primary provider has not answered
+    within its recent HEDGE_PERCENTILE latency is also sent to the next
+    healthy provider, and the first valid result is used.
     """
     
+    # Process-wide hedging counters
+    hedge_stats = {"fired": 0, "won": 0}
+    _hedge_stats_lock = threading.Lock()
+    
+    # Process-wide structured output parse counters per provider
+    parse_stats: Dict[str, Dict[str, int]] = {}
+    _parse_stats_lock = threading.Lock()
+    
     def __init__(
         self,
         system_prompt: str,
         providers: List[str] = None, 
         model_type: str = "text",
-        output_schema: Optional[Union[Dict, Type[BaseModel]]] = None
+        output_schema: Optional[Union[Dict, Type[BaseModel]]] = None,
+        hedge: bool = False,
+        context: Optional[str] = None
     ):
         """
         Initialize LLM chain with fallback support.
@@ -135,10 +323,15 @@ class LLMChain:
             providers (List[str], optional): List of providers to try in order
             model_type (str, optional): Type of model (text or vision)
             output_schema (Union[Dict, Type[BaseModel]], optional): Schema for structured output
+            hedge (bool, optional): Send slow requests to a second provider as well
+            context (str, optional): Stable context (e.g. the user's taxonomy) sent right
+                after the system prompt, so providers can cache it with the prefix
         """
         self.system_prompt = system_prompt
+        self.context = context
         self.model_type = model_type
         self.output_schema = output_schema
+        self.hedge = hedge
         
         # Set providers - use default + fallbacks if not provided
         if not providers:
@@ -169,7 +362,42 @@ class LLMChain:
             # Default to string output
             self.output_parser = StrOutputParser()
         
-    def _create_messages(self, input_text: str, image_data: Optional[Dict] = None, provider: str = None):
+    def _use_native_output(self, provider: str) -> bool:
+        """Whether the provider returns the Pydantic output schema natively (tool calling / JSON mode)"""
+        return (
+            settings.NATIVE_STRUCTURED_OUTPUT
+            and provider in settings.STRUCTURED_OUTPUT_METHODS
+            and isinstance(self.output_schema, type)
+            and issubclass(self.output_schema, BaseModel)
+        )
+    
+    def _system_content(self, include_format: bool = True) -> str:
+        """
+        The stable prefix of every request: system prompt, format instructions
+        and context. Only input_text changes between requests.
+        
+        Args:
+            include_format (bool): Add the output parser's format instructions
+                (not needed when the provider enforces the schema natively)
+        """
+        # Add output parser format instructions if needed
+        system_content = self.system_prompt
+        # StrOutputParser has no format instructions (get_format_instructions raises)
+        if include_format and self.output_parser and not isinstance(self.output_parser, StrOutputParser):
+            format_instructions = self.output_parser.get_format_instructions()
+            system_content = f"{system_content}\n\n{format_instructions}"
+        if self.context:
+            system_content = f"{system_content}\n\n{self.context}"
+        return system_content
+    
+    def _create_messages(
+        self,
+        input_text: str,
+        image_data: Optional[Dict] = None,
+        provider: str = None,
+        prefix_cached: bool = False,
+        native: bool = False
+    ):
         """
         Creates the message list for the LLM.
         
@@ -177,18 +405,24 @@ class LLMChain:
             input_text (str): The input text
             image_data (Dict, optional): Image data for vision models
             provider (str, optional): The provider being used
+            prefix_cached (bool, optional): The system prefix is in Gemini cached content
+            native (bool, optional): The provider enforces the output schema itself
             
         Returns:
             List: List of messages
         """
-        # Add output parser format instructions if needed
-        system_content = self.system_prompt
-        if self.output_parser and hasattr(self.output_parser, "get_format_instructions"):
-            format_instructions = self.output_parser.get_format_instructions()
-            system_content = f"{system_content}\n\n{format_instructions}"
+        system_content = self._system_content(include_format=not native)
+        if prefix_cached:
+            # The cached content already holds the system instruction
+            system_message = None
+        elif settings.PROMPT_CACHING and provider in CACHE_CONTROL_PROVIDERS:
+            # Mark the end of the stable prefix as a cache breakpoint
+            system_message = SystemMessage(content=[cache_control_block(system_content)])
+        else:
+            system_message = SystemMessage(content=system_content)
         
         messages = [
-            SystemMessage(content=system_content),
+            system_message,
             HumanMessage(content=input_text)
         ]
         
@@ -205,11 +439,147 @@ class LLMChain:
                 human_message = messages[1]
                 human_message.additional_kwargs = {"image_url": image_data}
         
-        return messages
+        return [message for message in messages if message is not None]
+        
+    def _prepare_call(self, provider: str, input_text: str, image_data: Optional[Dict] = None, native: bool = False):
+        """
+        Return the provider's cached LLM client with the messages to send.
+        With native structured output the schema is sent with the request, not as format instructions.
+        It may create a client or a Gemini context cache (network calls), so
+        async callers run it with asyncio.to_thread.
+        
+        Returns:
+            tuple: (LLM client, messages)
+        """
+        cached_content = None
+        if settings.PROMPT_CACHING and provider == "gemini":
+            model_name = settings.get_model_config(provider, self.model_type)["model_name"]
+            prefix = self._system_content(include_format=not native)
+            cached_content = gemini_context_cache.get_cache_name(model_name, prefix)
+        
+        if cached_content:
+            llm = LLMFactory.get_llm(provider=provider, model_type=self.model_type, cached_content=cached_content)
+        else:
+            llm = LLMFactory.get_llm(provider=provider, model_type=self.model_type)
+        messages = self._create_messages(input_text, image_data, provider, prefix_cached=bool(cached_content), native=native)
+        return llm, messages
+    
+    @staticmethod
+    def _record_call_failure(provider: str, llm: BaseChatModel, error: Exception, start_time: float):
+        # Rate limits are handled by the rate limiter, not the circuit breaker
+        if not is_rate_limit_error(error) and not isinstance(error, RateLimitTimeout):
+            provider_router.record_failure(provider, error, time.time() - start_time)
+            # Recreate the client on the next attempt
+            LLMFactory.invalidate_llm(llm)
+    
+    @classmethod
+    def _count_parse(cls, provider: str, key: str):
+        with cls._parse_stats_lock:
+            stats = cls.parse_stats.setdefault(provider, {"parsed": 0, "failed": 0, "repaired": 0})
+            stats[key] += 1
+    
+    @classmethod
+    def get_parse_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """Return parsed/failed/repaired counts and the parse failure rate per provider"""
+        with cls._parse_stats_lock:
+            return {
+                provider: dict(
+                    stats,
+                    failure_rate=stats["failed"] / (stats["parsed"] + stats["failed"])
+                    if stats["parsed"] + stats["failed"] else 0.0,
+                )
+                for provider, stats in cls.parse_stats.items()
+            }
+    
+    def _structured_runnable(self, llm: BaseChatModel, provider: str):
+        """The client wrapped to return the output schema natively, keeping the raw message"""
+        method = settings.STRUCTURED_OUTPUT_METHODS.get(provider)
+        kwargs = {"method": method} if method else {}
+        return llm.with_structured_output(self.output_schema, include_raw=True, **kwargs)
+    
+    def _structured_result(self, provider: str, response: Dict) -> Any:
+        """
+        Validate a native structured response.
+        
+        Args:
+            provider (str): The provider used
+            response (Dict): with_structured_output(include_raw=True) result
+            
+        Returns:
+            Any: Parsed schema object, or None if it did not validate
+        """
+        parsed = response.get("parsed")
+        if parsed is not None and response.get("parsing_error") is None:
+            return parsed
+        logger.warning(f"Structured output from {provider} did not validate: {response.get('parsing_error')}")
+        return None
+    
+    def _repair_messages(self, messages: List, response: Dict) -> List:
+        """Messages for the single repair call after a validation failure"""
+        raw = response.get("raw")
+        raw_text = getattr(raw, "content", "") or ""
+        tool_calls = getattr(raw, "tool_calls", None)
+        if tool_calls:
+            raw_text = json.dumps(tool_calls[0].get("args", {}), ensure_ascii=False)
+        return messages + [
+            AIMessage(content=raw_text or "(empty response)"),
+            HumanMessage(content=(
+                f"Your previous answer did not match the required schema: {response.get('parsing_error')}\n"
+                f"Return the same answer again, corrected so that it matches the schema exactly."
+            )),
+        ]
+    
+    def _finish_structured(self, provider: str, parsed: Any, repaired: Any = None) -> Any:
+        """Count the outcome of a native structured call and return the valid result"""
+        if parsed is not None:
+            self._count_parse(provider, "parsed")
+            return parsed
+        self._count_parse(provider, "failed")
+        if repaired is not None:
+            self._count_parse(provider, "repaired")
+            return repaired
+        raise StructuredOutputError(f"Provider {provider} returned output that does not match the schema")
+    
+    def _parse_output(self, response: Any, provider: str = None) -> Any:
+        """
+        Extract the text of an LLM response and parse it with the output parser.
+        
+        Args:
+            response (Any): The LLM response message
+            provider (str, optional): The provider used, for the parse statistics
+            
+        Returns:
+            Any: Parsed result, or the raw text if parsing fails
+        """
+        # Extract the content from the response
+        if hasattr(response, 'content'):
+            result = response.content
+        else:
+            result = str(response)
+        
+        # Parse the result if we have an output parser
+        if self.output_parser:
+            try:
+                logger.info("Parsing output with parser")
+                parsed_result = self.output_parser.parse(result)
+                logger.info(f"Successfully parsed output: {type(parsed_result)}")
+                if provider and not isinstance(self.output_parser, StrOutputParser):
+                    self._count_parse(provider, "parsed")
+                return parsed_result
+            except Exception as parser_error:
+                if provider:
+                    self._count_parse(provider, "failed")
+                logger.warning(f"Error parsing output: {str(parser_error)}")
+                logger.warning("Returning raw output instead")
+                return result
         
+        return result
+    
     @retry(
-        stop=stop_after_attempt(settings.RETRY_COUNT),
-        wait=wait_exponential(multiplier=settings.RETRY_DELAY, min=1, max=10)
+        before=retry_policy.before,
+        retry=retry_policy.should_retry,
+        wait=retry_policy.wait,
+        reraise=True
     )
     def _run_with_provider(self, provider: str, input_text: str, image_data: Optional[Dict] = None):
         """
@@ -223,59 +593,125 @@ class LLMChain:
         Returns:
             Any: The LLM response (string or structured object)
         """
+        trial = False
         try:
-            # Create LLM
-            llm = LLMFactory.create_llm(provider=provider, model_type=self.model_type)
-            
-            # Create messages using the separate method and passing the provider
-            messages = self._create_messages(input_text, image_data, provider)
+            # Skip the provider if its circuit opened (e.g. during earlier retries)
+            trial = provider_router.begin_request(provider)
+            # Get the cached LLM client and the messages for this provider
+            native = self._use_native_output(provider)
+            llm, messages = self._prepare_call(provider, input_text, image_data, native=native)
+            runnable = self._structured_runnable(llm, provider) if native else llm
             
             # Run chain
             start_time = time.time()
-            response = llm.invoke(messages)
+            try:
+                response = runnable.invoke(messages)
+            except Exception as invoke_error:
+                self._record_call_failure(provider, llm, invoke_error, start_time)
+                raise
+            duration = time.time() - start_time
+            provider_router.record_success(provider, duration)
+            logger.info(f"Provider {provider} responded in {duration:.2f} seconds")
+            prompt_cache_stats.record(provider, response["raw"] if native else response)
             
-            # Extract the content from the response
-            if hasattr(response, 'content'):
-                result = response.content
-            else:
-                result = str(response)
+            if not native:
+                return self._parse_output(response, provider)
             
+            parsed = self._structured_result(provider, response)
+            repaired = None
+            if parsed is None:
+                # One targeted repair call instead of re-running the whole request
+                repaired = self._structured_result(provider, runnable.invoke(self._repair_messages(messages, response)))
+            return self._finish_structured(provider, parsed, repaired)
+            
+        except Exception as e:
+            logger.error(f"Error with provider {provider}: {str(e)}")
+            raise
+        finally:
+            # A trial that neither succeeded nor failed must not keep the circuit half-open
+            if trial:
+                provider_router.release_trial(provider)
+    
+    @retry(
+        before=retry_policy.before,
+        retry=retry_policy.should_retry,
+        wait=retry_policy.wait,
+        reraise=True
+    )
+    async def _arun_with_provider(self, provider: str, input_text: str, image_data: Optional[Dict] = None):
+        """
+        Async version of _run_with_provider using the client's ainvoke.
+        
+        Args:
+            provider (str): The provider to use
+            input_text (str): The input text
+            image_data (Dict, optional): Image data for vision models
+            
+        Returns:
+            Any: The LLM response (string or structured object)
+        """
+        trial = False
+        try:
+            # Skip the provider if its circuit opened (e.g. during earlier retries)
+            trial = provider_router.begin_request(provider)
+            native = self._use_native_output(provider)
+            llm, messages = await asyncio.to_thread(self._prepare_call, provider, input_text, image_data, native)
+            runnable = self._structured_runnable(llm, provider) if native else llm
+            
+            start_time = time.time()
+            try:
+                response = await runnable.ainvoke(messages)
+            except Exception as invoke_error:
+                self._record_call_failure(provider, llm, invoke_error, start_time)
+                raise
             duration = time.time() - start_time
+            provider_router.record_success(provider, duration)
             logger.info(f"Provider {provider} responded in {duration:.2f} seconds")
+            prompt_cache_stats.record(provider, response["raw"] if native else response)
             
-            # Parse the result if we have an output parser
-            if self.output_parser:
-                try:
-                    logger.info("Parsing output with parser")
-                    parsed_result = self.output_parser.parse(result)
-                    logger.info(f"Successfully parsed output: {type(parsed_result)}")
-                    return parsed_result
-                except Exception as parser_error:
-                    logger.warning(f"Error parsing output: {str(parser_error)}")
-                    logger.warning("Returning raw output instead")
-                    return result
+            if not native:
+                return self._parse_output(response, provider)
             
-            return result
+            parsed = self._structured_result(provider, response)
+            repaired = None
+            if parsed is None:
+                repair_response = await runnable.ainvoke(self._repair_messages(messages, response))
+                repaired = self._structured_result(provider, repair_response)
+            return self._finish_structured(provider, parsed, repaired)
             
         except Exception as e:
             logger.error(f"Error with provider {provider}: {str(e)}")
             raise
+        finally:
+            # A trial that neither succeeded nor failed must not keep the circuit half-open
+            if trial:
+                provider_router.release_trial(provider)
     
-    def run(self, input_text: str, image_data: Optional[Dict] = None) -> Any:
+    def run(self, input_text: str, image_data: Optional[Dict] = None, hedge: Optional[bool] = None) -> Any:
         """
         Run the chain with fallback support.
         
         Args:
             input_text (str): The input text
             image_data (Dict, optional): Image data for vision models
+            hedge (bool, optional): Override the chain's hedging setting for this call
             
         Returns:
             Any: The LLM response (string or structured object)
         """
         errors = []
         
-        # Try each provider in order
-        for provider in self.providers:
+        # Try providers ordered by recent health; open circuits come last
+        providers = provider_router.order(self.providers)
+        if self.hedge if hedge is None else hedge:
+            return self._run_hedged(providers, input_text, image_data)
+        
+        for provider in providers:
+            if not provider_router.has_credentials(provider):
+                # Missing API key: skip without retrying
+                errors.append(f"Provider {provider} skipped: API key is not configured")
+                continue
+            
             try:
                 logger.info(f"Trying provider: {provider}")
                 return self._run_with_provider(provider, input_text, image_data)
@@ -285,14 +721,206 @@ class LLMChain:
                 logger.warning(error_msg)
                 errors.append(error_msg)
                 
-                # If it's the last provider, don't continue
-                if provider == self.providers[-1]:
-                    logger.error("All providers failed")
-                    raise Exception(f"All providers failed: {'; '.join(errors)}")
+                if provider != providers[-1]:
+                    logger.info(f"Falling back to next provider")
+        
+        logger.error("All providers failed")
+        raise Exception(f"All providers failed: {'; '.join(errors)}")
+                
+    async def arun(
+        self,
+        input_text: str,
+        image_data: Optional[Dict] = None,
+        semaphore: Optional[asyncio.Semaphore] = None
+    ) -> Any:
+        """
+        Async version of run with the same fallback and parsing (without hedging).
+        
+        Args:
+            input_text (str): The input text
+            image_data (Dict, optional): Image data for vision models
+            semaphore (asyncio.Semaphore, optional): Limits concurrent LLM calls
+                (defaults to the process-wide one from get_llm_semaphore)
+            
+        Returns:
+            Any: The LLM response (string or structured object)
+        """
+        errors = []
+        
+        async with semaphore or get_llm_semaphore():
+            providers = provider_router.order(self.providers)
+            for provider in providers:
+                if not provider_router.has_credentials(provider):
+                    errors.append(f"Provider {provider} skipped: API key is not configured")
+                    continue
+                
+                try:
+                    logger.info(f"Trying provider: {provider}")
+                    return await self._arun_with_provider(provider, input_text, image_data)
+                    
+                except Exception as e:
+                    error_msg = f"Provider {provider} failed: {str(e)}"
+                    logger.warning(error_msg)
+                    errors.append(error_msg)
+        
+        logger.error("All providers failed")
+        raise Exception(f"All providers failed: {'; '.join(errors)}")
+    
+    async def astream(
+        self,
+        input_text: str,
+        image_data: Optional[Dict] = None,
+        semaphore: Optional[asyncio.Semaphore] = None
+    ) -> AsyncIterator[Any]:
+        """
+        Stream the response of the first provider that answers.
+        
+        Text chains yield text chunks; chains with an output schema yield
+        the partially parsed object as it grows. A provider that fails
+        before its first chunk falls back to the next one; a failure in the
+        middle of a stream is raised, since the chunks were already sent.
+        
+        Args:
+            input_text (str): The input text
+            image_data (Dict, optional): Image data for vision models
+            semaphore (asyncio.Semaphore, optional): Limits concurrent LLM calls
+            
+        Yields:
+            Any: Text chunks or partial structured output
+        """
+        errors = []
+        
+        async with semaphore or get_llm_semaphore():
+            providers = provider_router.order(self.providers)
+            for provider in providers:
+                if not provider_router.has_credentials(provider):
+                    errors.append(f"Provider {provider} skipped: API key is not configured")
+                    continue
                 
-                # Otherwise, try the next provider
-                logger.info(f"Falling back to next provider")
+                started = False
+                trial = False
+                llm = None
+                start_time = time.time()
+                try:
+                    logger.info(f"Streaming from provider: {provider}")
+                    trial = provider_router.begin_request(provider)
+                    llm, messages = await asyncio.to_thread(self._prepare_call, provider, input_text, image_data)
+                    async for chunk in (llm | self.output_parser).astream(messages):
+                        started = True
+                        yield chunk
+                except Exception as e:
+                    if llm is not None:
+                        self._record_call_failure(provider, llm, e, start_time)
+                    if started:
+                        logger.error(f"Stream from provider {provider} failed: {str(e)}")
+                        raise
+                    error_msg = f"Provider {provider} failed: {str(e)}"
+                    logger.warning(error_msg)
+                    errors.append(error_msg)
+                    continue
+                finally:
+                    if trial:
+                        provider_router.release_trial(provider)
                 
+                provider_router.record_success(provider, time.time() - start_time)
+                return
+        
+        logger.error("All providers failed")
+        raise Exception(f"All providers failed: {'; '.join(errors)}")
+    
+    def _is_valid_result(self, result: Any) -> bool:
+        """A structured chain only accepts parsed output, not the raw-text fallback"""
+        if isinstance(self.output_parser, StrOutputParser):
+            return bool(result)
+        return not isinstance(result, str)
+    
+    @classmethod
+    def _count_hedge(cls, key: str):
+        with cls._hedge_stats_lock:
+            cls.hedge_stats[key] += 1
+    
+    def _run_hedged(self, providers: List[str], input_text: str, image_data: Optional[Dict] = None) -> Any:
+        """
+        Run the chain with a hedged second request.
+        
+        The primary provider gets hedge_delay seconds; after that the same
+        request is sent to the next healthy provider and whichever returns a
+        valid result first wins. Failures fall back to the next provider as in run().
+        
+        Args:
+            providers (List[str]): Providers in the order they should be tried
+            input_text (str): The input text
+            image_data (Dict, optional): Image data for vision models
+            
+        Returns:
+            Any: The LLM response (string or structured object)
+        """
+        errors = []
+        pending = {}  # future -> provider
+        fallback_result = None
+        hedge_provider = None
+        candidates = []
+        for provider in providers:
+            if provider_router.has_credentials(provider):
+                candidates.append(provider)
+            else:
+                errors.append(f"Provider {provider} skipped: API key is not configured")
+        
+        def submit_next(is_hedge=False):
+            while candidates:
+                provider = candidates.pop(0)
+                if is_hedge and not provider_router.is_available(provider):
+                    continue
+                logger.info(f"{'Hedging with' if is_hedge else 'Trying'} provider: {provider}")
+                future = _hedge_executor.submit(self._run_with_provider, provider, input_text, image_data)
+                pending[future] = provider
+                return provider
+            return None
+        
+        submit_next()
+        while pending:
+            # Only the first request gets a hedge timer; afterwards wait for the result
+            timeout = None
+            if hedge_provider is None and len(pending) == 1 and candidates:
+                timeout = provider_router.hedge_delay(next(iter(pending.values())))
+            
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedge_provider = submit_next(is_hedge=True) or ""
+                if hedge_provider:
+                    self._count_hedge("fired")
+                continue
+            
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error_msg = f"Provider {provider} failed: {str(e)}"
+                    logger.warning(error_msg)
+                    errors.append(error_msg)
+                    continue
+                
+                if self._is_valid_result(result):
+                    if provider == hedge_provider:
+                        self._count_hedge("won")
+                        logger.info(f"Hedged request to {provider} won")
+                    # The loser cannot be interrupted mid-request; its result is discarded
+                    for other in pending:
+                        other.cancel()
+                    return result
+                if fallback_result is None:
+                    fallback_result = result
+            
+            if not pending and fallback_result is None:
+                submit_next()
+        
+        if fallback_result is not None:
+            return fallback_result
+        
+        logger.error("All providers failed")
+        raise Exception(f"All providers failed: {'; '.join(errors)}")
+    
     def process_image(self, image_base64: str) -> Dict:
         """
         Process image data for vision models.
@@ -14,6 +14,7 @@ from .django_setup import setup_django
 from .html_fetcher import fetch_html
 from .screenshot import capture_screenshot
 from .content_extractor import extract_content
+from .parsed_page import ParsedPage
 from .content_analyzer import analyze_screenshot, categorize_content
 from .utils import load_api_key
 
@@ -76,12 +77,14 @@ def analyze_url(url):
     
     # HTML içeriğini çek
     html = fetch_html(url)
+    page = None
     content = None
     category_json = None
     
     if html:
-        # Ana içeriği ayıkla
-        content = extract_content(html)
+        # Ana içeriği ayıkla (HTML bir kez ayrıştırılır)
+        page = ParsedPage(html, url)
+        content = extract_content(page)
     
     # HTML içeriği alınamadıysa veya içerik çıkarılamazsa, Selenium ile ekran görüntüsü al
     if not html or not content or len(content.strip()) < 50:
@@ -96,8 +99,8 @@ def analyze_url(url):
     
     # Eğer ekran görüntüsü analizi yapılmadıysa veya başarısız olduysa, HTML içeriğini kategorize et
     if not category_json and content:
-        # İçeriği kategorize et
-        category_json = categorize_content(content, url)
+        # İçeriği kategorize et (sayfanın okunabilir özeti gönderilir)
+        category_json = categorize_content(page, url)
     
     if not content and not category_json:
         return f"URL: {url}\nSonuç: İçerik alınamadı veya analiz edilemedi."
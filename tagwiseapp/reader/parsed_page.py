@@ -0,0 +1,184 @@
+"""
+Parsed Page Module
+
+This module provides ParsedPage, the HTML of one fetch parsed a single
+time and shared by every extraction stage (main content, cleaned text,
+metadata and thumbnail). Each value is computed on first use.
+
+The document is parsed with lxml when it is installed and with Python's
+html.parser otherwise. Stages read the tree without changing it, so the
+order in which they run does not matter.
+"""
+
+import re
+import logging
+from functools import cached_property
+from typing import Iterator, Optional
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+# Elements left out of the main content (same as extract_content always removed)
+MAIN_CONTENT_SKIP = frozenset(["header", "nav", "footer", "script", "style", "iframe", "svg"])
+
+# Elements left out of the cleaned text (same as clean_html_content always removed)
+CLEAN_TEXT_SKIP = frozenset(["script", "style", "noscript", "iframe", "head", "meta", "link"])
+
+# String types get_text() returns (comments, doctype and script/style strings are not text)
+TEXT_TYPES = (NavigableString, CData)
+
+NON_PRINTABLE = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]')
+
+
+def _strings(node: Tag, skip: frozenset) -> Iterator[str]:
+    """Text strings under node, skipping the subtrees of the given elements"""
+    stack = [iter(node.children)]
+    while stack:
+        for child in stack[-1]:
+            if isinstance(child, Tag):
+                if child.name not in skip:
+                    stack.append(iter(child.children))
+                    break
+            elif type(child) in TEXT_TYPES:
+                yield child
+        else:
+            stack.pop()
+
+
+def _is_skipped(element: Tag, skip: frozenset) -> bool:
+    return any(parent.name in skip for parent in element.parents)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and drop non-printable characters"""
+    text = re.sub(r'\s+', ' ', text).strip()
+    return NON_PRINTABLE.sub('', text)
+
+
+class ParsedPage:
+    """
+    HTML of one page, parsed once.
+
+    Usage:
+        page = ParsedPage(html, url)
+        content = extract_content(page)
+        thumbnail = extract_thumbnail_from_html(page, url)
+        result = categorize_content(page, url)
+    """
+
+    def __init__(self, html: str, url: Optional[str] = None):
+        self.html = html or ""
+        self.url = url
+
+    @cached_property
+    def soup(self) -> BeautifulSoup:
+        return BeautifulSoup(self.html, PARSER)
+
+    def _find(self, *args, skip: frozenset = frozenset(), **kwargs) -> Optional[Tag]:
+        """First matching element that is not inside a skipped element"""
+        for element in self.soup.find_all(*args, **kwargs):
+            if not _is_skipped(element, skip):
+                return element
+        return None
+
+    @cached_property
+    def main_element(self) -> Optional[Tag]:
+        """main, article or the content div, or body if the page has none of them"""
+        skip = MAIN_CONTENT_SKIP
+        return (
+            self._find('main', skip=skip)
+            or self._find('article', skip=skip)
+            or self._find('div', {'id': 'content'}, skip=skip)
+            or self._find('div', {'class': 'content'}, skip=skip)
+            or self.soup.body
+        )
+
+    @cached_property
+    def main_text(self) -> str:
+        """Main content text without header, navigation, footer and scripts"""
+        if not self.html:
+            return ""
+        if self.main_element is None:
+            return self.soup.get_text(strip=True)
+        strings = (text.strip() for text in _strings(self.main_element, MAIN_CONTENT_SKIP))
+        return ' '.join(text for text in strings if text)
+
+    @cached_property
+    def clean_text(self) -> str:
+        """Whole page text without scripts, styles and head, whitespace normalized"""
+        return normalize_text(' '.join(_strings(self.soup, CLEAN_TEXT_SKIP)))
+
+    def _meta(self, **attrs) -> Optional[str]:
+        tag = self.soup.find('meta', attrs=attrs)
+        content = tag.get('content') if tag else None
+        return content.strip() if content else None
+
+    def _meta_urls(self, **attrs) -> Iterator[str]:
+        for tag in self.soup.find_all('meta', attrs=attrs):
+            content = tag.get('content')
+            if content:
+                yield content
+
+    @cached_property
+    def title(self) -> Optional[str]:
+        if self.soup.title and self.soup.title.string:
+            return self.soup.title.string.strip()
+        return self._meta(property='og:title')
+
+    @cached_property
+    def description(self) -> Optional[str]:
+        return self._meta(name='description') or self._meta(property='og:description')
+
+    @cached_property
+    def og_image(self) -> Optional[str]:
+        return next((url for url in self._meta_urls(property=lambda x: x and 'og:image' in x)
+                     if 'http://' in url or 'https://' in url), None)
+
+    @cached_property
+    def twitter_image(self) -> Optional[str]:
+        return next((url for url in self._meta_urls(name=lambda x: x and 'twitter:image' in x)
+                     if 'http://' in url or 'https://' in url), None)
+
+    @cached_property
+    def schema_image(self) -> Optional[str]:
+        return next(self._meta_urls(itemprop='image'), None)
+
+    @cached_property
+    def image_url(self) -> Optional[str]:
+        """Thumbnail candidate: og:image, then twitter:image, then schema.org image (absolute URL)"""
+        image_url = self.og_image or self.twitter_image or self.schema_image
+        if image_url and not image_url.startswith(('http://', 'https://')) and self.url:
+            image_url = urljoin(self.url, image_url)
+        return image_url
+
+    @cached_property
+    def canonical_url(self) -> Optional[str]:
+        link = self.soup.find('link', rel=lambda x: x and 'canonical' in x)
+        href = link.get('href') if link else None
+        return urljoin(self.url, href) if href and self.url else href
+
+    @cached_property
+    def language(self) -> Optional[str]:
+        html_tag = self.soup.find('html')
+        return html_tag.get('lang') if html_tag else None
+
+    @property
+    def metadata(self) -> dict:
+        return {
+            'title': self.title,
+            'description': self.description,
+            'image_url': self.image_url,
+            'og_image': self.og_image,
+            'twitter_image': self.twitter_image,
+            'schema_image': self.schema_image,
+            'canonical_url': self.canonical_url,
+            'language': self.language,
+        }
@@ -0,0 +1,240 @@
+"""
+Prompt Cache Module
+
+This module lets providers cache the stable prefix of LLMChain requests
+(system instruction, format instructions and the user's taxonomy context).
+
+- Anthropic: the prefix is sent as a system block with cache_control.
+- OpenAI: prompts are cached automatically when they share a prefix, so
+  the prefix only has to come first.
+- Gemini: a prefix that is reused often enough is stored as cached content
+  and later requests reference it instead of resending it.
+
+It also tracks cached input token counts reported in responses.
+"""
+
+import time
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Optional
+
+from . import settings
+from .token_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Providers that take cache_control breakpoints on message content blocks
+CACHE_CONTROL_PROVIDERS = ("anthropic", "fake")
+
+# Seconds a prefix that Gemini refused to cache is not tried again
+GEMINI_CACHE_RETRY_AFTER = 600
+# Seconds a request waits for another request that is creating the same cache
+GEMINI_CACHE_CREATE_WAIT = 10
+# Seconds between sweeps of expired caches and stale use counts
+GEMINI_CACHE_SWEEP_INTERVAL = 60
+
+
+def estimate_tokens(text: str, provider: str = None) -> int:
+    """Token count of a text for the provider's tokenizer (see token_budget.count_tokens)"""
+    return count_tokens(text, provider)
+
+
+def cache_control_block(text: str) -> dict:
+    """System content block marking the end of the cacheable prefix"""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+class GeminiContextCache:
+    """
+    Creates and reuses Gemini cached content for stable prompt prefixes.
+
+    A prefix is cached once it was used GEMINI_CACHE_MIN_USES times within
+    GEMINI_CACHE_TTL and is long enough for Gemini to accept it, so one-off
+    prompts do not pay for cache storage.
+    """
+
+    def __init__(self):
+        self._caches = {}  # (model, prefix hash) -> (cache name, expires at)
+        self._uses = {}  # (model, prefix hash) -> [use timestamps]
+        self._failed = {}  # (model, prefix hash) -> failed at
+        self._creating = {}  # (model, prefix hash) -> Event set when the creating request is done
+        self._expire_callbacks = []
+        self._swept_at = 0.0
+        self._lock = threading.Lock()
+
+    def on_expire(self, callback):
+        """
+        Register a callback called with the names of cached contents that
+        expired or were replaced (e.g. to drop LLM clients bound to them).
+        """
+        self._expire_callbacks.append(callback)
+
+    def _notify_expired(self, names):
+        names = [name for name in names if name]
+        if not names:
+            return
+        for callback in self._expire_callbacks:
+            try:
+                callback(names)
+            except Exception as e:
+                logger.error(f"Gemini cache expiry callback failed: {str(e)}")
+
+    def _sweep(self, now: float) -> list:
+        """Drop expired caches and stale use counts (under the lock); returns the expired cache names"""
+        if now - self._swept_at < GEMINI_CACHE_SWEEP_INTERVAL:
+            return []
+        self._swept_at = now
+        expired = [key for key, (_, expires_at) in self._caches.items() if expires_at - 60 <= now]
+        names = [self._caches.pop(key)[0] for key in expired]
+        for key in [key for key, uses in self._uses.items() if now - uses[-1] >= settings.GEMINI_CACHE_TTL]:
+            del self._uses[key]
+        for key in [key for key, failed_at in self._failed.items() if now - failed_at >= GEMINI_CACHE_RETRY_AFTER]:
+            del self._failed[key]
+        return names
+
+    def get_cache_name(self, model_name: str, prefix: str) -> Optional[str]:
+        """
+        Return the cached content name for the prefix, creating it when worthwhile.
+
+        Args:
+            model_name (str): Gemini model name
+            prefix (str): Stable system prefix of the request
+
+        Returns:
+            str or None: Cached content name, None if the prefix is sent normally
+        """
+        if estimate_tokens(prefix, "gemini") < settings.GEMINI_CACHE_MIN_TOKENS:
+            return None
+
+        key = (model_name, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+        now = time.time()
+        with self._lock:
+            expired = self._sweep(now)
+        self._notify_expired(expired)
+
+        with self._lock:
+            cached = self._caches.get(key)
+            # Leave a minute of margin so a request never hits an expired cache
+            if cached and cached[1] - 60 > now:
+                return cached[0]
+            creating = self._creating.get(key)
+            if creating is None:
+                if now - self._failed.get(key, 0) < GEMINI_CACHE_RETRY_AFTER:
+                    return None
+
+                uses = [t for t in self._uses.get(key, []) if now - t < settings.GEMINI_CACHE_TTL]
+                uses.append(now)
+                self._uses[key] = uses
+                if len(uses) < settings.GEMINI_CACHE_MIN_USES:
+                    return None
+                creating = self._creating[key] = threading.Event()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            # Another request is creating this cache; use it if it is ready in time
+            creating.wait(GEMINI_CACHE_CREATE_WAIT)
+            with self._lock:
+                cached = self._caches.get(key)
+            return cached[0] if cached and cached[1] - 60 > time.time() else None
+
+        # The network call runs outside the lock so requests for other prefixes are not held up
+        name = None
+        replaced = None
+        try:
+            name = self._create(model_name, prefix)
+        finally:
+            with self._lock:
+                if name is None:
+                    self._failed[key] = now
+                else:
+                    replaced = self._caches.get(key)
+                    self._caches[key] = (name, now + settings.GEMINI_CACHE_TTL)
+                    self._uses.pop(key, None)
+                self._creating.pop(key, None)
+            creating.set()
+        if replaced:
+            self._notify_expired([replaced[0]])
+        return name
+
+    def _create(self, model_name: str, prefix: str) -> Optional[str]:
+        try:
+            import google.generativeai as genai
+
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            cache = genai.caching.CachedContent.create(
+                model=model_name if model_name.startswith("models/") else f"models/{model_name}",
+                system_instruction=prefix,
+                ttl=timedelta(seconds=settings.GEMINI_CACHE_TTL),
+            )
+            logger.info(f"Created Gemini context cache {cache.name} ({estimate_tokens(prefix, 'gemini')} tokens)")
+            return cache.name
+        except Exception as e:
+            logger.warning(f"Could not create Gemini context cache: {str(e)}")
+            return None
+
+    def clear(self):
+        with self._lock:
+            names = [name for name, _ in self._caches.values()]
+            self._caches.clear()
+            self._uses.clear()
+            self._failed.clear()
+        self._notify_expired(names)
+
+
+class PromptCacheStats:
+    """Input and cached input token counts per provider"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, response):
+        """
+        Record the token usage of an LLM response.
+
+        Args:
+            provider (str): Provider that produced the response
+            response: LangChain AI message with usage_metadata
+        """
+        usage = getattr(response, "usage_metadata", None)
+        if not usage:
+            return
+        details = usage.get("input_token_details") or {}
+        with self._lock:
+            stats = self._stats.setdefault(provider, {
+                "requests": 0,
+                "input_tokens": 0,
+                "cache_read_tokens": 0,
+                "cache_creation_tokens": 0,
+                "cache_hits": 0,
+            })
+            stats["requests"] += 1
+            stats["input_tokens"] += usage.get("input_tokens", 0)
+            stats["cache_read_tokens"] += details.get("cache_read", 0) or 0
+            stats["cache_creation_tokens"] += details.get("cache_creation", 0) or 0
+            if details.get("cache_read"):
+                stats["cache_hits"] += 1
+
+    def get_stats(self) -> dict:
+        """Return token counts and the share of input tokens read from the cache per provider"""
+        with self._lock:
+            return {
+                provider: dict(
+                    stats,
+                    cached_input_ratio=stats["cache_read_tokens"] / stats["input_tokens"] if stats["input_tokens"] else 0.0,
+                )
+                for provider, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# Process-wide instances shared by all LLM chains
+gemini_context_cache = GeminiContextCache()
+prompt_cache_stats = PromptCacheStats()
@@ -0,0 +1,315 @@
+"""
+Provider Router Module
+
+This module tracks the health of LLM providers (rolling error rate and
+latency percentiles) and decides in which order LLMChain tries them.
+A provider that keeps failing gets an open circuit and is skipped until
+its cool-down expires; errors that cannot succeed on retry (missing API
+key, authentication, other 4xx responses) fail fast.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import List, Optional
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+
+# Circuit states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# HTTP status codes that are worth retrying
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Message fragments of errors that retrying cannot fix
+NON_RETRYABLE_MESSAGES = (
+    "api key",
+    "api_key",
+    "default credentials",
+    "unauthorized",
+    "permission denied",
+    "invalid x-api-key",
+    "authentication",
+)
+
+PROVIDER_API_KEYS = {
+    "gemini": "GEMINI_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a provider is skipped because its circuit is open"""
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller waited too long for the provider's rate limit"""
+
+
+class StructuredOutputError(Exception):
+    """Raised when a response still does not match the output schema after the repair call"""
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """
+    Extract the HTTP status code from a provider SDK exception if it has one.
+
+    Args:
+        error (Exception): Exception raised by the provider client
+
+    Returns:
+        int or None: HTTP status code
+    """
+    for attr in ("status_code", "code", "http_status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Decide whether retrying the same provider can succeed.
+
+    Args:
+        error (BaseException): Exception raised by a provider call
+
+    Returns:
+        bool: False for missing keys, auth errors, open circuits, rate limit timeouts and other 4xx responses
+    """
+    if isinstance(error, (CircuitOpenError, RateLimitTimeout, StructuredOutputError)):
+        return False
+
+    status_code = get_status_code(error)
+    if status_code is not None and 400 <= status_code < 500:
+        return status_code in RETRYABLE_STATUS_CODES
+
+    message = str(error).lower()
+    return not any(fragment in message for fragment in NON_RETRYABLE_MESSAGES)
+
+
+class ProviderHealth:
+    """Rolling call outcomes and circuit state of a single provider"""
+
+    def __init__(self, window_size: int, window_seconds: float):
+        self.calls = deque(maxlen=window_size)
+        self.window_seconds = window_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+
+    def _recent(self):
+        cutoff = time.time() - self.window_seconds
+        return [call for call in self.calls if call[0] >= cutoff]
+
+    def error_rate(self) -> float:
+        recent = self._recent()
+        if not recent:
+            return 0.0
+        return sum(1 for _, success, _ in recent if not success) / len(recent)
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        latencies = sorted(latency for _, success, latency in self._recent() if success)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(pct / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def call_count(self) -> int:
+        return len(self._recent())
+
+
+class ProviderRouter:
+    """
+    Process-wide health tracking and circuit breaking for LLM providers.
+    """
+
+    def __init__(
+        self,
+        error_threshold: float = settings.CIRCUIT_ERROR_THRESHOLD,
+        min_calls: int = settings.CIRCUIT_MIN_CALLS,
+        consecutive_failures: int = settings.CIRCUIT_CONSECUTIVE_FAILURES,
+        cooldown: float = settings.CIRCUIT_COOLDOWN,
+        window_size: int = settings.HEALTH_WINDOW_SIZE,
+        window_seconds: float = settings.HEALTH_WINDOW_SECONDS,
+        slow_p95: float = settings.SLOW_PROVIDER_P95,
+    ):
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.consecutive_failures = consecutive_failures
+        self.cooldown = cooldown
+        self.window_size = window_size
+        self.window_seconds = window_seconds
+        self.slow_p95 = slow_p95
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def _get(self, provider: str) -> ProviderHealth:
+        if provider not in self._health:
+            self._health[provider] = ProviderHealth(self.window_size, self.window_seconds)
+        return self._health[provider]
+
+    def has_credentials(self, provider: str) -> bool:
+        """Check that the provider's API key is configured"""
+        key_name = PROVIDER_API_KEYS.get(provider)
+        return key_name is None or bool(getattr(settings, key_name, None))
+
+    def _reserve(self, provider: str) -> Optional[bool]:
+        """None if the circuit is open, True if this call took the half-open trial, False otherwise"""
+        with self._lock:
+            health = self._get(provider)
+            if health.state == CLOSED:
+                return False
+            if health.state == OPEN and time.time() - health.opened_at >= self.cooldown:
+                health.state = HALF_OPEN
+                health.trial_in_flight = False
+            if health.state == HALF_OPEN and not health.trial_in_flight:
+                health.trial_in_flight = True
+                logger.info(f"Circuit half-open for provider {provider}, sending a trial request")
+                return True
+            return None
+
+    def allow_request(self, provider: str) -> bool:
+        """
+        Check whether a request may be sent to the provider now.
+        After the cool-down one trial request is let through (half-open).
+        """
+        return self._reserve(provider) is not None
+
+    def begin_request(self, provider: str) -> bool:
+        """
+        Reserve a request to the provider, raising CircuitOpenError if its circuit is open.
+
+        Returns:
+            bool: True if the request is the half-open trial; the caller must
+                then call release_trial when it finishes, whatever the outcome
+        """
+        trial = self._reserve(provider)
+        if trial is None:
+            raise CircuitOpenError(f"Circuit open for provider {provider}")
+        return trial
+
+    def release_trial(self, provider: str):
+        """
+        Free the half-open trial slot. A trial that ended without a recorded
+        success or failure (a 429, a configuration error, an error before the
+        request was sent) lets the next request try again.
+        """
+        with self._lock:
+            health = self._get(provider)
+            if health.state == HALF_OPEN:
+                health.trial_in_flight = False
+
+    def is_available(self, provider: str) -> bool:
+        """Check, without reserving a trial request, whether the provider can be tried"""
+        with self._lock:
+            health = self._get(provider)
+            if health.state == CLOSED:
+                return True
+            if health.state == OPEN:
+                return time.time() - health.opened_at >= self.cooldown
+            return not health.trial_in_flight
+
+    def hedge_delay(self, provider: str) -> float:
+        """
+        Seconds to wait for the provider before hedging: its recent
+        HEDGE_PERCENTILE latency, or HEDGE_DEFAULT_DELAY until enough calls are known.
+        """
+        with self._lock:
+            health = self._get(provider)
+            successes = sum(1 for _, success, _ in health._recent() if success)
+            if successes < settings.HEDGE_MIN_SAMPLES:
+                return settings.HEDGE_DEFAULT_DELAY
+            return max(settings.HEDGE_MIN_DELAY, health.latency_percentile(settings.HEDGE_PERCENTILE))
+
+    def record_success(self, provider: str, latency: float):
+        with self._lock:
+            health = self._get(provider)
+            if health.state != CLOSED:
+                logger.info(f"Circuit closed for provider {provider}")
+                health.calls.clear()
+            health.state = CLOSED
+            health.trial_in_flight = False
+            health.consecutive_failures = 0
+            health.calls.append((time.time(), True, latency))
+
+    def record_failure(self, provider: str, error: BaseException, latency: float):
+        # Configuration errors say nothing about the provider's health
+        if not is_retryable_error(error) and get_status_code(error) is None:
+            return
+
+        with self._lock:
+            health = self._get(provider)
+            health.calls.append((time.time(), False, latency))
+            health.consecutive_failures += 1
+
+            should_open = (
+                health.state == HALF_OPEN
+                or health.consecutive_failures >= self.consecutive_failures
+                or (health.call_count() >= self.min_calls and health.error_rate() >= self.error_threshold)
+            )
+            if should_open and health.state != OPEN:
+                health.state = OPEN
+                health.opened_at = time.time()
+                health.trial_in_flight = False
+                logger.warning(
+                    f"Circuit opened for provider {provider} "
+                    f"(error rate {health.error_rate():.0%}, {health.consecutive_failures} consecutive failures); "
+                    f"skipping it for {self.cooldown:.0f}s"
+                )
+
+    def order(self, providers: List[str]) -> List[str]:
+        """
+        Order providers by recent health, keeping the configured order for ties.
+        Providers with an open circuit are moved to the end.
+
+        Args:
+            providers (List[str]): Providers in configured preference order
+
+        Returns:
+            List[str]: Providers in the order they should be tried
+        """
+        with self._lock:
+            def sort_key(item):
+                index, provider = item
+                health = self._get(provider)
+                p95 = health.latency_percentile(95)
+                return (
+                    health.state == OPEN,
+                    round(health.error_rate(), 1),
+                    p95 is not None and p95 > self.slow_p95,
+                    index,
+                )
+
+            return [provider for _, provider in sorted(enumerate(providers), key=sort_key)]
+
+    def get_stats(self) -> dict:
+        """Return circuit state, error rate and latency percentiles per provider"""
+        with self._lock:
+            return {
+                provider: {
+                    "state": health.state,
+                    "calls": health.call_count(),
+                    "error_rate": health.error_rate(),
+                    "latency_p50": health.latency_percentile(50),
+                    "latency_p95": health.latency_percentile(95),
+                }
+                for provider, health in self._health.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._health.clear()
+
+
+# Process-wide router shared by all LLM chains
+provider_router = ProviderRouter()
@@ -0,0 +1,463 @@
+"""
+Rate Limiter Module
+
+This module keeps per-provider request and token budgets (token buckets)
+shared by every LLM client created by LLMFactory. Callers queue in FIFO
+order until the provider's budget allows the next request. A 429 response
+pauses the provider for its Retry-After and halves the budget, which then
+recovers with every successful call, so sustained throughput settles just
+below the provider's limit instead of alternating bursts and penalties.
+
+The budgets live in memory by default; with LLM_RATE_LIMIT_BACKEND=file
+they are kept in lock-protected files so several worker processes share them.
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from . import settings
+from .provider_router import RateLimitTimeout, get_status_code
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Message fragments of rate limit errors raised without a status code
+RATE_LIMIT_MESSAGES = (
+    "rate limit",
+    "rate_limit",
+    "too many requests",
+    "resource exhausted",
+    "resource_exhausted",
+    "quota exceeded",
+)
+
+# Response headers that tell when the provider accepts requests again
+RESET_HEADERS = (
+    "retry-after-ms",
+    "retry-after",
+    "x-ratelimit-reset-requests",
+    "x-ratelimit-reset-tokens",
+    "anthropic-ratelimit-requests-reset",
+    "anthropic-ratelimit-tokens-reset",
+)
+
+# Number of recent queue waits kept per provider for the percentiles
+WAIT_SAMPLES = 200
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """
+    Check whether a provider call failed because of a rate limit (HTTP 429).
+
+    Args:
+        error (BaseException): Exception raised by a provider call
+
+    Returns:
+        bool: True for rate limit / quota errors
+    """
+    if isinstance(error, RateLimitTimeout):
+        return False
+    if get_status_code(error) == 429:
+        return True
+    message = str(error).lower()
+    return any(fragment in message for fragment in RATE_LIMIT_MESSAGES)
+
+
+def _parse_reset(name: str, value: str) -> Optional[float]:
+    """Convert a reset header value (seconds, duration, or date) to seconds from now"""
+    value = value.strip()
+    if name == "retry-after-ms":
+        return float(value) / 1000
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    # OpenAI durations such as "1s", "6m0s" or "20ms"
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if parts and "".join(number + unit for number, unit in parts) == value:
+        scale = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+        return sum(float(number) * scale[unit] for number, unit in parts)
+
+    # Anthropic RFC 3339 timestamps or HTTP dates
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            reset_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if reset_at.tzinfo is None:
+        reset_at = reset_at.replace(tzinfo=timezone.utc)
+    return (reset_at - datetime.now(timezone.utc)).total_seconds()
+
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    """
+    Read how long to wait after a rate limit error from the response headers
+    (Retry-After, x-ratelimit-reset-*, anthropic-ratelimit-*-reset) or,
+    for Gemini, from the "retry in Ns" / retry_delay part of the message.
+
+    Args:
+        error (BaseException): Rate limit exception raised by a provider call
+
+    Returns:
+        float or None: Seconds to wait, None if the provider did not say
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    delays = []
+    for name in RESET_HEADERS:
+        value = headers.get(name)
+        if value:
+            try:
+                delay = _parse_reset(name, str(value))
+            except ValueError:
+                delay = None
+            if delay is not None:
+                delays.append(delay)
+        if delays and name.startswith("retry-after"):
+            # Retry-After is authoritative, the reset headers are a fallback
+            break
+    if delays:
+        return max(0.0, max(delays))
+
+    match = re.search(r"retry (?:in|after) (\d+(?:\.\d+)?)\s*s", str(error), re.IGNORECASE)
+    if not match:
+        match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", str(error))
+    return float(match.group(1)) if match else None
+
+
+class MemoryBucketStore:
+    """Budgets kept in this process only"""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self, provider: str):
+        with self._lock:
+            yield self._states.setdefault(provider, {})
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+
+class FileBucketStore:
+    """Budgets kept in one JSON file per provider, guarded by an exclusive file lock"""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self, provider: str):
+        path = os.path.join(self.directory, f"{provider}.json")
+        with self._lock, open(path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "{}")
+                except ValueError:
+                    state = {}
+                yield state
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+
+
+def create_store():
+    """Create the bucket store selected by RATE_LIMIT_BACKEND"""
+    if settings.RATE_LIMIT_BACKEND == "file":
+        if fcntl is None:
+            logger.warning("File based rate limiting needs fcntl, using in-memory rate limits")
+        else:
+            return FileBucketStore(settings.RATE_LIMIT_DIR)
+    return MemoryBucketStore()
+
+
+class RateLimiter:
+    """
+    Per-provider token buckets with a fair (FIFO) queue of waiting callers.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, int]] = None, store=None, max_wait: float = None):
+        self.limits = limits if limits is not None else settings.RATE_LIMITS
+        self.store = store or create_store()
+        self.max_wait = settings.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        self._conditions = {}  # provider -> Condition guarding its queue and bucket
+        self._conditions_lock = threading.Lock()
+        self._queues = {}
+        self._tickets = itertools.count()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _rates(self, provider: str, state: dict):
+        """Current requests/tokens per second and bucket capacities"""
+        limits = self.limits.get(provider, {})
+        factor = state.get("factor", 1.0)
+        rates = {}
+        for budget, limit_key in (("requests", "rpm"), ("tokens", "tpm")):
+            per_minute = limits.get(limit_key) or 0
+            if per_minute > 0:
+                capacity = max(1.0, per_minute * settings.RATE_LIMIT_BURST_SECONDS / 60)
+                rates[budget] = (per_minute * factor / 60, capacity)
+        return rates
+
+    def _refill(self, provider: str, state: dict, now: float):
+        elapsed = max(0.0, now - state.get("updated", now))
+        for budget, (rate, capacity) in self._rates(provider, state).items():
+            state[budget] = min(capacity, state.get(budget, capacity) + elapsed * rate)
+        state["updated"] = now
+
+    def _delay(self, provider: str, state: dict, now: float) -> float:
+        """Seconds until the next request fits in the provider's budget"""
+        delay = max(0.0, state.get("blocked_until", 0.0) - now)
+        rates = self._rates(provider, state)
+        if "requests" in rates and state["requests"] < 1:
+            delay = max(delay, (1 - state["requests"]) / rates["requests"][0])
+        # Tokens are charged after the call, so only a budget in debt has to wait
+        if "tokens" in rates and state["tokens"] <= 0:
+            delay = max(delay, (1 - state["tokens"]) / rates["tokens"][0])
+        return delay
+
+    def _take(self, provider: str) -> float:
+        """Consume one request if possible, otherwise return the delay until it is"""
+        with self.store.transaction(provider) as state:
+            now = time.time()
+            self._refill(provider, state, now)
+            delay = self._delay(provider, state, now)
+            if delay <= 0 and "requests" in state:
+                state["requests"] -= 1
+            return delay
+
+    def _condition(self, provider: str) -> threading.Condition:
+        """The provider's Condition, so callers of one provider never wake or block another's"""
+        with self._conditions_lock:
+            condition = self._conditions.get(provider)
+            if condition is None:
+                condition = self._conditions[provider] = threading.Condition()
+            return condition
+
+    def _provider_stats(self, provider: str) -> dict:
+        return self._stats.setdefault(provider, {
+            "acquired": 0,
+            "rate_limited": 0,
+            "timeouts": 0,
+            "waits": deque(maxlen=WAIT_SAMPLES),
+        })
+
+    def acquire(self, provider: str, timeout: float = None) -> float:
+        """
+        Wait until a request may be sent to the provider.
+
+        Args:
+            provider (str): Provider name
+            timeout (float, optional): Maximum seconds to queue (defaults to RATE_LIMIT_MAX_WAIT)
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            RateLimitTimeout: If the budget did not allow the request in time
+        """
+        timeout = self.max_wait if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        condition = self._condition(provider)
+        with condition:
+            queue = self._queues.setdefault(provider, deque())
+            ticket = next(self._tickets)
+            queue.append(ticket)
+            try:
+                while True:
+                    # Only the head of the queue may take from the bucket
+                    delay = self._take(provider) if queue[0] == ticket else None
+                    if delay is not None and delay <= 0:
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        with self._stats_lock:
+                            self._provider_stats(provider)["timeouts"] += 1
+                        raise RateLimitTimeout(
+                            f"Waited {timeout:.1f}s for the {provider} request budget"
+                        )
+                    condition.wait(remaining if delay is None else min(delay, remaining))
+            finally:
+                queue.remove(ticket)
+                condition.notify_all()
+
+        waited = time.monotonic() - started
+        with self._stats_lock:
+            stats = self._provider_stats(provider)
+            stats["acquired"] += 1
+            stats["waits"].append(waited)
+        if waited > 1:
+            logger.info(f"Waited {waited:.2f}s for the {provider} rate limit")
+        return waited
+
+    def try_acquire(self, provider: str) -> bool:
+        """Take a request from the budget only if nobody is queued and no wait is needed"""
+        with self._condition(provider):
+            if self._queues.get(provider):
+                return False
+            if self._take(provider) > 0:
+                return False
+        with self._stats_lock:
+            stats = self._provider_stats(provider)
+            stats["acquired"] += 1
+            stats["waits"].append(0.0)
+        return True
+
+    def record_success(self, provider: str, tokens: int = 0):
+        """
+        Charge the tokens used by a finished call and let the budget recover
+        a little after earlier rate limit errors.
+        """
+        with self.store.transaction(provider) as state:
+            self._refill(provider, state, time.time())
+            if tokens and "tokens" in state:
+                state["tokens"] -= tokens
+            state["factor"] = min(1.0, state.get("factor", 1.0) + settings.RATE_LIMIT_RECOVERY)
+
+    def record_rate_limited(self, provider: str, error: BaseException = None):
+        """
+        Pause the provider for its Retry-After (or RATE_LIMIT_DEFAULT_BACKOFF)
+        and halve its budget.
+        """
+        retry_after = get_retry_after(error) if error is not None else None
+        pause = settings.RATE_LIMIT_DEFAULT_BACKOFF if retry_after is None else retry_after
+        with self.store.transaction(provider) as state:
+            now = time.time()
+            self._refill(provider, state, now)
+            state["blocked_until"] = max(state.get("blocked_until", 0.0), now + pause)
+            state["factor"] = max(settings.RATE_LIMIT_MIN_FACTOR, state.get("factor", 1.0) / 2)
+            if "requests" in state:
+                state["requests"] = min(state["requests"], 0.0)
+            factor = state["factor"]
+        with self._stats_lock:
+            self._provider_stats(provider)["rate_limited"] += 1
+        logger.warning(
+            f"Provider {provider} rate limited; pausing {pause:.1f}s and using {factor:.0%} of its budget"
+        )
+
+    def for_provider(self, provider: str) -> "ProviderRateLimit":
+        """LangChain rate limiter that queues the provider's client calls here"""
+        return ProviderRateLimit(self, provider)
+
+    def callback(self, provider: str) -> "RateLimitCallbackHandler":
+        """LangChain callback that reports token usage and 429 errors of the provider"""
+        return RateLimitCallbackHandler(self, provider)
+
+    def get_stats(self) -> dict:
+        """Return queue length, queue wait percentiles and adaptive budget per provider"""
+        stats = {}
+        with self._stats_lock:
+            snapshot = {provider: dict(values, waits=sorted(values["waits"]))
+                        for provider, values in self._stats.items()}
+        for provider, values in snapshot.items():
+            waits = values.pop("waits")
+            with self.store.transaction(provider) as state:
+                factor = state.get("factor", 1.0)
+                paused_for = max(0.0, state.get("blocked_until", 0.0) - time.time())
+            values.update({
+                "queued": len(self._queues.get(provider, ())),
+                "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                "wait_p95": waits[min(len(waits) - 1, int(round(0.95 * (len(waits) - 1))))] if waits else 0.0,
+                "wait_max": waits[-1] if waits else 0.0,
+                "budget_factor": factor,
+                "paused_for": paused_for,
+            })
+            stats[provider] = values
+        return stats
+
+    def reset(self):
+        self.store.clear()
+        with self._stats_lock:
+            self._stats.clear()
+
+
+class ProviderRateLimit(BaseRateLimiter):
+    """Adapter that lets a LangChain chat model queue in the shared RateLimiter"""
+
+    def __init__(self, limiter: RateLimiter, provider: str):
+        self.limiter = limiter
+        self.provider = provider
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        if not blocking:
+            return self.limiter.try_acquire(self.provider)
+        self.limiter.acquire(self.provider)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        if not blocking:
+            return self.limiter.try_acquire(self.provider)
+        await asyncio.to_thread(self.limiter.acquire, self.provider)
+        return True
+
+
+def get_token_usage(response) -> int:
+    """Total tokens reported in a LangChain LLMResult"""
+    total = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                total += usage.get("total_tokens", 0)
+    if not total and response.llm_output:
+        usage = response.llm_output.get("token_usage") or response.llm_output.get("usage") or {}
+        total = usage.get("total_tokens") or (usage.get("input_tokens", 0) + usage.get("output_tokens", 0))
+    return total
+
+
+class RateLimitCallbackHandler(BaseCallbackHandler):
+    """Reports token usage and rate limit errors of a provider's client calls"""
+
+    def __init__(self, limiter: RateLimiter, provider: str):
+        self.limiter = limiter
+        self.provider = provider
+
+    def on_llm_end(self, response, **kwargs):
+        self.limiter.record_success(self.provider, get_token_usage(response))
+
+    def on_llm_error(self, error, **kwargs):
+        if is_rate_limit_error(error):
+            self.limiter.record_rate_limited(self.provider, error)
+
+
+# Process-wide rate limiter shared by all LLM clients
+rate_limiter = RateLimiter()
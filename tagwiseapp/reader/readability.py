@@ -0,0 +1,247 @@
+"""
+Readability Module
+
+This module builds a compact digest of a page's main content for LLM
+prompts. The page's text blocks (paragraphs, headings, list items, code)
+are collected from the shared ParsedPage tree, skipping navigation,
+cookie banners, comments, ads and similar boilerplate. Each container is
+scored by the text density of the paragraphs inside it and penalised by
+its link density; the best container (plus siblings that score nearly as
+well) is taken as the article.
+
+The digest keeps the title, the headings and the lead paragraph of each
+section first, then fills the rest of the token budget with the remaining
+paragraphs in document order. Repeated blocks are dropped.
+"""
+
+import re
+import logging
+from dataclasses import dataclass
+from typing import List
+
+from bs4 import Tag
+
+from .parsed_page import ParsedPage, TEXT_TYPES, _strings, normalize_text
+from .token_budget import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Elements whose subtree never contains article text
+SKIP_TAGS = frozenset([
+    "head", "script", "style", "noscript", "iframe", "svg", "template", "nav", "header",
+    "footer", "aside", "form", "button", "select", "textarea", "dialog",
+])
+# Elements read as one text block
+BLOCK_TAGS = frozenset([
+    "p", "pre", "blockquote", "li", "dd", "dt", "td", "th", "figcaption",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+])
+HEADING_TAGS = frozenset(["h1", "h2", "h3", "h4", "h5", "h6"])
+# Landmark roles of page chrome
+SKIP_ROLES = frozenset(["navigation", "banner", "contentinfo", "complementary", "dialog", "alert", "menu", "menubar"])
+
+# class/id words of boilerplate containers and of likely article containers. Chrome
+# words yield to article words ("post-header" is still the article); noise words
+# do not ("comment-content" is still a comment).
+NOISE_WORDS = re.compile(
+    r"(?:^|[-_\s])(?:cookie|cookies|consent|gdpr|comment|comments|reply|replies|disqus|ad|ads|advert|advertisement|"
+    r"sponsor|sponsored|promo|newsletter|subscribe|popup|modal)(?:$|[-_\s])",
+    re.IGNORECASE,
+)
+CHROME_WORDS = re.compile(
+    r"(?:^|[-_\s])(?:banner|share|sharing|social|related|recommended|sidebar|breadcrumb|breadcrumbs|menu|nav|navbar|"
+    r"footer|header|masthead|widget|pagination|toolbar)(?:$|[-_\s])",
+    re.IGNORECASE,
+)
+ARTICLE_WORDS = re.compile(
+    r"(?:^|[-_\s])(?:article|content|post|entry|main|body|text|story|prose|blog|markdown)(?:$|[-_\s])",
+    re.IGNORECASE,
+)
+
+CLASS_WEIGHT = 25
+TAG_WEIGHTS = {"article": 15, "main": 15, "div": 5, "section": 3, "pre": 3, "td": 3, "blockquote": 3, "body": -5}
+
+MIN_BLOCK_CHARS = 25  # shorter blocks do not score their container
+MIN_KEEP_CHARS = 10  # shorter non-heading blocks are not kept
+MAX_LINK_DENSITY = 0.5  # blocks and containers that are mostly links are navigation
+SIBLING_SCORE_RATIO = 0.2  # siblings scoring this share of the best container are kept too
+MIN_DIGEST_CHARS = 200  # shorter digests fall back to the main content text
+LEAD_PARAGRAPHS = 2  # paragraphs at the start of the article always kept
+
+
+@dataclass
+class Block:
+    element: Tag
+    text: str
+    link_chars: int
+    index: int
+
+    @property
+    def is_heading(self) -> bool:
+        return self.element.name in HEADING_TAGS
+
+    @property
+    def link_density(self) -> float:
+        return self.link_chars / len(self.text) if self.text else 1.0
+
+
+def _attribute_words(element: Tag) -> str:
+    classes = element.get("class") or []
+    if isinstance(classes, str):
+        classes = [classes]
+    return " ".join(classes + [element.get("id") or ""])
+
+
+def _is_boilerplate(element: Tag) -> bool:
+    if element.name in SKIP_TAGS or element.get("role") in SKIP_ROLES:
+        return True
+    if element.get("aria-hidden") == "true" or element.has_attr("hidden"):
+        return True
+    words = _attribute_words(element)
+    if not words.strip():
+        return False
+    return bool(NOISE_WORDS.search(words)) or (bool(CHROME_WORDS.search(words)) and not ARTICLE_WORDS.search(words))
+
+
+def _has_block_children(element: Tag) -> bool:
+    return any(child.name in BLOCK_TAGS for child in element.find_all(True))
+
+
+def _link_chars(element: Tag) -> int:
+    return sum(len(' '.join(_strings(link, SKIP_TAGS)).strip()) for link in element.find_all('a'))
+
+
+def collect_blocks(page: ParsedPage) -> List[Block]:
+    """Text blocks of the page in document order, without boilerplate subtrees"""
+    root = page.soup.body or page.soup
+    blocks = []
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        if element is not root and _is_boilerplate(element):
+            continue
+        if element.name in BLOCK_TAGS and not (element.name in ("li", "td", "dd") and _has_block_children(element)):
+            text = normalize_text(' '.join(_strings(element, SKIP_TAGS)))
+            if text:
+                blocks.append(Block(element, text, _link_chars(element), 0))
+            continue
+
+        # Loose text directly inside a container (e.g. <div>text<br>text</div>)
+        loose = normalize_text(' '.join(child for child in element.children if type(child) in TEXT_TYPES))
+        if len(loose) >= MIN_BLOCK_CHARS:
+            blocks.append(Block(element, loose, 0, 0))
+        stack.extend(reversed([child for child in element.children if isinstance(child, Tag)]))
+
+    # Pre-order walk: blocks are already in document order
+    for index, block in enumerate(blocks):
+        block.index = index
+    return blocks
+
+
+def _score_containers(blocks: List[Block]) -> dict:
+    """Container score from the paragraphs inside it, reduced by its link density"""
+    scores, text_chars, link_chars, elements = {}, {}, {}, {}
+    for block in blocks:
+        parent = block.element if block.element.name not in BLOCK_TAGS else block.element.parent
+        ancestors = [parent, parent.parent if parent is not None else None]
+        score = 0.0
+        if len(block.text) >= MIN_BLOCK_CHARS and block.link_density < MAX_LINK_DENSITY:
+            score = 1 + block.text.count(',') + min(len(block.text) / 100, 3)
+        for level, container in enumerate(ancestors):
+            if container is None or not isinstance(container, Tag):
+                continue
+            key = id(container)
+            if key not in scores:
+                elements[key] = container
+                words = _attribute_words(container)
+                scores[key] = TAG_WEIGHTS.get(container.name, 0) + (CLASS_WEIGHT if ARTICLE_WORDS.search(words) else 0)
+                text_chars[key] = link_chars[key] = 0
+            scores[key] += score / (level + 1)
+            text_chars[key] += len(block.text)
+            link_chars[key] += block.link_chars
+
+    return {
+        key: (elements[key], scores[key] * (1 - min(1.0, link_chars[key] / text_chars[key] if text_chars[key] else 1.0)))
+        for key in scores
+    }
+
+
+def _article_blocks(blocks: List[Block]) -> List[Block]:
+    containers = _score_containers(blocks)
+    if not containers:
+        return []
+    top, top_score = max(containers.values(), key=lambda item: item[1])
+    if top_score <= 0:
+        return []
+
+    selected = {id(top)}
+    threshold = max(10, top_score * SIBLING_SCORE_RATIO)
+    if top.parent is not None:
+        for sibling in top.parent.children:
+            if isinstance(sibling, Tag) and sibling is not top:
+                entry = containers.get(id(sibling))
+                if entry and entry[1] >= threshold:
+                    selected.add(id(sibling))
+
+    def inside(block):
+        if id(block.element) in selected:
+            return True
+        return any(id(parent) in selected for parent in block.element.parents)
+
+    return [
+        block for block in blocks
+        if inside(block) and (block.is_heading or (len(block.text) >= MIN_KEEP_CHARS and block.link_density < MAX_LINK_DENSITY))
+    ]
+
+
+def build_digest(page: ParsedPage, max_tokens: int) -> str:
+    """
+    Article digest of the page within max_tokens (token_budget.count_tokens).
+
+    Args:
+        page (ParsedPage): Ayrıştırılmış sayfa
+        max_tokens (int): Digest için token bütçesi
+
+    Returns:
+        str: Başlık, ara başlıklar ve paragraflar (satır başına bir blok)
+    """
+    blocks = _article_blocks(collect_blocks(page))
+
+    # Title, headings and lead paragraphs first, then the rest
+    seen, candidates = set(), []
+    if page.title:
+        seen.add(page.title.lower())
+        candidates.append((0, -1, page.title))
+    after_heading, paragraphs = True, 0
+    for block in blocks:
+        key = block.text.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        lead = block.is_heading or after_heading or paragraphs < LEAD_PARAGRAPHS
+        candidates.append((0 if lead else 1, block.index, block.text))
+        if not block.is_heading:
+            paragraphs += 1
+        after_heading = block.is_heading
+
+    chosen, used = [], 0
+    for rank in (0, 1):
+        for candidate in candidates:
+            if candidate[0] != rank:
+                continue
+            tokens = count_tokens(candidate[2])
+            if used + tokens > max_tokens:
+                remaining = max_tokens - used
+                if remaining > 32:
+                    chosen.append((candidate[1], truncate_to_tokens(candidate[2], remaining)))
+                    used = max_tokens
+                break
+            chosen.append((candidate[1], candidate[2]))
+            used += tokens
+    chosen.sort(key=lambda item: item[0])
+    digest = "\n".join(text for _, text in chosen)
+
+    if len(digest) < MIN_DIGEST_CHARS and len(page.main_text) > len(digest):
+        logger.info("Readability digest too short, using the main content text")
+        return truncate_to_tokens(normalize_text(page.main_text), max_tokens)
+    return digest
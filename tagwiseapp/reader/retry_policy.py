@@ -0,0 +1,212 @@
+"""
+Retry Policy Module
+
+This module decides whether a failed LLM provider call is retried. Errors
+are sorted into classes, each with its own retry rule:
+
+- transient: timeouts, connection errors and 5xx responses, retried with
+  exponential backoff
+- rate_limited: 429 responses, retried at once since the next attempt
+  queues in the rate limiter
+- permanent: missing keys, authentication, other 4xx responses, content
+  policy blocks and open circuits, never retried
+- parse_error: responses that do not match the output schema, never
+  retried here (native structured output already made a repair call)
+
+Retries also draw from a process-wide budget: within RETRY_BUDGET_WINDOW
+seconds at most RETRY_BUDGET_RATIO of the requests may be retried, so a
+provider outage does not multiply the load with retry storms.
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+from langchain_core.exceptions import OutputParserException
+from pydantic import ValidationError
+from tenacity import wait_exponential
+
+from . import settings
+from .provider_router import CircuitOpenError, RateLimitTimeout, StructuredOutputError, is_retryable_error
+from .rate_limiter import is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+# Error classes
+TRANSIENT = "transient"
+RATE_LIMITED = "rate_limited"
+PERMANENT = "permanent"
+PARSE_ERROR = "parse_error"
+
+ERROR_CLASSES = (TRANSIENT, RATE_LIMITED, PERMANENT, PARSE_ERROR)
+
+# Message fragments of requests blocked by the provider's content policy
+CONTENT_POLICY_MESSAGES = (
+    "content_policy",
+    "content policy",
+    "content_filter",
+    "safety settings",
+    "blocked due to safety",
+    "prohibited_content",
+)
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Sort a provider call error into a retry class.
+
+    Args:
+        error (BaseException): Exception raised by a provider call
+
+    Returns:
+        str: TRANSIENT, RATE_LIMITED, PERMANENT or PARSE_ERROR
+    """
+    if isinstance(error, (CircuitOpenError, RateLimitTimeout)):
+        return PERMANENT
+    if isinstance(error, (StructuredOutputError, OutputParserException, ValidationError, json.JSONDecodeError)):
+        return PARSE_ERROR
+    if is_rate_limit_error(error):
+        return RATE_LIMITED
+
+    message = str(error).lower()
+    if any(fragment in message for fragment in CONTENT_POLICY_MESSAGES):
+        return PERMANENT
+    return TRANSIENT if is_retryable_error(error) else PERMANENT
+
+
+class RetryBudget:
+    """
+    Sliding window of requests and retries. A retry is allowed while the
+    retries in the window stay below ratio * requests (and at least
+    min_retries, so a quiet process can still retry).
+    """
+
+    def __init__(self, ratio: float, window_seconds: float, min_retries: int):
+        self.ratio = ratio
+        self.window_seconds = window_seconds
+        self.min_retries = min_retries
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        cutoff = now - self.window_seconds
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def _allowed(self) -> float:
+        return max(self.min_retries, self.ratio * len(self._requests))
+
+    def record_request(self):
+        with self._lock:
+            now = time.time()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget; False if the budget is used up"""
+        with self._lock:
+            now = time.time()
+            self._trim(now)
+            if len(self._retries) >= self._allowed():
+                return False
+            self._retries.append(now)
+            return True
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            self._trim(time.time())
+            return {
+                "requests": len(self._requests),
+                "retries": len(self._retries),
+                "allowed": int(self._allowed()),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._requests.clear()
+            self._retries.clear()
+
+
+class RetryPolicy:
+    """
+    Tenacity hooks applying the per-class retry rules and the retry budget.
+
+    Usage:
+        @retry(before=retry_policy.before, retry=retry_policy.should_retry,
+               wait=retry_policy.wait, reraise=True)
+    """
+
+    def __init__(
+        self,
+        rules: dict = settings.RETRY_RULES,
+        budget: RetryBudget = None,
+        time_budget: float = settings.PROVIDER_TIME_BUDGET,
+    ):
+        self.rules = rules
+        self.budget = budget or RetryBudget(
+            settings.RETRY_BUDGET_RATIO, settings.RETRY_BUDGET_WINDOW, settings.RETRY_BUDGET_MIN_RETRIES
+        )
+        self.time_budget = time_budget
+        self._backoff = wait_exponential(multiplier=settings.RETRY_DELAY, min=1, max=10)
+        self._stats = {error_class: {"errors": 0, "retries": 0, "budget_denied": 0} for error_class in ERROR_CLASSES}
+        self._lock = threading.Lock()
+
+    def _count(self, error_class: str, key: str):
+        with self._lock:
+            self._stats[error_class][key] += 1
+
+    def before(self, retry_state):
+        """Count each provider call (not its retries) as a request for the budget"""
+        if retry_state.attempt_number == 1:
+            self.budget.record_request()
+
+    def should_retry(self, retry_state) -> bool:
+        """Decide from the error class, its attempt limit, the time budget and the retry budget"""
+        error = retry_state.outcome.exception()
+        if error is None:
+            return False
+
+        error_class = classify_error(error)
+        self._count(error_class, "errors")
+        rule = self.rules[error_class]
+        if retry_state.attempt_number >= rule["max_attempts"]:
+            return False
+        if retry_state.seconds_since_start >= self.time_budget:
+            return False
+        if not self.budget.try_spend():
+            self._count(error_class, "budget_denied")
+            logger.warning(f"Retry budget exhausted, not retrying {error_class} error: {str(error)}")
+            return False
+
+        self._count(error_class, "retries")
+        logger.info(f"Retrying {error_class} error (attempt {retry_state.attempt_number}): {str(error)}")
+        return True
+
+    def wait(self, retry_state) -> float:
+        """Seconds before the next attempt: exponential backoff for classes with backoff, else none"""
+        error = retry_state.outcome.exception()
+        if error is not None and self.rules[classify_error(error)]["backoff"]:
+            return self._backoff(retry_state)
+        return 0
+
+    def get_stats(self) -> dict:
+        """Return errors, retries and budget denials per error class, plus the budget window"""
+        with self._lock:
+            stats = {error_class: dict(counts) for error_class, counts in self._stats.items()}
+        stats["budget"] = self.budget.get_stats()
+        return stats
+
+    def reset(self):
+        with self._lock:
+            for counts in self._stats.values():
+                for key in counts:
+                    counts[key] = 0
+        self.budget.reset()
+
+
+# Process-wide policy shared by all LLM chains
+retry_policy = RetryPolicy()
@@ -4,8 +4,8 @@ Schema Module
 This module defines Pydantic models for structured output parsing.
 """
 
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Any, List, Optional
+from pydantic import BaseModel, ConfigDict, Field
 
 class CategoryModel(BaseModel):
     """Model for category with main and sub categories"""
@@ -25,15 +25,14 @@ class TagModel(BaseModel):
 
 class ContentAnalysisModel(BaseModel):
     """Model for content analysis results"""
-    url: str = Field(description="URL of the analyzed content")
+    url: Optional[str] = Field(None, description="URL of the analyzed content")
     title: str = Field(description="Title of the content")
     description: str = Field(description="Description of the content")
     categories: List[CategoryModel] = Field(description="List of categories")
     tags: List[str] = Field(description="List of tags")
     
-    class Config:
-        """Pydantic config"""
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "url": "https://example.com",
                 "title": "Example Title",
@@ -44,6 +43,30 @@ class ContentAnalysisModel(BaseModel):
                 "tags": ["example", "web", "tutorial"]
             }
         }
+    )
+
+class BatchItemAnalysisModel(ContentAnalysisModel):
+    """Model for one page of a batch analysis"""
+    index: int = Field(description="Index of the page in the request")
+
+class BatchContentAnalysisModel(BaseModel):
+    """Model for analyzing several pages in one request"""
+    items: List[BatchItemAnalysisModel] = Field(description="One analysis result per page")
+
+def analysis_to_dict(result: Any) -> Any:
+    """
+    Converts a parsed analysis model to the dict format used by the analyzers.
+    Other values (dicts, raw text) are returned unchanged.
+    
+    Args:
+        result: LLMChain result
+        
+    Returns:
+        Any: dict for Pydantic models, otherwise the result itself
+    """
+    if isinstance(result, BaseModel):
+        return result.model_dump(exclude_none=True)
+    return result
 
 def get_content_analysis_json_schema() -> dict:
     """
@@ -93,4 +116,4 @@ def get_content_analysis_json_schema() -> dict:
             }
         },
         "required": ["title", "description", "categories", "tags"]
-    } 
\ No newline at end of file
+    }
@@ -5,6 +5,7 @@ This module provides centralized configuration settings for LLM providers.
 """
 
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -38,6 +39,13 @@ MODEL_CONFIGS = {
         "vision_model": "claude-3-sonnet-20240229",
         "temperature": 0.2,
         "max_tokens": 1500,
+    },
+    # Local provider without network access (tests, offline benchmarks)
+    "fake": {
+        "text_model": "fake-text",
+        "vision_model": "fake-vision",
+        "temperature": 0.2,
+        "max_tokens": 1500,
     }
 }
 
@@ -45,6 +53,142 @@ MODEL_CONFIGS = {
 REQUEST_TIMEOUT = 30
 RETRY_COUNT = 3
 RETRY_DELAY = 2  # seconds between retries
+# Upper bound on the time spent retrying a single provider before falling back
+PROVIDER_TIME_BUDGET = 45
+
+# Retry rules per error class (see retry_policy.py); max_attempts includes the first call
+RETRY_RULES = {
+    "transient": {"max_attempts": RETRY_COUNT, "backoff": True},
+    "rate_limited": {"max_attempts": RETRY_COUNT, "backoff": False},  # the rate limiter waits
+    "permanent": {"max_attempts": 1, "backoff": False},
+    "parse_error": {"max_attempts": 1, "backoff": False},
+}
+# Process-wide retry budget: retries may be at most this share of the requests in the window
+RETRY_BUDGET_RATIO = float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_WINDOW = 60  # seconds
+RETRY_BUDGET_MIN_RETRIES = 3  # retries always allowed per window, for low traffic
+
+# Maximum number of concurrent async LLM calls (LLMChain.arun/astream) per event loop
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Provider routing / circuit breaker settings
+CIRCUIT_ERROR_THRESHOLD = 0.5  # error rate that opens the circuit
+CIRCUIT_MIN_CALLS = 4  # calls in the window before the error rate is trusted
+CIRCUIT_CONSECUTIVE_FAILURES = 3  # consecutive failures that open the circuit
+CIRCUIT_COOLDOWN = 60  # seconds a provider is skipped after its circuit opens
+HEALTH_WINDOW_SIZE = 50  # number of recent calls kept per provider
+HEALTH_WINDOW_SECONDS = 300  # age limit of the recent calls
+SLOW_PROVIDER_P95 = 15  # providers slower than this (p95, seconds) are tried later
+
+# Hedged requests: if the primary provider has not answered after its recent
+# HEDGE_PERCENTILE latency, the same request is sent to the next healthy provider.
+# Off by default: a hedged request is paid for twice and uses both providers' rate limits
+HEDGE_ANALYSIS = os.getenv("LLM_HEDGE_ANALYSIS", "false").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = 90
+HEDGE_MIN_SAMPLES = 5  # successful calls needed before the percentile is used
+HEDGE_DEFAULT_DELAY = 8  # seconds, used until enough latency samples exist
+HEDGE_MIN_DELAY = 1  # seconds
+
+# Native structured output: schema-bound responses instead of format instructions + JSON parsing
+NATIVE_STRUCTURED_OUTPUT = os.getenv("LLM_NATIVE_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+# with_structured_output method per provider (None: the provider's only/default method)
+STRUCTURED_OUTPUT_METHODS = {
+    "gemini": "json_mode",  # response_schema, also works with cached content
+    "openai": "function_calling",
+    "anthropic": None,  # tool calling
+    "fake": None,  # tool calling, with deterministic schema-valid arguments
+}
+
+# Provider prompt caching of the stable system prefix (system prompt + taxonomy)
+PROMPT_CACHING = os.getenv("LLM_PROMPT_CACHING", "true").lower() in ("1", "true", "yes")
+GEMINI_CACHE_MIN_TOKENS = 4096  # smallest prefix Gemini accepts as cached content
+GEMINI_CACHE_MIN_USES = 2  # uses within the TTL before a Gemini cache is created
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", "3600"))  # seconds
+
+# Batch categorization (categorize_contents)
+BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", "10"))  # pages per request
+BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "24000"))  # page content tokens per request
+BATCH_ITEM_MAX_TOKENS = 1500  # cleaned content tokens kept per page in a batch
+
+# Prompt token budgets (token_budget.py counts tokens per provider tokenizer)
+# Readability digest of HTML pages sent for categorization (readability.py)
+CONTENT_DIGEST_TOKENS = int(os.getenv("LLM_CONTENT_DIGEST_TOKENS", "2500"))
+# Plain-text content sent for categorization
+CONTENT_MAX_TOKENS = int(os.getenv("LLM_CONTENT_MAX_TOKENS", "4000"))
+# YouTube transcript sent for video analysis
+TRANSCRIPT_MAX_TOKENS = int(os.getenv("LLM_TRANSCRIPT_MAX_TOKENS", "2000"))
+# Chatbot: retrieved bookmark documents and conversation history per question
+CHATBOT_CONTEXT_TOKENS = int(os.getenv("CHATBOT_CONTEXT_TOKENS", "6000"))
+CHATBOT_HISTORY_TOKENS = int(os.getenv("CHATBOT_HISTORY_TOKENS", "2000"))
+TOKEN_COUNT_CACHE_SIZE = 4096  # cached (provider, text digest) token counts
+
+# Rate limits per provider: requests and tokens per minute (0 disables a budget)
+RATE_LIMITS = {
+    "gemini": {
+        "rpm": int(os.getenv("GEMINI_RPM", "60")),
+        "tpm": int(os.getenv("GEMINI_TPM", "1000000")),
+    },
+    "openai": {
+        "rpm": int(os.getenv("OPENAI_RPM", "500")),
+        "tpm": int(os.getenv("OPENAI_TPM", "30000")),
+    },
+    "anthropic": {
+        "rpm": int(os.getenv("ANTHROPIC_RPM", "50")),
+        "tpm": int(os.getenv("ANTHROPIC_TPM", "40000")),
+    },
+    # Unlimited unless set, so load tests can exercise the limiter offline
+    "fake": {
+        "rpm": int(os.getenv("FAKE_RPM", "0")),
+        "tpm": int(os.getenv("FAKE_TPM", "0")),
+    },
+}
+# "memory" keeps the budgets per process, "file" shares them between workers
+RATE_LIMIT_BACKEND = os.getenv("LLM_RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DIR = os.getenv("LLM_RATE_LIMIT_DIR", os.path.join(tempfile.gettempdir(), "tagwise-ratelimit"))
+RATE_LIMIT_BURST_SECONDS = 10  # bucket capacity, in seconds of budget
+RATE_LIMIT_MAX_WAIT = 30  # seconds a caller may queue before falling back
+RATE_LIMIT_DEFAULT_BACKOFF = 5  # seconds to pause after a 429 without Retry-After
+RATE_LIMIT_MIN_FACTOR = 0.25  # lowest fraction of the budget used after 429s
+RATE_LIMIT_RECOVERY = 0.05  # budget fraction regained per successful call
+
+# Fake provider behaviour (DEFAULT_LLM_PROVIDER=fake / EMBEDDING_PROVIDER=fake for offline runs)
+# Latency: "fixed:S", "uniform:MIN,MAX", "lognormal:MEDIAN,SIGMA" or "exponential:MEAN" (seconds)
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "fixed:0")
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))  # share of calls failing with a 503
+FAKE_LLM_RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0"))  # share of calls failing with a 429
+FAKE_LLM_STREAM_CHUNK_SIZE = 20  # characters per streamed chunk
+FAKE_LLM_STREAM_CHUNK_DELAY = float(os.getenv("FAKE_LLM_STREAM_CHUNK_DELAY", "0"))  # seconds between chunks
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED")) if os.getenv("FAKE_LLM_SEED") else None
+FAKE_EMBEDDING_DIMENSIONS = 768  # same as models/embedding-001
+
+# HTML fetching (html_fetcher.py): the body is streamed and reading stops at the byte cap
+HTML_FETCH_TIMEOUT = float(os.getenv("HTML_FETCH_TIMEOUT", "60"))  # seconds
+HTML_FETCH_MAX_BYTES = int(os.getenv("HTML_FETCH_MAX_BYTES", str(2 * 1024 * 1024)))  # decoded body bytes kept
+HTML_FETCH_CHUNK_SIZE = 64 * 1024  # bytes read per chunk
+HTML_HEAD_CHUNK_SIZE = 8 * 1024  # bytes read per chunk in head-only mode
+# Content types that are read; anything else (images, PDFs, archives) is rejected before the body
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "application/xml", "text/xml", "text/plain")
+
+# Stage graph (stage_graph.py): independent analysis stages run concurrently
+STAGE_MAX_WORKERS = int(os.getenv("STAGE_MAX_WORKERS", "4"))  # threads per analysis
+# Per-stage time limits in seconds; a stage over its limit gets its default result
+STAGE_TIMEOUTS = {
+    "thumbnail": float(os.getenv("STAGE_THUMBNAIL_TIMEOUT", "20")),
+    "screenshot": float(os.getenv("STAGE_SCREENSHOT_TIMEOUT", "60")),
+    "analysis": float(os.getenv("STAGE_ANALYSIS_TIMEOUT", "180")),
+    "youtube_metadata": float(os.getenv("STAGE_YOUTUBE_METADATA_TIMEOUT", "20")),
+    "youtube_transcript": float(os.getenv("STAGE_YOUTUBE_TRANSCRIPT_TIMEOUT", "30")),
+}
+
+# Single flight (single_flight.py): concurrent analyses of the same URL share one run
+# "memory" coalesces the threads of a process, "db" also workers (PostgreSQL advisory locks)
+SINGLE_FLIGHT_BACKEND = os.getenv("SINGLE_FLIGHT_BACKEND", "memory")
+SINGLE_FLIGHT_WAIT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_WAIT_TIMEOUT", "300"))  # seconds a duplicate request waits
+
+# YouTube cache (youtube_cache.py): video info, title, transcript and thumbnail URL by video id
+YOUTUBE_CACHE_TTL = int(os.getenv("YOUTUBE_CACHE_TTL", str(7 * 24 * 60 * 60)))  # seconds; 0 disables the cache
+YOUTUBE_CACHE_MAX_ENTRIES = int(os.getenv("YOUTUBE_CACHE_MAX_ENTRIES", "5000"))  # least recently used are evicted
+YOUTUBE_CACHE_TRANSCRIPT_CHARS = 100000  # transcript characters kept per video
 
 # Response formats
 RESPONSE_FORMAT = "json"
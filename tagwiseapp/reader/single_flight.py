@@ -0,0 +1,282 @@
+"""
+Single Flight Module
+
+This module coalesces concurrent identical URL analyses. The first caller
+for a URL does the work (page fetch, thumbnail or screenshot, LLM call);
+callers that arrive while it is running wait for it and get the same
+result instead of repeating the work. Results are only shared between
+callers that overlap in time; nothing is cached after the flight lands.
+
+Flights are keyed by the normalized URL, so "https://Example.com/a/?utm_source=x#top"
+and "https://example.com/a" are one flight.
+
+- memory (default): coalesces the threads (do) and coroutines (ado) of one process
+- db: additionally takes a PostgreSQL advisory lock per URL, so callers in
+  other worker processes wait for the running analysis and read its result
+  from the AnalysisFlight table. Other databases fall back to memory.
+"""
+
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that do not change the page (dropped from the flight key)
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "yclid", "mc_cid", "mc_eid", "igshid", "ref_src")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Seconds between advisory lock attempts while another worker runs the flight
+DB_LOCK_POLL_INTERVAL = 0.1
+
+
+def normalize_url_key(url: str) -> str:
+    """
+    Flight key of a URL: lower-case scheme and host, no default port, fragment,
+    tracking parameters or trailing slash, query parameters sorted.
+
+    Args:
+        url (str): URL
+
+    Returns:
+        str: Normalize edilmiş URL
+    """
+    url = (url or "").strip()
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAMS)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+class _Flight:
+    """One in-flight call; thread waiters block on done, coroutine waiters await a future"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+        self.futures = []
+
+    def finish(self):
+        """Wake every waiter (futures are resolved on their own event loop)"""
+        self.done.set()
+        for future in self.futures:
+            future.get_loop().call_soon_threadsafe(_resolve, future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+    """
+
+    def __init__(self, name: str, backend: Optional[str] = None, wait_timeout: Optional[float] = None):
+        self.name = name
+        self.backend = backend or settings.SINGLE_FLIGHT_BACKEND
+        self.wait_timeout = wait_timeout or settings.SINGLE_FLIGHT_WAIT_TIMEOUT
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "executed": 0, "coalesced": 0, "coalesced_across_workers": 0,
+                      "wait_timeouts": 0, "errors": 0}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key (str): Uçuş anahtarı (ör. normalize_url_key(url))
+            fn (Callable): İşi yapan fonksiyon; db modunda sonucu JSON'a çevrilebilir olmalı
+
+        Returns:
+            Tuple[Any, bool]: Sonuç ve sonucun başka bir çağrıdan paylaşılıp paylaşılmadığı
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                # The running call is stuck; do not keep this request waiting forever
+                logger.warning(f"[{self.name}] Waited {self.wait_timeout}s for {key}, running it separately")
+                self._count("wait_timeouts")
+                self._count("executed")
+                return fn(), False
+            self._count("coalesced")
+            logger.info(f"[{self.name}] Coalesced request for {key} ({self.stats['coalesced']} coalesced so far)")
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+
+        try:
+            flight.value, shared = self._execute(key, fn)
+            return flight.value, shared
+        except Exception as e:
+            flight.error = e
+            self._count("errors")
+            raise
+        finally:
+            self._land(key, flight)
+
+    async def ado(self, key: str, afn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Async version of do: waiting callers await the running flight instead of
+        blocking a thread. Flights are shared with callers of do.
+
+        Args:
+            key (str): Uçuş anahtarı (ör. normalize_url_key(url))
+            afn (Callable): İşi yapan coroutine fonksiyonu; db modunda sonucu JSON'a çevrilebilir olmalı
+
+        Returns:
+            Tuple[Any, bool]: Sonuç ve sonucun başka bir çağrıdan paylaşılıp paylaşılmadığı
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+                landed = asyncio.get_running_loop().create_future()
+                flight.futures.append(landed)
+
+        if not leader:
+            try:
+                await asyncio.wait_for(landed, self.wait_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"[{self.name}] Waited {self.wait_timeout}s for {key}, running it separately")
+                self._count("wait_timeouts")
+                self._count("executed")
+                return await afn(), False
+            self._count("coalesced")
+            logger.info(f"[{self.name}] Coalesced request for {key} ({self.stats['coalesced']} coalesced so far)")
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+
+        try:
+            flight.value, shared = await self._aexecute(key, afn)
+            return flight.value, shared
+        except Exception as e:
+            flight.error = e
+            self._count("errors")
+            raise
+        finally:
+            self._land(key, flight)
+
+    def _land(self, key: str, flight: _Flight):
+        with self._lock:
+            del self._flights[key]
+        flight.finish()
+        if flight.waiters:
+            logger.info(f"[{self.name}] {flight.waiters} waiting request(s) for {key} shared one analysis")
+
+    async def _aexecute(self, key: str, afn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        if self.backend == "db":
+            from asgiref.sync import async_to_sync, sync_to_async
+            # The advisory lock belongs to one DB connection, so the locked section
+            # runs in a worker thread; the work itself goes back to this event loop
+            return await sync_to_async(self._execute_in_worker, thread_sensitive=False)(key, async_to_sync(afn))
+        self._count("executed")
+        return await afn(), False
+
+    def _execute_in_worker(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        from django.db import connections
+        try:
+            return self._execute(key, fn)
+        finally:
+            connections.close_all()
+
+    def _execute(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        if self.backend == "db":
+            from django.db import connection
+            if connection.vendor == "postgresql":
+                return self._execute_locked(key, fn, connection)
+            logger.debug(f"[{self.name}] Advisory locks need PostgreSQL, coalescing in-process only")
+        self._count("executed")
+        return fn(), False
+
+    def _execute_locked(self, key: str, fn: Callable[[], Any], connection) -> Tuple[Any, bool]:
+        """Run fn under a PostgreSQL advisory lock, or read the result of the worker holding it"""
+        from django.utils import timezone
+        from ..models import AnalysisFlight
+
+        digest = hashlib.sha256(f"{self.name}:{key}".encode("utf-8")).hexdigest()
+        lock_id = int.from_bytes(bytes.fromhex(digest[:16]), "big", signed=True)
+        waited_since = timezone.now()
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock_id])
+                if cursor.fetchone()[0]:
+                    break
+                if time.monotonic() >= deadline:
+                    logger.warning(f"[{self.name}] Advisory lock for {key} still held after {self.wait_timeout}s, running it separately")
+                    self._count("wait_timeouts")
+                    self._count("executed")
+                    return fn(), False
+                waited = True
+                time.sleep(DB_LOCK_POLL_INTERVAL)
+
+            try:
+                if waited:
+                    # Another worker finished the same analysis while we waited
+                    stored = AnalysisFlight.objects.filter(key=digest, created_at__gte=waited_since).first()
+                    if stored is not None:
+                        self._count("coalesced_across_workers")
+                        logger.info(f"[{self.name}] Coalesced request for {key} with another worker")
+                        return stored.value, True
+
+                self._count("executed")
+                value = fn()
+                AnalysisFlight.objects.update_or_create(key=digest, defaults={"value": value, "created_at": timezone.now()})
+                # Results are only for callers waiting right now; drop old ones
+                AnalysisFlight.objects.filter(
+                    created_at__lt=timezone.now() - timedelta(seconds=self.wait_timeout)
+                ).delete()
+                return value, False
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+
+    def get_stats(self) -> dict:
+        """Call, execution and coalesced request counts"""
+        with self._lock:
+            stats = dict(self.stats, in_flight=len(self._flights), backend=self.backend)
+        shared = stats["coalesced"] + stats["coalesced_across_workers"]
+        stats["coalesced_rate"] = shared / stats["calls"] if stats["calls"] else 0.0
+        return stats
+
+
+# Process-wide flight group of URL analyses
+url_analysis_flight = SingleFlight("url-analysis")
@@ -0,0 +1,229 @@
+"""
+Stage Graph Module
+
+This module runs the stages of an analysis as a small dependency graph:
+a stage starts as soon as the stages it depends on have finished, so
+independent network calls (page thumbnail, screenshot, LLM request,
+YouTube metadata and transcript) overlap and the end-to-end latency
+approaches the slowest chain of stages instead of their sum.
+
+- Each stage has its own timeout. A stage that times out or raises gets
+  its default value, and the stages after it still run.
+- A stage can have a condition evaluated on its dependencies' results.
+  Fallbacks whose condition is false are never started, and stages still
+  waiting when the graph deadline passes are cancelled.
+
+Usage:
+    graph = StageGraph("url-analysis")
+    graph.add("thumbnail", lambda: extract_thumbnail_from_html(page, url), timeout=20)
+    graph.add("screenshot", lambda thumbnail: capture_screenshot(url), deps=["thumbnail"],
+              when=lambda thumbnail: thumbnail is None)
+    graph.add("analysis", lambda: categorize_content(page, url))
+    results = graph.run()
+    results["screenshot"], results.skipped, results.timings
+
+Async views await their stages directly with asyncio.gather and wrap each
+one in arun_stage, which applies the same timeout/default rules.
+"""
+
+import time
+import asyncio
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """One node of the graph: fn is called with the dependencies' results as keyword arguments"""
+
+    def __init__(self, name: str, fn: Callable, deps: Iterable[str] = (), timeout: Optional[float] = None,
+                 when: Optional[Callable[..., bool]] = None, default: Any = None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.when = when
+        self.default = default
+
+
+class StageResults(dict):
+    """Stage results by name, with per-stage status, errors and durations"""
+
+    def __init__(self):
+        super().__init__()
+        self.status = {}
+        self.errors = {}
+        self.timings = {}
+
+    @property
+    def skipped(self):
+        return [name for name, status in self.status.items() if status in ("skipped", "cancelled")]
+
+    @property
+    def timed_out(self):
+        return [name for name, status in self.status.items() if status == "timeout"]
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name}={self.status[name]}" + (f"({self.timings[name]:.2f}s)" if name in self.timings else "")
+            for name in self.status
+        )
+
+
+async def arun_stage(name: str, awaitable, timeout: Optional[float] = None, default: Any = None) -> Any:
+    """
+    Await one stage of an async analysis; like StageGraph, a stage that times
+    out or raises yields its default value.
+
+    Args:
+        name (str): Aşamanın adı (loglar için)
+        awaitable: Aşamanın coroutine'i
+        timeout (float, optional): Aşamanın süre sınırı (saniye)
+        default (Any): Süre aşımı veya hata durumunda dönen değer
+
+    Returns:
+        Any: Aşamanın sonucu veya default
+    """
+    started = time.monotonic()
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Stage {name} timed out after {timeout}s")
+        return default
+    except Exception as e:
+        logger.warning(f"Stage {name} failed: {e}")
+        return default
+    finally:
+        logger.debug(f"Stage {name} finished in {time.monotonic() - started:.2f}s")
+
+
+def _run_stage(stage: Stage, kwargs: dict):
+    try:
+        return stage.fn(**kwargs)
+    finally:
+        # Worker threads open their own database connections; do not leave them behind
+        try:
+            from django.db import connections
+            connections.close_all()
+        except Exception:
+            pass
+
+
+class StageGraph:
+    """Dependency graph of analysis stages, run on a thread pool"""
+
+    def __init__(self, name: str = "stages", max_workers: Optional[int] = None):
+        self.name = name
+        self.max_workers = max_workers or settings.STAGE_MAX_WORKERS
+        self.stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, fn: Callable, deps: Iterable[str] = (), timeout: Optional[float] = None,
+            when: Optional[Callable[..., bool]] = None, default: Any = None) -> "StageGraph":
+        """
+        Add a stage.
+
+        Args:
+            name (str): Aşama adı (sonuçlarda anahtar)
+            fn (Callable): Bağımlılıkların sonuçlarıyla (isimleriyle) çağrılan fonksiyon
+            deps (Iterable[str]): Önce bitmesi gereken aşamalar
+            timeout (float, optional): Aşamanın süre sınırı (saniye); aşılırsa default kullanılır
+            when (Callable, optional): Bağımlılık sonuçlarıyla çağrılır; False ise aşama çalışmaz
+            default: Aşama atlanır, hata verir veya zaman aşımına uğrarsa sonucu
+
+        Returns:
+            StageGraph: Zincirleme çağrı için graf
+        """
+        unknown = [dep for dep in deps if dep not in self.stages]
+        if unknown:
+            raise ValueError(f"Stage {name} depends on unknown stages: {unknown}")
+        self.stages[name] = Stage(name, fn, deps, timeout, when, default)
+        return self
+
+    def run(self, timeout: Optional[float] = None) -> StageResults:
+        """
+        Run the graph and return the results of all stages.
+
+        Args:
+            timeout (float, optional): Grafın toplam süre sınırı (saniye)
+
+        Returns:
+            StageResults: Aşama sonuçları (atlanan/başarısız aşamalar için default)
+        """
+        results = StageResults()
+        graph_start = time.monotonic()
+        graph_deadline = graph_start + timeout if timeout else None
+        waiting = dict(self.stages)
+        running = {}  # future -> (stage, start, deadline)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"stage-{self.name}")
+
+        def finish(stage, value, status, started=None, error=None):
+            results[stage.name] = value
+            results.status[stage.name] = status
+            if started is not None:
+                results.timings[stage.name] = time.monotonic() - started
+            if error is not None:
+                results.errors[stage.name] = error
+
+        try:
+            while waiting or running:
+                # Start (or skip) every stage whose dependencies have finished
+                for name, stage in list(waiting.items()):
+                    if any(dep not in results.status for dep in stage.deps):
+                        continue
+                    del waiting[name]
+                    kwargs = {dep: results[dep] for dep in stage.deps}
+                    try:
+                        needed = stage.when(**kwargs) if stage.when else True
+                    except Exception as e:
+                        logger.error(f"[{self.name}] Condition of stage {name} failed: {str(e)}")
+                        needed = False
+                    if not needed:
+                        finish(stage, stage.default, "skipped")
+                        continue
+                    started = time.monotonic()
+                    deadline = started + stage.timeout if stage.timeout else None
+                    if graph_deadline:
+                        deadline = min(deadline or graph_deadline, graph_deadline)
+                    running[executor.submit(_run_stage, stage, kwargs)] = (stage, started, deadline)
+
+                if not running:
+                    # Only stages whose dependencies can never finish are left
+                    for stage in waiting.values():
+                        finish(stage, stage.default, "cancelled")
+                    break
+
+                deadlines = [deadline for _, _, deadline in running.values() if deadline]
+                wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    stage, started, _ = running.pop(future)
+                    try:
+                        finish(stage, future.result(), "done", started)
+                    except Exception as e:
+                        logger.error(f"[{self.name}] Stage {stage.name} failed: {str(e)}")
+                        finish(stage, stage.default, "failed", started, e)
+
+                now = time.monotonic()
+                for future, (stage, started, deadline) in list(running.items()):
+                    if deadline and now >= deadline:
+                        # The thread cannot be stopped; its result is ignored
+                        future.cancel()
+                        del running[future]
+                        logger.warning(f"[{self.name}] Stage {stage.name} timed out after {now - started:.1f}s")
+                        finish(stage, stage.default, "timeout", started)
+
+                if graph_deadline and now >= graph_deadline:
+                    for stage in waiting.values():
+                        finish(stage, stage.default, "cancelled")
+                    waiting.clear()
+        finally:
+            # Do not wait for timed-out stages; cancel anything not yet started
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        logger.info(f"[{self.name}] Stages finished in {time.monotonic() - graph_start:.2f}s: {results.summary()}")
+        return results
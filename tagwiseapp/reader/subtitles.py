@@ -0,0 +1,252 @@
+"""
+Subtitles Module
+
+This module reads YouTube subtitle tracks in memory. A track URL taken from
+the yt-dlp info dict is streamed and parsed chunk by chunk (WebVTT, SRV3 /
+timedtext XML or JSON3); reading stops as soon as max_chars characters of
+caption text are collected. No files are written.
+
+Auto-generated captions repeat the previous line in every cue (rolling
+captions); repeated lines are dropped, so the collected text reads as the
+spoken text once.
+
+Usage:
+    track = choose_subtitle_track(info["subtitles"], info["automatic_captions"], ["tr", "en"])
+    text = fetch_subtitle_text(track["url"], track["ext"], max_chars=100000)
+"""
+
+import re
+import json
+import html
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, List, Optional
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+import httpx
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+
+# Track formats this module parses, in order of preference
+SUBTITLE_FORMATS = ("json3", "srv3", "vtt")
+TAG = re.compile(r"<[^>]+>")
+WHITESPACE = re.compile(r"\s+")
+# Lines compared against each new line to drop rolling-caption repeats
+RECENT_LINES = 3
+
+
+class SubtitleParser(ABC):
+    """
+    Incremental subtitle parser: feed() text chunks, close() at the end of
+    the stream, text() the caption text.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.chars = 0
+        self.done = False
+        self._parts = []
+        self._recent = deque(maxlen=RECENT_LINES)
+
+    def _add(self, line: str):
+        line = WHITESPACE.sub(" ", html.unescape(TAG.sub("", line))).strip()
+        if not line or line in self._recent or self.done:
+            return
+        self._recent.append(line)
+        self._parts.append(line)
+        self.chars += len(line) + 1
+        if self.chars >= self.max_chars:
+            self.done = True
+
+    @abstractmethod
+    def feed(self, chunk: str) -> bool:
+        """Parse a chunk; returns True once max_chars characters are collected"""
+
+    def close(self):
+        """Parse whatever is left at the end of the stream"""
+
+    def text(self) -> str:
+        return " ".join(self._parts)[:self.max_chars]
+
+
+class VttParser(SubtitleParser):
+    """WebVTT: cue text lines, without the header, cue ids, timings, NOTE and STYLE blocks"""
+
+    def __init__(self, max_chars: int):
+        super().__init__(max_chars)
+        self._pending = ""
+        self._skip_block = True  # the header block up to the first blank line
+
+    def _line(self, line: str):
+        line = line.strip()
+        if not line:
+            self._skip_block = False
+            return
+        if self._skip_block:
+            return
+        if line.startswith(("NOTE", "STYLE", "REGION")):
+            self._skip_block = True
+            return
+        if "-->" in line or line.isdigit():
+            return
+        self._add(line)
+
+    def feed(self, chunk: str) -> bool:
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._line(line)
+            if self.done:
+                break
+        return self.done
+
+    def close(self):
+        if self._pending:
+            self._line(self._pending)
+            self._pending = ""
+
+
+class Srv3Parser(SubtitleParser):
+    """SRV3 / timedtext XML: the text of every <p> (srv3) or <text> (srv1) element"""
+
+    def __init__(self, max_chars: int):
+        super().__init__(max_chars)
+        self._parser = XMLPullParser(events=("end",))
+
+    def _events(self):
+        for _, element in self._parser.read_events():
+            if element.tag in ("p", "text"):
+                self._add("".join(element.itertext()))
+                element.clear()
+                if self.done:
+                    break
+
+    def feed(self, chunk: str) -> bool:
+        try:
+            self._parser.feed(chunk)
+            self._events()
+        except ParseError as e:
+            logger.warning(f"Subtitle XML parse error, keeping {self.chars} characters: {str(e)}")
+            self.done = True
+        return self.done
+
+    def close(self):
+        try:
+            self._parser.close()
+            self._events()
+        except ParseError:
+            pass
+
+
+class Json3Parser(SubtitleParser):
+    """JSON3: the segments of each object of the "events" array, decoded one event at a time"""
+
+    def __init__(self, max_chars: int):
+        super().__init__(max_chars)
+        self._buffer = ""
+        self._in_events = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk: str) -> bool:
+        self._buffer += chunk
+        if not self._in_events:
+            start = re.search(r'"events"\s*:\s*\[', self._buffer)
+            if not start:
+                return False
+            self._buffer = self._buffer[start.end():]
+            self._in_events = True
+
+        position = 0
+        while not self.done:
+            while position < len(self._buffer) and self._buffer[position] in " \t\r\n,":
+                position += 1
+            if position >= len(self._buffer):
+                break
+            if self._buffer[position] == "]":
+                self.done = True
+                break
+            try:
+                event, position = self._decoder.raw_decode(self._buffer, position)
+            except ValueError:
+                break  # the event is not complete yet
+            self._add("".join(segment.get("utf8", "") for segment in event.get("segs") or []))
+        self._buffer = self._buffer[position:]
+        return self.done
+
+    def close(self):
+        # Events are added as soon as they are complete; what is left is an event
+        # cut off by the end of the stream
+        if self._buffer.strip(" \t\r\n,]}"):
+            logger.debug(f"Dropping an incomplete JSON3 event ({len(self._buffer)} characters)")
+        self._buffer = ""
+
+
+PARSERS = {"vtt": VttParser, "srv3": Srv3Parser, "srv2": Srv3Parser, "srv1": Srv3Parser, "json3": Json3Parser}
+
+
+def create_subtitle_parser(ext: str, max_chars: int) -> Optional[SubtitleParser]:
+    """Parser for a track format (vtt, srv1-3, json3), or None if the format is not supported"""
+    parser = PARSERS.get(ext)
+    return parser(max_chars) if parser else None
+
+
+def choose_subtitle_track(subtitles: Dict[str, List[dict]], automatic_captions: Dict[str, List[dict]],
+                          languages: List[str]) -> Optional[dict]:
+    """
+    Pick the subtitle track to read from the yt-dlp info dict.
+
+    Manual subtitles of a language come before its automatic captions, and
+    languages are tried in the given order ("en" also matches "en-US").
+
+    Args:
+        subtitles (dict): info['subtitles'] (dil -> format listesi)
+        automatic_captions (dict): info['automatic_captions']
+        languages (List[str]): Tercih sırasına göre diller
+
+    Returns:
+        dict or None: Seçilen iz ('url', 'ext', 'lang', 'automatic')
+    """
+    for language in languages:
+        for automatic, tracks in ((False, subtitles or {}), (True, automatic_captions or {})):
+            candidates = [lang for lang in tracks if lang == language or lang.startswith(f"{language}-")]
+            # Exact language first; "-orig" is the spoken original of translated auto captions
+            candidates.sort(key=lambda lang: (lang != language, not lang.endswith("-orig"), lang))
+            for lang in candidates:
+                formats = {track.get("ext"): track for track in tracks[lang] if track.get("url")}
+                for ext in SUBTITLE_FORMATS:
+                    if ext in formats:
+                        return {"url": formats[ext]["url"], "ext": ext, "lang": lang, "automatic": automatic}
+    return None
+
+
+def fetch_subtitle_text(url: str, ext: str, max_chars: int) -> Optional[str]:
+    """
+    Stream a subtitle track and return its caption text.
+
+    Args:
+        url (str): Altyazı izinin URL'si
+        ext (str): İz formatı (vtt, srv3, json3)
+        max_chars (int): Toplanacak en fazla karakter; ulaşılınca okuma durur
+
+    Returns:
+        str or None: Altyazı metni; iz okunamazsa None
+    """
+    parser = create_subtitle_parser(ext, max_chars)
+    if parser is None:
+        logger.warning(f"Unsupported subtitle format: {ext}")
+        return None
+    try:
+        with httpx.stream("GET", url, timeout=settings.HTML_FETCH_TIMEOUT, follow_redirects=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_text():
+                if parser.feed(chunk):
+                    break
+            else:
+                parser.close()
+    except httpx.HTTPError as e:
+        logger.error(f"Subtitle track could not be read: {str(e)}")
+        return None
+    return parser.text() or None
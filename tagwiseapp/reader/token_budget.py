@@ -0,0 +1,207 @@
+"""
+Token Budget Module
+
+This module counts prompt tokens and fits content into token budgets, so
+every prompt builder limits its input by tokens instead of characters.
+
+Counting depends on the provider's tokenizer:
+
+- openai: tiktoken when it is installed and its encoding can be loaded
+- every provider (and openai without tiktoken): an approximation from the
+  character mix of the text. English and code (ASCII) take about four
+  characters per token, Turkish and other accented Latin text noticeably
+  fewer, and CJK text about one character per token, so a fixed
+  characters-per-token ratio over- or under-shoots by a wide margin.
+
+Counts are cached per (provider, digest of the text), as the same content
+is counted when it is budgeted, packed into batches and charged to the
+rate limiter. Only the digest is kept, not the text itself.
+"""
+
+import re
+import math
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Characters per token by script, per provider tokenizer (approximations)
+CHARS_PER_TOKEN = {
+    "openai": {"ascii": 4.0, "latin": 2.4, "cjk": 1.1, "other": 2.0},
+    "anthropic": {"ascii": 3.5, "latin": 2.0, "cjk": 0.9, "other": 1.6},
+    "gemini": {"ascii": 4.0, "latin": 2.8, "cjk": 1.4, "other": 2.4},
+    "fake": {"ascii": 4.0, "latin": 4.0, "cjk": 4.0, "other": 4.0},
+}
+DEFAULT_CHARS_PER_TOKEN = CHARS_PER_TOKEN["gemini"]
+
+# tiktoken encoding per provider (only providers whose tokenizer tiktoken has)
+TIKTOKEN_ENCODINGS = {"openai": "o200k_base"}
+
+# Accented Latin letters (Turkish ç ğ ı İ ö ş ü, Western and Central European)
+LATIN_EXTENDED = re.compile(r"[\u00c0-\u024f\u1e00-\u1eff]")
+# Han, kana, hangul and CJK punctuation / full-width forms
+CJK = re.compile(r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+TRUNCATION_SUFFIX = "..."
+
+
+@lru_cache(maxsize=None)
+def _tiktoken_encoding(provider: str):
+    """The provider's tiktoken encoding, or None if tiktoken or the encoding is unavailable"""
+    name = TIKTOKEN_ENCODINGS.get(provider)
+    if not name or tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # The encoding file is downloaded on first use; offline hosts use the approximation
+        logger.warning(f"tiktoken encoding {name} unavailable, approximating token counts: {str(e)}")
+        return None
+
+
+def _approximate(text: str, provider: str) -> int:
+    ratios = CHARS_PER_TOKEN.get(provider, DEFAULT_CHARS_PER_TOKEN)
+    non_ascii = len(NON_ASCII.findall(text))
+    if not non_ascii:
+        return math.ceil(len(text) / ratios["ascii"])
+    latin = len(LATIN_EXTENDED.findall(text))
+    cjk = len(CJK.findall(text))
+    other = non_ascii - latin - cjk
+    tokens = (
+        (len(text) - non_ascii) / ratios["ascii"]
+        + latin / ratios["latin"]
+        + cjk / ratios["cjk"]
+        + other / ratios["other"]
+    )
+    return math.ceil(tokens)
+
+
+def _count(text: str, provider: str) -> int:
+    encoding = _tiktoken_encoding(provider)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return _approximate(text, provider)
+
+
+_count_cache = OrderedDict()  # (text digest, provider) -> token count, least recently used first
+_count_cache_stats = {"hits": 0, "misses": 0}
+_count_cache_lock = threading.Lock()
+
+
+def _cached_count(text: str, provider: str) -> int:
+    key = (hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest(), provider)
+    with _count_cache_lock:
+        count = _count_cache.get(key)
+        if count is not None:
+            _count_cache.move_to_end(key)
+            _count_cache_stats["hits"] += 1
+            return count
+        _count_cache_stats["misses"] += 1
+
+    count = _count(text, provider)
+    with _count_cache_lock:
+        _count_cache[key] = count
+        while len(_count_cache) > settings.TOKEN_COUNT_CACHE_SIZE:
+            _count_cache.popitem(last=False)
+    return count
+
+
+def count_tokens(text: str, provider: Optional[str] = None) -> int:
+    """
+    Token count of a text for a provider's tokenizer.
+
+    Args:
+        text (str): Metin
+        provider (str, optional): Sağlayıcı; varsayılan DEFAULT_PROVIDER
+
+    Returns:
+        int: Tahmini token sayısı
+    """
+    if not text:
+        return 0
+    return _cached_count(text, provider or settings.DEFAULT_PROVIDER)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, provider: Optional[str] = None,
+                       suffix: str = TRUNCATION_SUFFIX) -> str:
+    """
+    Cut a text to at most max_tokens tokens, at a word boundary where possible.
+
+    Args:
+        text (str): Metin
+        max_tokens (int): Token bütçesi (suffix dahil)
+        provider (str, optional): Sağlayıcı; varsayılan DEFAULT_PROVIDER
+        suffix (str): Kesilen metnin sonuna eklenen ek
+
+    Returns:
+        str: Bütçeye sığan metin
+    """
+    provider = provider or settings.DEFAULT_PROVIDER
+    if not text or count_tokens(text, provider) <= max_tokens:
+        return text
+    budget = max_tokens - _count(suffix, provider) if suffix else max_tokens
+    if budget <= 0:
+        return ""
+
+    encoding = _tiktoken_encoding(provider)
+    if encoding is not None:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:budget])
+    else:
+        # Longest prefix within the budget (the count grows with the prefix length);
+        # no script takes more characters per token than the largest ratio
+        ratios = CHARS_PER_TOKEN.get(provider, DEFAULT_CHARS_PER_TOKEN)
+        low, high = 0, min(len(text), int(budget * max(ratios.values())) + 1)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if _count(text[:middle], provider) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        cut = text[:low]
+
+    # Do not end in the middle of a word unless the text has no spaces nearby
+    boundary = cut.rfind(" ")
+    if boundary > len(cut) * 0.8:
+        cut = cut[:boundary]
+    return cut.rstrip() + suffix
+
+
+def fit_count(texts: List[str], max_tokens: int, provider: Optional[str] = None) -> int:
+    """
+    Number of leading texts whose tokens together fit in max_tokens.
+
+    Pass the texts most-important-first (e.g. retrieved documents by rank,
+    or chat messages newest-first).
+
+    Args:
+        texts (List[str]): Metinler, önem sırasına göre
+        max_tokens (int): Toplam token bütçesi
+        provider (str, optional): Sağlayıcı; varsayılan DEFAULT_PROVIDER
+
+    Returns:
+        int: Bütçeye sığan baştaki metin sayısı
+    """
+    used = 0
+    for index, text in enumerate(texts):
+        used += count_tokens(text, provider)
+        if used > max_tokens:
+            return index
+    return len(texts)
+
+
+def get_cache_stats() -> dict:
+    """Hits, misses and size of the token count cache"""
+    with _count_cache_lock:
+        return dict(_count_cache_stats, size=len(_count_cache))
@@ -206,96 +206,111 @@ def load_image_from_file(image_path):
         print(traceback.format_exc())
         return None
 
+def _thumbnail_image_url(html, url):
+    """og:image, twitter:image veya schema.org image etiketindeki mutlak resim URL'si"""
+    from urllib.parse import urljoin
+    from .parsed_page import ParsedPage
+    
+    # og:image, twitter:image ve schema.org image meta etiketleri (bu sırayla)
+    page = html if isinstance(html, ParsedPage) else ParsedPage(html, url)
+    image_url = page.image_url
+    
+    # Göreceli URL'yi mutlak URL'ye çevir
+    if image_url and not image_url.startswith(('http://', 'https://')):
+        image_url = urljoin(url, image_url)
+    if image_url:
+        print(f"Thumbnail URL bulundu: {image_url[:100]}...")
+    return image_url
+
+def _thumbnail_headers(url):
+    return {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+        "Accept": "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8",
+        "Referer": url
+    }
+
+def _valid_thumbnail(status_code, content_type, content):
+    """İndirilen resmi doğrular; geçerliyse resim verisini, değilse None döndürür"""
+    from PIL import Image
+    import io
+    
+    if status_code != 200:
+        return None
+    
+    # Resim formatını doğrula
+    if 'image' not in content_type:
+        print(f"Geçersiz içerik türü: {content_type}")
+        return None
+    
+    try:
+        # Resmi PIL ile aç ve boyutlarını kontrol et
+        img = Image.open(io.BytesIO(content))
+        width, height = img.size
+        
+        # Minimum boyut kontrolü
+        if width >= 200 and height >= 200:
+            print(f"Geçerli resim indirildi: {width}x{height}")
+            return content
+        print(f"Resim çok küçük: {width}x{height}")
+    except Exception as img_error:
+        print(f"Resim doğrulama hatası: {img_error}")
+    return None
+
 def extract_thumbnail_from_html(html, url):
     """
     HTML içeriğinden thumbnail meta etiketlerini çeker ve resmi indirir.
     Öncelikli olarak og:image ve twitter:image meta etiketlerini kullanır.
     
     Args:
-        html (str): HTML içeriği
+        html (str or ParsedPage): HTML içeriği veya bir kez ayrıştırılmış sayfa
         url (str): Sayfanın URL'si
         
     Returns:
         bytes: İndirilen resim verisi veya None
     """
     try:
-        from bs4 import BeautifulSoup
         import requests
-        from urllib.parse import urljoin, urlparse
-        from PIL import Image
-        import io
         
-        # HTML içeriğini parse et
-        soup = BeautifulSoup(html, 'html.parser')
-        image_url = None
+        image_url = _thumbnail_image_url(html, url)
         
-        # 1. og:image meta etiketlerini kontrol et (en yaygın ve güvenilir yöntem)
-        og_tags = soup.find_all('meta', attrs={'property': lambda x: x and 'og:image' in x})
-        if og_tags:
-            for tag in og_tags:
-                content = tag.get('content')
-                if content and ('http://' in content or 'https://' in content):
-                    image_url = content
-                    print(f"og:image bulundu: {image_url[:100]}...")
-                    break
+        # Resmi indir ve doğrula
+        if image_url:
+            try:
+                response = requests.get(image_url, headers=_thumbnail_headers(url), timeout=10)
+                return _valid_thumbnail(response.status_code, response.headers.get('Content-Type', ''), response.content)
+            except Exception as req_error:
+                print(f"Resim indirme hatası: {req_error}")
         
-        # 2. twitter:image meta etiketlerini kontrol et
-        if not image_url:
-            twitter_tags = soup.find_all('meta', attrs={'name': lambda x: x and 'twitter:image' in x})
-            if twitter_tags:
-                for tag in twitter_tags:
-                    content = tag.get('content')
-                    if content and ('http://' in content or 'https://' in content):
-                        image_url = content
-                        print(f"twitter:image bulundu: {image_url[:100]}...")
-                        break
+        return None
         
-        # 3. Schema.org image meta etiketlerini kontrol et
-        if not image_url:
-            schema_tags = soup.find_all('meta', attrs={'itemprop': 'image'})
-            if schema_tags:
-                for tag in schema_tags:
-                    content = tag.get('content')
-                    if content:
-                        image_url = content
-                        print(f"schema.org image bulundu: {image_url[:100]}...")
-                        break
+    except Exception as e:
+        print(f"Thumbnail çekilirken hata: {e}")
+        import traceback
+        print(traceback.format_exc())
+        return None
+
+async def aextract_thumbnail_from_html(html, url):
+    """
+    extract_thumbnail_from_html'in asenkron versiyonu (resim httpx.AsyncClient ile indirilir).
+    
+    Args:
+        html (str or ParsedPage): HTML içeriği veya bir kez ayrıştırılmış sayfa
+        url (str): Sayfanın URL'si
         
-        # Göreceli URL'yi mutlak URL'ye çevir
-        if image_url and not image_url.startswith(('http://', 'https://')):
-            image_url = urljoin(url, image_url)
-            print(f"URL mutlak URL'ye çevrildi: {image_url}")
+    Returns:
+        bytes: İndirilen resim verisi veya None
+    """
+    try:
+        import httpx
+        
+        image_url = _thumbnail_image_url(html, url)
         
         # Resmi indir ve doğrula
         if image_url:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-                "Accept": "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8",
-                "Referer": url
-            }
-            
             try:
-                response = requests.get(image_url, headers=headers, timeout=10)
-                if response.status_code == 200:
-                    content_type = response.headers.get('Content-Type', '')
-                    
-                    # Resim formatını doğrula
-                    if 'image' in content_type:
-                        try:
-                            # Resmi PIL ile aç ve boyutlarını kontrol et
-                            img = Image.open(io.BytesIO(response.content))
-                            width, height = img.size
-                            
-                            # Minimum boyut kontrolü
-                            if width >= 200 and height >= 200:
-                                print(f"Geçerli resim indirildi: {width}x{height}")
-                                return response.content
-                            else:
-                                print(f"Resim çok küçük: {width}x{height}")
-                        except Exception as img_error:
-                            print(f"Resim doğrulama hatası: {img_error}")
-                    else:
-                        print(f"Geçersiz içerik türü: {content_type}")
+                async with httpx.AsyncClient(headers=_thumbnail_headers(url), timeout=10, follow_redirects=True) as client:
+                    response = await client.get(image_url)
+                return _valid_thumbnail(response.status_code, response.headers.get('Content-Type', ''), response.content)
             except Exception as req_error:
                 print(f"Resim indirme hatası: {req_error}")
         
@@ -303,8 +318,6 @@ def extract_thumbnail_from_html(html, url):
         
     except Exception as e:
         print(f"Thumbnail çekilirken hata: {e}")
-        import traceback
-        print(traceback.format_exc())
         return None
 
 if __name__ == "__main__":
@@ -7,8 +7,11 @@ This module provides functions for analyzing YouTube videos with Gemini AI.
 import os
 import re
 import json
-import tempfile
+import time
+import threading
 import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs
 import google.generativeai as genai
 from dotenv import load_dotenv
@@ -20,10 +23,25 @@ from .utils import correct_json_format, ensure_correct_json_structure
 from .category_matcher import match_categories_and_tags, get_existing_categories, get_existing_tags, find_similar_category, find_similar_tag
 from .content_analyzer import configure_llm
 from .prompts import YOUTUBE_SYSTEM_INSTRUCTION
+from .settings import TRANSCRIPT_MAX_TOKENS, YOUTUBE_CACHE_TRANSCRIPT_CHARS
+from .subtitles import choose_subtitle_track, fetch_subtitle_text
+from .token_budget import truncate_to_tokens
+from .youtube_cache import youtube_cache
+from .single_flight import SingleFlight
 
 # YouTube video ID extraction pattern
 YOUTUBE_ID_PATTERN = re.compile(r'((?:https?:)?//)?((?:www|m)\.)?((?:youtube\.com|youtu.be))(/(?:[\w\-]+\?v=|embed/|v/)?)([\w\-]+)(\S+)?')
 
+# Transcript languages, in order of preference
+TRANSCRIPT_LANGUAGES = ['tr', 'en']
+# yt-dlp results kept in memory so the video info and the subtitle fallback share one extraction
+YTDLP_INFO_MEMO_SECONDS = 300  # subtitle track URLs are signed and expire
+YTDLP_INFO_MEMO_SIZE = 64
+
+_info_memo = OrderedDict()
+_info_memo_lock = threading.Lock()
+_info_flight = SingleFlight("youtube-info", backend="memory")
+
 # System prompt for YouTube video analysis
 YOUTUBE_SYSTEM_INSTRUCTION = """
 Sen YouTube videolarını kategorize etme konusunda UZMAN bir analistsin.
@@ -164,7 +182,7 @@ def extract_youtube_video_id(url):
     if 'youtu.be' in url:
         parts = url.split('/')
         for part in parts:
-            if part and part != 'youtu.be' and '?' not in part:
+            if part and part != 'youtu.be' and not part.endswith(':') and '?' not in part:
                 return part
     
     # Regex ile ID çıkarma
@@ -206,104 +224,172 @@ def is_youtube_url(url):
     video_id = extract_youtube_video_id(url)
     return video_id is not None
 
-def get_youtube_transcript(video_id, max_chars=8000):
+def get_youtube_transcript(video_id, max_tokens=None):
     """
     YouTube video ID'sinden altyazı (transcript) metnini alır.
+    Temizlenmiş altyazı video ID'sine göre önbelleğe alınır.
     
     Args:
         video_id (str): YouTube video ID'si
-        max_chars (int): Maksimum karakter sayısı
+        max_tokens (int, optional): Maksimum token sayısı; varsayılan TRANSCRIPT_MAX_TOKENS
         
     Returns:
         str: Altyazı metni veya None
     """
+    max_tokens = max_tokens or TRANSCRIPT_MAX_TOKENS
+    cached = youtube_cache.get(video_id)
+    if cached and "transcript" in cached:
+        print(f"Altyazı önbellekten alındı: {video_id}")
+        transcript_text = cached["transcript"]
+    else:
+        transcript_text, found = _fetch_youtube_transcript(video_id)
+        # Altyazısı olmayan videolar da kaydedilir; ağ hataları kaydedilmez
+        if transcript_text or found is False:
+            youtube_cache.put(video_id, transcript=transcript_text)
+    
+    if not transcript_text:
+        return None
+    # Metni token bütçesine göre sınırla
+    return truncate_to_tokens(transcript_text, max_tokens, suffix="")
+
+def _fetch_youtube_transcript(video_id):
+    """
+    Altyazıyı transcript API'sinden, olmazsa yt-dlp ile alır.
+    
+    Args:
+        video_id (str): YouTube video ID'si
+        
+    Returns:
+        tuple: (altyazı metni veya None, altyazı bulunup bulunamadığı; hata nedeniyle bilinmiyorsa None)
+    """
     try:
         # Altyazıları al
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['tr', 'en'])
+        transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=TRANSCRIPT_LANGUAGES)
         
         # Altyazıları birleştir
-        transcript_text = " ".join([item['text'] for item in transcript_list])
-        
-        # Metni sınırla
-        if len(transcript_text) > max_chars:
-            transcript_text = transcript_text[:max_chars]
-            
-        return transcript_text
+        return " ".join([item['text'] for item in transcript_list]), True
     except (TranscriptsDisabled, NoTranscriptFound, Exception) as e:
         print(f"Altyazı alınırken hata: {e}")
         
-        # İkinci yöntem: yt-dlp ile altyazı çekmeyi dene
+        # İkinci yöntem: video bilgileri için yapılan yt-dlp çıkarımındaki altyazı izini
+        # doğrudan bellekte oku (dosya yazılmaz, ikinci bir çıkarım yapılmaz)
         try:
             print(f"yt-dlp ile altyazı alınmaya çalışılıyor: {video_id}")
-            ydl_opts = {
-                'skip_download': True,
-                'writesubtitles': True,
-                'writeautomaticsub': True,
-                'subtitleslangs': ['tr', 'en'],
-                'outtmpl': f'{tempfile.gettempdir()}/%(id)s.%(ext)s',
-            }
+            extracted = _extract_youtube_info(f"https://www.youtube.com/watch?v={video_id}")
+            if not extracted:
+                print("yt-dlp ile de altyazı alınamadı.")
+                return None, None
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
-                
-                # Altyazıları kontrol et
-                if info.get('subtitles') or info.get('automatic_captions'):
-                    subs = info.get('subtitles', {})
-                    auto_subs = info.get('automatic_captions', {})
-                    
-                    # En iyi altyazıyı seç
-                    sub_texts = []
-                    for lang in ['tr', 'en']:
-                        if lang in subs:
-                            for format_info in subs[lang]:
-                                if format_info.get('ext') == 'vtt':
-                                    sub_file = ydl.prepare_filename(info) + f".{lang}.vtt"
-                                    try:
-                                        with open(sub_file, 'r', encoding='utf-8') as f:
-                                            sub_texts.append(f.read())
-                                    except Exception:
-                                        pass
-                        
-                        if not sub_texts and lang in auto_subs:
-                            for format_info in auto_subs[lang]:
-                                if format_info.get('ext') == 'vtt':
-                                    sub_file = ydl.prepare_filename(info) + f".{lang}.vtt"
-                                    try:
-                                        with open(sub_file, 'r', encoding='utf-8') as f:
-                                            sub_texts.append(f.read())
-                                    except Exception:
-                                        pass
-                    
-                    if sub_texts:
-                        # VTT formatını temizle
-                        def clean_vtt(vtt_text):
-                            lines = vtt_text.splitlines()
-                            cleaned_text = []
-                            for line in lines:
-                                # Zaman damgalarını ve VTT başlıklarını atla
-                                if '-->' in line or 'WEBVTT' in line or line.strip().isdigit() or not line.strip():
-                                    continue
-                                cleaned_text.append(line.strip())
-                            return ' '.join(cleaned_text)
-                        
-                        transcript_text = ' '.join([clean_vtt(text) for text in sub_texts])
-                        if len(transcript_text) > max_chars:
-                            transcript_text = transcript_text[:max_chars]
-                        
-                        print(f"yt-dlp ile altyazı başarıyla alındı.")
-                        return transcript_text
+            track = choose_subtitle_track(extracted['subtitles'], extracted['automatic_captions'], TRANSCRIPT_LANGUAGES)
+            if not track:
+                print("Videonun altyazısı yok.")
+                return None, False
+            
+            transcript_text = fetch_subtitle_text(track['url'], track['ext'], YOUTUBE_CACHE_TRANSCRIPT_CHARS)
+            if transcript_text:
+                print(f"yt-dlp ile altyazı başarıyla alındı ({track['lang']}, {track['ext']}).")
+                return transcript_text, True
             
             print("yt-dlp ile de altyazı alınamadı.")
-            return None
+            return None, None
             
         except Exception as ydl_err:
             print(f"yt-dlp ile altyazı alınırken hata: {ydl_err}")
-            return None
+            return None, None
+
+def _extract_youtube_info(url):
+    """
+    yt-dlp ile video bilgilerini çıkarır. Sonuç video ID'sine göre kısa süre
+    hatırlanır ve eşzamanlı çağrılar tek bir çıkarımı paylaşır; böylece video
+    bilgileri ve altyazı yedeği aynı extract_info çağrısını kullanır.
+    
+    Args:
+        url (str): YouTube video URL'si
+        
+    Returns:
+        dict: 'video_info' (meta veriler), 'subtitles' ve 'automatic_captions'
+            (yalnızca TRANSCRIPT_LANGUAGES dilleri); video bulunamazsa None
+    """
+    video_id = extract_youtube_video_id(url) or url
+    with _info_memo_lock:
+        memo = _info_memo.get(video_id)
+        if memo and time.monotonic() - memo[0] < YTDLP_INFO_MEMO_SECONDS:
+            return memo[1]
+    
+    extracted, _ = _info_flight.do(video_id, lambda: _run_ytdlp(url))
+    if extracted:
+        with _info_memo_lock:
+            _info_memo[video_id] = (time.monotonic(), extracted)
+            _info_memo.move_to_end(video_id)
+            while len(_info_memo) > YTDLP_INFO_MEMO_SIZE:
+                _info_memo.popitem(last=False)
+    return extracted
+
+def _run_ytdlp(url):
+    print(f"yt-dlp ile video bilgileri alınıyor: {url}")
+    ydl_opts = {
+        'skip_download': True,
+        'format': 'best',
+        'ignoreerrors': True,
+        'no_warnings': True,
+    }
+    
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    
+    if not info:
+        return None
+    
+    def tracks(by_language):
+        # Çeviri altyazıları dahil yüzlerce dil olabilir; yalnızca kullanılan diller tutulur
+        return {
+            lang: [{'ext': track.get('ext'), 'url': track.get('url')} for track in formats]
+            for lang, formats in (by_language or {}).items()
+            if any(lang == language or lang.startswith(f"{language}-") for language in TRANSCRIPT_LANGUAGES)
+        }
+    
+    return {
+        # Meta verileri oluştur
+        'video_info': {
+            'title': info.get('title', ''),
+            'description': info.get('description', ''),
+            'keywords': info.get('tags', []),
+            'channel_name': info.get('uploader', ''),
+            'views': info.get('view_count', 0),
+            'publish_date': info.get('upload_date', ''),
+            'length': info.get('duration', 0),
+            'thumbnail_url': info.get('thumbnail', ''),
+            'categories': info.get('categories', []),
+        },
+        'subtitles': tracks(info.get('subtitles')),
+        'automatic_captions': tracks(info.get('automatic_captions')),
+    }
         
 def get_youtube_video_info(url):
     """
     yt-dlp kullanarak YouTube video bilgilerini alır.
     
+    Args:
+        url (str): YouTube video URL'si
+        
+    Returns:
+        dict: Video meta verileri veya None
+    """
+    video_id = extract_youtube_video_id(url)
+    cached = youtube_cache.get(video_id)
+    if cached and cached.get("info"):
+        print(f"Video bilgileri önbellekten alındı: {video_id}")
+        return dict(cached["info"])
+    
+    video_info = _fetch_youtube_video_info(url)
+    if video_info:
+        youtube_cache.put(video_id, info=video_info)
+    return video_info
+
+def _fetch_youtube_video_info(url):
+    """
+    Video bilgilerini yt-dlp ile, olmazsa PyTube ile alır.
+    
     Args:
         url (str): YouTube video URL'si
         
@@ -312,36 +398,15 @@ def get_youtube_video_info(url):
     """
     try:
         # yt-dlp ile video bilgilerini al
-        print(f"yt-dlp ile video bilgileri alınıyor: {url}")
-        ydl_opts = {
-            'skip_download': True,
-            'format': 'best',
-            'ignoreerrors': True,
-            'no_warnings': True,
-        }
+        extracted = _extract_youtube_info(url)
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            if not info:
-                print("yt-dlp: Video bilgileri alınamadı.")
-                return None
-            
-            # Meta verileri oluştur
-            video_info = {
-                'title': info.get('title', ''),
-                'description': info.get('description', ''),
-                'keywords': info.get('tags', []),
-                'channel_name': info.get('uploader', ''),
-                'views': info.get('view_count', 0),
-                'publish_date': info.get('upload_date', ''),
-                'length': info.get('duration', 0),
-                'thumbnail_url': info.get('thumbnail', ''),
-                'categories': info.get('categories', []),
-            }
-            
-            print(f"yt-dlp: Video bilgileri başarıyla alındı: {video_info['title']}")
-            return video_info
+        if not extracted:
+            print("yt-dlp: Video bilgileri alınamadı.")
+            return None
+        
+        video_info = dict(extracted['video_info'])
+        print(f"yt-dlp: Video bilgileri başarıyla alındı: {video_info['title']}")
+        return video_info
             
     except Exception as e:
         print(f"yt-dlp ile video bilgileri alınırken hata: {e}")
@@ -377,6 +442,30 @@ def get_youtube_title_from_url(url):
     YouTube video başlığını direkt olarak sayfadan çekmeye çalışır.
     yt-dlp ve PyTube başarısız olduğunda bu yöntem kullanılır.
     
+    Args:
+        url (str): YouTube video URL'si
+        
+    Returns:
+        str: Video başlığı veya None
+    """
+    video_id = extract_youtube_video_id(url)
+    cached = youtube_cache.get(video_id)
+    if cached:
+        # Önbellekteki video bilgilerinin başlığı da sayfadaki başlıktır
+        title = cached.get("title") or (cached.get("info") or {}).get("title")
+        if title:
+            print(f"Video başlığı önbellekten alındı: {title}")
+            return title
+    
+    title = _scrape_youtube_title(url)
+    if title:
+        youtube_cache.put(video_id, title=title)
+    return title
+
+def _scrape_youtube_title(url):
+    """
+    Video başlığını YouTube sayfasının meta etiketlerinden çeker.
+    
     Args:
         url (str): YouTube video URL'si
         
@@ -428,13 +517,15 @@ def get_youtube_title_from_url(url):
         print(traceback.format_exc())
         return None
 
-def analyze_youtube_video(url, user=None):
+def analyze_youtube_video(url, user=None, match=True):
     """
     YouTube videosunu analiz eder ve kategorize eder.
     
     Args:
         url (str): YouTube video URL'si
         user: Kullanıcı objesi, kişiselleştirilmiş kategoriler için kullanılır. Defaults to None.
+        match (bool): False ise kategori ve etiketler veritabanıyla eşleştirilmeden
+            döndürülür (bkz. content_analyzer.match_result_to_user). Defaults to True.
         
     Returns:
         dict: Analiz sonuçları
@@ -448,11 +539,23 @@ def analyze_youtube_video(url, user=None):
         return None
     
     try:
+        # Başlık, video bilgileri, altyazılar ve thumbnail birbirinden bağımsız;
+        # ağ istekleri eşzamanlı yapılır ve toplam süre en yavaş isteğe yaklaşır
+        from .stage_graph import StageGraph
+        from .settings import STAGE_TIMEOUTS
+        graph = StageGraph("youtube-video")
         # Video başlığını doğrudan çek (alternatif yöntem)
-        direct_title = get_youtube_title_from_url(url)
-        
+        graph.add("title", lambda: get_youtube_title_from_url(url), timeout=STAGE_TIMEOUTS["youtube_metadata"])
         # Video bilgilerini al (başlık, açıklama, meta veriler)
-        video_info = get_youtube_video_info(url)
+        graph.add("video_info", lambda: get_youtube_video_info(url), timeout=STAGE_TIMEOUTS["youtube_metadata"])
+        # Video altyazılarını al (varsa)
+        graph.add("transcript", lambda: get_youtube_transcript(video_id), timeout=STAGE_TIMEOUTS["youtube_transcript"])
+        # Thumbnail URL'sini al (yüksek kaliteli)
+        graph.add("thumbnail_url", lambda: get_youtube_thumbnail_webp(video_id), timeout=STAGE_TIMEOUTS["thumbnail"])
+        stages = graph.run()
+        
+        direct_title = stages["title"]
+        video_info = stages["video_info"]
         
         # Video bilgileri yoksa ve başlık doğrudan çekilmişse, video_info oluştur
         if not video_info and direct_title:
@@ -478,11 +581,9 @@ def analyze_youtube_video(url, user=None):
         elif not video_info.get('title') and direct_title:
             video_info['title'] = direct_title
         
-        # Video altyazılarını al (varsa)
-        transcript = get_youtube_transcript(video_id)
+        transcript = stages["transcript"]
         
-        # Thumbnail URL'sini al (yüksek kaliteli)
-        thumbnail_url = get_youtube_thumbnail_webp(video_id)
+        thumbnail_url = stages["thumbnail_url"]
         if thumbnail_url:
             video_info['thumbnail_url'] = thumbnail_url
         else:
@@ -499,11 +600,12 @@ def analyze_youtube_video(url, user=None):
         
         # LLM için prompt oluştur
         from .category_prompt_factory import CategoryPromptFactory
-        from .schemas import get_content_analysis_json_schema
+        from .schemas import ContentAnalysisModel, analysis_to_dict
         from .llm_factory import LLMChain
+        from .settings import HEDGE_ANALYSIS
         
-        # JSON şeması ile yapılandırılmış çıktı için
-        output_schema = get_content_analysis_json_schema()
+        # Pydantic şeması ile yapılandırılmış çıktı için (sağlayıcı şemayı doğrudan uygular)
+        output_schema = ContentAnalysisModel
         
         # YouTube için özel prompt oluştur
         prompt = CategoryPromptFactory.create_youtube_prompt(
@@ -521,11 +623,12 @@ def analyze_youtube_video(url, user=None):
         llm_chain = LLMChain(
             system_prompt=YOUTUBE_SYSTEM_INSTRUCTION,
             output_schema=output_schema,
-            model_type="text"
+            model_type="text",
+            hedge=HEDGE_ANALYSIS
         )
         
         # Zinciri çalıştır
-        result = llm_chain.run(prompt)
+        result = analysis_to_dict(llm_chain.run(prompt))
         
         # Debug için LLM yanıtını logla
         print(f"LLM yanıtı: {result}")
@@ -536,7 +639,7 @@ def analyze_youtube_video(url, user=None):
             json_result = result
             
             # URL ekle (yoksa)
-            if 'url' not in json_result:
+            if not json_result.get('url'):
                 json_result['url'] = url
             
             # LLM'nin oluşturduğu başlık yerine gerçek video başlığını kullan
@@ -572,12 +675,16 @@ def analyze_youtube_video(url, user=None):
                 if not main_category:
                     continue
                 
-                # Ana kategoriyi eşleştir
-                matched_main = find_similar_category(main_category, existing_categories, is_main_category=True, accept_new=True)
-                
-                # Alt kategoriyi eşleştir
-                matched_sub = find_similar_category(sub_category, existing_categories, is_main_category=False, accept_new=True, 
-                                                   parent_category_id=matched_main.get('id') if matched_main else None)
+                if not match:
+                    # Eşleştirme istenmiyorsa LLM'nin önerdiği isimler olduğu gibi kalır
+                    matched_main = matched_sub = None
+                else:
+                    # Ana kategoriyi eşleştir
+                    matched_main = find_similar_category(main_category, existing_categories, is_main_category=True, accept_new=True)
+                    
+                    # Alt kategoriyi eşleştir
+                    matched_sub = find_similar_category(sub_category, existing_categories, is_main_category=False, accept_new=True, 
+                                                       parent_category_id=matched_main.get('id') if matched_main else None)
                 
                 # Eşleşen kategoriyi ekle
                 if matched_main and matched_sub:
@@ -663,7 +770,10 @@ def analyze_youtube_video(url, user=None):
                 
                 if tag_name:
                     # Mevcut etiketlerle eşleştir veya yeni oluştur
-                    matched_tag = find_similar_tag(tag_name, existing_tags, accept_new=True)
+                    if match:
+                        matched_tag = find_similar_tag(tag_name, existing_tags, accept_new=True)
+                    else:
+                        matched_tag = {'name': tag_name, 'id': None}
                     if matched_tag:
                         matched_tags.append({
                             'name': matched_tag.get('name'),
@@ -735,6 +845,9 @@ def analyze_youtube_video(url, user=None):
             "thumbnail_url": f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg" if video_id else None
         }
         
+        if not match:
+            return default_json
+        
         # Varsayılan etiketleri eşleştir
         try:
             existing_categories = get_existing_categories()
@@ -745,6 +858,113 @@ def analyze_youtube_video(url, user=None):
             # Eşleştirme de başarısız olursa orijinal varsayılan değerleri döndür
             return default_json
 
+# Thumbnail formatları (kaliteden düşüğe doğru)
+THUMBNAIL_FORMATS = [
+    "maxresdefault.jpg",  # En yüksek kalite (1280x720)
+    "sddefault.jpg",      # Standart yüksek kalite (640x480)
+    "hqdefault.jpg",      # Yüksek kalite (480x360)
+    "mqdefault.jpg",      # Orta kalite (320x180)
+    "default.jpg"         # Düşük kalite (120x90)
+]
+WEBP_THUMBNAIL_URL = "https://i.ytimg.com/vi_webp/{video_id}/maxresdefault.webp"
+JPG_THUMBNAIL_URL = "https://img.youtube.com/vi/{video_id}/{format}"
+THUMBNAIL_PROBE_TIMEOUT = 3  # seconds per HEAD request
+# Resolved thumbnail URLs kept in memory per (video id, preferences)
+THUMBNAIL_MEMO_SIZE = 1024
+
+_thumbnail_memo = OrderedDict()
+_thumbnail_memo_lock = threading.Lock()
+_thumbnail_flight = SingleFlight("youtube-thumbnail", backend="memory")
+
+def _thumbnail_candidates(video_id, prefer_webp, prefer_high_quality):
+    formats = THUMBNAIL_FORMATS if prefer_high_quality else list(reversed(THUMBNAIL_FORMATS))
+    candidates = [JPG_THUMBNAIL_URL.format(video_id=video_id, format=format) for format in formats]
+    if prefer_webp:
+        candidates.insert(0, WEBP_THUMBNAIL_URL.format(video_id=video_id))
+    return candidates
+
+def _probe_thumbnail(thumbnail_url):
+    """URL'nin gerçekten bir resim olup olmadığını kontrol eder"""
+    try:
+        response = requests.head(thumbnail_url, timeout=THUMBNAIL_PROBE_TIMEOUT)
+        return response.status_code == 200 and 'image' in response.headers.get('content-type', '')
+    except requests.RequestException as e:
+        print(f"Thumbnail kontrolü sırasında hata: {e}")
+        return False
+
+def _probe_thumbnails(candidates):
+    """
+    Tüm thumbnail varyantlarını eşzamanlı olarak kontrol eder ve tercih sırasına
+    göre ilk mevcut olanı döndürür. Daha iyi varyantların hepsi yanıt verdiğinde
+    daha kötü varyantlar beklenmez.
+    
+    Args:
+        candidates (list): Tercih sırasına göre thumbnail URL'leri
+        
+    Returns:
+        str: Mevcut en iyi thumbnail URL'si veya None
+    """
+    executor = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="thumbnail-probe")
+    try:
+        futures = [executor.submit(_probe_thumbnail, candidate) for candidate in candidates]
+        for candidate, future in zip(candidates, futures):
+            if future.result():
+                return candidate
+        return None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def resolve_youtube_thumbnail(video_id, prefer_webp=True, prefer_high_quality=True):
+    """
+    YouTube video ID'si için en iyi thumbnail URL'sini bulur.
+    
+    Tüm varyantlar tek turda eşzamanlı kontrol edilir; sonuç video ID'sine göre
+    hatırlanır (varsayılan tercihlerde önbelleğe de kaydedilir) ve aynı video için
+    eşzamanlı çağrılar tek bir kontrol turunu paylaşır.
+    
+    Args:
+        video_id (str): YouTube video ID'si
+        prefer_webp (bool): True ise önce WebP formatı denenir
+        prefer_high_quality (bool): True ise yüksek kaliteli thumbnail tercih edilir
+        
+    Returns:
+        str: Thumbnail URL'si (hiçbiri bulunamazsa default.jpg)
+    """
+    key = (video_id, prefer_webp, prefer_high_quality)
+    with _thumbnail_memo_lock:
+        if key in _thumbnail_memo:
+            _thumbnail_memo.move_to_end(key)
+            return _thumbnail_memo[key]
+    
+    persistent = prefer_webp and prefer_high_quality
+    if persistent:
+        cached = youtube_cache.get(video_id)
+        if cached and cached.get("thumbnail_url"):
+            thumbnail_url = cached["thumbnail_url"]
+            _remember_thumbnail(key, thumbnail_url)
+            return thumbnail_url
+    
+    thumbnail_url, _ = _thumbnail_flight.do(
+        "/".join(str(part) for part in key),
+        lambda: _probe_thumbnails(_thumbnail_candidates(video_id, prefer_webp, prefer_high_quality))
+    )
+    if not thumbnail_url:
+        # Hiçbir thumbnail bulunamazsa, varsayılan URL'yi döndür (hatırlanmaz; ağ hatası olabilir)
+        return JPG_THUMBNAIL_URL.format(video_id=video_id, format="default.jpg")
+    
+    print(f"Thumbnail bulundu: {thumbnail_url}")
+    _remember_thumbnail(key, thumbnail_url)
+    if persistent:
+        youtube_cache.put(video_id, thumbnail_url=thumbnail_url)
+    return thumbnail_url
+
+def _remember_thumbnail(key, thumbnail_url):
+    with _thumbnail_memo_lock:
+        _thumbnail_memo[key] = thumbnail_url
+        _thumbnail_memo.move_to_end(key)
+        while len(_thumbnail_memo) > THUMBNAIL_MEMO_SIZE:
+            _thumbnail_memo.popitem(last=False)
+
 def get_youtube_thumbnail(video_id, prefer_high_quality=True):
     """
     YouTube video ID'si için en iyi kalitede thumbnail URL'sini alır.
@@ -767,48 +987,14 @@ def get_youtube_thumbnail(video_id, prefer_high_quality=True):
         print("Thumbnail için geçerli bir YouTube video ID'si gereklidir")
         return None
     
-    # Thumbnail formatları (kaliteden düşüğe doğru)
-    thumbnail_formats = [
-        "maxresdefault.jpg",  # En yüksek kalite
-        "sddefault.jpg",      # Standart yüksek kalite
-        "hqdefault.jpg",      # Yüksek kalite
-        "mqdefault.jpg",      # Orta kalite
-        "default.jpg"         # Düşük kalite
-    ]
-    
-    # Düşük kaliteyi tercih ediyorsa, sıralamayı tersine çevir
-    if not prefer_high_quality:
-        thumbnail_formats.reverse()
-    
-    # Her formatta thumbnail'i kontrol et
-    for format in thumbnail_formats:
-        thumbnail_url = f"https://img.youtube.com/vi/{video_id}/{format}"
-        
-        try:
-            # URL'nin gerçekten bir resim olup olmadığını kontrol et
-            response = requests.head(thumbnail_url, timeout=3)
-            
-            # Başarılı bir yanıt aldık mı?
-            if response.status_code == 200:
-                content_type = response.headers.get('content-type', '')
-                
-                # İçerik türü bir resim mi?
-                if 'image' in content_type:
-                    print(f"Thumbnail bulundu: {format}")
-                    return thumbnail_url
-                
-        except requests.RequestException as e:
-            print(f"Thumbnail kontrolü sırasında hata: {e}")
-            continue
-    
-    # Hiçbir thumbnail bulunamazsa, varsayılan URL'yi döndür
-    return f"https://img.youtube.com/vi/{video_id}/default.jpg"
+    return resolve_youtube_thumbnail(video_id, prefer_webp=False, prefer_high_quality=prefer_high_quality)
 
 def get_youtube_thumbnail_webp(video_id, prefer_high_quality=True):
     """
     YouTube video ID'si için WebP formatında thumbnail URL'sini alır.
     
     WebP formatında YouTube thumbnail'leri genellikle daha yüksek kalitededir.
+    WebP thumbnail bulunamazsa en iyi JPG thumbnail döndürülür.
     
     Args:
         video_id (str): YouTube video ID'si
@@ -821,26 +1007,7 @@ def get_youtube_thumbnail_webp(video_id, prefer_high_quality=True):
         print("Thumbnail için geçerli bir YouTube video ID'si gereklidir")
         return None
     
-    # WebP formatı için maxresdefault.webp veya normal thumbnail URL'si
-    webp_url = f"https://i.ytimg.com/vi_webp/{video_id}/maxresdefault.webp"
-    
-    try:
-        # URL'nin gerçekten bir resim olup olmadığını kontrol et
-        response = requests.head(webp_url, timeout=3)
-        
-        # Başarılı bir yanıt aldık mı?
-        if response.status_code == 200:
-            content_type = response.headers.get('content-type', '')
-            
-            # İçerik türü bir WebP resmi mi?
-            if 'image' in content_type:
-                print(f"WebP Thumbnail bulundu: {webp_url}")
-                return webp_url
-    except requests.RequestException as e:
-        print(f"WebP thumbnail kontrolü sırasında hata: {e}")
-    
-    # WebP thumbnail bulunamazsa, normal JPG thumbnail'e dön
-    return get_youtube_thumbnail(video_id, prefer_high_quality)
+    return resolve_youtube_thumbnail(video_id, prefer_webp=True, prefer_high_quality=prefer_high_quality)
 
 def fetch_youtube_thumbnail(video_id, prefer_webp=True, prefer_high_quality=True):
     """
@@ -858,11 +1025,8 @@ def fetch_youtube_thumbnail(video_id, prefer_webp=True, prefer_high_quality=True
         print("Thumbnail için geçerli bir YouTube video ID'si gereklidir")
         return None
     
-    # Thumbnail URL'sini al
-    if prefer_webp:
-        thumbnail_url = get_youtube_thumbnail_webp(video_id, prefer_high_quality)
-    else:
-        thumbnail_url = get_youtube_thumbnail(video_id, prefer_high_quality)
+    # Thumbnail URL'sini al (analiz sırasında bulunduysa tekrar kontrol edilmez)
+    thumbnail_url = resolve_youtube_thumbnail(video_id, prefer_webp, prefer_high_quality)
     
     if not thumbnail_url:
         return None
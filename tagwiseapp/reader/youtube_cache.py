@@ -0,0 +1,191 @@
+"""
+YouTube Cache Module
+
+This module keeps the slow-to-fetch data of a YouTube video (yt-dlp video
+info, scraped title, cleaned transcript and resolved thumbnail URL) in the
+database, keyed by video id, so analyzing a video again (web view, the
+analyze_youtube command, the API) skips yt-dlp, the page scrape and the
+transcript API.
+
+- Entries expire YOUTUBE_CACHE_TTL seconds after they were written.
+- Transcripts are stored zlib-compressed and capped at
+  YOUTUBE_CACHE_TRANSCRIPT_CHARS characters; "no transcript" is cached too.
+- At most YOUTUBE_CACHE_MAX_ENTRIES videos are kept; the least recently
+  used ones are evicted.
+
+Usage:
+    cached = youtube_cache.get(video_id)
+    if cached and "transcript" in cached:
+        ...
+    youtube_cache.put(video_id, transcript=text)
+"""
+
+import zlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("info", "title", "transcript", "thumbnail_url")
+# last_used_at is only refreshed when older than this (seconds), to avoid a write per lookup
+TOUCH_INTERVAL = 60
+TRANSCRIPT_COMPRESSION_LEVEL = 6
+
+
+def compress_transcript(text: Optional[str]) -> bytes:
+    """Transcript as stored: zlib-compressed UTF-8, b"" for a video without one"""
+    if not text:
+        return b""
+    return zlib.compress(text[:settings.YOUTUBE_CACHE_TRANSCRIPT_CHARS].encode("utf-8"), TRANSCRIPT_COMPRESSION_LEVEL)
+
+
+def decompress_transcript(data: Optional[bytes]) -> Optional[str]:
+    if not data:
+        return None
+    return zlib.decompress(bytes(data)).decode("utf-8")
+
+
+class YouTubeCache:
+    """
+    Database-backed cache of YouTube video data, keyed by video id.
+    """
+
+    def __init__(self, ttl: Optional[int] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else settings.YOUTUBE_CACHE_TTL
+        self.max_entries = max_entries if max_entries is not None else settings.YOUTUBE_CACHE_MAX_ENTRIES
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cached data of a video.
+
+        Args:
+            video_id (str): YouTube video ID'si
+
+        Returns:
+            dict or None: Önbellekteki alanlar ('info', 'title', 'transcript', 'thumbnail_url');
+                yalnızca kaydedilmiş alanlar bulunur ('transcript' None ise videonun altyazısı yok)
+        """
+        if not video_id or not self.enabled:
+            return None
+        try:
+            from django.utils import timezone
+            from ..models import YouTubeVideoCache
+
+            entry = YouTubeVideoCache.objects.filter(video_id=video_id).first()
+            now = timezone.now()
+            if entry is None or entry.created_at < now - timedelta(seconds=self.ttl):
+                if entry is not None:
+                    entry.delete()
+                self._count("misses")
+                return None
+            if entry.last_used_at < now - timedelta(seconds=TOUCH_INTERVAL):
+                YouTubeVideoCache.objects.filter(pk=entry.pk).update(last_used_at=now)
+        except Exception as e:
+            # Without a database (or before migrations) the cache is simply skipped
+            logger.error(f"YouTube cache lookup failed for {video_id}: {str(e)}")
+            self._count("errors")
+            return None
+
+        cached = {}
+        if entry.info is not None:
+            cached["info"] = entry.info
+        if entry.title:
+            cached["title"] = entry.title
+        if entry.transcript is not None:
+            cached["transcript"] = decompress_transcript(entry.transcript)
+        if entry.thumbnail_url:
+            cached["thumbnail_url"] = entry.thumbnail_url
+        self._count("hits" if cached else "misses")
+        return cached or None
+
+    def put(self, video_id: str, **fields) -> bool:
+        """
+        Store fields of a video (info, title, transcript, thumbnail_url).
+
+        Args:
+            video_id (str): YouTube video ID'si
+            **fields: Kaydedilecek alanlar; transcript=None altyazının olmadığını kaydeder
+
+        Returns:
+            bool: Kaydedildiyse True
+        """
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown YouTube cache fields: {sorted(unknown)}")
+        if not video_id or not fields or not self.enabled:
+            return False
+        if "transcript" in fields:
+            fields["transcript"] = compress_transcript(fields["transcript"])
+        if fields.get("title"):
+            fields["title"] = fields["title"][:500]
+
+        try:
+            from django.db import IntegrityError
+            from django.utils import timezone
+            from ..models import YouTubeVideoCache
+
+            now = timezone.now()
+            # Fields of one analysis arrive from concurrent stages; the first one creates the row
+            if not YouTubeVideoCache.objects.filter(video_id=video_id).update(last_used_at=now, **fields):
+                try:
+                    YouTubeVideoCache.objects.create(video_id=video_id, created_at=now, last_used_at=now, **fields)
+                    self._evict()
+                except IntegrityError:
+                    YouTubeVideoCache.objects.filter(video_id=video_id).update(last_used_at=now, **fields)
+            self._count("stores")
+            return True
+        except Exception as e:
+            logger.error(f"YouTube cache store failed for {video_id}: {str(e)}")
+            self._count("errors")
+            return False
+
+    def _evict(self):
+        """Drop expired entries and the least recently used ones over max_entries"""
+        from django.utils import timezone
+        from ..models import YouTubeVideoCache
+
+        expired, _ = YouTubeVideoCache.objects.filter(
+            created_at__lt=timezone.now() - timedelta(seconds=self.ttl)
+        ).delete()
+        overflow = YouTubeVideoCache.objects.count() - self.max_entries
+        if overflow > 0:
+            oldest = YouTubeVideoCache.objects.order_by("last_used_at").values_list("pk", flat=True)[:overflow]
+            overflow, _ = YouTubeVideoCache.objects.filter(pk__in=list(oldest)).delete()
+        evicted = expired + max(overflow, 0)
+        if evicted:
+            self._count("evicted", evicted)
+            logger.info(f"YouTube cache evicted {evicted} entries")
+
+    def invalidate(self, video_id: str):
+        """Forget a video (e.g. after its title or transcript changed)"""
+        try:
+            from ..models import YouTubeVideoCache
+            YouTubeVideoCache.objects.filter(video_id=video_id).delete()
+        except Exception as e:
+            logger.error(f"YouTube cache invalidation failed for {video_id}: {str(e)}")
+
+    def get_stats(self) -> dict:
+        """Hits, misses, stores and evictions"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+# Process-wide cache shared by the views, the analyze_youtube command and the API
+youtube_cache = YouTubeCache()
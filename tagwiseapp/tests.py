@@ -1,3 +1,1092 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import path
+from . import views
+from .reader.llm_factory import LLMFactory
+
+# Async views are only routed by urls.py when settings.ASYNC_VIEWS is set
+urlpatterns = [
+    path('api/analyze-url/', views.analyze_url_async),
+]
 
 # Create your tests here.
+
+class LLMFactoryTestCase(TestCase):
+    """Test case for the cached LLM client registry"""
+    
+    def setUp(self):
+        LLMFactory.clear_llm_cache()
+    
+    def test_get_llm_reuses_clients(self):
+        """Same parameters return the same client, different ones a new client"""
+        first = LLMFactory.get_llm(provider="anthropic", anthropic_api_key="test-key")
+        second = LLMFactory.get_llm(provider="anthropic", anthropic_api_key="test-key")
+        other = LLMFactory.get_llm(provider="anthropic", temperature=0.9, anthropic_api_key="test-key")
+        
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+    
+    def test_invalidate_llm_recreates_client(self):
+        """A client dropped after a failure is rebuilt on the next call"""
+        first = LLMFactory.get_llm(provider="anthropic", anthropic_api_key="test-key")
+        
+        self.assertTrue(LLMFactory.invalidate_llm(first))
+        self.assertFalse(LLMFactory.invalidate_llm(first))
+        self.assertIsNot(LLMFactory.get_llm(provider="anthropic", anthropic_api_key="test-key"), first)
+    
+    def test_sdk_clients_do_not_retry(self):
+        """A failing request reaches the provider once; retries are left to the retry budget"""
+        import httpx
+        from unittest import mock
+        from google.api_core.exceptions import ServiceUnavailable
+        
+        gemini = LLMFactory.create_llm("gemini", google_api_key="test-key")
+        with mock.patch.object(type(gemini.client), "generate_content",
+                               side_effect=ServiceUnavailable("overloaded")) as generate_content:
+            with self.assertRaises(ServiceUnavailable):
+                gemini.invoke("hi")
+        self.assertEqual(generate_content.call_count, 1)
+        
+        requests = []
+        
+        def overloaded(request):
+            requests.append(request)
+            return httpx.Response(503, json={"error": {"message": "overloaded"}})
+        
+        openai = LLMFactory.create_llm("openai", openai_api_key="test-key",
+                                       http_client=httpx.Client(transport=httpx.MockTransport(overloaded)))
+        with self.assertRaises(Exception):
+            openai.invoke("hi")
+        self.assertEqual(len(requests), 1)
+        
+        anthropic = LLMFactory.create_llm("anthropic", anthropic_api_key="test-key")
+        self.assertEqual(anthropic._client.max_retries, 0)
+
+
+class ProviderRouterTestCase(TestCase):
+    """Test case for provider health tracking and circuit breaking"""
+    
+    def setUp(self):
+        from .reader.provider_router import ProviderRouter
+        
+        self.router = ProviderRouter(consecutive_failures=2, min_calls=10, cooldown=60)
+    
+    def test_circuit_opens_and_provider_moves_last(self):
+        """Repeated failures open the circuit, skip the provider and reorder fallbacks"""
+        error = TimeoutError("Request timed out")
+        self.router.record_failure("gemini", error, 30.0)
+        self.assertTrue(self.router.allow_request("gemini"))
+        
+        self.router.record_failure("gemini", error, 30.0)
+        self.assertFalse(self.router.allow_request("gemini"))
+        self.assertEqual(self.router.order(["gemini", "openai", "anthropic"]), ["openai", "anthropic", "gemini"])
+    
+    def test_half_open_trial_closes_circuit(self):
+        """After the cool-down one trial request is allowed and a success closes the circuit"""
+        self.router.cooldown = 0
+        self.router.record_failure("openai", TimeoutError("timeout"), 1.0)
+        self.router.record_failure("openai", TimeoutError("timeout"), 1.0)
+        
+        self.assertTrue(self.router.allow_request("openai"))
+        self.assertFalse(self.router.allow_request("openai"))
+        self.router.record_success("openai", 0.5)
+        self.assertEqual(self.router.get_stats()["openai"]["state"], "closed")
+    
+    def test_rate_limited_trial_releases_slot(self):
+        """A 429 during the half-open trial frees the trial slot instead of blocking the provider"""
+        from unittest import mock
+        from .reader.llm_factory import LLMChain
+        
+        class RateLimitError(Exception):
+            status_code = 429
+        
+        self.router.cooldown = 0
+        self.router.record_failure("openai", TimeoutError("timeout"), 1.0)
+        self.router.record_failure("openai", TimeoutError("timeout"), 1.0)
+        
+        llm = mock.Mock()
+        llm.invoke.side_effect = RateLimitError("Too many requests")
+        chain = LLMChain(system_prompt="test", providers=["openai"])
+        with mock.patch("tagwiseapp.reader.llm_factory.provider_router", self.router), \
+                mock.patch.object(chain, "_prepare_call", return_value=(llm, [])), \
+                mock.patch.object(chain, "_use_native_output", return_value=False):
+            with self.assertRaises(RateLimitError):
+                # Without tenacity's retries
+                LLMChain._run_with_provider.__wrapped__(chain, "openai", "hello")
+        
+        self.assertEqual(self.router.get_stats()["openai"]["state"], "half_open")
+        self.assertTrue(self.router.allow_request("openai"))
+    
+    def test_non_retryable_errors(self):
+        """Auth, missing key and other 4xx errors are not retried; 429 and 5xx are"""
+        from .reader.provider_router import is_retryable_error
+        
+        class StatusError(Exception):
+            def __init__(self, status_code):
+                super().__init__(f"HTTP {status_code}")
+                self.status_code = status_code
+        
+        self.assertFalse(is_retryable_error(StatusError(401)))
+        self.assertFalse(is_retryable_error(StatusError(400)))
+        self.assertFalse(is_retryable_error(ValueError("Missing API key for Gemini")))
+        self.assertTrue(is_retryable_error(StatusError(429)))
+        self.assertTrue(is_retryable_error(StatusError(503)))
+        self.assertTrue(is_retryable_error(TimeoutError("timed out")))
+
+
+class HedgedLLMChainTestCase(TestCase):
+    """Test case for hedged requests in LLMChain"""
+    
+    def test_slow_primary_is_hedged(self):
+        """A primary slower than the hedge delay loses to the second provider"""
+        import time
+        from unittest import mock
+        from .reader.llm_factory import LLMChain
+        from .reader.provider_router import provider_router
+        
+        def fake_run(provider, input_text, image_data=None):
+            if provider == "gemini":
+                time.sleep(0.5)
+            return f"answer from {provider}"
+        
+        chain = LLMChain(system_prompt="test", providers=["gemini", "openai"], hedge=True)
+        fired, won = LLMChain.hedge_stats["fired"], LLMChain.hedge_stats["won"]
+        with mock.patch.object(chain, "_run_with_provider", side_effect=fake_run), \
+                mock.patch.object(provider_router, "has_credentials", return_value=True), \
+                mock.patch.object(provider_router, "hedge_delay", return_value=0.05):
+            self.assertEqual(chain.run("hello"), "answer from openai")
+            self.assertEqual(chain.run("hello", hedge=False), "answer from gemini")
+        
+        self.assertEqual(LLMChain.hedge_stats["fired"], fired + 1)
+        self.assertEqual(LLMChain.hedge_stats["won"], won + 1)
+
+
+class RateLimiterTestCase(TestCase):
+    """Test case for the per-provider token bucket rate limiter"""
+    
+    def setUp(self):
+        from .reader.rate_limiter import RateLimiter, MemoryBucketStore
+        
+        # 600 rpm = 10 requests per second, bucket of 2 requests
+        self.limiter = RateLimiter(limits={"openai": {"rpm": 600, "tpm": 0}}, store=MemoryBucketStore(), max_wait=2)
+    
+    def test_requests_are_paced_to_the_budget(self):
+        """Once the burst is used up requests wait for the bucket to refill"""
+        from unittest import mock
+        
+        with mock.patch("tagwiseapp.reader.rate_limiter.settings.RATE_LIMIT_BURST_SECONDS", 0.2):
+            waits = [self.limiter.acquire("openai") for _ in range(4)]
+        
+        self.assertLess(waits[0], 0.05)
+        self.assertGreater(waits[3], 0.05)
+        self.assertEqual(self.limiter.get_stats()["openai"]["acquired"], 4)
+    
+    def test_providers_do_not_wait_for_each_other(self):
+        """A caller queued for one provider does not hold up another provider"""
+        import threading
+        from .reader.rate_limiter import RateLimiter, MemoryBucketStore
+        from .reader.provider_router import RateLimitTimeout
+        
+        limiter = RateLimiter(limits={"openai": {"rpm": 6, "tpm": 0}, "gemini": {"rpm": 0, "tpm": 0}},
+                              store=MemoryBucketStore(), max_wait=2)
+        limiter.acquire("openai")
+        errors = []
+        
+        def wait_for_openai():
+            try:
+                limiter.acquire("openai", timeout=0.5)
+            except RateLimitTimeout as e:
+                errors.append(e)
+        
+        waiting = threading.Thread(target=wait_for_openai)
+        waiting.start()
+        self.assertLess(limiter.acquire("gemini"), 0.05)
+        self.assertIsNot(limiter._condition("openai"), limiter._condition("gemini"))
+        waiting.join()
+        self.assertEqual(len(errors), 1)
+    
+    def test_rate_limit_error_uses_retry_after(self):
+        """A 429 pauses the provider for its Retry-After and halves the budget"""
+        from .reader.rate_limiter import is_rate_limit_error, get_retry_after
+        from .reader.provider_router import RateLimitTimeout
+        
+        class RateLimitError(Exception):
+            status_code = 429
+            
+            class response:
+                headers = {"retry-after": "30"}
+        
+        error = RateLimitError("Too many requests")
+        self.assertTrue(is_rate_limit_error(error))
+        self.assertEqual(get_retry_after(error), 30.0)
+        self.assertEqual(get_retry_after(Exception("429 Resource exhausted. Please retry in 12.5s.")), 12.5)
+        
+        self.limiter.record_rate_limited("openai", error)
+        stats = self.limiter.get_stats()["openai"]
+        self.assertEqual(stats["budget_factor"], 0.5)
+        self.assertGreater(stats["paused_for"], 25)
+        with self.assertRaises(RateLimitTimeout):
+            self.limiter.acquire("openai", timeout=0.1)
+
+
+class AsyncLLMChainTestCase(TestCase):
+    """Test case for LLMChain.arun/astream"""
+    
+    def test_arun_falls_back_and_astream_yields_chunks(self):
+        """arun skips a failing provider; astream streams text chunks"""
+        import asyncio
+        from unittest import mock
+        from langchain_core.language_models import FakeListChatModel
+        from .reader.llm_factory import LLMChain
+        from .reader.provider_router import provider_router
+        
+        class BrokenChatModel(FakeListChatModel):
+            async def ainvoke(self, *args, **kwargs):
+                raise ValueError("Invalid API key")
+        
+        clients = {"gemini": BrokenChatModel(responses=[""]), "openai": FakeListChatModel(responses=["hello world"])}
+        chain = LLMChain(system_prompt="test", providers=["gemini", "openai"])
+        
+        async def run_both():
+            semaphore = asyncio.Semaphore(1)
+            result = await chain.arun("hi", semaphore=semaphore)
+            chunks = [chunk async for chunk in LLMChain("test", providers=["openai"]).astream("hi", semaphore=semaphore)]
+            return result, chunks
+        
+        with mock.patch("tagwiseapp.reader.llm_factory.LLMFactory.get_llm",
+                        side_effect=lambda provider, **kwargs: clients[provider]), \
+                mock.patch.object(provider_router, "has_credentials", return_value=True):
+            result, chunks = asyncio.run(run_both())
+        
+        self.assertEqual(result, "hello world")
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), "hello world")
+
+
+class BatchCategorizationTestCase(TestCase):
+    """Test case for categorize_contents"""
+    
+    def test_missing_items_are_retried_then_categorized_alone(self):
+        """Pages missing from the batch response are retried once, then sent as single requests"""
+        from unittest import mock
+        from .reader import content_analyzer
+        
+        def analysis(index):
+            return {"index": index, "title": f"Page {index}", "description": "",
+                    "categories": [{"main": "Technology", "sub": "Programming"}], "tags": ["python"]}
+        
+        responses = [{"items": [analysis(0), analysis(1)]}, {"items": []}]
+        items = [{"content": f"<p>Page {i} content</p>", "url": f"https://example.com/{i}"} for i in range(3)]
+        
+        with mock.patch.object(content_analyzer.LLMChain, "run", side_effect=responses) as run, \
+                mock.patch.object(content_analyzer, "categorize_content", return_value={"title": "single"}) as single:
+            results = content_analyzer.categorize_contents(items)
+        
+        self.assertEqual(run.call_count, 2)
+        self.assertIn("https://example.com/2", run.call_args_list[1].args[0])
+        self.assertNotIn("https://example.com/0", run.call_args_list[1].args[0])
+        single.assert_called_once()
+        self.assertEqual([r["title"] for r in results], ["Page 0", "Page 1", "single"])
+        self.assertEqual(results[1]["url"], "https://example.com/1")
+        self.assertEqual(results[0]["categories"][0]["main"], "Technology")
+    
+    def test_batch_results_use_the_users_tags(self):
+        """Batch results are matched against the user's tags, not every user's"""
+        from unittest import mock
+        from .reader import content_analyzer
+        
+        user = object()
+        user_tags = [{"id": 7, "name": "Python"}]
+        response = {"items": [{"index": index, "title": f"Page {index}", "description": "",
+                               "categories": [{"main": "Technology", "sub": "Programming"}], "tags": ["python"]}
+                              for index in range(2)]}
+        items = [{"content": f"<p>Page {i} content</p>", "url": f"https://example.com/{i}"} for i in range(2)]
+        
+        with mock.patch.object(content_analyzer.LLMChain, "run", return_value=response), \
+                mock.patch.object(content_analyzer, "get_existing_categories", return_value=[]), \
+                mock.patch.object(content_analyzer, "get_existing_tags",
+                                  side_effect=lambda user=None: user_tags if user else [{"id": 9, "name": "python"}]):
+            results = content_analyzer.categorize_contents(items, user=user)
+        
+        self.assertEqual([result["tags"] for result in results], [[{"name": "Python", "id": 7}]] * 2)
+    
+    def test_unstructured_categorization(self):
+        """With use_structured_output=False the parsed text response is matched, not replaced by the default"""
+        from unittest import mock
+        from langchain_core.language_models import FakeListChatModel
+        from .reader import content_analyzer
+        
+        llm = FakeListChatModel(responses=['{"title": "Django", "description": "Web framework", '
+                                           '"categories": [{"main": "Technology", "sub": "Programming"}], "tags": ["python"]}'])
+        
+        with mock.patch.object(content_analyzer.LLMFactory, "get_llm", return_value=llm), \
+                mock.patch.object(content_analyzer, "get_existing_categories", return_value=[]), \
+                mock.patch.object(content_analyzer, "get_existing_tags", return_value=[{"id": 7, "name": "Python"}]):
+            result = content_analyzer.categorize_content("Django is a Python web framework.", "https://example.com",
+                                                         use_structured_output=False, user=object())
+        
+        self.assertEqual(result["title"], "Django")
+        self.assertEqual(result["categories"][0]["main"], "Technology")
+        self.assertEqual(result["tags"], [{"name": "Python", "id": 7}])
+
+
+class PromptCachingTestCase(TestCase):
+    """Test case for provider prompt caching of the stable prefix"""
+    
+    def test_repeated_prefix_is_read_from_cache(self):
+        """The second request with the same context reads the prefix from the (fake) provider cache"""
+        from .reader.llm_factory import LLMChain
+        from .reader.fake_provider import clear_fake_cache
+        from .reader.prompt_cache import prompt_cache_stats
+        
+        clear_fake_cache()
+        prompt_cache_stats.reset()
+        chain = LLMChain(system_prompt="Categorize pages.", providers=["fake"], context="Mevcut etiket örnekleri:\npython, django")
+        
+        messages = chain._create_messages("page", provider="anthropic")
+        self.assertEqual(messages[0].content[0]["cache_control"], {"type": "ephemeral"})
+        self.assertIn("django", messages[0].content[0]["text"])
+        
+        chain.run("first page")
+        chain.run("second page")
+        stats = prompt_cache_stats.get_stats()["fake"]
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["cache_hits"], 1)
+        self.assertGreater(stats["cache_read_tokens"], 0)
+    
+    def test_gemini_cache_is_created_outside_the_lock(self):
+        """Concurrent requests for one prefix create its cache once, other prefixes are not blocked"""
+        import time
+        import threading
+        from unittest import mock
+        from concurrent.futures import ThreadPoolExecutor
+        from .reader.prompt_cache import GeminiContextCache
+        
+        cache = GeminiContextCache()
+        release = threading.Event()
+        created = []
+        
+        def slow_create(model_name, prefix):
+            created.append(prefix)
+            if prefix == "slow":
+                release.wait(5)
+            return f"cachedContents/{prefix}"
+        
+        with mock.patch.object(cache, "_create", side_effect=slow_create), \
+                mock.patch("tagwiseapp.reader.prompt_cache.estimate_tokens", return_value=10000), \
+                mock.patch("tagwiseapp.reader.prompt_cache.settings.GEMINI_CACHE_MIN_USES", 1), \
+                ThreadPoolExecutor(max_workers=3) as executor:
+            slow = [executor.submit(cache.get_cache_name, "gemini-2.0-flash", "slow") for _ in range(2)]
+            time.sleep(0.1)
+            self.assertEqual(cache.get_cache_name("gemini-2.0-flash", "fast"), "cachedContents/fast")
+            release.set()
+            self.assertEqual([future.result() for future in slow], ["cachedContents/slow"] * 2)
+        
+        self.assertEqual(sorted(created), ["fast", "slow"])
+    
+    def test_clients_of_expired_gemini_caches_are_dropped(self):
+        """Clients bound to a cached content name leave the registry when the cache expires"""
+        from unittest import mock
+        from .reader.llm_factory import LLMFactory
+        from .reader.prompt_cache import GeminiContextCache
+        
+        cache = GeminiContextCache()
+        cache.on_expire(LLMFactory.drop_cached_content_clients)
+        LLMFactory.clear_llm_cache()
+        with mock.patch.object(cache, "_create", return_value="cachedContents/abc"), \
+                mock.patch("tagwiseapp.reader.prompt_cache.estimate_tokens", return_value=10000), \
+                mock.patch("tagwiseapp.reader.prompt_cache.settings.GEMINI_CACHE_MIN_USES", 1):
+            name = cache.get_cache_name("gemini-2.0-flash", "prefix")
+        LLMFactory.get_llm(provider="fake", cached_content=name)
+        LLMFactory.get_llm(provider="fake")
+        
+        cache.clear()
+        self.assertEqual(len(LLMFactory._clients), 1)
+
+
+class NativeStructuredOutputTestCase(TestCase):
+    """Test case for native structured output with a single repair call"""
+    
+    def test_invalid_output_is_repaired_once(self):
+        """A response that does not validate gets one repair call and is counted per provider"""
+        from unittest import mock
+        from langchain_core.messages import AIMessage
+        from .reader.llm_factory import LLMChain, LLMFactory
+        from .reader.provider_router import provider_router
+        from .reader.schemas import ContentAnalysisModel, analysis_to_dict
+        
+        valid = ContentAnalysisModel(title="Django", description="Web framework",
+                                     categories=[{"main": "Technology", "sub": "Programming"}], tags=["python"])
+        structured = mock.Mock()
+        structured.invoke.side_effect = [
+            {"raw": AIMessage(content='{"title": "Django"}'), "parsed": None, "parsing_error": ValueError("categories missing")},
+            {"raw": AIMessage(content=valid.model_dump_json()), "parsed": valid, "parsing_error": None},
+        ]
+        llm = mock.Mock()
+        llm.with_structured_output.return_value = structured
+        
+        chain = LLMChain(system_prompt="Categorize pages.", providers=["openai"], output_schema=ContentAnalysisModel)
+        before = LLMChain.get_parse_stats().get("openai", {"failed": 0, "repaired": 0})
+        with mock.patch.object(LLMFactory, "get_llm", return_value=llm), \
+                mock.patch.object(provider_router, "has_credentials", return_value=True):
+            result = chain.run("page")
+        
+        self.assertEqual(analysis_to_dict(result)["categories"], [{"main": "Technology", "sub": "Programming"}])
+        self.assertEqual(structured.invoke.call_count, 2)
+        first_messages, repair_messages = (call.args[0] for call in structured.invoke.call_args_list)
+        self.assertNotIn("JSON", first_messages[0].content)
+        self.assertIn("categories missing", repair_messages[-1].content)
+        stats = LLMChain.get_parse_stats()["openai"]
+        self.assertEqual(stats["failed"], before["failed"] + 1)
+        self.assertEqual(stats["repaired"], before["repaired"] + 1)
+
+
+class RetryPolicyTestCase(TestCase):
+    """Test case for error-classified retries and the retry budget"""
+    
+    def test_errors_are_classified(self):
+        from .reader import retry_policy as policy
+        from .reader.provider_router import StructuredOutputError
+        
+        class StatusError(Exception):
+            def __init__(self, status_code, message="error"):
+                super().__init__(message)
+                self.status_code = status_code
+        
+        self.assertEqual(policy.classify_error(StatusError(503)), policy.TRANSIENT)
+        self.assertEqual(policy.classify_error(TimeoutError("timed out")), policy.TRANSIENT)
+        self.assertEqual(policy.classify_error(StatusError(429)), policy.RATE_LIMITED)
+        self.assertEqual(policy.classify_error(StatusError(401)), policy.PERMANENT)
+        self.assertEqual(policy.classify_error(ValueError("Response blocked due to safety settings")), policy.PERMANENT)
+        self.assertEqual(policy.classify_error(StructuredOutputError("no match")), policy.PARSE_ERROR)
+    
+    def test_budget_stops_retry_storm(self):
+        """Once the budget is used up, transient errors fail without retrying"""
+        from tenacity import retry
+        from .reader.retry_policy import RetryPolicy, RetryBudget
+        
+        rules = {cls: {"max_attempts": 3, "backoff": False}
+                 for cls in ("transient", "rate_limited", "permanent", "parse_error")}
+        rules["permanent"]["max_attempts"] = 1
+        policy = RetryPolicy(rules=rules, budget=RetryBudget(ratio=0.1, window_seconds=60, min_retries=2))
+        attempts = []
+        
+        @retry(before=policy.before, retry=policy.should_retry, wait=policy.wait, reraise=True)
+        def call(error):
+            attempts.append(error)
+            raise error
+        
+        for _ in range(5):
+            with self.assertRaises(TimeoutError):
+                call(TimeoutError("timed out"))
+        with self.assertRaises(PermissionError):
+            call(PermissionError("invalid x-api-key"))
+        
+        stats = policy.get_stats()
+        self.assertEqual(stats["transient"]["retries"], 2)
+        self.assertGreater(stats["transient"]["budget_denied"], 0)
+        self.assertEqual(stats["permanent"], {"errors": 1, "retries": 0, "budget_denied": 0})
+        self.assertEqual(len(attempts), 5 + 2 + 1)
+
+
+class FakeProviderTestCase(TestCase):
+    """Test case for the offline fake LLM and embedding providers"""
+    
+    def test_structured_output_is_valid_and_deterministic(self):
+        from .reader.llm_factory import LLMChain
+        from .reader.schemas import ContentAnalysisModel, BatchContentAnalysisModel
+        
+        chain = LLMChain(system_prompt="Categorize pages.", providers=["fake"], output_schema=ContentAnalysisModel)
+        first = chain.run("https://example.com/django")
+        self.assertIsInstance(first, ContentAnalysisModel)
+        self.assertGreater(len(first.categories), 0)
+        self.assertEqual(first, chain.run("https://example.com/django"))
+        
+        batch_chain = LLMChain(system_prompt="Categorize pages.", providers=["fake"], output_schema=BatchContentAnalysisModel)
+        batch = batch_chain.run("### Sayfa 0\nURL: a\n\n### Sayfa 2\nURL: b")
+        self.assertEqual([item.index for item in batch.items], [0, 2])
+    
+    def test_injected_rate_limit_and_streaming(self):
+        import asyncio
+        from .reader.fake_provider import FakeChatModel
+        from .reader.rate_limiter import is_rate_limit_error
+        
+        with self.assertRaises(Exception) as context:
+            FakeChatModel(rate_limit_rate=1.0).invoke("hello")
+        self.assertTrue(is_rate_limit_error(context.exception))
+        
+        model = FakeChatModel(default_response="a" * 50, stream_chunk_size=20, latency="uniform:0,0.01", seed=1)
+        
+        async def collect():
+            return [chunk.content async for chunk in model.astream("hello")]
+        
+        self.assertEqual(asyncio.run(collect()), ["a" * 20, "a" * 20, "a" * 10])
+    
+    def test_fake_embeddings(self):
+        import os
+        from unittest import mock
+        from .rag.embeddings import get_embeddings
+        
+        with mock.patch.dict(os.environ, {"EMBEDDING_PROVIDER": "fake"}):
+            embeddings = get_embeddings()
+        django, framework, cooking = embeddings.embed_documents(
+            ["django web framework", "python web framework", "pasta cooking recipe"]
+        )
+        self.assertEqual(django, embeddings.embed_query("django web framework"))
+        similarity = lambda a, b: sum(x * y for x, y in zip(a, b))
+        self.assertGreater(similarity(django, framework), similarity(django, cooking))
+
+
+class ParsedPageTestCase(TestCase):
+    """ParsedPage parses the HTML once and serves every extraction stage"""
+    
+    HTML = (
+        '<html lang="tr"><head><title> Django Rehberi </title>'
+        '<meta itemprop="image" content="/images/cover.png">'
+        '<script>var tracking = 1;</script></head>'
+        '<body><nav>Menü</nav><article><h1>Django</h1><p>Model ve view katmanı.</p>'
+        '<script>ignored()</script></article><footer>Telif</footer></body></html>'
+    )
+    
+    def test_stages_share_one_parse(self):
+        from unittest import mock
+        from .reader import parsed_page
+        from .reader.content_extractor import extract_content
+        from .reader.html_utils import clean_html_content
+        
+        page = parsed_page.ParsedPage(self.HTML, "https://example.com/docs/django")
+        with mock.patch.object(parsed_page, "BeautifulSoup", wraps=parsed_page.BeautifulSoup) as soup:
+            self.assertEqual(extract_content(page), "Django Model ve view katmanı.")
+            self.assertEqual(clean_html_content(page), "Menü Django Model ve view katmanı. Telif")
+            self.assertEqual(page.image_url, "https://example.com/images/cover.png")
+            self.assertEqual(page.title, "Django Rehberi")
+            self.assertEqual(page.language, "tr")
+        self.assertEqual(soup.call_count, 1)
+    
+    def test_plain_text_is_not_parsed(self):
+        from unittest import mock
+        from .reader import parsed_page
+        from .reader.html_utils import clean_html_content
+        
+        with mock.patch.object(parsed_page, "BeautifulSoup") as soup:
+            self.assertEqual(clean_html_content("  Zaten   düz\n metin  "), "Zaten düz metin")
+        soup.assert_not_called()
+
+
+class StreamingFetchTestCase(TestCase):
+    """fetch_html streams the body, rejects non-HTML and stops at the byte cap or end of head"""
+    
+    HEAD = (
+        '<html><head><meta charset="iso-8859-9"><title>Çay</title>'
+        '<meta property="og:image" content="https://example.com/cay.png"></head>'
+    ).encode('iso-8859-9')
+    
+    @classmethod
+    def setUpClass(cls):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        super().setUpClass()
+        head = cls.HEAD
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                content_type = 'image/png' if self.path == '/image' else 'text/html'
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.end_headers()
+                try:
+                    self.wfile.write(head)
+                    for _ in range(200):
+                        self.wfile.write(b'<p>' + b'x' * 16 * 1024 + b'</p>')
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+        
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+    
+    def test_byte_cap_and_content_type(self):
+        from .reader.html_fetcher import fetch_html
+        
+        html = fetch_html(self.base_url + '/page', max_bytes=100 * 1024)
+        self.assertTrue(html.startswith('<html><head><meta charset="iso-8859-9"><title>Çay</title>'))
+        self.assertEqual(len(html.encode('iso-8859-9')), 100 * 1024)
+        self.assertIsNone(fetch_html(self.base_url + '/image'))
+    
+    def test_head_only(self):
+        import asyncio
+        from .reader.html_fetcher import afetch_html, fetch_page_metadata
+        
+        metadata = fetch_page_metadata(self.base_url + '/page')
+        self.assertEqual(metadata['title'], 'Çay')
+        self.assertEqual(metadata['image_url'], 'https://example.com/cay.png')
+        
+        html = asyncio.run(afetch_html(self.base_url + '/page', head_only=True))
+        self.assertIn('</head>', html)
+        self.assertLess(len(html), 32 * 1024)
+
+
+class ReadabilityDigestTestCase(TestCase):
+    """extract_digest keeps the article and drops banners, menus and comments"""
+    
+    PARAGRAPH = "Django modelleri veritabanı tablolarını Python sınıfları olarak tanımlar, sorgular ORM ile yazılır. "
+    
+    def page_html(self, paragraphs=3):
+        article = "".join(f"<p>{i}. {self.PARAGRAPH * 2}</p>" for i in range(paragraphs))
+        return (
+            '<html><head><title>Django ORM Rehberi</title></head><body>'
+            '<div id="cookie-consent"><p>Bu site çerezleri kullanır, devam ederek çerez politikamızı kabul etmiş olursunuz.</p></div>'
+            '<div class="mega-menu"><ul>' + ''.join(f'<li><a href="/k/{i}">Kategori bağlantısı {i}</a></li>' for i in range(30)) + '</ul></div>'
+            f'<div class="post"><h2>Modeller</h2>{article}</div>'
+            '<div class="comments">' + '<div class="comment"><p>Harika bir yazı olmuş, elinize sağlık, teşekkürler!</p></div>' * 20 + '</div>'
+            '</body></html>'
+        )
+    
+    def test_digest_keeps_article_only(self):
+        from .reader.content_extractor import extract_digest
+        
+        digest = extract_digest(self.page_html())
+        lines = digest.split("\n")
+        self.assertEqual(lines[:2], ["Django ORM Rehberi", "Modeller"])
+        self.assertEqual(len(lines), 5)
+        self.assertNotIn("çerez", digest)
+        self.assertNotIn("Kategori bağlantısı", digest)
+        self.assertNotIn("Harika bir yazı", digest)
+    
+    def test_token_budget_keeps_lead(self):
+        from .reader.content_extractor import extract_digest
+        from .reader.prompt_cache import estimate_tokens
+        
+        digest = extract_digest(self.page_html(paragraphs=40), max_tokens=300)
+        self.assertLessEqual(estimate_tokens(digest), 300 + 1)
+        self.assertIn("0. Django", digest)
+        self.assertNotIn("39. Django", digest)
+
+
+class TokenBudgetTestCase(TestCase):
+    """Prompt content is budgeted in provider tokens, not characters"""
+    
+    def test_counts_depend_on_script_and_provider(self):
+        from .reader.token_budget import count_tokens
+        
+        english = "The bookmark manager stores pages and tags. " * 10
+        turkish = "Yer imi yöneticisi sayfaları ve etiketleri saklıyor. " * 10
+        japanese = "ブックマークはページとタグを保存します。" * 10
+        
+        self.assertAlmostEqual(count_tokens(english, "gemini") / len(english), 0.25, places=2)
+        self.assertGreater(count_tokens(turkish, "gemini") / len(turkish), count_tokens(english, "gemini") / len(english))
+        self.assertGreater(count_tokens(japanese, "gemini"), len(japanese) / 2)
+        self.assertGreater(count_tokens(turkish, "anthropic"), count_tokens(turkish, "gemini"))
+        self.assertEqual(count_tokens(""), 0)
+    
+    def test_truncate_and_fit(self):
+        from .reader.token_budget import count_tokens, fit_count, truncate_to_tokens
+        
+        text = "Çalışma notları ve öğrenme kaynakları. " * 200
+        for provider in ("gemini", "anthropic", "openai"):
+            truncated = truncate_to_tokens(text, 100, provider)
+            self.assertLessEqual(count_tokens(truncated, provider), 100)
+            self.assertGreater(count_tokens(truncated, provider), 90)
+            self.assertTrue(truncated.endswith("..."))
+        self.assertEqual(truncate_to_tokens("kısa metin", 100), "kısa metin")
+        
+        documents = ["a" * 400, "b" * 400, "c" * 400]
+        self.assertEqual(fit_count(documents, 250, "gemini"), 2)
+        self.assertEqual(fit_count(documents, 50, "gemini"), 0)
+    
+    def test_count_cache_is_bounded(self):
+        """The count cache keeps digests of at most TOKEN_COUNT_CACHE_SIZE texts"""
+        from unittest import mock
+        from .reader import token_budget
+        
+        with mock.patch.object(token_budget.settings, "TOKEN_COUNT_CACHE_SIZE", 2):
+            hits = token_budget.get_cache_stats()["hits"]
+            for text in ("bir " * 5000, "iki " * 5000, "üç " * 5000):
+                token_budget.count_tokens(text, "gemini")
+            token_budget.count_tokens("üç " * 5000, "gemini")
+            
+            self.assertEqual(len(token_budget._count_cache), 2)
+            self.assertEqual(token_budget.get_cache_stats()["hits"], hits + 1)
+            self.assertTrue(all(isinstance(digest, bytes) and len(digest) == 16 for digest, _ in token_budget._count_cache))
+
+
+class StageGraphTestCase(TestCase):
+    """Independent analysis stages run concurrently; slow or failing stages get their default"""
+    
+    def test_independent_stages_overlap(self):
+        import time
+        from .reader.stage_graph import StageGraph
+        
+        graph = StageGraph("test")
+        graph.add("thumbnail", lambda: time.sleep(0.3) or b"thumb")
+        graph.add("analysis", lambda: time.sleep(0.3) or {"main_category": "Yazılım"})
+        graph.add("screenshot", lambda thumbnail: b"shot", deps=["thumbnail"], when=lambda thumbnail: not thumbnail)
+        graph.add("summary", lambda analysis: analysis["main_category"], deps=["analysis"])
+        
+        start = time.monotonic()
+        results = graph.run()
+        
+        self.assertLess(time.monotonic() - start, 0.55)
+        self.assertEqual(results["thumbnail"], b"thumb")
+        self.assertEqual(results["summary"], "Yazılım")
+        self.assertIsNone(results["screenshot"])
+        self.assertEqual(results.skipped, ["screenshot"])
+    
+    def test_timeout_and_failure_use_default(self):
+        import time
+        from .reader.stage_graph import StageGraph
+        
+        def broken():
+            raise RuntimeError("bağlantı hatası")
+        
+        graph = StageGraph("test")
+        graph.add("transcript", lambda: time.sleep(1) or "altyazı", timeout=0.1, default="")
+        graph.add("video_info", broken, default={})
+        graph.add("prompt", lambda transcript, video_info: (transcript, video_info), deps=["transcript", "video_info"])
+        
+        start = time.monotonic()
+        results = graph.run()
+        
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(results["prompt"], ("", {}))
+        self.assertEqual(results.timed_out, ["transcript"])
+        self.assertEqual(results.status["video_info"], "failed")
+        with self.assertRaises(ValueError):
+            graph.add("orphan", lambda missing: None, deps=["missing"])
+
+
+class SingleFlightTestCase(TestCase):
+    """Concurrent analyses of the same URL run once and share the result"""
+    
+    def test_normalize_url_key(self):
+        from .reader.single_flight import normalize_url_key
+        
+        self.assertEqual(normalize_url_key("https://Example.com:443/docs/?utm_source=x&b=2&a=1#intro"),
+                         "https://example.com/docs?a=1&b=2")
+        self.assertEqual(normalize_url_key("example.com"), "https://example.com/")
+        self.assertNotEqual(normalize_url_key("https://example.com/a"), normalize_url_key("https://example.com/b"))
+    
+    def test_concurrent_calls_share_one_execution(self):
+        import time
+        import threading
+        from .reader.single_flight import SingleFlight
+        
+        flight = SingleFlight("test", backend="memory", wait_timeout=5)
+        runs = []
+        
+        def analyze():
+            runs.append(1)
+            time.sleep(0.3)
+            return {"title": "Django"}
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("https://example.com/", analyze)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(runs), 1)
+        self.assertEqual([value for value, _ in results], [{"title": "Django"}] * 5)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+        stats = flight.get_stats()
+        self.assertEqual((stats["calls"], stats["executed"], stats["coalesced"]), (5, 1, 4))
+        
+        # Once the flight has landed the next call runs again
+        flight.do("https://example.com/", analyze)
+        self.assertEqual(len(runs), 2)
+    
+    def test_waiters_get_the_error(self):
+        import time
+        import threading
+        from .reader.single_flight import SingleFlight
+        
+        flight = SingleFlight("test", backend="memory", wait_timeout=5)
+        
+        def broken():
+            time.sleep(0.2)
+            raise RuntimeError("sayfa alınamadı")
+        
+        errors = []
+        
+        def call():
+            try:
+                flight.do("https://example.com/", broken)
+            except RuntimeError as e:
+                errors.append(str(e))
+        
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, ["sayfa alınamadı"] * 3)
+        self.assertEqual(flight.get_stats()["executed"], 1)
+    
+    def test_coroutines_share_one_execution(self):
+        import asyncio
+        from .reader.single_flight import SingleFlight
+        
+        flight = SingleFlight("test", backend="memory", wait_timeout=5)
+        runs = []
+        
+        async def analyze():
+            runs.append(1)
+            await asyncio.sleep(0.2)
+            return {"title": "Django"}
+        
+        async def three_callers():
+            return await asyncio.gather(*(flight.ado("https://example.com/", analyze) for _ in range(3)))
+        
+        results = asyncio.run(three_callers())
+        
+        self.assertEqual(len(runs), 1)
+        self.assertEqual([value for value, _ in results], [{"title": "Django"}] * 3)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True])
+    
+    def test_shared_analysis_is_matched_per_user(self):
+        import json
+        import time
+        import threading
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from . import views
+        from .reader.single_flight import SingleFlight
+        
+        alice, bob = User(pk=1, username="alice"), User(pk=2, username="bob")
+        categories = {
+            "alice": [{"id": 10, "name": "Yazılım", "is_main": True, "parent_id": None},
+                      {"id": 11, "name": "Web", "is_main": False, "parent_id": 10}],
+            "bob": [{"id": 20, "name": "yazılım", "is_main": True, "parent_id": None},
+                    {"id": 21, "name": "web", "is_main": False, "parent_id": 20}],
+        }
+        tags = {"alice": [{"id": 100, "name": "Django"}], "bob": [{"id": 200, "name": "django"}]}
+        runs = []
+        
+        def analyze_once(url, user, html=None, fetch=True):
+            runs.append(user.username)
+            time.sleep(0.3)
+            # Raw LLM output: names only, no ids
+            return {"status": 200, "data": {"url": url, "title": "Django",
+                                            "categories": [{"main": "Yazılım", "sub": "Web"}],
+                                            "tags": [{"name": "django"}]}}
+        
+        responses = {}
+        
+        def request(user):
+            responses[user.username] = json.loads(views.run_url_analysis("https://example.com/", user).content)
+        
+        with mock.patch.object(views, "url_analysis_flight", SingleFlight("test", backend="memory", wait_timeout=5)), \
+             mock.patch.object(views, "analyze_url_once", side_effect=analyze_once), \
+             mock.patch("tagwiseapp.reader.content_analyzer.get_existing_categories",
+                        side_effect=lambda user=None: categories[user.username]), \
+             mock.patch("tagwiseapp.reader.content_analyzer.get_existing_tags",
+                        side_effect=lambda user=None: tags[user.username]):
+            threads = [threading.Thread(target=request, args=(user,)) for user in (alice, bob)]
+            for thread in threads:
+                thread.start()
+                time.sleep(0.05)
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(runs, ["alice"])
+        self.assertEqual(responses["alice"]["categories_original"][0]["main_id"], 10)
+        self.assertEqual(responses["alice"]["categories_original"][0]["sub_id"], 11)
+        self.assertEqual(responses["alice"]["tags_original"], [{"name": "Django", "id": 100}])
+        self.assertEqual(responses["bob"]["categories_original"][0]["main_id"], 20)
+        self.assertEqual(responses["bob"]["categories_original"][0]["sub_id"], 21)
+        self.assertEqual(responses["bob"]["tags_original"], [{"name": "django", "id": 200}])
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncAnalyzeUrlTestCase(TestCase):
+    """analyze_url_async fetches and calls the LLM without a worker thread"""
+    
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import Tag
+        
+        self.user = User.objects.create_user(username="asyncuser", password="password123")
+        Tag.objects.create(name="django", user=self.user)
+    
+    async def test_analyze_url_async(self):
+        import json
+        from unittest import mock
+        from .reader import settings as llm_settings
+        from .reader.llm_factory import LLMChain
+        
+        html = ("<html><head><title>Django</title></head><body><article><h1>Django</h1><p>"
+                + "Django is a high-level Python web framework. " * 20 + "</p></article></body></html>")
+        await self.async_client.aforce_login(self.user)
+        
+        with mock.patch.object(llm_settings, "DEFAULT_PROVIDER", "fake"), \
+                mock.patch.object(llm_settings, "FALLBACK_PROVIDERS", []), \
+                mock.patch.object(views, "afetch_html", mock.AsyncMock(return_value=html)) as afetch_html, \
+                mock.patch.object(views, "fetch_html", side_effect=AssertionError("blocking fetch")), \
+                mock.patch("tagwiseapp.reader.utils.aextract_thumbnail_from_html", mock.AsyncMock(return_value=None)), \
+                mock.patch.object(views, "capture_screenshot", return_value=None), \
+                mock.patch.object(LLMChain, "run", side_effect=AssertionError("blocking LLM call")), \
+                mock.patch.object(LLMChain, "arun", autospec=True, side_effect=LLMChain.arun) as arun:
+            response = await self.async_client.post("/api/analyze-url/", json.dumps({"url": "example.com/django"}),
+                                                     content_type="application/json")
+        
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        afetch_html.assert_awaited_once_with("https://example.com/django")
+        self.assertEqual(arun.await_count, 1)
+        self.assertTrue(data["categories"])
+        self.assertFalse(data["screenshot_used"])
+
+
+class YouTubeCacheTestCase(TestCase):
+    """Video info and transcripts are fetched once per video id"""
+    
+    def test_store_expire_and_evict(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import YouTubeVideoCache
+        from .reader.youtube_cache import YouTubeCache
+        
+        cache = YouTubeCache(ttl=3600, max_entries=2)
+        transcript = "Bu videoda Django ile REST API geliştiriyoruz. " * 200
+        cache.put("video1", info={"title": "Django REST"}, transcript=transcript)
+        cache.put("video2", transcript=None)
+        
+        self.assertEqual(cache.get("video1"), {"info": {"title": "Django REST"}, "transcript": transcript})
+        self.assertEqual(cache.get("video2"), {"transcript": None})
+        self.assertLess(len(YouTubeVideoCache.objects.get(video_id="video1").transcript), len(transcript) / 10)
+        
+        # The least recently used video is evicted
+        YouTubeVideoCache.objects.filter(video_id="video1").update(last_used_at=timezone.now() - timedelta(hours=1))
+        cache.put("video3", title="Yeni video")
+        self.assertIsNone(cache.get("video1"))
+        self.assertEqual(YouTubeVideoCache.objects.count(), 2)
+        
+        # Expired entries are misses
+        YouTubeVideoCache.objects.filter(video_id="video3").update(created_at=timezone.now() - timedelta(hours=2))
+        self.assertIsNone(cache.get("video3"))
+    
+    def test_transcript_is_fetched_once(self):
+        from unittest import mock
+        from .reader import youtube_analyzer
+        
+        with mock.patch.object(youtube_analyzer, "_fetch_youtube_transcript", return_value=("merhaba dünya", True)) as fetch:
+            self.assertEqual(youtube_analyzer.get_youtube_transcript("abc123"), "merhaba dünya")
+            self.assertEqual(youtube_analyzer.get_youtube_transcript("abc123"), "merhaba dünya")
+        self.assertEqual(fetch.call_count, 1)
+        
+        # A video without subtitles is not asked for them again either
+        with mock.patch.object(youtube_analyzer, "_fetch_youtube_transcript", return_value=(None, False)) as fetch:
+            self.assertIsNone(youtube_analyzer.get_youtube_transcript("nosubs"))
+            self.assertIsNone(youtube_analyzer.get_youtube_transcript("nosubs"))
+        self.assertEqual(fetch.call_count, 1)
+
+
+class YouTubeThumbnailTestCase(TestCase):
+    """Thumbnail variants are probed concurrently, once per video"""
+    
+    def test_probes_in_parallel_and_remembers(self):
+        import time
+        from unittest import mock
+        from .reader import youtube_analyzer
+        
+        available = {"sddefault.jpg", "hqdefault.jpg", "default.jpg"}
+        probed = []
+        
+        def head(url, timeout=None):
+            probed.append(url)
+            time.sleep(0.2)
+            found = url.rsplit("/", 1)[-1] in available
+            return mock.Mock(status_code=200 if found else 404, headers={"content-type": "image/jpeg" if found else "text/html"})
+        
+        with mock.patch.object(youtube_analyzer.requests, "head", side_effect=head):
+            start = time.monotonic()
+            url = youtube_analyzer.get_youtube_thumbnail_webp("thumb42")
+            elapsed = time.monotonic() - start
+            # The analysis and the thumbnail download ask again: no second probe round
+            self.assertEqual(youtube_analyzer.resolve_youtube_thumbnail("thumb42"), url)
+        
+        self.assertEqual(url, "https://img.youtube.com/vi/thumb42/sddefault.jpg")
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(len(probed), 6)
+
+
+class SubtitleParserTestCase(TestCase):
+    """Subtitle tracks are parsed incrementally in memory"""
+    
+    def feed_in_chunks(self, parser, document, size=7):
+        for start in range(0, len(document), size):
+            if parser.feed(document[start:start + size]):
+                return parser.text()
+        parser.close()
+        return parser.text()
+    
+    def test_formats_and_rolling_captions(self):
+        import json
+        from .reader.subtitles import create_subtitle_parser
+        
+        vtt = (
+            "WEBVTT\nKind: captions\nLanguage: en\n\n"
+            "00:00:00.000 --> 00:00:02.000 align:start position:0%\n"
+            "welcome<00:00:00.500><c> to</c><c> the</c>\n\n"
+            "00:00:02.000 --> 00:00:04.000 align:start position:0%\n"
+            "welcome to the\ndjango &amp; rest tutorial\n\n"
+            "NOTE this is not a caption\n\n"
+            "00:00:04.000 --> 00:00:06.000\n"
+            "django &amp; rest tutorial\nlet's start\n"
+        )
+        srv3 = '<?xml version="1.0" encoding="utf-8" ?><timedtext format="3"><body>' \
+               '<p t="0" d="2000"><s>welcome</s><s> to the</s></p><p t="2000" d="2000">django &amp; rest tutorial</p>' \
+               '<p t="4000" d="2000">let\'s start</p></body></timedtext>'
+        json3 = json.dumps({"wireMagic": "pb3", "events": [
+            {"tStartMs": 0, "segs": [{"utf8": "welcome"}, {"utf8": " to the"}]},
+            {"tStartMs": 1500, "aAppend": 1, "segs": [{"utf8": "\n"}]},
+            {"tStartMs": 2000, "segs": [{"utf8": "django & rest tutorial"}]},
+            {"tStartMs": 4000, "segs": [{"utf8": "let's start"}]},
+        ]})
+        
+        expected = "welcome to the django & rest tutorial let's start"
+        for ext, document in (("vtt", vtt), ("srv3", srv3), ("json3", json3)):
+            self.assertEqual(self.feed_in_chunks(create_subtitle_parser(ext, 1000), document), expected, ext)
+    
+    def test_stops_at_max_chars_and_picks_track(self):
+        from .reader.subtitles import choose_subtitle_track, create_subtitle_parser
+        
+        cues = "".join(f"00:00:{i:02d}.000 --> 00:00:{i + 1:02d}.000\ncümle numarası {i}\n\n" for i in range(50))
+        parser = create_subtitle_parser("vtt", 60)
+        text = self.feed_in_chunks(parser, "WEBVTT\n\n" + cues)
+        self.assertEqual(len(text), 60)
+        self.assertTrue(text.startswith("cümle numarası 0 cümle numarası 1"))
+        self.assertTrue(parser.done)
+        
+        subtitles = {"de": [{"ext": "vtt", "url": "https://example.com/de"}]}
+        automatic = {
+            "en": [{"ext": "vtt", "url": "https://example.com/en.vtt"}, {"ext": "json3", "url": "https://example.com/en.json3"}],
+            "tr": [{"ext": "srv3", "url": "https://example.com/tr.srv3"}],
+        }
+        self.assertEqual(choose_subtitle_track(subtitles, automatic, ["tr", "en"])["url"], "https://example.com/tr.srv3")
+        self.assertEqual(choose_subtitle_track(subtitles, automatic, ["en"])["ext"], "json3")
+        self.assertIsNone(choose_subtitle_track(subtitles, {}, ["tr", "en"]))
+    
+    def test_parser_interface(self):
+        """Parsers must implement feed(); a JSON3 event cut off by the end of the stream is dropped on close()"""
+        from .reader.subtitles import SubtitleParser, create_subtitle_parser
+        
+        with self.assertRaises(TypeError):
+            SubtitleParser(100)
+        
+        parser = create_subtitle_parser("json3", 1000)
+        parser.feed('{"events": [{"segs": [{"utf8": "first line"}]}, {"segs": [{"utf8": "cut')
+        parser.close()
+        self.assertEqual(parser.text(), "first line")
+        self.assertEqual(parser._buffer, "")
@@ -1,11 +1,17 @@
 import json
 import os
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
-from django.urls import reverse
+from django.urls import path, reverse
+from . import views_chatbot
 from .models import Bookmark, Tag, Category
 from .rag.chatbot import BookmarkChatbot
 
+# Async views are only routed by urls.py when settings.ASYNC_VIEWS is set
+urlpatterns = [
+    path('chatbot/ask/', views_chatbot.chatbot_ask_async),
+]
+
 class ChatbotTestCase(TestCase):
     """Test case for chatbot functionality"""
     
@@ -83,4 +89,289 @@ class ChatbotTestCase(TestCase):
         """Test resetting the chatbot conversation"""
         response = self.client.post(reverse('tagwiseapp:chatbot_reset'))
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.json()['status'], 'success') 
\ No newline at end of file
+        self.assertEqual(response.json()['status'], 'success') 
+
+class MetadataIndexTestCase(TestCase):
+    """Test case for the category/tag metadata index used for filtered retrieval"""
+    
+    def test_lookup_is_case_insensitive(self):
+        """Categories and tags are matched regardless of case"""
+        from .rag.metadata_index import MetadataIndex
+        
+        index = MetadataIndex()
+        index.add(0, {"categories": ["Programming"], "tags": ["python"]})
+        index.add(1, {"categories": ["programming"], "tags": ["Django"]})
+        index.add(2, {"categories": ["News"], "tags": []})
+        
+        self.assertEqual(index.lookup("categories", "PROGRAMMING"), {0, 1})
+        self.assertEqual(index.lookup("tags", "django"), {1})
+        self.assertEqual(index.lookup("categories", "Unknown"), set())
+        self.assertEqual(index.size, 3)
+    
+    def test_round_trip(self):
+        """The index survives serialization to and from a dict"""
+        from .rag.metadata_index import MetadataIndex
+        
+        index = MetadataIndex()
+        index.add(4, {"subcategories": ["Web"]})
+        restored = MetadataIndex.from_dict(index.to_dict())
+        
+        self.assertEqual(restored.lookup("subcategories", "web"), {4})
+        self.assertEqual(restored.size, 5)
+
+
+class AnswerCacheTestCase(TestCase):
+    """Test case for the semantic chatbot answer cache"""
+    
+    def setUp(self):
+        from .rag.answer_cache import AnswerCache
+        
+        self.cache = AnswerCache(threshold=0.95)
+        self.vectors = {
+            "What did I save about Django?": [1.0, 0.0, 0.0],
+            "what have i saved about django": [0.99, 0.05, 0.0],
+            "Show me my cooking recipes": [0.0, 1.0, 0.0],
+        }
+        self.embed = lambda question: self.vectors[question]
+    
+    def test_similar_question_hits(self):
+        """A near-identical question reuses the stored answer and sources"""
+        self.cache.store(1, 100, "What did I save about Django?", "Two bookmarks.", [{"id": 1}], embed_fn=self.embed)
+        
+        cached = self.cache.lookup(1, 100, "what have i saved about django", embed_fn=self.embed)
+        self.assertEqual(cached, {"answer": "Two bookmarks.", "sources": [{"id": 1}]})
+        self.assertIsNone(self.cache.lookup(1, 100, "Show me my cooking recipes", embed_fn=self.embed))
+        self.assertEqual(self.cache.get_stats()["hits"], 1)
+        self.assertEqual(self.cache.get_stats()["misses"], 1)
+    
+    def test_version_and_scope_invalidate(self):
+        """Answers are not reused across index versions, users or filters"""
+        self.cache.store(1, 100, "What did I save about Django?", "Two bookmarks.", [], embed_fn=self.embed)
+        
+        self.assertIsNone(self.cache.lookup(2, 100, "What did I save about Django?", embed_fn=self.embed))
+        self.assertIsNone(self.cache.lookup(1, 100, "What did I save about Django?", embed_fn=self.embed, scope="categories:news"))
+        self.assertIsNone(self.cache.lookup(1, 101, "What did I save about Django?", embed_fn=self.embed))
+        self.assertIsNone(self.cache.lookup(1, 100, "What did I save about Django?", embed_fn=self.embed))
+    
+    def test_chatbot_cache_hit_is_remembered(self):
+        """A cache hit (streamed or not) joins the conversation memory; question vectors stay bounded"""
+        from collections import OrderedDict
+        from unittest import mock
+        from langchain.memory import ConversationBufferMemory
+        from .rag import chatbot as chatbot_module
+        
+        chatbot = BookmarkChatbot.__new__(BookmarkChatbot)
+        chatbot.user_id = 1
+        chatbot.filter_scope = None
+        chatbot.memory = ConversationBufferMemory(return_messages=True, input_key="question", output_key="answer")
+        chatbot._question_vectors = OrderedDict()
+        chatbot.vectorstore = mock.Mock()
+        chatbot.vectorstore._embed_query.side_effect = lambda question: self.vectors[question]
+        
+        with mock.patch.object(chatbot_module, "answer_cache", self.cache), \
+                mock.patch.object(chatbot_module, "get_vectorstore_version", return_value=100), \
+                mock.patch.object(chatbot_module, "QUESTION_VECTOR_CACHE_SIZE", 1):
+            chatbot.cache_response("What did I save about Django?", "Two bookmarks.", [])
+            cached = chatbot.get_cached_response("what have i saved about django")
+        
+        self.assertEqual(cached["answer"], "Two bookmarks.")
+        self.assertEqual([message.content for message in chatbot.memory.chat_memory.messages],
+                         ["what have i saved about django", "Two bookmarks."])
+        self.assertEqual(list(chatbot._question_vectors), ["what have i saved about django"])
+
+
+class QueryRouterTestCase(TestCase):
+    """Test case for answering structured questions from the database"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='routeruser', password='password123')
+        self.category = Category.objects.create(name='Programming', user=self.user)
+        self.tag = Tag.objects.create(name='python', user=self.user)
+        
+        for i in range(3):
+            bookmark = Bookmark.objects.create(
+                url=f'https://example.com/{i}',
+                title=f'Bookmark {i}',
+                user=self.user
+            )
+            bookmark.main_categories.add(self.category)
+            if i > 0:
+                bookmark.tags.add(self.tag)
+    
+    def test_parse_structured_query(self):
+        """Count and listing questions are detected, open-ended ones are not"""
+        from .rag.query_router import parse_structured_query
+        
+        parsed = parse_structured_query("How many bookmarks do I have tagged python in Programming?")
+        self.assertEqual(parsed["intent"], "count")
+        self.assertEqual(parsed["tag"], "python")
+        self.assertEqual(parsed["category"], "Programming")
+        
+        parsed = parse_structured_query("Show me my latest 2 saves in Programming")
+        self.assertEqual((parsed["intent"], parsed["limit"], parsed["category"]), ("latest", 2, "Programming"))
+        
+        self.assertIsNone(parse_structured_query("What did I save about Django templates?"))
+    
+    def test_route_structured_query(self):
+        """Routed questions are answered from the ORM with sources"""
+        from .rag.query_router import route_structured_query
+        
+        routed = route_structured_query(self.user.id, "how many bookmarks tagged PYTHON?")
+        self.assertEqual(routed["answer"], "You have 2 bookmarks tagged 'PYTHON'.")
+        
+        routed = route_structured_query(self.user.id, "list my last 2 bookmarks", category="Programming")
+        self.assertEqual([source["url"] for source in routed["sources"]], ['https://example.com/2', 'https://example.com/1'])
+        
+        self.assertIsNone(route_structured_query(self.user.id, "Summarize my Python bookmarks"))
+    
+    def test_topical_questions_go_to_rag(self):
+        """Topics left after the lookup phrase and unknown tags or categories fall back to RAG"""
+        from .rag.query_router import parse_structured_query, route_structured_query
+        
+        self.assertIsNone(parse_structured_query("How many bookmarks are about machine learning?"))
+        self.assertIsNone(parse_structured_query("latest bookmarks about react"))
+        self.assertIsNone(parse_structured_query("How many bookmarks did I save in 2023?", category_names=["Programming"]))
+        self.assertIsNone(route_structured_query(self.user.id, "How many bookmarks did I save in 2023?"))
+        self.assertIsNone(route_structured_query(self.user.id, "how many bookmarks tagged rust?"))
+        self.assertIsNone(route_structured_query(self.user.id, "latest bookmarks in my Programming category mention async"))
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncChatbotViewsTestCase(TestCase):
+    """chatbot_ask_async and ahandle_streaming_response under the async test client"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='asyncchat', password='password123')
+    
+    def make_chatbot(self):
+        from unittest import mock
+        from langchain.memory import ConversationBufferMemory
+        
+        async def astream_response(message):
+            for chunk in ["You saved ", "two Django ", "bookmarks."]:
+                yield chunk
+        
+        chatbot = mock.Mock()
+        chatbot.memory = ConversationBufferMemory(return_messages=True, input_key="question", output_key="answer")
+        chatbot.can_use_cache.return_value = False
+        chatbot.aroute_query = mock.AsyncMock(return_value=None)
+        chatbot.aget_response = mock.AsyncMock(return_value={"answer": "You saved two Django bookmarks.", "sources": []})
+        chatbot.astream_response = astream_response
+        chatbot.last_sources = [{"title": "Django", "url": "https://www.djangoproject.com"}]
+        chatbot.stream_response.side_effect = AssertionError("blocking stream")
+        chatbot.get_response.side_effect = AssertionError("blocking LLM call")
+        return chatbot
+    
+    async def ask(self, chatbot, **body):
+        from unittest import mock
+        
+        await self.async_client.aforce_login(self.user)
+        with mock.patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                mock.patch.object(views_chatbot, "BookmarkChatbot", return_value=chatbot):
+            response = await self.async_client.post('/chatbot/ask/', json.dumps(dict(message="django bookmarks", **body)),
+                                                    content_type='application/json')
+            if response.streaming:
+                return response, [json.loads(line) async for line in response.streaming_content]
+            return response, None
+    
+    async def test_chatbot_ask_async(self):
+        from .models import ChatMessage
+        
+        chatbot = self.make_chatbot()
+        response, _ = await self.ask(chatbot)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["message"], "You saved two Django bookmarks.")
+        chatbot.aget_response.assert_awaited_once_with("django bookmarks", use_cache=True)
+        saved = [message.content async for message in ChatMessage.objects.filter(is_user=False)]
+        self.assertEqual(saved, ["You saved two Django bookmarks."])
+    
+    async def test_streamed_answer(self):
+        from .models import ChatMessage
+        
+        response, events = await self.ask(self.make_chatbot(), stream=True)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event["type"] for event in events],
+                         ["metadata", "title", "content", "content", "content", "completion"])
+        self.assertEqual("".join(event["chunk"] for event in events if event["type"] == "content"),
+                         "You saved two Django bookmarks.")
+        self.assertEqual(events[-1]["sources"], [{"title": "Django", "url": "https://www.djangoproject.com"}])
+        saved = [message.content async for message in ChatMessage.objects.filter(is_user=False)]
+        self.assertEqual(saved, ["You saved two Django bookmarks."])
+
+
+class TitleGeneratorTestCase(TestCase):
+    """Test case for background conversation title helpers"""
+    
+    def test_clean_title(self):
+        """Prefixes and wrapping quotes are removed, unusable titles fall back to the message"""
+        from .rag.title_generator import clean_title
+        
+        self.assertEqual(clean_title('Title: "Django Bookmarks"', "x"), "Django Bookmarks")
+        self.assertEqual(clean_title("", "What did I save about Django last week?"), "What did I save about...")
+        self.assertEqual(len(clean_title("a" * 150, "x")), 100)
+    
+    def test_generate_title_without_api_key(self):
+        """Without an API key the title is derived from the message instead of failing"""
+        from .rag.title_generator import generate_title
+        
+        previous = os.environ.pop("GEMINI_API_KEY", None)
+        try:
+            self.assertEqual(generate_title("python tutorials"), "python tutorials")
+        finally:
+            if previous is not None:
+                os.environ["GEMINI_API_KEY"] = previous
+    
+    def test_sync_stream_does_not_wait_for_title(self):
+        """The sync stream ends at completion with title_pending; the UI polls for the title"""
+        import json
+        import time
+        import threading
+        from unittest import mock
+        from concurrent.futures import ThreadPoolExecutor
+        from .models import ChatConversation
+        from .views_chatbot import handle_streaming_response
+        
+        user = User.objects.create_user(username='titleuser', password='password123')
+        conversation = ChatConversation.objects.create(user=user, title="PENDING_AI_TITLE")
+        chatbot = mock.Mock()
+        chatbot.can_use_cache.return_value = False
+        chatbot.route_query.return_value = {"answer": "You have 3 bookmarks.", "sources": []}
+        release = threading.Event()
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            title_future = executor.submit(lambda: release.wait(5) and "Bookmark Count")
+            started = time.monotonic()
+            response = handle_streaming_response(chatbot, "how many bookmarks?", conversation, title_future)
+            events = [json.loads(line) for line in response.streaming_content]
+            elapsed = time.monotonic() - started
+            release.set()
+        
+        self.assertEqual([event["type"] for event in events], ["metadata", "content", "completion"])
+        self.assertTrue(events[2]["title_pending"])
+        self.assertLess(elapsed, 1)
+    
+    async def test_async_stream_sends_title_after_completion(self):
+        """A title that finishes after the answer is still sent by the async stream, after the completion event"""
+        import json
+        import time
+        from unittest import mock
+        from concurrent.futures import ThreadPoolExecutor
+        from .models import ChatConversation
+        from .views_chatbot import ahandle_streaming_response
+        
+        user = await User.objects.acreate(username='titleuser')
+        conversation = await ChatConversation.objects.acreate(user=user, title="PENDING_AI_TITLE")
+        chatbot = mock.Mock()
+        chatbot.can_use_cache.return_value = False
+        chatbot.aroute_query = mock.AsyncMock(return_value={"answer": "You have 3 bookmarks.", "sources": []})
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            title_future = executor.submit(lambda: time.sleep(0.2) or "Bookmark Count")
+            response = ahandle_streaming_response(chatbot, "how many bookmarks?", conversation, title_future)
+            events = [json.loads(line) async for line in response.streaming_content]
+        
+        self.assertEqual([event["type"] for event in events], ["metadata", "content", "completion", "title"])
+        self.assertTrue(events[2]["title_pending"])
+        self.assertEqual(events[3]["title"], "Bookmark Count")
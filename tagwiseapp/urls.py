@@ -1,4 +1,5 @@
 from django.urls import path, include
+from django.conf import settings
 from . import views
 from . import views_chatbot
 app_name = 'tagwiseapp'
@@ -30,7 +31,8 @@ urlpatterns = [
     path('topics/', views.topics, name="topics"),
     path('tagged-bookmarks/', views.tagged_bookmarks, name="tagged_bookmarks"),
     path('test/', views.test_page, name='test_page'),
-    path('api/analyze-url/', views.analyze_url, name='analyze_url'),
+    path('api/analyze-url/', views.analyze_url_async if settings.ASYNC_VIEWS else views.analyze_url, name='analyze_url'),
+    path('api/analyze-url/stats/', views.analyze_url_stats, name='analyze_url_stats'),
     path('api/save-bookmark/', views.save_bookmark, name='save_bookmark'),
     path('api/update-bookmark/', views.update_bookmark, name='update_bookmark'),
     path('api/test-url/', views.test_url, name='test_url'),
@@ -47,8 +49,9 @@ urlpatterns = [
     
     # Chatbot endpoints
     path('chatbot/init/', views_chatbot.chatbot_init, name='chatbot_init'),
-    path('chatbot/ask/', views_chatbot.chatbot_ask, name='chatbot_ask'),
+    path('chatbot/ask/', views_chatbot.chatbot_ask_async if settings.ASYNC_VIEWS else views_chatbot.chatbot_ask, name='chatbot_ask'),
     path('chatbot/reset/', views_chatbot.chatbot_reset, name='chatbot_reset'),
+    path('chatbot/cache-stats/', views_chatbot.chatbot_cache_stats, name='chatbot_cache_stats'),
     
     # Chatbot conversation management
     path('chatbot/conversations/', views_chatbot.get_conversations, name='get_conversations'),
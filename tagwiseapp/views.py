@@ -6,13 +6,14 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 import json
 import os
-from .reader.html_fetcher import fetch_html
+import asyncio
+from .reader.html_fetcher import fetch_html, afetch_html
 from .reader.content_extractor import extract_content
-from .reader.content_analyzer import categorize_content
+from .reader.content_analyzer import categorize_content, acategorize_content, match_result_to_user
 from .reader.screenshot import capture_screenshot
 from .reader.content_analyzer import analyze_screenshot
 from .models import Bookmark, Category, Tag, Collection, Profile
-from django.db import models
+from django.db import models, connections
 from collections import Counter
 from django.contrib import messages
 from django.conf import settings
@@ -23,9 +24,11 @@ import time
 import traceback
 from django.db.models import Q, Count
 from django.utils import timezone
+from .reader.single_flight import url_analysis_flight, normalize_url_key
 from .reader.youtube_analyzer import is_youtube_url, analyze_youtube_video, extract_youtube_video_id, fetch_youtube_thumbnail
 from django.views.decorators.http import require_POST
 from django.utils import translation
+from asgiref.sync import sync_to_async
 
 # Create your views here.
 
@@ -281,203 +284,37 @@ def analyze_url(request):
                 url = 'https://' + url
                 print(f"URL düzeltildi: {url}")
             
-            # Thumbnails dizininin varlığını kontrol et ve yoksa oluştur
-            thumbnails_dir = os.path.join('media', 'thumbnails')
-            if not os.path.exists(thumbnails_dir):
-                os.makedirs(thumbnails_dir, exist_ok=True)
-                print(f"Thumbnails dizini oluşturuldu: {thumbnails_dir}")
+            return run_url_analysis(url, request.user)
             
-            # YouTube URL kontrolü yap
-            if is_youtube_url(url):
-                print(f"YouTube URL'i tespit edildi, YouTube analizörü kullanılıyor: {url}")
-                
-                # YouTube video ID'sini çıkar
-                video_id = extract_youtube_video_id(url)
-                
-                if video_id:
-                    # YouTube thumbnail'ini indir
-                    print(f"YouTube thumbnail indiriliyor: {video_id}")
-                    thumbnail_data = fetch_youtube_thumbnail(video_id)
-                    
-                    if thumbnail_data:
-                        # Benzersiz dosya adı oluştur
-                        import uuid
-                        filename = f"youtube_{video_id}_{uuid.uuid4()}.jpg"
-                        thumbnail_path = os.path.join('media', 'thumbnails', filename)
-                        
-                        # Thumbnail'i kaydet
-                        with open(thumbnail_path, 'wb') as f:
-                            f.write(thumbnail_data)
-                        
-                        # Thumbnail yolu için normalize et
-                        screenshot_path = normalize_thumbnail_path(thumbnail_path)
-                        print(f"YouTube thumbnail kaydedildi: {screenshot_path}")
-                
-                # YouTube analizini yap - kullanıcıyı analize ilet
-                result = analyze_youtube_video(url, user=request.user)
-                
-                if result:
-                    print(f"YouTube analizi tamamlandı: {result}")
-                    
-                    # Eğer thumbnail kaydedildiyse, sonuca ekle
-                    if 'screenshot_path' in locals():
-                        result['screenshot_data'] = screenshot_path
-                        result['screenshot_used'] = False  # Ekran görüntüsü değil, orijinal thumbnail
-                    
-                    # YouTube analizinden gelen sonucu döndür
-                    converted_result = convert_api_format_for_frontend(result)
-                    return JsonResponse(converted_result)
-                else:
-                    print("YouTube analizi başarısız oldu, standart analiz deneniyor...")
+        except Exception as e:
+            print(f"Hata: {str(e)}")
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Geçersiz istek'}, status=400)
+
+@csrf_exempt
+@login_required(login_url='tagwiseapp:login')
+async def analyze_url_async(request):
+    """
+    analyze_url'in asenkron versiyonu; ASGI modunda kullanılır.
+    Sayfa ve thumbnail httpx.AsyncClient ile çekilir, LLM analizi LLMChain.arun ile
+    yapılır; ORM işleri sync_to_async ile çalışır (bkz. aanalyze_url_once).
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            url = data.get('url')
             
-            # YouTube analizi yapılmadıysa veya başarısız olduysa, standart analizi devam ettir
+            if not url:
+                return JsonResponse({'error': 'URL gereklidir'}, status=400)
             
-            # Fetch HTML content
-            print("HTML içeriği alınıyor...")
-            html = fetch_html(url)
-            content = None
-            category_json = None
-            screenshot_path = None
-            screenshot_used = False
-            screenshot = None  # Initialize screenshot variable to avoid reference error
+            # URL formatını kontrol et
+            if not url.startswith(('http://', 'https://')):
+                url = 'https://' + url
             
-            if html:
-                print("HTML içeriği alındı, içerik çıkarılıyor...")
-                # Extract main content
-                content = extract_content(html)
-                
-                # HTML'den thumbnail almayı dene
-                from .reader.utils import extract_thumbnail_from_html
-                thumbnail = extract_thumbnail_from_html(html, url)
-                
-                if thumbnail:
-                    print("HTML'den thumbnail alındı")
-                    # Generate a unique filename for the thumbnail
-                    import uuid
-                    filename = f"{uuid.uuid4()}.png"
-                    
-                    # Ensure the path exists
-                    thumbnails_dir = os.path.join('media', 'thumbnails')
-                    if not os.path.exists(thumbnails_dir):
-                        os.makedirs(thumbnails_dir, exist_ok=True)
-                        print(f"Thumbnails dizini oluşturuldu: {thumbnails_dir}")
-                    
-                    thumbnail_path = os.path.join('media', 'thumbnails', filename)
-                    
-                    # Save the thumbnail
-                    with open(thumbnail_path, 'wb') as f:
-                        f.write(thumbnail)
-                    
-                    # Store the relative path in screenshot_path - normalize the path
-                    screenshot_path = normalize_thumbnail_path(thumbnail_path)
-                    screenshot_used = False
-                else:
-                    print("HTML'den thumbnail alınamadı, ekran görüntüsü alınıyor...")
-                    # Take screenshot as fallback
-                    screenshot = capture_screenshot(url)
-                    
-                    if screenshot:
-                        # Generate a unique filename for the screenshot
-                        import uuid
-                        filename = f"{uuid.uuid4()}.png"
-                        
-                        # Ensure the path exists
-                        thumbnails_dir = os.path.join('media', 'thumbnails')
-                        if not os.path.exists(thumbnails_dir):
-                            os.makedirs(thumbnails_dir, exist_ok=True)
-                            print(f"Thumbnails dizini oluşturuldu: {thumbnails_dir}")
-                        
-                        thumbnail_path = os.path.join('media', 'thumbnails', filename)
-                        
-                        # Save the screenshot
-                        with open(thumbnail_path, 'wb') as f:
-                            f.write(screenshot)
-                        
-                        # Store the relative path in screenshot_path - normalize the path
-                        screenshot_path = normalize_thumbnail_path(thumbnail_path)
-                        screenshot_used = True
+            user = await request.auser()
             
-            # HTML içeriği alınamadıysa veya içerik çıkarılamazsa, ekran görüntüsünden kategorize et
-            if not html or not content or len(content.strip()) < 50:
-                print("HTML içeriği alınamadı veya içerik yetersiz, ekran görüntüsünden analiz yapılıyor...")
-                
-                # Eğer halihazırda bir ekran görüntüsü yoksa, şimdi al
-                if not screenshot:
-                    screenshot = capture_screenshot(url)
-                
-                if screenshot:
-                    # Convert binary screenshot to base64 for analysis
-                    screenshot_base64 = base64.b64encode(screenshot).decode('utf-8')
-                    # Ekran görüntüsünü Gemini ile analiz et ve kategorize et
-                    # Kullanıcıyı analize ilet
-                    category_json = analyze_screenshot(screenshot_base64, url, user=request.user)
-                    screenshot_used = True
-            
-            # Eğer ekran görüntüsü analizi yapılmadıysa veya başarısız olduysa, HTML içeriğini kategorize et
-            if not category_json and content:
-                print("İçerik çıkarıldı, kategorize ediliyor...")
-                # Kategorize içerik - kullanıcıyı analize ilet
-                category_json = categorize_content(content, url, user=request.user)
-            
-            if not content and not category_json:
-                return JsonResponse({'error': 'İçerik alınamadı veya analiz edilemedi'}, status=400)
-            
-            print(f"Kategori JSON: {category_json}")
-            
-            # Parse JSON string to dict
-            try:
-                if isinstance(category_json, str):
-                    result = json.loads(category_json)
-                else:
-                    result = category_json
-                
-                # Add screenshot_used flag and screenshot path to result
-                if isinstance(result, dict):
-                    result['screenshot_used'] = screenshot_used
-                    if screenshot_path:
-                        result['screenshot_data'] = screenshot_path
-                    
-                    # Tags kısmını kontrol et
-                    if 'tags' in result:
-                        print(f"Result'ta tags var. Tags: {result['tags']}")
-                    else:
-                        print("Result'ta tags yok.")
-                
-                # Frontend'in beklediği formata dönüştür
-                converted_result = convert_api_format_for_frontend(result)
-                return JsonResponse(converted_result)
-            except json.JSONDecodeError:
-                # If JSON parsing fails, try to use the corrected JSON from the categorization function
-                print("JSON ayrıştırma hatası: Hata düzeltme mekanizması deneniyor...")
-                try:
-                    from .reader.utils import ensure_correct_json_structure
-                    
-                    # Fallback JSON oluştur
-                    fallback_json = ensure_correct_json_structure({}, url)
-                    
-                    # Add screenshot_used flag and screenshot path to result
-                    fallback_json['screenshot_used'] = screenshot_used
-                    if screenshot_path:
-                        fallback_json['screenshot_data'] = screenshot_path
-                    
-                    # Tags kısmını kontrol et
-                    if 'tags' in fallback_json:
-                        print(f"Fallback JSON'da tags var. Tags: {fallback_json['tags']}")
-                    else:
-                        print("Fallback JSON'da tags yok. Boş dizi ekleniyor.")
-                        fallback_json['tags'] = []
-                    
-                    print(f"Düzeltilmiş fallback JSON: {fallback_json}")
-                    converted_fallback = convert_api_format_for_frontend(fallback_json)
-                    return JsonResponse(converted_fallback)
-                except Exception as fallback_error:
-                    print(f"Fallback JSON hatası: {fallback_error}")
-                    # If everything fails, return the raw string
-                    return JsonResponse({
-                        'raw_result': category_json,
-                        'screenshot_used': screenshot_used,
-                        'screenshot_data': screenshot_path
-                    })
+            return await arun_url_analysis(url, user)
             
         except Exception as e:
             print(f"Hata: {str(e)}")
@@ -485,6 +322,367 @@ def analyze_url(request):
     
     return JsonResponse({'error': 'Geçersiz istek'}, status=400)
 
+async def arun_url_analysis(url, user):
+    """
+    run_url_analysis'in asenkron versiyonu; aynı uçuş grubunu paylaşır, böylece
+    senkron ve asenkron istekler aynı URL için tek analiz yapar.
+    
+    Args:
+        url (str): Analiz edilecek URL (protokol eklenmiş)
+        user: Analizi yapan kullanıcı
+        
+    Returns:
+        JsonResponse: Analiz sonucu
+    """
+    outcome, shared = await url_analysis_flight.ado(normalize_url_key(url), lambda: aanalyze_url_once(url, user))
+    data = outcome['data']
+    if outcome['status'] != 200:
+        return JsonResponse(data, status=outcome['status'])
+    
+    if 'raw_result' not in data:
+        if shared:
+            print(f"Paylaşılan analiz sonucu kullanıcıya göre eşleştiriliyor: {url}")
+        # Kullanıcının kategori ve etiketleri veritabanından okunur
+        data = await sync_to_async(match_result_to_user)(data, user)
+    
+    # Frontend'in beklediği formata dönüştür
+    return JsonResponse(convert_api_format_for_frontend(data))
+
+async def aanalyze_url_once(url, user):
+    """
+    analyze_url_once'ın asenkron versiyonu.
+    
+    HTML afetch_html ile çekilir; thumbnail indirme ve LLM analizi (acategorize_content)
+    event loop'ta eşzamanlı çalışır. Yalnızca senkron kütüphanelere dayanan işler bir
+    worker thread'ine verilir: YouTube analizi (youtube-transcript-api), Selenium ile
+    alınan ekran görüntüsü ve içerik yetersizse ekran görüntüsünden yapılan analiz.
+    
+    Args:
+        url (str): Analiz edilecek URL (protokol eklenmiş)
+        user: Analizi yapan kullanıcı (kategori önerileri için)
+        
+    Returns:
+        dict: analyze_url_once ile aynı biçimde sonuç
+    """
+    from .reader.parsed_page import ParsedPage
+    from .reader.settings import STAGE_TIMEOUTS
+    from .reader.stage_graph import arun_stage
+    from .reader.utils import aextract_thumbnail_from_html
+    
+    if is_youtube_url(url):
+        return await sync_to_async(analyze_url_once_in_worker, thread_sensitive=False)(url, user)
+    
+    print("HTML içeriği alınıyor (async)...")
+    html = await afetch_html(url)
+    page = None
+    content = None
+    if html:
+        # HTML bir kez ayrıştırılır; içerik ve thumbnail aynı ağaçtan çıkarılır
+        page = ParsedPage(html, url)
+        content = extract_content(page)
+    
+    content_sufficient = bool(html and content and len(content.strip()) >= 50)
+    if not content_sufficient:
+        # Ekran görüntüsünden analiz Selenium'a bağlı; HTML tekrar çekilmez
+        print("HTML içeriği alınamadı veya içerik yetersiz, ekran görüntüsünden analiz yapılıyor...")
+        return await sync_to_async(analyze_url_once_in_worker, thread_sensitive=False)(url, user, html=html, fetch=False)
+    
+    async def thumbnail_or_screenshot():
+        thumbnail = await arun_stage("thumbnail", aextract_thumbnail_from_html(page, url), STAGE_TIMEOUTS["thumbnail"])
+        if thumbnail:
+            return thumbnail, None
+        # Ekran görüntüsü yalnızca HTML'den thumbnail alınamazsa gerekir (Selenium senkron çalışır)
+        screenshot = await arun_stage("screenshot", sync_to_async(capture_screenshot, thread_sensitive=False)(url),
+                                      STAGE_TIMEOUTS["screenshot"])
+        return None, screenshot
+    
+    print("İçerik çıkarıldı, kategorize ediliyor (async)...")
+    (thumbnail, screenshot), category_json = await asyncio.gather(
+        thumbnail_or_screenshot(),
+        arun_stage("analysis", acategorize_content(page, url, user=user, match=False), STAGE_TIMEOUTS["analysis"]),
+    )
+    return finish_url_analysis(url, content, content_sufficient, thumbnail, screenshot, category_json)
+
+def analyze_url_once_in_worker(url, user, html=None, fetch=True):
+    """
+    analyze_url_once'ı sync_to_async(thread_sensitive=False) worker thread'inde çalıştırır.
+    Analiz paralel çalışabilsin diye paylaşılan ORM thread'i kullanılmaz; thread'in
+    açtığı veritabanı bağlantıları iş bitince kapatılır.
+    """
+    try:
+        return analyze_url_once(url, user, html=html, fetch=fetch)
+    finally:
+        connections.close_all()
+
+@login_required(login_url='tagwiseapp:login')
+def analyze_url_stats(request):
+    """Aynı URL için birleştirilen (coalesced) analiz isteklerinin sayıları (yalnızca süper kullanıcılar)"""
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Yetkisiz erişim'}, status=403)
+    
+    return JsonResponse({'status': 'success', 'stats': url_analysis_flight.get_stats()})
+
+def run_url_analysis(url, user, html=None, fetch=True):
+    """
+    URL'yi analiz eder ve frontend için JSON yanıtı döndürür.
+    
+    Aynı URL için eşzamanlı gelen istekler tek bir analizi paylaşır
+    (sayfa çekme, ekran görüntüsü ve LLM çağrısı bir kez yapılır). Paylaşılan
+    sonuç eşleştirilmemiş LLM çıktısıdır; kategori ve etiketler uçuşun dışında,
+    analizi başlatan dahil her kullanıcının kendi kategori ve etiketleriyle eşleştirilir.
+    
+    Args:
+        url (str): Analiz edilecek URL (protokol eklenmiş)
+        user: Analizi yapan kullanıcı
+        html (str, optional): Önceden çekilmiş HTML içeriği
+        fetch (bool): False ise HTML tekrar çekilmez, verilen html kullanılır
+        
+    Returns:
+        JsonResponse: Analiz sonucu
+    """
+    outcome, shared = url_analysis_flight.do(
+        normalize_url_key(url), lambda: analyze_url_once(url, user, html=html, fetch=fetch)
+    )
+    data = outcome['data']
+    if outcome['status'] != 200:
+        return JsonResponse(data, status=outcome['status'])
+    
+    if 'raw_result' not in data:
+        if shared:
+            print(f"Paylaşılan analiz sonucu kullanıcıya göre eşleştiriliyor: {url}")
+        data = match_result_to_user(data, user)
+    
+    # Frontend'in beklediği formata dönüştür
+    return JsonResponse(convert_api_format_for_frontend(data))
+
+def analysis_outcome(data, status=200):
+    """analyze_url_once sonucu: HTTP durum kodu ve analiz sonucu veya hata"""
+    return {'status': status, 'data': data}
+
+def analyze_url_once(url, user, html=None, fetch=True):
+    """
+    URL'yi analiz eder (run_url_analysis'in tek uçuşta çalışan kısmı).
+    
+    Args:
+        url (str): Analiz edilecek URL (protokol eklenmiş)
+        user: Analizi yapan kullanıcı (kategori önerileri için)
+        html (str, optional): Önceden çekilmiş HTML içeriği
+        fetch (bool): False ise HTML tekrar çekilmez, verilen html kullanılır
+        
+    Returns:
+        dict: HTTP durum kodu ('status') ve analiz sonucu veya hata ('data');
+            JSON'a çevrilebilir. Kategori ve etiketler eşleştirilmemiştir
+            (bkz. match_result_to_user)
+    """
+    # Thumbnails dizininin varlığını kontrol et ve yoksa oluştur
+    thumbnails_dir = os.path.join('media', 'thumbnails')
+    if not os.path.exists(thumbnails_dir):
+        os.makedirs(thumbnails_dir, exist_ok=True)
+        print(f"Thumbnails dizini oluşturuldu: {thumbnails_dir}")
+    
+    # YouTube URL kontrolü yap
+    if is_youtube_url(url):
+        print(f"YouTube URL'i tespit edildi, YouTube analizörü kullanılıyor: {url}")
+        
+        # YouTube video ID'sini çıkar
+        video_id = extract_youtube_video_id(url)
+        
+        # Thumbnail indirme ve video analizi eşzamanlı çalışır
+        from .reader.stage_graph import StageGraph
+        from .reader.settings import STAGE_TIMEOUTS
+        graph = StageGraph("youtube-analysis")
+        if video_id:
+            print(f"YouTube thumbnail indiriliyor: {video_id}")
+            graph.add("thumbnail", lambda: fetch_youtube_thumbnail(video_id), timeout=STAGE_TIMEOUTS["thumbnail"])
+        # YouTube analizini yap - kullanıcıyı analize ilet
+        graph.add("analysis", lambda: analyze_youtube_video(url, user=user, match=False), timeout=STAGE_TIMEOUTS["analysis"])
+        stages = graph.run()
+        
+        thumbnail_data = stages.get("thumbnail")
+        if thumbnail_data:
+            # Benzersiz dosya adı oluştur
+            import uuid
+            filename = f"youtube_{video_id}_{uuid.uuid4()}.jpg"
+            thumbnail_path = os.path.join('media', 'thumbnails', filename)
+            
+            # Thumbnail'i kaydet
+            with open(thumbnail_path, 'wb') as f:
+                f.write(thumbnail_data)
+            
+            # Thumbnail yolu için normalize et
+            screenshot_path = normalize_thumbnail_path(thumbnail_path)
+            print(f"YouTube thumbnail kaydedildi: {screenshot_path}")
+        
+        result = stages["analysis"]
+        
+        if result:
+            print(f"YouTube analizi tamamlandı: {result}")
+            
+            # Eğer thumbnail kaydedildiyse, sonuca ekle
+            if 'screenshot_path' in locals():
+                result['screenshot_data'] = screenshot_path
+                result['screenshot_used'] = False  # Ekran görüntüsü değil, orijinal thumbnail
+            
+            # YouTube analizinden gelen sonucu döndür
+            return analysis_outcome(result)
+        else:
+            print("YouTube analizi başarısız oldu, standart analiz deneniyor...")
+    
+    # YouTube analizi yapılmadıysa veya başarısız olduysa, standart analizi devam ettir
+    
+    # Fetch HTML content
+    if fetch:
+        print("HTML içeriği alınıyor...")
+        html = fetch_html(url)
+    page = None
+    content = None
+    
+    if html:
+        print("HTML içeriği alındı, içerik çıkarılıyor...")
+        # HTML bir kez ayrıştırılır; içerik ve thumbnail aynı ağaçtan çıkarılır
+        from .reader.parsed_page import ParsedPage
+        page = ParsedPage(html, url)
+        
+        # Extract main content
+        content = extract_content(page)
+    
+    # İçerik yeterliyse LLM analizi thumbnail/ekran görüntüsü ile eşzamanlı çalışır;
+    # değilse ekran görüntüsü hemen alınır ve analiz ondan yapılır
+    content_sufficient = bool(html and content and len(content.strip()) >= 50)
+    
+    from .reader.stage_graph import StageGraph
+    from .reader.settings import STAGE_TIMEOUTS
+    from .reader.utils import extract_thumbnail_from_html
+    graph = StageGraph("url-analysis")
+    if html:
+        # HTML'den thumbnail almayı dene
+        graph.add("thumbnail", lambda: extract_thumbnail_from_html(page, url), timeout=STAGE_TIMEOUTS["thumbnail"])
+    
+    if content_sufficient:
+        print("İçerik çıkarıldı, kategorize ediliyor...")
+        # Kategorize içerik - kullanıcıyı analize ilet (sayfanın okunabilir özeti gönderilir)
+        graph.add("analysis", lambda: categorize_content(page, url, user=user, match=False), timeout=STAGE_TIMEOUTS["analysis"])
+        # Ekran görüntüsü yalnızca HTML'den thumbnail alınamazsa gerekir
+        graph.add("screenshot", lambda thumbnail: capture_screenshot(url), deps=["thumbnail"],
+                  when=lambda thumbnail: not thumbnail, timeout=STAGE_TIMEOUTS["screenshot"])
+    else:
+        # HTML içeriği alınamadıysa veya içerik yetersizse, ekran görüntüsünden kategorize et
+        print("HTML içeriği alınamadı veya içerik yetersiz, ekran görüntüsünden analiz yapılıyor...")
+        graph.add("screenshot", lambda: capture_screenshot(url), timeout=STAGE_TIMEOUTS["screenshot"])
+        # Ekran görüntüsünü Gemini ile analiz et ve kategorize et - kullanıcıyı analize ilet
+        graph.add("screenshot_analysis",
+                  lambda screenshot: analyze_screenshot(base64.b64encode(screenshot).decode('utf-8'), url, user=user, match=False),
+                  deps=["screenshot"], when=lambda screenshot: bool(screenshot), timeout=STAGE_TIMEOUTS["analysis"])
+        # Ekran görüntüsü analizi yapılmadıysa veya başarısız olduysa, HTML içeriğini kategorize et
+        graph.add("analysis", lambda screenshot_analysis: categorize_content(page, url, user=user, match=False),
+                  deps=["screenshot_analysis"], when=lambda screenshot_analysis: not screenshot_analysis and bool(content),
+                  timeout=STAGE_TIMEOUTS["analysis"])
+    
+    stages = graph.run()
+    return finish_url_analysis(url, content, content_sufficient, stages.get("thumbnail"), stages.get("screenshot"),
+                               stages.get("screenshot_analysis") or stages.get("analysis"))
+
+def finish_url_analysis(url, content, content_sufficient, thumbnail, screenshot, category_json):
+    """
+    Analiz aşamalarının sonuçlarından analyze_url_once sonucunu oluşturur
+    (thumbnail veya ekran görüntüsü kaydedilir, LLM sonucu ayrıştırılır).
+    
+    Args:
+        url (str): Analiz edilen URL
+        content (str): Sayfadan çıkarılan içerik
+        content_sufficient (bool): İçerik LLM analizi için yeterli miydi
+        thumbnail (bytes): HTML'den alınan thumbnail
+        screenshot (bytes): Ekran görüntüsü
+        category_json (dict or str): LLM analiz sonucu
+        
+    Returns:
+        dict: analyze_url_once ile aynı biçimde sonuç
+    """
+    screenshot_path = None
+    screenshot_used = False
+    
+    if thumbnail or screenshot:
+        print("HTML'den thumbnail alındı" if thumbnail else "Ekran görüntüsü thumbnail olarak kaydediliyor...")
+        # Generate a unique filename for the thumbnail
+        import uuid
+        filename = f"{uuid.uuid4()}.png"
+        
+        # Ensure the path exists
+        thumbnails_dir = os.path.join('media', 'thumbnails')
+        if not os.path.exists(thumbnails_dir):
+            os.makedirs(thumbnails_dir, exist_ok=True)
+            print(f"Thumbnails dizini oluşturuldu: {thumbnails_dir}")
+        
+        thumbnail_path = os.path.join('media', 'thumbnails', filename)
+        
+        # Save the thumbnail (or the screenshot taken in its place)
+        with open(thumbnail_path, 'wb') as f:
+            f.write(thumbnail or screenshot)
+        
+        # Store the relative path in screenshot_path - normalize the path
+        screenshot_path = normalize_thumbnail_path(thumbnail_path)
+        screenshot_used = not thumbnail
+    
+    if screenshot and not content_sufficient:
+        screenshot_used = True
+    
+    if not content and not category_json:
+        return analysis_outcome({'error': 'İçerik alınamadı veya analiz edilemedi'}, status=400)
+    
+    print(f"Kategori JSON: {category_json}")
+    
+    # Parse JSON string to dict
+    try:
+        if isinstance(category_json, str):
+            result = json.loads(category_json)
+        else:
+            result = category_json
+        
+        # Add screenshot_used flag and screenshot path to result
+        if isinstance(result, dict):
+            result['screenshot_used'] = screenshot_used
+            if screenshot_path:
+                result['screenshot_data'] = screenshot_path
+            
+            # Tags kısmını kontrol et
+            if 'tags' in result:
+                print(f"Result'ta tags var. Tags: {result['tags']}")
+            else:
+                print("Result'ta tags yok.")
+        
+        return analysis_outcome(result)
+    except json.JSONDecodeError:
+        # If JSON parsing fails, try to use the corrected JSON from the categorization function
+        print("JSON ayrıştırma hatası: Hata düzeltme mekanizması deneniyor...")
+        try:
+            from .reader.utils import ensure_correct_json_structure
+            
+            # Fallback JSON oluştur
+            fallback_json = ensure_correct_json_structure({}, url)
+            
+            # Add screenshot_used flag and screenshot path to result
+            fallback_json['screenshot_used'] = screenshot_used
+            if screenshot_path:
+                fallback_json['screenshot_data'] = screenshot_path
+            
+            # Tags kısmını kontrol et
+            if 'tags' in fallback_json:
+                print(f"Fallback JSON'da tags var. Tags: {fallback_json['tags']}")
+            else:
+                print("Fallback JSON'da tags yok. Boş dizi ekleniyor.")
+                fallback_json['tags'] = []
+            
+            print(f"Düzeltilmiş fallback JSON: {fallback_json}")
+            return analysis_outcome(fallback_json)
+        except Exception as fallback_error:
+            print(f"Fallback JSON hatası: {fallback_error}")
+            # If everything fails, return the raw string
+            return analysis_outcome({
+                'raw_result': category_json,
+                'screenshot_used': screenshot_used,
+                'screenshot_data': screenshot_path
+            })
+
 def convert_api_format_for_frontend(data):
     """
     API'dan gelen veri formatını frontend'in beklediği formata dönüştürür.
@@ -7,14 +7,14 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import ensure_csrf_cookie
 from .rag.chatbot import BookmarkChatbot
 from .rag.indexer import index_user_bookmarks
+from .rag.answer_cache import answer_cache
+from .rag.title_generator import PENDING_AI_TITLE, TITLE_WAIT_TIMEOUT, schedule_title_generation
 from .models import ChatConversation, ChatMessage
 from django.shortcuts import get_object_or_404
 from django.db.models import Max
 import time
 import asyncio
-
-# Define constants
-PENDING_AI_TITLE = "PENDING_AI_TITLE"
+from asgiref.sync import sync_to_async
 
 logger = logging.getLogger(__name__)
 
@@ -56,6 +56,65 @@ def chatbot_init(request):
             "message": "Failed to initialize chatbot. Please try again later."
         }, status=500)
 
+def get_or_create_conversation(user, conversation_id):
+    """Get the user's conversation, or create a new one awaiting an AI title"""
+    if conversation_id:
+        try:
+            return ChatConversation.objects.get(id=conversation_id, user=user)
+        except ChatConversation.DoesNotExist:
+            # If conversation doesn't exist or doesn't belong to user, create a new one
+            conversation = ChatConversation.objects.create(
+                user=user,
+                title=PENDING_AI_TITLE  # Will be replaced with AI generated title
+            )
+            logger.info(f"Created replacement conversation with id {conversation.id} (existing one not found)")
+            return conversation
+    
+    # Create a new conversation
+    conversation = ChatConversation.objects.create(
+        user=user,
+        title=PENDING_AI_TITLE  # Will be replaced with AI generated title
+    )
+    logger.info(f"Created new conversation with id {conversation.id} (no conversation_id provided)")
+    return conversation
+
+def load_conversation_memory(chatbot, conversation):
+    """Load previous messages from a conversation into chatbot memory"""
+    previous_messages = ChatMessage.objects.filter(conversation=conversation).order_by('created_at')
+    for prev_msg in previous_messages:
+        if prev_msg.is_user:
+            chatbot.memory.chat_memory.add_user_message(prev_msg.content)
+        else:
+            chatbot.memory.chat_memory.add_ai_message(prev_msg.content)
+
+def start_conversation_turn(conversation, message, generate_title, api_key):
+    """
+    Save the user message and schedule title generation if needed.
+    
+    Returns:
+        tuple: (background title task or None, title taken from the first message or None)
+    """
+    ChatMessage.objects.create(
+        conversation=conversation,
+        is_user=True,
+        content=message
+    )
+    
+    is_first_message = conversation.messages.count() <= 1  # Only user message
+    needs_ai_title = is_first_message or conversation.title == PENDING_AI_TITLE
+    if generate_title and needs_ai_title:
+        return schedule_title_generation(conversation.id, message, conversation.title, api_key=api_key), None
+    
+    if is_first_message:
+        # If no AI title requested, use first message
+        words = message.split()[:3]
+        simple_title = " ".join(words) + "..."
+        logger.info(f"Using simple title from first message: '{simple_title}'")
+        conversation.title = simple_title
+        conversation.save()
+        return None, simple_title
+    return None, None
+
 @login_required
 @ensure_csrf_cookie
 @require_http_methods(["POST"])
@@ -69,7 +128,8 @@ def chatbot_ask(request):
         "category": "optional category filter",
         "conversation_id": null or id,  # if null, creates a new conversation
         "generate_title": false,  # if true, generates a title using AI
-        "stream": false  # if true, returns a streaming response
+        "stream": false,  # if true, returns a streaming response
+        "bypass_cache": false  # if true, skips the semantic answer cache
     }
     """
     try:
@@ -96,6 +156,7 @@ def chatbot_ask(request):
         conversation_id = data.get("conversation_id", None)
         generate_title = data.get("generate_title", False)
         stream_response = data.get("stream", False)
+        bypass_cache = data.get("bypass_cache", False)
         
         if not message:
             return JsonResponse({
@@ -107,35 +168,14 @@ def chatbot_ask(request):
         user_id = request.user.id
         
         # Get or create conversation
-        if conversation_id:
-            try:
-                conversation = ChatConversation.objects.get(id=conversation_id, user=request.user)
-            except ChatConversation.DoesNotExist:
-                # If conversation doesn't exist or doesn't belong to user, create a new one
-                conversation = ChatConversation.objects.create(
-                    user=request.user,
-                    title=PENDING_AI_TITLE  # Will be replaced with AI generated title
-                )
-                logger.info(f"Created replacement conversation with id {conversation.id} (existing one not found)")
-        else:
-            # Create a new conversation
-            conversation = ChatConversation.objects.create(
-                user=request.user,
-                title=PENDING_AI_TITLE  # Will be replaced with AI generated title
-            )
-            logger.info(f"Created new conversation with id {conversation.id} (no conversation_id provided)")
+        conversation = get_or_create_conversation(request.user, conversation_id)
         
         # Create chatbot instance
         try:
             chatbot = BookmarkChatbot(user_id)
             
             # Load previous messages from this conversation into chatbot memory
-            previous_messages = ChatMessage.objects.filter(conversation=conversation).order_by('created_at')
-            for prev_msg in previous_messages:
-                if prev_msg.is_user:
-                    chatbot.memory.chat_memory.add_user_message(prev_msg.content)
-                else:
-                    chatbot.memory.chat_memory.add_ai_message(prev_msg.content)
+            load_conversation_memory(chatbot, conversation)
             
         except Exception as e:
             logger.error(f"Error creating chatbot instance: {str(e)}")
@@ -152,20 +192,20 @@ def chatbot_ask(request):
                 logger.error(f"Error applying category filter: {str(e)}")
                 # Continue without filter instead of failing
         
-        # Save user message to database
-        user_message = ChatMessage.objects.create(
-            conversation=conversation,
-            is_user=True,
-            content=message
-        )
+        if bypass_cache:
+            answer_cache.record_bypass()
+        
+        # Save user message and start title generation right away so it runs alongside the answer
+        title_future, simple_title = start_conversation_turn(conversation, message, generate_title, api_key)
         
         # Check if this is a streaming request
         if stream_response:
-            return handle_streaming_response(chatbot, message, conversation, user_message, generate_title)
+            return handle_streaming_response(chatbot, message, conversation, title_future,
+                                             use_cache=not bypass_cache, simple_title=simple_title)
         
         # Handle non-streaming response (original implementation)
         try:
-            response = chatbot.get_response(message)
+            response = chatbot.get_response(message, use_cache=not bypass_cache)
             
             # Save bot response to database
             bot_message = ChatMessage.objects.create(
@@ -174,84 +214,6 @@ def chatbot_ask(request):
                 content=response["answer"]
             )
             
-            # Generate AI title if this is the first message AND generate_title is True
-            # OR if the conversation title is still PENDING_AI_TITLE
-            is_first_message = conversation.messages.count() <= 2  # Only user message and bot response
-            needs_ai_title = is_first_message or conversation.title == PENDING_AI_TITLE
-            
-            if generate_title and needs_ai_title:
-                try:
-                    logger.info(f"Generating title for conversation {conversation.id} using LangChain...")
-                    title_prompt = f"""
-                    Create a concise, descriptive title (3-5 words) for this conversation based on the user's query and AI response below.
-                    The title should reflect the main topic or intent of the conversation.
-                    Do not include phrases like 'Title:', 'Chat about:', or similar prefixes.
-                    Just return the title itself, nothing else.
-                    
-                    User: {user_message}
-                    AI: {response["answer"]}
-                    
-                    Examples:
-                    - "Data Analysis Project Plan"
-                    - "Python Error Debugging"
-                    - "Marketing Strategy Ideas"
-                    - "React Component Design"
-                    
-                    Title:
-                    """
-                    
-                    # Use existing chatbot with same template for title generation
-                    logger.debug("Sending title generation request to LangChain")
-                    title_response = chatbot.ask(title_prompt)
-                    raw_title = ""
-                    
-                    if title_response and hasattr(title_response, 'get') and title_response.get("answer"):
-                        raw_title = title_response.get("answer", "")
-                        logger.debug(f"Raw title received: {raw_title}")
-                    else:
-                        logger.warning("Invalid or empty response from LangChain for title generation")
-                    
-                    # Clean the title (remove common prefixes, quotes, etc.)
-                    title = raw_title.strip()
-                    for prefix in ["Title:", "title:", "Title", "TITLE:", "TITLE", "Chat Title:", "Chat title:"]:
-                        if title.startswith(prefix):
-                            title = title[len(prefix):].strip()
-                    
-                    # Remove quotes if they wrap the entire title
-                    if (title.startswith('"') and title.endswith('"')) or (title.startswith("'") and title.endswith("'")):
-                        title = title[1:-1].strip()
-                    
-                    # Ensure title is not empty and not too long
-                    if not title or len(title) < 3:
-                        # Fallback: use first few words of the user message
-                        truncated_message = " ".join(message.split()[:5])
-                        title = truncated_message + "..." if len(message.split()) > 5 else truncated_message
-                        logger.info(f"Using fallback title based on user message: {title}")
-                    elif len(title) > 100:
-                        title = title[:97] + "..."
-                    
-                    # Update the conversation title in the database
-                    conversation.title = title
-                    conversation.save()
-                    logger.info(f"Updated conversation {conversation.id} title to: {title}")
-                    
-                except Exception as e:
-                    logger.error(f"Error generating title: {str(e)}")
-                    # If title generation fails, set a meaningful title based on the first few words
-                    if conversation.title == PENDING_AI_TITLE:
-                        truncated_message = " ".join(message.split()[:5])
-                        title = truncated_message + "..." if len(message.split()) > 5 else truncated_message
-                        conversation.title = title
-                        conversation.save()
-                        logger.info(f"Set fallback title for conversation {conversation.id}: {title}")
-            elif is_first_message:
-                # If no AI title requested, use first message
-                words = message.split()[:3]
-                simple_title = " ".join(words) + "..."
-                logger.info(f"Using simple title from first message: '{simple_title}'")
-                conversation.title = simple_title
-                conversation.save()
-                
             # Update conversation.updated_at
             conversation.save(update_fields=['updated_at'])
                 
@@ -268,13 +230,21 @@ def chatbot_ask(request):
                 content=response["answer"]
             )
         
+        # The title is only included if it is ready; otherwise it is saved in the background
+        if title_future is not None:
+            conversation_title = get_ready_title(title_future)
+        else:
+            conversation_title = conversation.title
+        
         # Format response
         return JsonResponse({
             "status": "success",
             "message": response["answer"],
             "sources": response.get("sources", []),
+            "cached": response.get("cached", False),
             "conversation_id": conversation.id,
-            "conversation_title": conversation.title
+            "conversation_title": conversation_title,
+            "title_pending": title_future is not None and conversation_title is None
         })
         
     except Exception as e:
@@ -284,14 +254,36 @@ def chatbot_ask(request):
             "message": "An error occurred processing your request. Please try again later."
         }, status=500)
 
-def handle_streaming_response(chatbot, message, conversation, user_message, generate_title):
+def get_ready_title(title_future):
+    """Return the generated title if the background task has finished, otherwise None"""
+    if title_future is None or not title_future.done():
+        return None
+    try:
+        return title_future.result()
+    except Exception as e:
+        logger.error(f"Error in background title generation: {str(e)}")
+        return None
+
+def title_json(title):
+    return json.dumps({
+        "type": "title",
+        "title": title
+    }) + "\n"
+
+def handle_streaming_response(chatbot, message, conversation, title_future=None, use_cache=True, simple_title=None):
     """
-    Handle streaming response from chatbot
+    Handle streaming response from chatbot.
+    
+    Title generation (if requested) already runs in the background; its
+    title event is sent as soon as it is ready. The completion event does
+    not wait for it: if the title is still pending, the stream ends with
+    title_pending set and the chat UI polls the conversation for the title,
+    so the worker is not held. (ahandle_streaming_response can keep the
+    stream open, since waiting there does not pin a thread.)
     """
     try:
-        # Determine if we need to generate a title
-        is_first_message = conversation.messages.count() <= 1  # Only user message
-        needs_ai_title = is_first_message or conversation.title == PENDING_AI_TITLE
+        # Answers can only be cached/reused for questions without prior context
+        use_cache = use_cache and chatbot.can_use_cache()
         
         # Create a generator that yields response chunks
         def response_generator():
@@ -299,22 +291,40 @@ def handle_streaming_response(chatbot, message, conversation, user_message, gene
             yield json.dumps({
                 "type": "metadata",
                 "conversation_id": conversation.id,
-                "initial_title": "Processing..." if needs_ai_title else conversation.title
+                "initial_title": "Processing..." if title_future is not None else conversation.title
             }) + "\n"
             
+            if simple_title:
+                yield title_json(simple_title)
+            
             # Response content
             full_response = ""
-            title_stream_started = False
+            title_sent = title_future is None
+            
+            def title_event():
+                title = get_ready_title(title_future)
+                return title_json(title) if title else None
             
-            # Stream the main response
+            # Stream the main response (or send a database/cached answer instantly)
             try:
-                for chunk in chatbot.stream_response(message):
+                routed = chatbot.route_query(message)
+                cached = chatbot.get_cached_response(message) if use_cache and routed is None else None
+                direct = routed or cached
+                chunks = [direct["answer"]] if direct else chatbot.stream_response(message)
+                
+                for chunk in chunks:
                     full_response += chunk
                     yield json.dumps({
                         "type": "content",
                         "chunk": chunk
                     }) + "\n"
                     
+                    if not title_sent:
+                        event = title_event()
+                        if event:
+                            title_sent = True
+                            yield event
+                    
                 # Save the full response to the database
                 bot_message = ChatMessage.objects.create(
                     conversation=conversation,
@@ -322,99 +332,36 @@ def handle_streaming_response(chatbot, message, conversation, user_message, gene
                     content=full_response
                 )
                 
-                # Stream title generation if needed
-                if generate_title and needs_ai_title:
-                    yield json.dumps({
-                        "type": "status",
-                        "message": "Generating title..."
-                    }) + "\n"
-                    
-                    title_stream_started = True
-                    title_prompt = f"""
-                    Create a concise, descriptive title (3-5 words) for this conversation based on the user's query and AI response below.
-                    The title should reflect the main topic or intent of the conversation.
-                    Do not include phrases like 'Title:', 'Chat about:', or similar prefixes.
-                    Just return the title itself, nothing else.
-                    
-                    User: {user_message.content}
-                    AI: {full_response}
-                    
-                    Examples:
-                    - "Data Analysis Project Plan"
-                    - "Python Error Debugging"
-                    - "Marketing Strategy Ideas"
-                    - "React Component Design"
-                    
-                    Title:
-                    """
-                    
-                    # Stream title generation
-                    raw_title_chunks = []
-                    for title_chunk in chatbot.stream_title_generation(title_prompt):
-                        raw_title_chunks.append(title_chunk)
-                        yield json.dumps({
-                            "type": "title_progress",
-                            "chunk": title_chunk
-                        }) + "\n"
-                    
-                    # Process the complete title
-                    raw_title = "".join(raw_title_chunks)
-                    
-                    # Clean the title (remove common prefixes, quotes, etc.)
-                    title = raw_title.strip()
-                    for prefix in ["Title:", "title:", "Title", "TITLE:", "TITLE", "Chat Title:", "Chat title:"]:
-                        if title.startswith(prefix):
-                            title = title[len(prefix):].strip()
-                    
-                    # Remove quotes if they wrap the entire title
-                    if (title.startswith('"') and title.endswith('"')) or (title.startswith("'") and title.endswith("'")):
-                        title = title[1:-1].strip()
-                    
-                    # Ensure title is not empty and not too long
-                    if not title or len(title) < 3:
-                        # Fallback: use first few words of the user message
-                        truncated_message = " ".join(user_message.content.split()[:5])
-                        title = truncated_message + "..." if len(user_message.content.split()) > 5 else truncated_message
-                    elif len(title) > 100:
-                        title = title[:97] + "..."
-                    
-                    # Update the conversation title in the database
-                    conversation.title = title
-                    conversation.save()
-                    
-                    # Send the final title
-                    yield json.dumps({
-                        "type": "title",
-                        "title": title
-                    }) + "\n"
-                elif is_first_message:
-                    # If no AI title requested but it's the first message, use first message
-                    words = message.split()[:3]
-                    simple_title = " ".join(words) + "..."
-                    conversation.title = simple_title
-                    conversation.save()
-                    
-                    yield json.dumps({
-                        "type": "title",
-                        "title": simple_title
-                    }) + "\n"
-                
                 # Update conversation.updated_at
                 conversation.save(update_fields=['updated_at'])
                 
                 # Final metadata with sources
                 sources = []
-                # Try to extract sources from the chatbot's RAG results
-                try:
-                    # Use direct query to get sources (this would be available after the streaming)
-                    direct_response = chatbot.get_response(message)
-                    sources = direct_response.get("sources", [])
-                except Exception as e:
-                    logger.error(f"Error getting sources: {str(e)}")
+                if direct:
+                    sources = direct["sources"]
+                else:
+                    # Try to extract sources from the chatbot's RAG results
+                    try:
+                        # Use direct query to get sources (this would be available after the streaming)
+                        direct_response = chatbot.get_response(message, use_cache=False)
+                        sources = direct_response.get("sources", [])
+                    except Exception as e:
+                        logger.error(f"Error getting sources: {str(e)}")
+                    
+                    if use_cache:
+                        chatbot.cache_response(message, full_response, sources)
+                
+                if not title_sent:
+                    event = title_event()
+                    if event:
+                        title_sent = True
+                        yield event
                 
                 yield json.dumps({
                     "type": "completion",
-                    "sources": sources
+                    "sources": sources,
+                    "cached": bool(cached),
+                    "title_pending": not title_sent
                 }) + "\n"
                 
             except Exception as e:
@@ -436,17 +383,10 @@ def handle_streaming_response(chatbot, message, conversation, user_message, gene
                     "message": error_message
                 }) + "\n"
                 
-                # Set a fallback title if needed
-                if needs_ai_title and not title_stream_started:
-                    truncated_message = " ".join(message.split()[:5])
-                    title = truncated_message + "..." if len(message.split()) > 5 else truncated_message
-                    conversation.title = title
-                    conversation.save()
-                    
-                    yield json.dumps({
-                        "type": "title",
-                        "title": title
-                    }) + "\n"
+                if not title_sent:
+                    event = title_event()
+                    if event:
+                        yield event
         
         return StreamingHttpResponse(
             response_generator(),
@@ -460,6 +400,239 @@ def handle_streaming_response(chatbot, message, conversation, user_message, gene
             "message": "Failed to set up streaming response"
         }, status=500)
 
+@login_required
+@ensure_csrf_cookie
+@require_http_methods(["POST"])
+async def chatbot_ask_async(request):
+    """
+    Async version of chatbot_ask, used when the project is served through
+    ASGI (tagwisebackend/asgi.py). Accepts the same request body.
+    
+    LLM calls use ainvoke/astream so a waiting request does not hold a
+    worker thread; only ORM work runs through sync_to_async.
+    """
+    try:
+        # Check if Gemini API key is available
+        api_key = os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            logger.error("GEMINI_API_KEY environment variable is not set")
+            return JsonResponse({
+                "status": "error", 
+                "message": "API configuration is missing. Please contact the administrator."
+            }, status=500)
+        
+        # Parse request body
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({
+                "status": "error", 
+                "message": "Invalid JSON in request body"
+            }, status=400)
+            
+        message = data.get("message", "").strip()
+        category = data.get("category", None)
+        conversation_id = data.get("conversation_id", None)
+        generate_title = data.get("generate_title", False)
+        stream_response = data.get("stream", False)
+        bypass_cache = data.get("bypass_cache", False)
+        
+        if not message:
+            return JsonResponse({
+                "status": "error", 
+                "message": "No message provided"
+            }, status=400)
+        
+        user = await request.auser()
+        conversation = await sync_to_async(get_or_create_conversation)(user, conversation_id)
+        
+        # Create chatbot instance (loading the FAISS index is file I/O, not ORM, so it
+        # runs outside the shared ORM thread)
+        try:
+            chatbot = await sync_to_async(BookmarkChatbot, thread_sensitive=False)(user.id)
+            await sync_to_async(load_conversation_memory)(chatbot, conversation)
+        except Exception as e:
+            logger.error(f"Error creating chatbot instance: {str(e)}")
+            return JsonResponse({
+                "status": "error", 
+                "message": "Failed to initialize chatbot. Please try again later."
+            }, status=500)
+        
+        # Apply category filter if provided (it may load the filter index from disk)
+        if category:
+            try:
+                await sync_to_async(chatbot.filter_by_category, thread_sensitive=False)(category)
+            except Exception as e:
+                logger.error(f"Error applying category filter: {str(e)}")
+        
+        if bypass_cache:
+            answer_cache.record_bypass()
+        
+        title_future, simple_title = await sync_to_async(start_conversation_turn)(conversation, message, generate_title, api_key)
+        
+        if stream_response:
+            return ahandle_streaming_response(chatbot, message, conversation, title_future,
+                                              use_cache=not bypass_cache, simple_title=simple_title)
+        
+        try:
+            response = await chatbot.aget_response(message, use_cache=not bypass_cache)
+        except Exception as e:
+            logger.error(f"Error in chatbot response: {str(e)}")
+            response = {
+                "answer": "I'm sorry, I encountered an error processing your request. Please try again later.",
+                "sources": []
+            }
+        
+        await ChatMessage.objects.acreate(
+            conversation=conversation,
+            is_user=False,
+            content=response["answer"]
+        )
+        await conversation.asave(update_fields=['updated_at'])
+        
+        if title_future is not None:
+            conversation_title = get_ready_title(title_future)
+        else:
+            conversation_title = conversation.title
+        
+        return JsonResponse({
+            "status": "success",
+            "message": response["answer"],
+            "sources": response.get("sources", []),
+            "cached": response.get("cached", False),
+            "conversation_id": conversation.id,
+            "conversation_title": conversation_title,
+            "title_pending": title_future is not None and conversation_title is None
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in chatbot_ask_async: {str(e)}")
+        return JsonResponse({
+            "status": "error", 
+            "message": "An error occurred processing your request. Please try again later."
+        }, status=500)
+
+def ahandle_streaming_response(chatbot, message, conversation, title_future=None, use_cache=True, simple_title=None):
+    """
+    Async version of handle_streaming_response. Returns a StreamingHttpResponse
+    over an async generator, so the stream does not pin a worker thread while
+    waiting on the LLM.
+    """
+    use_cache = use_cache and chatbot.can_use_cache()
+    
+    def title_event():
+        title = get_ready_title(title_future)
+        return title_json(title) if title else None
+    
+    async def wait_title_event():
+        """Title event once the background task finishes, waiting at most TITLE_WAIT_TIMEOUT seconds"""
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(title_future)), TITLE_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Title was not ready within {TITLE_WAIT_TIMEOUT}s, it will be saved in the background")
+        except Exception:
+            pass  # logged by get_ready_title
+        return title_event()
+    
+    async def response_generator():
+        yield json.dumps({
+            "type": "metadata",
+            "conversation_id": conversation.id,
+            "initial_title": "Processing..." if title_future is not None else conversation.title
+        }) + "\n"
+        
+        if simple_title:
+            yield title_json(simple_title)
+        
+        full_response = ""
+        title_sent = title_future is None
+        
+        try:
+            routed = await chatbot.aroute_query(message)
+            cached = await chatbot.aget_cached_response(message) if use_cache and routed is None else None
+            direct = routed or cached
+            
+            if direct:
+                full_response = direct["answer"]
+                yield json.dumps({
+                    "type": "content",
+                    "chunk": full_response
+                }) + "\n"
+            else:
+                async for chunk in chatbot.astream_response(message):
+                    full_response += chunk
+                    yield json.dumps({
+                        "type": "content",
+                        "chunk": chunk
+                    }) + "\n"
+                    
+                    if not title_sent:
+                        event = title_event()
+                        if event:
+                            title_sent = True
+                            yield event
+            
+            await ChatMessage.objects.acreate(
+                conversation=conversation,
+                is_user=False,
+                content=full_response
+            )
+            await conversation.asave(update_fields=['updated_at'])
+            
+            # Sources come with the streamed chain output, no second LLM call is needed
+            if direct:
+                sources = direct["sources"]
+            else:
+                sources = getattr(chatbot, "last_sources", [])
+                if use_cache:
+                    chatbot.cache_response(message, full_response, sources)
+            
+            if not title_sent:
+                event = title_event()
+                if event:
+                    title_sent = True
+                    yield event
+            
+            yield json.dumps({
+                "type": "completion",
+                "sources": sources,
+                "cached": bool(cached),
+                "title_pending": not title_sent
+            }) + "\n"
+            
+            if not title_sent:
+                # The answer is complete; keep the stream open until the title arrives
+                event = await wait_title_event()
+                if event:
+                    title_sent = True
+                    yield event
+            
+        except Exception as e:
+            logger.error(f"Error in async streaming response: {str(e)}")
+            error_message = "I'm sorry, I encountered an error processing your request."
+            
+            if not full_response:
+                await ChatMessage.objects.acreate(
+                    conversation=conversation,
+                    is_user=False,
+                    content=error_message
+                )
+            
+            yield json.dumps({
+                "type": "error",
+                "message": error_message
+            }) + "\n"
+            
+            if not title_sent:
+                event = title_event()
+                if event:
+                    yield event
+    
+    return StreamingHttpResponse(
+        response_generator(),
+        content_type='application/json'
+    )
+
 @login_required
 @ensure_csrf_cookie
 @require_http_methods(["GET"])
@@ -474,9 +647,9 @@ def get_conversations(request):
             # Get first message content to use as title if needed
             try:
                 first_message = conv.messages.filter(is_user=True).earliest('created_at').content
-                title = conv.title or first_message[:50]
+                title = conv.title if conv.title != PENDING_AI_TITLE else first_message[:50]
             except ChatMessage.DoesNotExist:
-                title = conv.title or "New conversation"
+                title = conv.title if conv.title != PENDING_AI_TITLE else "New conversation"
                 
             result.append({
                 "id": conv.id,
@@ -624,6 +797,21 @@ def rename_conversation(request, conversation_id):
             "message": "Failed to rename conversation"
         }, status=500)
 
+@login_required
+@require_http_methods(["GET"])
+def chatbot_cache_stats(request):
+    """Return hit/miss metrics of the semantic answer cache (superusers only)"""
+    if not request.user.is_superuser:
+        return JsonResponse({
+            "status": "error",
+            "message": "Permission denied"
+        }, status=403)
+    
+    return JsonResponse({
+        "status": "success",
+        "stats": answer_cache.get_stats()
+    })
+
 @login_required
 @ensure_csrf_cookie
 @require_http_methods(["POST"])
@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tagwisebackend.settings')
 
+# Serve chat streaming and URL analysis with the async views, e.g.
+#   gunicorn tagwisebackend.asgi:application -k uvicorn.workers.UvicornWorker
+os.environ.setdefault('TAGWISE_ASYNC_VIEWS', 'true')
+
 application = get_asgi_application()
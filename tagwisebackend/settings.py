@@ -96,6 +96,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'tagwisebackend.wsgi.application'
+ASGI_APPLICATION = 'tagwisebackend.asgi.application'
+
+# Use the async chat/URL analysis views (set automatically when served through asgi.py)
+ASYNC_VIEWS = os.environ.get('TAGWISE_ASYNC_VIEWS', 'false').lower() in ('1', 'true', 'yes')
 
 
 # Database